@@ -181,34 +181,6 @@ for tool_slug in "${EXTERNAL_TOOLS[@]}"; do
 			git -C "${tool_path}" pull -q 2>/dev/null || log_debug "Could not update ${tool_name}"
 		fi
 	fi
-	
-	# Build OMCDecoder binary if it doesn't exist
-	if [[ "${tool_name}" == "OMCDecoder" ]] && [[ -d "${tool_path}" ]]; then
-		if [[ ! -f "${UTILSDIR}/bin/omcdecoder" ]] || [[ ! -x "${UTILSDIR}/bin/omcdecoder" ]]; then
-			log_info "Building OMCDecoder binary..."
-			if [[ "${DUMPRX_DRY_RUN}" != "true" ]]; then
-				if command -v clang++ >/dev/null 2>&1; then
-					(cd "${tool_path}" && clang++ -lz -I./include decoder.cpp -o omcdecoder 2>/dev/null) || log_warn "Failed to build OMCDecoder"
-					if [[ -f "${tool_path}/omcdecoder" ]]; then
-						cp "${tool_path}/omcdecoder" "${UTILSDIR}/bin/omcdecoder" 2>/dev/null
-						chmod +x "${UTILSDIR}/bin/omcdecoder" 2>/dev/null
-						log_success "OMCDecoder binary built successfully"
-					fi
-				elif command -v g++ >/dev/null 2>&1; then
-					(cd "${tool_path}" && g++ -lz -I./include decoder.cpp -o omcdecoder 2>/dev/null) || log_warn "Failed to build OMCDecoder"
-					if [[ -f "${tool_path}/omcdecoder" ]]; then
-						cp "${tool_path}/omcdecoder" "${UTILSDIR}/bin/omcdecoder" 2>/dev/null
-						chmod +x "${UTILSDIR}/bin/omcdecoder" 2>/dev/null
-						log_success "OMCDecoder binary built successfully"
-					fi
-				else
-					log_warn "No C++ compiler found, cannot build OMCDecoder"
-				fi
-			fi
-		else
-			log_debug "OMCDecoder binary already exists"
-		fi
-	fi
 done
 
 log_success "External tools ready"
@@ -217,6 +189,7 @@ log_success "External tools ready"
 # Set Utility Program Alias
 SDAT2IMG="${UTILSDIR}"/sdat2img.py
 SIMG2IMG="${UTILSDIR}"/bin/simg2img
+SPARSEIMG="${UTILSDIR}"/sparseimg.py
 PACKSPARSEIMG="${UTILSDIR}"/bin/packsparseimg
 UNSIN="${UTILSDIR}"/unsin
 PAYLOAD_EXTRACTOR="${UTILSDIR}"/bin/payload-dumper-go
@@ -228,6 +201,10 @@ OFP_QC_DECRYPT="${UTILSDIR}"/oppo_decrypt/ofp_qc_decrypt.py
 OFP_MTK_DECRYPT="${UTILSDIR}"/oppo_decrypt/ofp_mtk_decrypt.py
 OPSDECRYPT="${UTILSDIR}"/oppo_decrypt/opscrypto.py
 LPUNPACK="${UTILSDIR}"/lpunpack
+SUPERIMG="${UTILSDIR}"/superimg.py
+EXT4IMG="${UTILSDIR}"/ext4img.py
+EROFSIMG="${UTILSDIR}"/erofsimg.py
+F2FSIMG="${UTILSDIR}"/f2fsimg.py
 SPLITUAPP="${UTILSDIR}"/splituapp.py
 PACEXTRACTOR="${UTILSDIR}"/pacextractor/python/pacExtractor.py
 NB0_EXTRACT="${UTILSDIR}"/nb0-extract
@@ -241,8 +218,53 @@ AFPTOOL_EXTRACT="${UTILSDIR}"/bin/afptool
 RK_EXTRACT="${UTILSDIR}"/bin/rkImageMaker
 TRANSFER="${UTILSDIR}"/bin/transfer
 OMCDECODER="${UTILSDIR}"/omcdecoder.py
+ARCHIVE_INDEX="${UTILSDIR}"/archive_index.py
+IMGSNIFF="${UTILSDIR}"/imgsniff.py
+PROPINDEX="${UTILSDIR}"/propindex.py
+BLOBHASH="${UTILSDIR}"/blobhash.py
+MANIFEST="${UTILSDIR}"/manifest.py
+SPLITFILES="${UTILSDIR}"/splitfiles.py
+BOARDINFO="${UTILSDIR}"/boardinfo.py
+TELEMETRY="${UTILSDIR}"/telemetry.py
+CHECKPOINT="${UTILSDIR}"/checkpoint.py
+IMGSTRIP="${UTILSDIR}"/imgstrip.py
 OMCDECODER_BIN="${UTILSDIR}"/bin/omcdecoder
 
+# Stage telemetry: timings.json and trace.json are written on exit. Nested
+# runs (bash "${0}" ...) inherit DUMPRX_TELEMETRY_FILE and only add stages
+TELEMETRY_SAMPLER=""
+function telemetry_finish() {
+	local status=$?
+	log_stage_end_all "${status}"
+	[[ -n "${TELEMETRY_SAMPLER}" ]] && kill "${TELEMETRY_SAMPLER}" 2>/dev/null
+	python3 "${TELEMETRY}" report "${DUMPRX_TELEMETRY_FILE}" -o "${DUMPRX_TELEMETRY_DIR}"/timings.json \
+		--trace "${DUMPRX_TELEMETRY_DIR}"/trace.json \
+		&& log_info "Stage timings: ${DUMPRX_TELEMETRY_DIR}/timings.json"
+	return "${status}"
+}
+
+if [[ "${DUMPRX_TELEMETRY}" == "true" && -z "${DUMPRX_TELEMETRY_FILE}" ]]; then
+	DUMPRX_TELEMETRY_DIR="${DUMPRX_TELEMETRY_DIR:-${PROJECT_DIR}/telemetry}"
+	if util_mkdir "${DUMPRX_TELEMETRY_DIR}"; then
+		export DUMPRX_TELEMETRY_FILE="${DUMPRX_TELEMETRY_DIR}/events.jsonl"
+		: > "${DUMPRX_TELEMETRY_FILE}"
+		python3 "${TELEMETRY}" sample --pid $$ OUTDIR="${OUTDIR}" TMPDIR="${TMPDIR}" &
+		TELEMETRY_SAMPLER=$!
+		# Not a job of this shell, so waiting for partition jobs never waits for it
+		disown "${TELEMETRY_SAMPLER}" 2>/dev/null
+		trap telemetry_finish EXIT
+		log_stage_begin dump
+	fi
+fi
+
+# Stage checkpoints, kept in ${OUTDIR}/.dumprx_state.json: a rerun of the
+# same firmware skips the stages that completed and whose outputs are intact
+function checkpoint(){
+	# Usage: checkpoint <input|check|save|get|reset> [checkpoint.py options]
+	python3 "${CHECKPOINT}" "${OUTDIR}" "$@"
+}
+[[ "${DUMPRX_RESUME}" == "true" ]] || checkpoint reset
+
 if ! command -v 7zz > /dev/null 2>&1; then
 	BIN_7ZZ="${UTILSDIR}"/bin/7zz
 else
@@ -256,6 +278,8 @@ fi
 # Set Names of Downloader Utility Programs
 MEGAMEDIADRIVE_DL="${UTILSDIR}"/downloaders/mega-media-drive_dl.sh
 AFHDL="${UTILSDIR}"/downloaders/afh_dl.py
+SEGMENTED="${UTILSDIR}"/downloaders/segmented.py
+REMOTEZIP="${UTILSDIR}"/remotezip.py
 
 # EROFS
 FSCK_EROFS=${UTILSDIR}/bin/fsck.erofs
@@ -291,27 +315,36 @@ else
 		URL=${FIRMWARE_INPUT}
 		util_mkdir "${INPUTDIR}" || exit 1
 		cd "${INPUTDIR}/" || exit 1
-		util_remove "${INPUTDIR:?}"/*
 		
-		# Download using the new downloader library
-		if ! download_file "${URL}" "${INPUTDIR}"; then
-			log_fatal "Download failed"
-			exit 1
+		if checkpoint check download --any-input -p "${URL}"; then
+			log_info "Resuming: firmware already downloaded"
+		else
+			util_remove "${INPUTDIR:?}"/*
+			
+			# Download using the new downloader library
+			log_stage_begin download
+			if ! download_file "${URL}" "${INPUTDIR}"; then
+				log_fatal "Download failed"
+				exit 1
+			fi
+			log_stage_end download
+			
+			# Sanitize filenames
+			for f in *; do
+				if [[ -f "${f}" ]]; then
+					if util_command_exists detox; then
+						detox -r "${f}" 2>/dev/null
+					fi
+				fi
+			done
+			
+			checkpoint save download --any-input -p "${URL}" -o "${INPUTDIR}"
 		fi
 		
 		unset URL
 		
-		# Sanitize filenames
-		for f in *; do
-			if [[ -f "${f}" ]]; then
-				if util_command_exists detox; then
-					detox -r "${f}" 2>/dev/null
-				fi
-			fi
-		done
-		
 		# Input File Variables
-		FILEPATH=$(find "$(pwd)" -maxdepth 1 -type f 2>/dev/null)
+		FILEPATH=$(find "$(pwd)" -maxdepth 1 -type f ! -name '.*' 2>/dev/null)
 		log_info "Working with: ${FILEPATH##*/}"
 		
 		# Check if multiple files or directory
@@ -390,26 +423,96 @@ fi
 
 cd "${PROJECT_DIR}/" || exit
 
+# Archive listing: the firmware archive is listed once by archive_index.py
+# (manifest cached in TMPDIR) and kept in memory for every later query
+ARCHIVE_INDEX_FILE=""
+ARCHIVE_INDEX_NAMES=""
+
+function archive_index_load() {
+	local archive="$1"
+	ARCHIVE_INDEX_FILE="${archive}"
+	ARCHIVE_INDEX_NAMES=""
+	if [[ -f "${archive}" ]]; then
+		ARCHIVE_INDEX_NAMES=$(python3 "${ARCHIVE_INDEX}" "${archive}" -m "${TMPDIR}"/archive_index.json --7zz "${BIN_7ZZ}" ls 2>/dev/null)
+	fi
+}
+
+# Print member names of an archive, one per line (the name column of 7zz l -ba)
+function archive_ls() {
+	local archive="$1"
+	if [[ "${archive}" != "${ARCHIVE_INDEX_FILE}" ]]; then
+		[[ -f "${archive}" ]] && python3 "${ARCHIVE_INDEX}" "${archive}" --7zz "${BIN_7ZZ}" ls 2>/dev/null
+		return 0
+	fi
+	[[ -n "${ARCHIVE_INDEX_NAMES}" ]] && printf '%s\n' "${ARCHIVE_INDEX_NAMES}"
+	return 0
+}
+
+# Extract every member matching the given globs into the current directory in
+# one batch: zip/tar members concurrently, 7z/rar in a single 7zz pass.
+# Options (e.g. --rename REGEX REPL) are passed through to archive_index.py
+function archive_extract() {
+	local archive="$1"
+	shift
+	[[ -f "${archive}" ]] || return 1
+	local -a manifest_args=()
+	[[ "${archive}" == "${ARCHIVE_INDEX_FILE}" ]] && manifest_args=(-m "${TMPDIR}"/archive_index.json)
+	python3 "${ARCHIVE_INDEX}" "${archive}" "${manifest_args[@]}" --7zz "${BIN_7ZZ}" extract -o . "$@" >> "${TMPDIR}"/zip.log 2>&1
+}
+
+# Expand sparse image(s) to a raw image: sparse_to_raw [--move-raw] <sparse>... <raw>
+# With --move-raw a single raw input is moved into place instead of copied
+function sparse_to_raw() {
+	local -a args=("$@")
+	[[ "${args[0]}" == "--move-raw" ]] && args=("${args[@]:1}")
+	python3 "${SPARSEIMG}" "$@" >/dev/null 2>>"${TMPDIR}"/extract.log && return 0
+	log_debug "sparseimg.py failed on ${args[*]:0:${#args[@]}-1}, trying simg2img"
+	"${SIMG2IMG}" "${args[@]}" 2>/dev/null
+}
+
+# Sparse chunks (sparsechunk.N, super.N.img, super_*) that make up super.img
+SUPER_CHUNKS=()
+
 # Function for Extracting Super Images
 function superimage_extract() {
 	log_step "Extracting partitions from Super image"
-	if [ -f super.img ]; then
-		log_debug "Converting sparse super image to raw"
-		${SIMG2IMG} super.img super.img.raw 2>/dev/null
-	fi
-	if [[ ! -s super.img.raw ]] && [ -f super.img ]; then
-		mv super.img super.img.raw
+	local -a super_src=()
+	if [[ -s super.img.raw ]]; then
+		super_src=(super.img.raw)
+	elif [[ ${#SUPER_CHUNKS[@]} -gt 0 ]]; then
+		super_src=("${SUPER_CHUNKS[@]}")
+	elif [ -f super.img ]; then
+		super_src=(super.img)
+	fi
+	# Read logical partitions straight out of the (sparse, chunked or raw) image
+	if [[ ${#super_src[@]} -gt 0 ]] && python3 "${SUPERIMG}" "${super_src[@]}" -o . -p "${PARTITIONS}" 2>>"${TMPDIR}"/extract.log >/dev/null; then
+		log_debug "Extracted logical partitions from ${super_src[*]} in place"
+	else
+		log_debug "In-place super reader failed, falling back to a raw copy + lpunpack"
+		if [[ ${#SUPER_CHUNKS[@]} -gt 0 ]]; then
+			log_debug "Merging sparse super chunks into a raw image"
+			sparse_to_raw "${SUPER_CHUNKS[@]}" super.img.raw
+		elif [ -f super.img ]; then
+			log_debug "Converting sparse super image to raw"
+			sparse_to_raw --move-raw super.img super.img.raw
+		fi
+		if [[ ! -s super.img.raw ]] && [ -f super.img ]; then
+			mv super.img super.img.raw
+		fi
+		for partition in $PARTITIONS; do
+			[[ -f "$partition".img ]] && continue
+			($LPUNPACK --partition="$partition"_a super.img.raw || $LPUNPACK --partition="$partition" super.img.raw) 2>/dev/null
+			[ -f "$partition"_a.img ] && mv "$partition"_a.img "$partition".img
+		done
 	fi
+	local -a missing=()
 	for partition in $PARTITIONS; do
-		($LPUNPACK --partition="$partition"_a super.img.raw || $LPUNPACK --partition="$partition" super.img.raw) 2>/dev/null
-		if [ -f "$partition"_a.img ]; then
-			mv "$partition"_a.img "$partition".img
-		else
-			foundpartitions=$(${BIN_7ZZ} l -ba "${FILEPATH}" | rev | gawk '{ print $1 }' | rev | grep "$partition".img)
-			${BIN_7ZZ} e -y "${FILEPATH}" "$foundpartitions" dummypartition 2>/dev/null >> "$TMPDIR"/zip.log
-		fi
+		[ ! -f "$partition".img ] && missing+=("$partition".img)
 	done
+	[[ ${#missing[@]} -gt 0 ]] && archive_extract "${FILEPATH}" "${missing[@]}"
 	rm -rf super.img.raw
+	[[ ${#SUPER_CHUNKS[@]} -gt 0 ]] && rm -f -- "${SUPER_CHUNKS[@]}"
+	SUPER_CHUNKS=()
 	log_success "Super image extraction completed"
 }
 
@@ -422,6 +525,24 @@ function detect_filesystem() {
 	local img_file="$1"
 	local fs_type=""
 	
+	# Read the superblock locations with imgsniff.py; reuse the batch result
+	# from IMGSNIFF_CACHE while the image is unchanged
+	local stamp
+	stamp="$(stat -c '%s:%Y' "${img_file}" 2>/dev/null)"
+	if [[ -s "${IMGSNIFF_CACHE:-}" ]]; then
+		fs_type=$(jq -r --arg f "${img_file}" --arg s "${stamp}" '.[$f] | select(.stamp == $s) | .type' "${IMGSNIFF_CACHE}" 2>/dev/null)
+	fi
+	if [[ -z "${fs_type}" ]]; then
+		fs_type=$(python3 "${IMGSNIFF}" --type-only "${img_file}" 2>/dev/null)
+	fi
+	case "${fs_type}" in
+		sparse|ext4|erofs|f2fs|squashfs|boot|vendor_boot|dtbo|super)
+			echo "${fs_type}"
+			return 0
+			;;
+	esac
+	fs_type=""
+	
 	# Check for sparse image first
 	if file "${img_file}" | grep -q "Android sparse image"; then
 		echo "sparse"
@@ -452,6 +573,20 @@ function detect_filesystem() {
 	fi
 }
 
+# Detect the filesystem inside a sparse image (ext4, erofs, f2fs or unknown)
+function detect_sparse_filesystem() {
+	local img_file="$1"
+	local inner="" stamp
+	stamp="$(stat -c '%s:%Y' "${img_file}" 2>/dev/null)"
+	if [[ -s "${IMGSNIFF_CACHE:-}" ]]; then
+		inner=$(jq -r --arg f "${img_file}" --arg s "${stamp}" '.[$f] | select(.stamp == $s) | .inner // empty' "${IMGSNIFF_CACHE}" 2>/dev/null)
+	fi
+	if [[ -z "${inner}" ]]; then
+		inner=$(python3 "${IMGSNIFF}" "${img_file}" 2>/dev/null | jq -r '.[] | .inner // empty' 2>/dev/null)
+	fi
+	echo "${inner:-unknown}"
+}
+
 # Extract partition using 7z
 function extract_with_7z() {
 	local partition="$1"
@@ -491,6 +626,49 @@ function extract_with_7z() {
 	fi
 }
 
+# Extract partition with a rootless image reader (ext4img.py, erofsimg.py,
+# f2fsimg.py); owners, modes, capabilities and SELinux labels go to
+# fs_config sidecars. Compressed images need the modules in
+# utils/requirements.txt (installed by setup.sh)
+function extract_with_image_reader() {
+	local reader="$1"
+	local partition="$2"
+	local img_file="$3"
+	local output_dir="$4"
+	local name
+	name=$(basename "${reader}")
+	
+	log_debug "Attempting extraction with ${name}..."
+	
+	mkdir -p "${OUTDIR}"/fs_config 2>/dev/null
+	if python3 "${reader}" "${img_file}" -o "${output_dir}" --prefix "${partition}" \
+		--fs-config "${OUTDIR}/fs_config/${partition}_fs_config" \
+		--file-contexts "${OUTDIR}/fs_config/${partition}_file_contexts" >/dev/null 2>>"${TMPDIR}"/extract.log; then
+		log_debug "Successfully extracted with ${name}"
+		return 0
+	fi
+	log_debug "${name} extraction failed"
+	rm -f "${OUTDIR}/fs_config/${partition}_fs_config" "${OUTDIR}/fs_config/${partition}_file_contexts"
+	# Leave an empty directory for the fallback extractor
+	rm -rf "${output_dir:?}"/* 2>/dev/null
+	return 1
+}
+
+# Extract partition using the rootless ext4 reader
+function extract_with_ext4img() {
+	extract_with_image_reader "${EXT4IMG}" "$@"
+}
+
+# Extract partition using the rootless EROFS reader, decompressing on all cores
+function extract_with_erofsimg() {
+	extract_with_image_reader "${EROFSIMG}" "$@"
+}
+
+# Extract partition using the rootless F2FS reader
+function extract_with_f2fsimg() {
+	extract_with_image_reader "${F2FSIMG}" "$@"
+}
+
 # Extract partition using fsck.erofs
 function extract_with_erofs() {
 	local partition="$1"
@@ -593,6 +771,7 @@ function extract_with_mount() {
 	local partition="$1"
 	local img_file="$2"
 	local output_dir="$3"
+	local offset="${4:-0}"
 	local temp_mount="${output_dir}_mount_tmp"
 	
 	log_debug "Attempting extraction with mount loop..."
@@ -603,9 +782,11 @@ function extract_with_mount() {
 	# Try to mount with specific filesystem types (including f2fs as fallback)
 	local mount_success=false
 	local fs_types=("auto" "erofs" "ext4" "f2fs")
+	local mount_opts="loop,ro"
+	[[ "${offset}" != "0" ]] && mount_opts+=",offset=${offset}"
 	
 	for fs_type in "${fs_types[@]}"; do
-		if sudo mount -o loop,ro -t "${fs_type}" "${img_file}" "${temp_mount}" 2>/dev/null; then
+		if sudo mount -o "${mount_opts}" -t "${fs_type}" "${img_file}" "${temp_mount}" 2>/dev/null; then
 			log_debug "Successfully mounted ${partition} as ${fs_type}"
 			mount_success=true
 			break
@@ -618,16 +799,10 @@ function extract_with_mount() {
 		return 1
 	fi
 	
-	# Copy contents using simple cp approach (memory efficient, proven to work)
+	# Copy contents straight into the output directory
 	log_info "Copying files from mount (this may take a while for large partitions)..."
-	
-	# Create temporary output directory for copying
-	local temp_output="${output_dir}_tmp"
-	mkdir -p "${temp_output}" 2>/dev/null
-	
-	# Copy files from mount to temporary directory
-	log_debug "Copying files from mount..."
-	sudo cp -rf "${temp_mount}/." "${temp_output}/" 2>/dev/null
+	mkdir -p "${output_dir}" 2>/dev/null
+	sudo cp -rf "${temp_mount}/." "${output_dir}/" 2>/dev/null
 	local cp_result=$?
 	
 	# Unmount the image
@@ -635,25 +810,14 @@ function extract_with_mount() {
 	rm -rf "${temp_mount}"
 	
 	if [ ${cp_result} -eq 0 ]; then
-		# Move files from temporary to final output directory
-		mkdir -p "${output_dir}" 2>/dev/null
-		if sudo cp -rf "${temp_output}/." "${output_dir}/" 2>/dev/null; then
-			sudo rm -rf "${temp_output}"
-			
-			# Fix permissions
-			sudo chown -R "$(whoami)" "${output_dir}/" 2>/dev/null
-			chmod -R u+rwX "${output_dir}/" 2>/dev/null
-			
-			log_debug "Successfully copied files from mount"
-			return 0
-		else
-			log_error "Failed to copy files from temporary directory to output directory"
-			sudo rm -rf "${temp_output}"
-			return 1
-		fi
+		# Fix permissions
+		sudo chown -R "$(whoami)" "${output_dir}/" 2>/dev/null
+		chmod -R u+rwX "${output_dir}/" 2>/dev/null
+		
+		log_debug "Successfully copied files from mount"
+		return 0
 	else
 		log_error "Failed to copy files from mount"
-		sudo rm -rf "${temp_output}"
 		return 1
 	fi
 }
@@ -685,10 +849,30 @@ function extract_partition_image() {
 	fs_type=$(detect_filesystem "${img_file}")
 	log_info "Detected filesystem: ${fs_type}"
 	
-	# Handle sparse images first
+	# Handle sparse images first; ext4, EROFS and F2FS are read straight from
+	# the sparse image by the reader for the filesystem inside it. A reader
+	# that failed is not run again on the converted image
+	local reader tried=""
+	if [[ "${fs_type}" == "sparse" ]]; then
+		local inner readers
+		inner=$(detect_sparse_filesystem "${img_file}")
+		log_debug "Sparse image contains: ${inner}"
+		case "${inner}" in
+			ext4|erofs|f2fs) readers="${inner}img" ;;
+			*) readers="ext4img erofsimg f2fsimg" ;;
+		esac
+		for reader in ${readers}; do
+			tried+=" ${reader}"
+			if "extract_with_${reader}" "${partition}" "${img_file}" "${output_dir}"; then
+				log_success "Extracted ${partition} with ${reader}.py"
+				rm -f "${img_file}" 2>/dev/null
+				return 0
+			fi
+		done
+	fi
 	if [[ "${fs_type}" == "sparse" ]]; then
 		log_info "Converting sparse image to raw..."
-		if "${SIMG2IMG}" "${img_file}" "${img_file}.raw" 2>/dev/null; then
+		if sparse_to_raw "${img_file}" "${img_file}.raw"; then
 			mv "${img_file}.raw" "${img_file}"
 			fs_type=$(detect_filesystem "${img_file}")
 			log_success "Sparse image converted, new filesystem: ${fs_type}"
@@ -697,11 +881,43 @@ function extract_partition_image() {
 		fi
 	fi
 	
+	# A vendor header that could not be collapsed in place is skipped by a
+	# loop mount offset; the other extractors need the image rewritten
+	local header_offset=0
+	local header_file
+	header_file="$(dirname "${img_file}")/.$(basename "${img_file}").offset"
+	[[ -s "${header_file}" ]] && header_offset=$(<"${header_file}")
+	if [[ "${header_offset}" != "0" ]]; then
+		log_info "Skipping ${header_offset}-byte header on ${partition}"
+		case "${fs_type}" in
+			erofs|f2fs) reader="${fs_type}img" ;;
+			*) reader="ext4img" ;;
+		esac
+		tried+=" ${reader}"
+		if "extract_with_${reader}" "${partition}" "${img_file}" "${output_dir}"; then
+			log_success "Extracted ${partition} with ${reader}.py"
+			rm -f "${img_file}" "${header_file}" 2>/dev/null
+			return 0
+		fi
+		if extract_with_mount "${partition}" "${img_file}" "${output_dir}" "${header_offset}"; then
+			log_success "Extracted ${partition} with mount loop"
+			rm -f "${img_file}" "${header_file}" 2>/dev/null
+			return 0
+		fi
+		python3 "${IMGSTRIP}" materialize "${img_file}" 2>>"${TMPDIR}"/extract.log || log_warn "Failed to strip header from ${partition}"
+	fi
+	
 	# Try extraction methods in order based on filesystem type
 	local extraction_success=false
 	
-	# For EROFS: Use fsck.erofs for extraction (native tool, most efficient)
+	# For EROFS: Use the parallel reader, then fsck.erofs as fallback
 	if [[ "${fs_type}" == "erofs" ]]; then
+		if [[ "${tried}" != *" erofsimg"* ]] && extract_with_erofsimg "${partition}" "${img_file}" "${output_dir}"; then
+			log_success "Extracted ${partition} with erofsimg.py"
+			rm -f "${img_file}" 2>/dev/null
+			extraction_success=true
+			return 0
+		fi
 		log_info "Trying fsck.erofs extraction for EROFS..."
 		if extract_with_erofs "${partition}" "${img_file}" "${output_dir}"; then
 			log_success "Extracted ${partition} with fsck.erofs"
@@ -713,8 +929,14 @@ function extract_partition_image() {
 		fi
 	fi
 	
-	# For ext4 or unknown: Try 7z first (fast), then mount
+	# For ext4 or unknown: Try the rootless reader first, then 7z, then mount
 	if [[ "${fs_type}" == "ext4" ]] || [[ "${fs_type}" == "unknown" ]]; then
+		if [[ "${tried}" != *" ext4img"* ]] && extract_with_ext4img "${partition}" "${img_file}" "${output_dir}"; then
+			log_success "Extracted ${partition} with ext4img.py"
+			rm -f "${img_file}" 2>/dev/null
+			extraction_success=true
+			return 0
+		fi
 		if extract_with_7z "${partition}" "${img_file}" "${output_dir}"; then
 			log_success "Extracted ${partition} with 7z"
 			rm -f "${img_file}" 2>/dev/null
@@ -725,8 +947,14 @@ function extract_partition_image() {
 		fi
 	fi
 	
-	# For F2FS: Try mount first (faster), then extract.f2fs as fallback
+	# For F2FS: Try the rootless reader first, then mount, then extract.f2fs
 	if [[ "${fs_type}" == "f2fs" ]]; then
+		if [[ "${tried}" != *" f2fsimg"* ]] && extract_with_f2fsimg "${partition}" "${img_file}" "${output_dir}"; then
+			log_success "Extracted ${partition} with f2fsimg.py"
+			rm -f "${img_file}" 2>/dev/null
+			extraction_success=true
+			return 0
+		fi
 		log_info "Trying mount loop extraction for F2FS..."
 		if extract_with_mount "${partition}" "${img_file}" "${output_dir}"; then
 			log_success "Extracted ${partition} with mount loop"
@@ -783,15 +1011,15 @@ function extract_partition_image() {
 		# Provide helpful error messages based on filesystem
 		case "${fs_type}" in
 			"erofs")
-				log_error "Methods tried: fsck.erofs"
+				log_error "Methods tried: erofsimg.py, fsck.erofs"
 				log_error "EROFS requires Linux kernel 5.4+ and fsck.erofs tool"
 				;;
 			"f2fs")
-				log_error "Methods tried: extract.f2fs, mount loop"
+				log_error "Methods tried: f2fsimg.py, mount loop, extract.f2fs"
 				log_error "F2FS extraction failed - image may be encrypted or corrupted"
 				;;
 			"ext4"|"unknown")
-				log_error "Methods tried: 7z, mount loop"
+				log_error "Methods tried: ext4img.py, 7z, mount loop"
 				log_error "Unknown filesystem - image may be encrypted or corrupted"
 				;;
 			*)
@@ -807,6 +1035,105 @@ function extract_partition_image() {
 	return 0
 }
 
+# Record an extracted partition; a successful extraction removes its image
+function checkpoint_partition() {
+	local partition="$1"
+	[[ -d "${partition}" && ! -f "${partition}.img" ]] || return 0
+	checkpoint save "partition/${partition}" -o "${partition}" \
+		--consumes "${partition}.img" --consumes ".${partition}.img.offset" \
+		|| log_warn "Could not record a checkpoint for ${partition}"
+	return 0
+}
+
+# Extract partitions concurrently, largest image first. Running jobs are
+# bounded by DUMPRX_EXTRACT_JOBS (default: CPU count) and by
+# DUMPRX_EXTRACT_IO_BUDGET, the total MiB of images in flight. Each job logs to
+# ${TMPDIR}/extract_jobs/<partition>.log; results are added to
+# partitions_extracted and partitions_failed
+function extract_partitions_parallel() {
+	local max_jobs="${DUMPRX_EXTRACT_JOBS:-0}"
+	[[ "${max_jobs}" =~ ^[0-9]+$ && "${max_jobs}" -gt 0 ]] || max_jobs=$(nproc 2>/dev/null || echo 1)
+	local io_budget=0
+	[[ "${DUMPRX_EXTRACT_IO_BUDGET:-0}" =~ ^[0-9]+$ ]] && io_budget=$((DUMPRX_EXTRACT_IO_BUDGET * 1024 * 1024))
+	local job_dir="${TMPDIR}/extract_jobs"
+	mkdir -p "${job_dir}"
+	
+	local -a queue=()
+	mapfile -t queue < <(for p in "$@"; do
+		[[ -f "${p}.img" ]] && printf '%s %s\n' "$(stat -c %s "${p}.img")" "${p}"
+	done | sort -rn)
+	[[ ${#queue[@]} -eq 0 ]] && return 0
+	
+	# Background jobs cannot answer a sudo prompt; without cached credentials
+	# their mount fallback fails fast and is retried in the foreground below
+	local sudo_ok=true
+	if command -v sudo >/dev/null 2>&1 && ! sudo -n true 2>/dev/null; then
+		sudo_ok=false
+	fi
+	
+	log_info "Extracting ${#queue[@]} partition(s) with up to ${max_jobs} parallel job(s)"
+	
+	local -A running=() running_size=()
+	local -a retry=()
+	local in_flight=0 entry size partition pid status
+	while [[ ${#queue[@]} -gt 0 || ${#running[@]} -gt 0 ]]; do
+		# Start every queued job that fits, largest first
+		local -a waiting=()
+		for entry in "${queue[@]}"; do
+			size=${entry%% *}
+			partition=${entry#* }
+			if [[ ${#running[@]} -ge ${max_jobs} ]] || { [[ ${io_budget} -gt 0 && ${#running[@]} -gt 0 ]] && [[ $((in_flight + size)) -gt ${io_budget} ]]; }; then
+				waiting+=("${entry}")
+				continue
+			fi
+			rm -f "${job_dir}/${partition}.status"
+			(
+				${sudo_ok} || function sudo() { command sudo -n "$@"; }
+				log_stage_begin extract "${partition}"
+				extract_partition_image "${partition}" && checkpoint_partition "${partition}"
+				log_stage_end extract "${partition}"
+				echo $? > "${job_dir}/${partition}.status"
+			) < /dev/null > "${job_dir}/${partition}.log" 2>&1 &
+			running[$!]="${partition}"
+			running_size[$!]=${size}
+			in_flight=$((in_flight + size))
+			log_debug "Started ${partition} ($((size / 1024 / 1024)) MiB)"
+		done
+		queue=("${waiting[@]}")
+		
+		wait -n 2>/dev/null
+		for pid in "${!running[@]}"; do
+			kill -0 "${pid}" 2>/dev/null && continue
+			wait "${pid}" 2>/dev/null
+			partition="${running[${pid}]}"
+			in_flight=$((in_flight - running_size[${pid}]))
+			unset "running[${pid}]" "running_size[${pid}]"
+			status=$(cat "${job_dir}/${partition}.status" 2>/dev/null || echo 1)
+			if [[ "${status}" -eq 0 ]]; then
+				((partitions_extracted++))
+				log_success "Extracted ${partition}"
+			elif ! ${sudo_ok} && [[ -f "${partition}.img" ]]; then
+				retry+=("${partition}")
+			else
+				((partitions_failed++))
+				log_error "Failed to extract ${partition} (log: ${job_dir}/${partition}.log)"
+				grep -i "error\|fail" "${job_dir}/${partition}.log" 2>/dev/null | tail -n 3
+			fi
+		done
+	done
+	
+	for partition in "${retry[@]}"; do
+		log_info "Retrying ${partition} in the foreground"
+		log_stage_begin extract "${partition}"
+		extract_partition_image "${partition}" && checkpoint_partition "${partition}"
+		if log_stage_end extract "${partition}"; then
+			((partitions_extracted++))
+		else
+			((partitions_failed++))
+		fi
+	done
+}
+
 # Extract boot image components
 function extract_boot_image() {
 	local boot_type="$1"  # "boot", "vendor_boot", "recovery", "init_boot"
@@ -895,6 +1222,10 @@ function extract_dtbo_image() {
 
 log_header "Firmware Extraction Process"
 log_info "Output directory: ${OUTDIR}"
+
+# Unpack the firmware into ${OUTDIR}/*.img (the body keeps its top-level indentation)
+function unpack_firmware() {
+log_stage_begin unpack
 cd "${TMPDIR}/" || exit
 
 # Oppo .ozip Check
@@ -917,12 +1248,15 @@ if [[ $(head -c12 "${FILEPATH}" 2>/dev/null | tr -d '\0') == "OPPOENCRYPT!" ]] |
 	( bash "${0}" "${PROJECT_DIR}/input/" 2>/dev/null || bash "${0}" "${INPUTDIR}"/"${FILE%.*}".zip ) || exit 1
 	exit
 fi
+# List the archive once; every format check below queries the in-memory listing
+archive_index_load "${FILEPATH}"
+
 # Oneplus .ops Check
-if ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q ".*.ops" 2>/dev/null; then
+if archive_ls "${FILEPATH}" | grep -q ".*.ops" 2>/dev/null; then
 	log_step "Oppo/Oneplus ops firmware detected"
 	log_info "Extracting ops file from archive..."
-	foundops=$(${BIN_7ZZ} l -ba "${FILEPATH}" | gawk '{print $NF}' | grep ".*.ops")
-	${BIN_7ZZ} e -y -- "${FILEPATH}" "${foundops}" */"${foundops}" 2>/dev/null >> "${TMPDIR}"/zip.log
+	foundops=$(archive_ls "${FILEPATH}" | gawk '{print $NF}' | grep ".*.ops")
+	archive_extract "${FILEPATH}" '*.ops'
 	mkdir -p "${INPUTDIR}" 2>/dev/null && rm -rf -- "${INPUTDIR:?}"/* 2>/dev/null
 	mv "$(echo "${foundops}" | gawk -F['/'] '{print $NF}')" "${INPUTDIR}"/
 	sleep 1s
@@ -946,11 +1280,11 @@ if [[ "${EXTENSION}" == "ops" ]]; then
 	exit
 fi
 # Oppo .ofp Check
-if ${BIN_7ZZ} l -ba "${FILEPATH}" | gawk '{print $NF}' | grep -q ".*.ofp" 2>/dev/null; then
+if archive_ls "${FILEPATH}" | gawk '{print $NF}' | grep -q ".*.ofp" 2>/dev/null; then
 	log_step "Oppo ofp firmware detected"
 	log_info "Extracting ofp file from archive..."
-	foundofp=$(${BIN_7ZZ} l -ba "${FILEPATH}" | gawk '{print $NF}' | grep ".*.ofp")
-	${BIN_7ZZ} e -y -- "${FILEPATH}" "${foundofp}" */"${foundofp}" 2>/dev/null >> "${TMPDIR}"/zip.log
+	foundofp=$(archive_ls "${FILEPATH}" | gawk '{print $NF}' | grep ".*.ofp")
+	archive_extract "${FILEPATH}" '*.ofp'
 	mkdir -p "${INPUTDIR}" 2>/dev/null && rm -rf -- "${INPUTDIR:?}"/* 2>/dev/null
 	mv "$(echo "${foundofp}" | gawk -F['/'] '{print $NF}')" "${INPUTDIR}"/
 	sleep 1s
@@ -1031,7 +1365,7 @@ if echo "${FILEPATH}" | grep -i "^ruu_" | grep -q -i "exe$" || [[ "${EXTENSION}"
 fi
 
 # Amlogic upgrade package (AML) Check
-if ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -qi aml; then
+if archive_ls "${FILEPATH}" | grep -qi aml; then
 	log_step "Amlogic upgrade package detected"
 	cp "${FILEPATH}" "${TMPDIR}"
 	FILE="${TMPDIR}/$(basename "${FILEPATH}")"
@@ -1054,16 +1388,19 @@ fi
 # Extract & Move Raw Otherpartitons To OUTDIR
 if [[ -f "${FILEPATH}" ]]; then
 	other_partition_count=0
+	other_patterns=()
+	for otherpartition in ${OTHERPARTITIONS}; do
+		other_patterns+=("${otherpartition%:*}*")
+	done
+	archive_extract "${FILEPATH}" "${other_patterns[@]}"
 	for otherpartition in ${OTHERPARTITIONS}; do
 		filename=${otherpartition%:*} && outname=${otherpartition#*:}
-		if ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q "${filename}"; then
+		if archive_ls "${FILEPATH}" | grep -q "${filename}"; then
 			((other_partition_count++))
 			log_debug "Extracting ${filename} as ${outname}"
-			foundfile=$(${BIN_7ZZ} l -ba "${FILEPATH}" | grep "${filename}" | awk '{print $NF}')
-			${BIN_7ZZ} e -y -- "${FILEPATH}" "${foundfile}" */"${foundfile}" 2>/dev/null >> "${TMPDIR}"/zip.log
 			output=$(ls -- "${filename}"* 2>/dev/null)
 			[[ ! -e "${TMPDIR}"/"${outname}".img ]] && mv "${output}" "${TMPDIR}"/"${outname}".img
-			"${SIMG2IMG}" "${TMPDIR}"/"${outname}".img "${OUTDIR}"/"${outname}".img 2>/dev/null
+			sparse_to_raw --move-raw "${TMPDIR}"/"${outname}".img "${OUTDIR}"/"${outname}".img
 			[[ ! -s "${OUTDIR}"/"${outname}".img && -f "${TMPDIR}"/"${outname}".img ]] && mv "${outname}".img "${OUTDIR}"/"${outname}".img
 		fi
 	done
@@ -1071,11 +1408,16 @@ if [[ -f "${FILEPATH}" ]]; then
 fi
 
 # Extract/Put Image/Extra Files In TMPDIR
-if ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q "system.new.dat" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "system.new.dat*" -print | wc -l) -ge 1 ]]; then
+if archive_ls "${FILEPATH}" | grep -q "system.new.dat" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "system.new.dat*" -print | wc -l) -ge 1 ]]; then
 	log_step "A-only DAT-formatted OTA detected"
+	# Pull every partition's members out in one batch, dropping Oplus NV IDs from the names
+	dat_patterns=()
+	for partition in $PARTITIONS; do
+		dat_patterns+=("${partition}.new.dat*" "${partition}.transfer.list" "${partition}.img")
+		dat_patterns+=("${partition}.*.new.dat*" "${partition}.*.transfer.list" "${partition}.*.img")
+	done
+	archive_extract "${FILEPATH}" --rename '(\w+)\.(\d+)\.(\w+)' '\1.\3' "${dat_patterns[@]}"
 	for partition in $PARTITIONS; do
-		${BIN_7ZZ} e -y "${FILEPATH}" "${partition}".new.dat* "${partition}".transfer.list "${partition}".img 2>/dev/null >> "${TMPDIR}"/zip.log
-		${BIN_7ZZ} e -y "${FILEPATH}" "${partition}".*".new.dat*" "${partition}".*".transfer.list" "${partition}".*".img" 2>/dev/null >> "${TMPDIR}"/zip.log
 		rename 's/(\w+)\.(\d+)\.(\w+)/$1.$3/' *
 		# For Oplus A-only OTAs, eg OnePlus Nord 2. Regex matches the 8 digits of Oplus NV ID (prop ro.build.oplus_nv_id) to remove them.
 		# hello@world:~/test_regex# rename -n 's/(\w+)\.(\d+)\.(\w+)/$1.$3/' *
@@ -1090,7 +1432,7 @@ if ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q "system.new.dat" 2>/dev/null || [[ $
 		while IFS= read -r -d '' file; do
 			dat_files+=("$file")
 		done < <(find . -maxdepth 1 -name "*.new.dat*" -print0)
-		
+	
 		for i in "${dat_files[@]}"; do
 			line=$(basename "$i" | cut -d"." -f1)
 			if [[ "$i" =~ \.dat\.xz$ ]]; then
@@ -1110,15 +1452,17 @@ if ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q "system.new.dat" 2>/dev/null || [[ $
 		done
 	done
 	log_success "DAT extraction completed"
-elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q rawprogram || [[ $(find "${TMPDIR}" -type f -name "*rawprogram*" | wc -l) -ge 1 ]]; then
+elif archive_ls "${FILEPATH}" | grep -q rawprogram || [[ $(find "${TMPDIR}" -type f -name "*rawprogram*" | wc -l) -ge 1 ]]; then
 	log_step "QFIL firmware detected"
-	rawprograms=$(${BIN_7ZZ} l -ba "${FILEPATH}" | gawk '{ print $NF }' | grep rawprogram)
-	${BIN_7ZZ} e -y "${FILEPATH}" "$rawprograms" 2>/dev/null >> "${TMPDIR}"/zip.log
 	log_info "Extracting partitions from QFIL package..."
+	qfil_patterns=('*rawprogram*')
+	for partition in $PARTITIONS; do
+		qfil_patterns+=("*${partition}*")
+	done
+	archive_extract "${FILEPATH}" "${qfil_patterns[@]}"
 	for partition in $PARTITIONS; do
-		partitionsonzip=$(${BIN_7ZZ} l -ba "${FILEPATH}" | gawk '{ print $NF }' | grep "$partition")
+		partitionsonzip=$(archive_ls "${FILEPATH}" | gawk '{ print $NF }' | grep "$partition")
 		if [[ -n "$partitionsonzip" ]]; then
-			${BIN_7ZZ} e -y "${FILEPATH}" "$partitionsonzip" 2>/dev/null >> "${TMPDIR}"/zip.log
 			if [[ ! -f "$partition.img" ]]; then
 				if [[ -f "$partition.raw.img" ]]; then
 					mv "$partition.raw.img" "$partition.img"
@@ -1134,24 +1478,27 @@ elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q rawprogram || [[ $(find "${TMPDIR}
 		superimage_extract || exit 1
 	fi
 	log_success "QFIL extraction completed"
-elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q ".*.nb0" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "*.nb0*" | wc -l) -ge 1 ]]; then
+elif archive_ls "${FILEPATH}" | grep -q ".*.nb0" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "*.nb0*" | wc -l) -ge 1 ]]; then
 	log_step "nb0-formatted firmware detected"
 	if [[ -f "${FILEPATH}" ]]; then
-		to_extract=$(${BIN_7ZZ} l -ba "${FILEPATH}" | grep ".*.nb0" | gawk '{print $NF}')
-		${BIN_7ZZ} e -y -- "${FILEPATH}" "${to_extract}" 2>/dev/null >> "${TMPDIR}"/zip.log
+		to_extract=$(archive_ls "${FILEPATH}" | grep ".*.nb0" | gawk '{print $NF}')
+		archive_extract "${FILEPATH}" '*.nb0*'
 	else
 		find "${TMPDIR}" -type f -name "*.nb0*" -exec mv {} . \; 2>/dev/null
 	fi
 	log_info "Extracting nb0 firmware..."
 	"${NB0_EXTRACT}" "${to_extract}" "${TMPDIR}"
 	log_success "nb0 extraction completed"
-elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep system | grep chunk | grep -q -v ".*\.so$" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "*system*chunk*" | wc -l) -ge 1 ]]; then
+elif archive_ls "${FILEPATH}" | grep system | grep chunk | grep -q -v ".*\.so$" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "*system*chunk*" | wc -l) -ge 1 ]]; then
 	log_step "Chunk-formatted firmware detected"
 	log_info "Extracting chunk files..."
 	for partition in ${PARTITIONS}; do
 		if [[ -f "${FILEPATH}" ]]; then
-			foundpartitions=$(${BIN_7ZZ} l -ba "${FILEPATH}" | gawk '{print $NF}' | grep "${partition}".img)
-			${BIN_7ZZ} e -y -- "${FILEPATH}" *"${partition}"*chunk* */*"${partition}"*chunk* "${foundpartitions}" dummypartition 2>/dev/null >> "${TMPDIR}"/zip.log
+			# One pass per partition: merged chunks are deleted below, and a
+			# longer name (system_ext) needs its own chunks again afterwards
+			if archive_ls "${FILEPATH}" | grep -q "${partition}.*chunk\|${partition}.img"; then
+				archive_extract "${FILEPATH}" "*${partition}*chunk*" "*${partition}?img"
+			fi
 		else
 			find "${TMPDIR}" -type f -name "*${partition}*chunk*" -exec mv {} . \; 2>/dev/null
 			find "${TMPDIR}" -type f -name "*${partition}*.img" -exec mv {} . \; 2>/dev/null
@@ -1161,14 +1508,14 @@ elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep system | grep chunk | grep -q -v ".*\
 		romchunk=$(find . -maxdepth 1 -type f -name "*${partition}*chunk*" | cut -d'/' -f'2-' | sort)
 		if echo "${romchunk}" | grep -q "sparsechunk"; then
 			if [[ ! -f "${partition}".img ]]; then
-				"${SIMG2IMG}" "${romchunk}" "${partition}".img.raw 2>/dev/null
-				mv "${partition}".img.raw "${partition}".img
+				mapfile -t romchunks <<< "${romchunk}"
+				sparse_to_raw "${romchunks[@]}" "${partition}".img
 			fi
 			rm -rf -- *"${partition}"*chunk* 2>/dev/null
 		fi
 	done
 	log_success "Chunk extraction completed"
-elif ${BIN_7ZZ} l -ba "${FILEPATH}" | gawk '{print $NF}' | grep -q "system_new.img\|^system.img\|\/system.img\|\/system_image.emmc.img\|^system_image.emmc.img" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "system*.img" | wc -l) -ge 1 ]]; then
+elif archive_ls "${FILEPATH}" | gawk '{print $NF}' | grep -q "system_new.img\|^system.img\|\/system.img\|\/system_image.emmc.img\|^system_image.emmc.img" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "system*.img" | wc -l) -ge 1 ]]; then
 	log_step "Image files detected"
 	if [[ -f "${FILEPATH}" ]]; then
 		log_info "Extracting image files..."
@@ -1185,7 +1532,7 @@ elif ${BIN_7ZZ} l -ba "${FILEPATH}" | gawk '{print $NF}' | grep -q "system_new.i
 	find "${TMPDIR}" -type f ! -name "*img*" -exec rm -rf {} \;	# delete other files
 	find "${TMPDIR}" -maxdepth 3 -type f -name "*.img" -exec mv {} . \; 2>/dev/null
 	log_success "Image extraction completed"
-elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q "system.sin\|.*system_.*\.sin" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "system*.sin" | wc -l) -ge 1 ]]; then
+elif archive_ls "${FILEPATH}" | grep -q "system.sin\|.*system_.*\.sin" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "system*.sin" | wc -l) -ge 1 ]]; then
 	log_step "Sony sin image detected"
 	[[ -f "${FILEPATH}" ]] && ${BIN_7ZZ} x -y "${FILEPATH}" 2>/dev/null >> "${TMPDIR}"/zip.log
 	log_info "Processing sin files..."
@@ -1204,7 +1551,7 @@ elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q "system.sin\|.*system_.*\.sin" 2>/
 		superimage_extract || exit 1
 	fi
 	log_success "sin extraction completed"
-elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep ".pac$" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "*.pac" | wc -l) -ge 1 ]]; then
+elif archive_ls "${FILEPATH}" | grep ".pac$" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "*.pac" | wc -l) -ge 1 ]]; then
 	log_step "PAC archive detected"
 	[[ -f "${FILEPATH}" ]] && ${BIN_7ZZ} x -y "${FILEPATH}" 2>/dev/null >> "${TMPDIR}"/zip.log
 	for f in "${TMPDIR}"/*; do detox -r "${f}"; done
@@ -1217,27 +1564,31 @@ elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep ".pac$" 2>/dev/null || [[ $(find "${T
 		superimage_extract || exit 1
 	fi
 	log_success "PAC extraction completed"
-elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q "system.bin" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "system.bin" | wc -l) -ge 1 ]]; then
+elif archive_ls "${FILEPATH}" | grep -q "system.bin" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "system.bin" | wc -l) -ge 1 ]]; then
 	log_step "Binary images detected"
 	[[ -f "${FILEPATH}" ]] && ${BIN_7ZZ} x -y "${FILEPATH}" 2>/dev/null >> "${TMPDIR}"/zip.log
 	log_info "Converting .bin files to .img..."
 	find "${TMPDIR}" -mindepth 2 -type f -name "*.bin" -exec mv {} . \;	# move .img in sub-dir to ${TMPDIR}
 	find "${TMPDIR}" -maxdepth 1 -type f -name "*.bin" | while read -r i; do mv "${i}" "${i/\.bin/.img}" 2>/dev/null; done	# proper names
 	log_success "Binary image conversion completed"
-elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q "system-p" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "system-p*" | wc -l) -ge 1 ]]; then
+elif archive_ls "${FILEPATH}" | grep -q "system-p" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "system-p*" | wc -l) -ge 1 ]]; then
 	log_step "P-suffix images detected"
 	log_info "Processing p-suffix partitions..."
+	psuffix_patterns=()
+	for partition in ${PARTITIONS}; do
+		psuffix_patterns+=("*${partition}-p*")
+	done
+	archive_extract "${FILEPATH}" "${psuffix_patterns[@]}"
 	for partition in ${PARTITIONS}; do
 		if [[ -f "${FILEPATH}" ]]; then
-			foundpartitions=$(${BIN_7ZZ} l -ba "${FILEPATH}" | gawk '{print $NF}' | grep "${partition}-p")
-			${BIN_7ZZ} e -y -- "${FILEPATH}" "${foundpartitions}" dummypartition 2>/dev/null >> "${TMPDIR}"/zip.log
+			foundpartitions=$(archive_ls "${FILEPATH}" | gawk '{print $NF}' | grep "${partition}-p")
 		else
 			foundpartitions=$(find . -type f -name "*${partition}-p*" | cut -d'/' -f'2-')
 		fi
 	[[ -n "${foundpartitions}" ]] && mv "$(ls "${partition}"-p*)" "${partition}".img
 	done
 	log_success "P-suffix extraction completed"
-elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q "system-sign.img" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "system-sign.img" | wc -l) -ge 1 ]]; then
+elif archive_ls "${FILEPATH}" | grep -q "system-sign.img" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "system-sign.img" | wc -l) -ge 1 ]]; then
 	log_step "Signed images detected"
 	[[ -f "${FILEPATH}" ]] && ${BIN_7ZZ} x -y "${FILEPATH}" 2>/dev/null >> "${TMPDIR}"/zip.log
 	for f in "${TMPDIR}"/*; do detox -r "${f}"; done
@@ -1268,47 +1619,36 @@ elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q "system-sign.img" 2>/dev/null || [
 		fi
 	done
 	log_success "Signed image processing completed"
-elif [[ $(${BIN_7ZZ} l -ba "$FILEPATH" | grep "super.img") ]]; then
+elif [[ $(archive_ls "${FILEPATH}" | grep "super.img") ]]; then
 	log_step "Super image detected in archive"
-	foundsupers=$(${BIN_7ZZ} l -ba "${FILEPATH}" | gawk '{ print $NF }' | grep "super.img")
-	${BIN_7ZZ} e -y "${FILEPATH}" $foundsupers dummypartition 2>/dev/null >> ${TMPDIR}/zip.log
+	archive_extract "${FILEPATH}" '*super?img*'
 	# Use find instead of ls | grep
 	superchunk=$(find . -maxdepth 1 -type f -name "*super*chunk*" | sort)
 	if echo "$superchunk" | grep -q "sparsechunk"; then
-		log_info "Converting sparse super chunks..."
-		# Word splitting is intentional here - simg2img requires multiple files as separate arguments
-		# shellcheck disable=SC2086
-		"${SIMG2IMG}" ${superchunk} super.img.raw 2>/dev/null
-		rm -rf ./*super*chunk*
+		log_info "Reading super image from sparse chunks..."
+		mapfile -t SUPER_CHUNKS <<< "${superchunk}"
 	fi
 	superimage_extract || exit 1
 elif [[ $(find "${TMPDIR}" -type f -name "super*.*img" | wc -l) -ge 1 ]]; then
 	log_step "Super image detected"
-	if [[ -f "${FILEPATH}" ]]; then
-		foundsupers=$(${BIN_7ZZ} l -ba "${FILEPATH}" | gawk '{print $NF}' | grep "super.*img")
-		${BIN_7ZZ} e -y -- "${FILEPATH}" "${foundsupers}" dummypartition 2>/dev/null >> "${TMPDIR}"/zip.log
-	fi
+	archive_extract "${FILEPATH}" '*super*img*'
 	# Use find instead of ls | grep
 	splitsupers=$(find . -maxdepth 1 -type f -name "super.[0-9]*.img" | sort)
 	if [[ -n "${splitsupers}" ]]; then
-		log_info "Creating super.img from split files..."
-		# Word splitting is intentional here - simg2img requires multiple files as separate arguments
-		# shellcheck disable=SC2086
-		"${SIMG2IMG}" ${splitsupers} super.img.raw 2>/dev/null
-		rm -rf ${splitsupers}
+		log_info "Reading super image from split files..."
+		mapfile -t SUPER_CHUNKS <<< "${splitsupers}"
 	fi
 	superchunk=$(find . -maxdepth 1 -type f -name "*super*chunk*" | cut -d'/' -f'2-' | sort)
 	if echo "${superchunk}" | grep -q "sparsechunk"; then
-		log_info "Creating super.img from sparse chunks..."
-		"${SIMG2IMG}" ${superchunk} super.img.raw 2>/dev/null
-		rm -rf -- *super*chunk*
+		log_info "Reading super image from sparse chunks..."
+		mapfile -t SUPER_CHUNKS <<< "${superchunk}"
 	fi
 	superimage_extract || exit 1
-elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep tar.md5 | gawk '{print $NF}' | grep -q AP_ 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "*AP_*tar.md5" | wc -l) -ge 1 ]]; then
+elif archive_ls "${FILEPATH}" | grep tar.md5 | gawk '{print $NF}' | grep -q AP_ 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "*AP_*tar.md5" | wc -l) -ge 1 ]]; then
 	log_step "Samsung AP tar.md5 firmware detected"
 	#mv -f "${FILEPATH}" "${TMPDIR}"/
 	[[ -f "${FILEPATH}" ]] && ${BIN_7ZZ} e -y "${FILEPATH}" 2>/dev/null >> "${TMPDIR}"/zip.log
-	
+
 	# Extract tar.md5 archives
 	tarmd5_files=(*.tar.md5)
 	tarmd5_count=${#tarmd5_files[@]}
@@ -1320,7 +1660,7 @@ elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep tar.md5 | gawk '{print $NF}' | grep -
 		done
 		log_success "Extracted ${tarmd5_count} tar.md5 archive(s)"
 	fi
-	
+
 	# Extract lz4 archives
 	lz4_files=(*.lz4)
 	if [[ -e "${lz4_files[0]}" ]]; then
@@ -1332,20 +1672,20 @@ elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep tar.md5 | gawk '{print $NF}' | grep -
 		done
 		log_success "Extracted ${lz4_count} lz4 archive(s)"
 	fi
-	
+
 	# Rename Samsung ext4 files
 	ext4_files=()
 	while IFS= read -r -d '' file; do
 		ext4_files+=("$file")
 	done < <(find -maxdepth 1 -type f -name '*.ext4' -printf '%P\0')
-	
+
 	if [[ ${#ext4_files[@]} -gt 0 ]]; then
 		log_debug "Renaming ${#ext4_files[@]} ext4 file(s)..."
 		for samsung_ext4_img_files in "${ext4_files[@]}"; do
 			mv "${samsung_ext4_img_files}" "${samsung_ext4_img_files%%.ext4}"
 		done
 	fi
-	
+
 	if [[ -f super.img ]]; then
 		superimage_extract || exit 1	
 	fi
@@ -1353,12 +1693,12 @@ elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep tar.md5 | gawk '{print $NF}' | grep -
 		log_error "Extraction failed - system.img not found"
 		rm -rf "${TMPDIR}" && exit 1
 	fi
-elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q payload.bin 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "payload.bin" | wc -l) -ge 1 ]]; then
+elif archive_ls "${FILEPATH}" | grep -q payload.bin 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "payload.bin" | wc -l) -ge 1 ]]; then
 	log_step "AB OTA payload.bin detected"
 	log_info "Extracting payload using $(nproc --all) CPU cores..."
 	${PAYLOAD_EXTRACTOR} -c "$(nproc --all)" -o "${TMPDIR}" "${FILEPATH}" >/dev/null
 	log_success "Payload extraction completed"
-elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep ".*.rar\|.*.zip\|.*.7z\|.*.tar$" 2>/dev/null || [[ $(find "${TMPDIR}" -type f \( -name "*.rar" -o -name "*.zip" -o -name "*.7z" -o -name "*.tar" \) | wc -l) -ge 1 ]]; then
+elif archive_ls "${FILEPATH}" | grep ".*.rar\|.*.zip\|.*.7z\|.*.tar$" 2>/dev/null || [[ $(find "${TMPDIR}" -type f \( -name "*.rar" -o -name "*.zip" -o -name "*.7z" -o -name "*.tar" \) | wc -l) -ge 1 ]]; then
 	log_step "Compressed archive firmware detected"
 	if [[ -f "${FILEPATH}" ]]; then
 		mkdir -p "${TMPDIR}"/"${UNZIP_DIR}" 2>/dev/null
@@ -1378,7 +1718,7 @@ elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep ".*.rar\|.*.zip\|.*.7z\|.*.tar$" 2>/d
 		exit
 	done
 	rm -rf "${TMPDIR:?}"/"${UNZIP_DIR}"
-elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q "UPDATE.APP" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "UPDATE.APP") ]]; then
+elif archive_ls "${FILEPATH}" | grep -q "UPDATE.APP" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "UPDATE.APP") ]]; then
 	log_step "Huawei UPDATE.APP detected"
 	[[ -f "${FILEPATH}" ]] && ${BIN_7ZZ} x "${FILEPATH}" UPDATE.APP 2>/dev/null >> "${TMPDIR}"/zip.log
 	find "${TMPDIR}" -type f -name "UPDATE.APP" -exec mv {} . \;
@@ -1389,13 +1729,19 @@ elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q "UPDATE.APP" 2>/dev/null || [[ $(f
 	done )
 	find output/ -type f -name "*.img" -exec mv {} . \;	# Partitions Are Extracted In "output" Folder
 	if [[ -f super.img ]]; then
-		log_info "Creating super.img from sparse files..."
-		"${SIMG2IMG}" super.img super_* super.img.raw 2>/dev/null
-		[[ ! -s super.img.raw && -f super.img ]] && mv super.img super.img.raw
+		SUPER_CHUNKS=(super.img)
+		for superpart in super_*; do
+			[[ -f "${superpart}" ]] && SUPER_CHUNKS+=("${superpart}")
+		done
+		if [[ ${#SUPER_CHUNKS[@]} -gt 1 ]]; then
+			log_info "Reading super image from sparse files..."
+		else
+			SUPER_CHUNKS=()
+		fi
 	fi
 	superimage_extract || exit 1
 	log_success "UPDATE.APP extraction completed"
-elif ${BIN_7ZZ} l -ba "${FILEPATH}" | grep -q "rockchip" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "rockchip") ]]; then
+elif archive_ls "${FILEPATH}" | grep -q "rockchip" 2>/dev/null || [[ $(find "${TMPDIR}" -type f -name "rockchip") ]]; then
 	log_step "Rockchip firmware detected"
 	log_info "Extracting Rockchip firmware..."
 	${RK_EXTRACT} -unpack "${FILEPATH}" ${TMPDIR}
@@ -1434,38 +1780,57 @@ for otherpartition in ${OTHERPARTITIONS}; do
 		((other_parts_processed++))
 		log_debug "Processing ${filename} as ${outname}"
 		[[ ! -e "${TMPDIR}"/"${outname}".img ]] && mv "${output}" "${TMPDIR}"/"${outname}".img
-		"${SIMG2IMG}" "${TMPDIR}"/"${outname}".img "${OUTDIR}"/"${outname}".img 2>/dev/null
+		sparse_to_raw --move-raw "${TMPDIR}"/"${outname}".img "${OUTDIR}"/"${outname}".img
 		[[ ! -s "${OUTDIR}"/"${outname}".img && -f "${TMPDIR}"/"${outname}".img ]] && mv "${outname}".img "${OUTDIR}"/"${outname}".img
 	fi
 done
 [[ ${other_parts_processed} -gt 0 ]] && log_info "Processed ${other_parts_processed} additional partition(s)"
 
 # Process All partitions From TMPDIR Now
+missing_parts=()
 for partition in ${PARTITIONS}; do
-	if [[ ! -f "${partition}".img ]]; then
-		foundpart=$(${BIN_7ZZ} l -ba "${FILEPATH}" | gawk '{print $NF}' | grep "${partition}.img" 2>/dev/null)
-		${BIN_7ZZ} e -y -- "${FILEPATH}" "${foundpart}" */"${foundpart}" 2>/dev/null >> "${TMPDIR}"/zip.log
-	fi
-	[[ -f "${partition}".img ]] && "${SIMG2IMG}" "${partition}".img "${OUTDIR}"/"${partition}".img 2>/dev/null
+	[[ ! -f "${partition}".img ]] && missing_parts+=("${partition}.img")
+done
+[[ ${#missing_parts[@]} -gt 0 ]] && archive_extract "${FILEPATH}" "${missing_parts[@]}"
+for partition in ${PARTITIONS}; do
+	[[ -f "${partition}".img ]] && sparse_to_raw --move-raw "${partition}".img "${OUTDIR}"/"${partition}".img
 	[[ ! -s "${OUTDIR}"/"${partition}".img && -f "${TMPDIR}"/"${partition}".img ]] && mv "${TMPDIR}"/"${partition}".img "${OUTDIR}"/"${partition}".img
+done
+# Look for MOTO/ASUS headers in front of ext4 images; imgsniff.py only reads
+# the candidate superblock offsets instead of grepping whole images
+ext4_images=()
+for partition in ${EXT4PARTITIONS}; do
+	[[ -f "${OUTDIR}"/"${partition}".img ]] && ext4_images+=("${OUTDIR}"/"${partition}".img)
+done
+ext4_sniff="{}"
+[[ ${#ext4_images[@]} -gt 0 ]] && ext4_sniff=$(python3 "${IMGSNIFF}" "${ext4_images[@]}" 2>/dev/null)
+for partition in ${PARTITIONS}; do
 	if [[ "${EXT4PARTITIONS}" =~ (^|[[:space:]])"${partition}"($|[[:space:]]) && -f "${OUTDIR}"/"${partition}".img ]]; then
-		MAGIC=$(head -c12 "${OUTDIR}"/"${partition}".img | tr -d '\0')
-		offset=$(LANG=C grep -aobP -m1 '\x53\xEF' "${OUTDIR}"/"${partition}".img | head -1 | gawk '{print $1 - 1080}')
-		if echo "${MAGIC}" | grep -q "MOTO"; then
-			[[ "$offset" == 128055 ]] && offset=131072
-			printf "MOTO header detected on %s in %s\n" "${partition}" "${offset}"
-		elif echo "${MAGIC}" | grep -q "ASUS"; then
-			printf "ASUS header detected on %s in %s\n" "${partition}" "${offset}"
+		read -r vendor offset < <(jq -r --arg f "${OUTDIR}/${partition}.img" '.[$f] | "\(.vendor // "-") \(.offset // 0)"' <<< "${ext4_sniff}" 2>/dev/null)
+		if [[ -n "${vendor}" && "${vendor}" != "-" ]]; then
+			printf "%s header detected on %s in %s\n" "${vendor}" "${partition}" "${offset}"
 		else
 			offset=0
 		fi
-		if [[ ! "${offset}" == "0" ]]; then
-			dd if="${OUTDIR}"/"${partition}".img of="${OUTDIR}"/"${partition}".img-2 ibs=$offset skip=1 2>/dev/null
-			mv -f "${OUTDIR}"/"${partition}".img-2 "${OUTDIR}"/"${partition}".img
+		if [[ -n "${offset}" && ! "${offset}" == "0" ]]; then
+			# Collapse the header in place, or record it for the extractors
+			strip_mode=$(python3 "${IMGSTRIP}" strip "${offset}" "${OUTDIR}"/"${partition}".img 2>>"${TMPDIR}"/extract.log)
+			log_debug "Header on ${partition}: ${strip_mode:-strip failed}"
 		fi
 	fi
 	[[ ! -s "${OUTDIR}"/"${partition}".img && -f "${OUTDIR}"/"${partition}".img ]] && rm "${OUTDIR}"/"${partition}".img
 done
+log_stage_end unpack
+}
+
+checkpoint input "${FILEPATH:-${FIRMWARE_INPUT}}" >/dev/null
+if checkpoint check unpack; then
+	log_info "Resuming: firmware already unpacked"
+else
+	unpack_firmware
+	# Every image the partition phase starts from
+	compgen -G "${OUTDIR}/*.img" >/dev/null && checkpoint save unpack --files-in "${OUTDIR}"
+fi
 
 cd "${OUTDIR}"/ || exit
 rm -rf "${TMPDIR:?}"/*
@@ -1476,7 +1841,10 @@ rm -rf "${TMPDIR:?}"/*
 
 log_header "Partition Extraction Phase"
 
+# Extract boot images and partitions in ${OUTDIR} (the body keeps its top-level indentation)
+function extract_partitions() {
 # Extract boot images using new modular functions
+log_stage_begin boot_images
 extract_boot_image "boot"
 extract_boot_image "vendor_boot"
 extract_boot_image "recovery"
@@ -1485,19 +1853,21 @@ extract_boot_image "vendor_kernel_boot"
 
 # Extract DTBO
 extract_dtbo_image
+log_stage_end boot_images
 
 # Extract all regular partitions with improved logic
 log_step "Extracting regular partitions"
 partitions_extracted=0
 partitions_failed=0
 
-for p in $PARTITIONS; do
-	if extract_partition_image "${p}"; then
-		((partitions_extracted++))
-	else
-		((partitions_failed++))
-	fi
-done
+# Classify every image once; detect_filesystem reads this while images are unchanged
+IMGSNIFF_CACHE="${TMPDIR}"/imgsniff.json
+compgen -G "*.img" >/dev/null && python3 "${IMGSNIFF}" "$(pwd)" 2>/dev/null | jq 'with_entries(.key |= sub(".*/"; ""))' > "${IMGSNIFF_CACHE}" 2>/dev/null
+
+# shellcheck disable=SC2086
+log_stage_begin partitions
+extract_partitions_parallel $PARTITIONS
+log_stage_end partitions
 
 if [[ ${partitions_extracted} -gt 0 ]]; then
 	log_success "Successfully extracted ${partitions_extracted} partition(s)"
@@ -1518,18 +1888,22 @@ done
 # Process optics partition if it exists (Samsung OMC decoder)
 if [[ -d "optics" ]]; then
 	log_step "Processing optics partition for OMC XML decryption"
-	if [[ -f "${OMCDECODER}" ]] && [[ -x "${OMCDECODER_BIN}" ]]; then
+	if [[ -f "${OMCDECODER}" ]]; then
 		log_info "Decrypting OMC XML files in optics partition..."
-		python3 "${OMCDECODER}" "optics" --in-place --binary "${OMCDECODER_BIN}" 2>/dev/null
-		if [[ $? -eq 0 ]]; then
+		log_stage_begin omc optics
+		# Decoding runs in-process; the binary is only a fallback when present
+		omc_args=()
+		[[ -x "${OMCDECODER_BIN}" ]] && omc_args=(--binary "${OMCDECODER_BIN}")
+		python3 "${OMCDECODER}" "optics" --in-place "${omc_args[@]}" \
+			--state "${DUMPRX_CACHE_DIR}/omcdecoder_state.json" 2>/dev/null
+		if log_stage_end omc optics; then
 			log_success "OMC XML files decrypted successfully"
 		else
 			log_warn "OMC decoder encountered issues, some files may not be decrypted"
 		fi
 	else
 		log_warn "OMC decoder not available, skipping XML decryption"
-		[[ ! -f "${OMCDECODER}" ]] && log_debug "OMC decoder script not found: ${OMCDECODER}"
-		[[ ! -x "${OMCDECODER_BIN}" ]] && log_debug "OMC decoder binary not found or not executable: ${OMCDECODER_BIN}"
+		log_debug "OMC decoder script not found: ${OMCDECODER}"
 	fi
 fi
 
@@ -1547,111 +1921,33 @@ for dir in "vendor/euclid" "system/system/euclid"; do
 		popd >/dev/null || exit 1
 	fi
 done
+}
 
-# board-info.txt
-find "${OUTDIR}"/modem -type f -exec strings {} \; 2>/dev/null | grep "QC_IMAGE_VERSION_STRING=MPSS." | sed "s|QC_IMAGE_VERSION_STRING=MPSS.||g" | cut -c 4- | sed -e 's/^/require version-baseband=/' >> "${TMPDIR}"/board-info.txt
-find "${OUTDIR}"/tz* -type f -exec strings {} \; 2>/dev/null | grep "QC_IMAGE_VERSION_STRING" | sed "s|QC_IMAGE_VERSION_STRING|require version-trustzone|g" >> "${TMPDIR}"/board-info.txt
-if [ -e "${OUTDIR}"/vendor/build.prop ]; then
-	strings "${OUTDIR}"/vendor/build.prop | grep "ro.vendor.build.date.utc" | sed "s|ro.vendor.build.date.utc|require version-vendor|g" >> "${TMPDIR}"/board-info.txt
+if checkpoint check partitions; then
+	log_info "Resuming: partitions already extracted"
+else
+	extract_partitions
+	# What the metadata stage below starts from
+	partition_outputs=()
+	for d in "${OUTDIR}"/*/; do
+		[[ "${d%/}" == "${TMPDIR}" ]] || partition_outputs+=(-o "${d%/}")
+	done
+	checkpoint save partitions "${partition_outputs[@]}"
 fi
-sort -u < "${TMPDIR}"/board-info.txt > "${OUTDIR}"/board-info.txt
-
-# set variables
-[[ $(find "$(pwd)"/system "$(pwd)"/system/system "$(pwd)"/vendor "$(pwd)"/*product -maxdepth 1 -type f -name "build*.prop" 2>/dev/null | sort -u | gawk '{print $NF}') ]] || { printf "No system/vendor/product build*.prop found, pushing cancelled.\n" && exit 1; }
-
-flavor=$(grep -m1 -oP "(?<=^ro.build.flavor=).*" -hs {system,system/system,vendor}/build*.prop)
-[[ -z "${flavor}" ]] && flavor=$(grep -m1 -oP "(?<=^ro.vendor.build.flavor=).*" -hs vendor/build*.prop)
-[[ -z "${flavor}" ]] && flavor=$(grep -m1 -oP "(?<=^ro.system.build.flavor=).*" -hs {system,system/system}/build*.prop)
-[[ -z "${flavor}" ]] && flavor=$(grep -m1 -oP "(?<=^ro.build.type=).*" -hs {system,system/system}/build*.prop)
-release=$(grep -m1 -oP "(?<=^ro.build.version.release=).*" -hs {system,system/system,vendor}/build*.prop)
-[[ -z "${release}" ]] && release=$(grep -m1 -oP "(?<=^ro.vendor.build.version.release=).*" -hs vendor/build*.prop)
-[[ -z "${release}" ]] && release=$(grep -m1 -oP "(?<=^ro.system.build.version.release=).*" -hs {system,system/system}/build*.prop)
-id=$(grep -m1 -oP "(?<=^ro.build.id=).*" -hs {system,system/system,vendor}/build*.prop)
-[[ -z "${id}" ]] && id=$(grep -m1 -oP "(?<=^ro.vendor.build.id=).*" -hs vendor/build*.prop)
-[[ -z "${id}" ]] && id=$(grep -m1 -oP "(?<=^ro.system.build.id=).*" -hs {system,system/system}/build*.prop)
-tags=$(grep -m1 -oP "(?<=^ro.build.tags=).*" -hs {system,system/system,vendor}/build*.prop)
-[[ -z "${tags}" ]] && tags=$(grep -m1 -oP "(?<=^ro.vendor.build.tags=).*" -hs vendor/build*.prop)
-[[ -z "${tags}" ]] && tags=$(grep -m1 -oP "(?<=^ro.system.build.tags=).*" -hs {system,system/system}/build*.prop)
-platform=$(grep -m1 -oP "(?<=^ro.board.platform=).*" -hs {system,system/system,vendor}/build*.prop | head -1)
-[[ -z "${platform}" ]] && platform=$(grep -m1 -oP "(?<=^ro.vendor.board.platform=).*" -hs vendor/build*.prop)
-[[ -z "${platform}" ]] && platform=$(grep -m1 -oP "(?<=^ro.system.board.platform=).*" -hs {system,system/system}/build*.prop)
-manufacturer=$(grep -m1 -oP "(?<=^ro.product.manufacturer=).*" -hs {system,system/system,vendor}/build*.prop | head -1)
-[[ -z "${manufacturer}" ]] && manufacturer=$(grep -m1 -oP "(?<=^ro.product.brand.sub=).*" -hs system/system/euclid/my_product/build*.prop)
-[[ -z "${manufacturer}" ]] && manufacturer=$(grep -m1 -oP "(?<=^ro.vendor.product.manufacturer=).*" -hs vendor/build*.prop | head -1)
-[[ -z "${manufacturer}" ]] && manufacturer=$(grep -m1 -oP "(?<=^ro.product.vendor.manufacturer=).*" -hs vendor/build*.prop | head -1)
-[[ -z "${manufacturer}" ]] && manufacturer=$(grep -m1 -oP "(?<=^ro.system.product.manufacturer=).*" -hs {system,system/system}/build*.prop)
-[[ -z "${manufacturer}" ]] && manufacturer=$(grep -m1 -oP "(?<=^ro.product.system.manufacturer=).*" -hs {system,system/system}/build*.prop)
-[[ -z "${manufacturer}" ]] && manufacturer=$(grep -m1 -oP "(?<=^ro.product.odm.manufacturer=).*" -hs vendor/odm/etc/build*.prop)
-[[ -z "${manufacturer}" ]] && manufacturer=$(grep -m1 -oP "(?<=^ro.product.manufacturer=).*" -hs {oppo_product,my_product,product}/build*.prop | head -1)
-[[ -z "${manufacturer}" ]] && manufacturer=$(grep -m1 -oP "(?<=^ro.product.manufacturer=).*" -hs vendor/euclid/*/build.prop)
-[[ -z "${manufacturer}" ]] && manufacturer=$(grep -m1 -oP "(?<=^ro.system.product.manufacturer=).*" -hs vendor/euclid/*/build.prop)
-[[ -z "${manufacturer}" ]] && manufacturer=$(grep -m1 -oP "(?<=^ro.product.product.manufacturer=).*" -hs vendor/euclid/product/build*.prop)
-[[ -z "${manufacturer}" ]] && manufacturer=$(grep -m1 -oP "(?<=^ro.product.vendor.manufacturer=).*" -hs vendor/build*.prop)
-[[ -z "${manufacturer}" ]] && manufacturer=$(grep -m1 -oP "(?<=^ro.product.system.manufacturer=).*" -hs {system,system/system}/build*.prop)
-fingerprint=$(grep -m1 -oP "(?<=^ro.build.fingerprint=).*" -hs {system,system/system}/build*.prop)
-[[ -z "${fingerprint}" ]] && fingerprint=$(grep -m1 -oP "(?<=^ro.vendor.build.fingerprint=).*" -hs vendor/build*.prop | head -1)
-[[ -z "${fingerprint}" ]] && fingerprint=$(grep -m1 -oP "(?<=^ro.system.build.fingerprint=).*" -hs {system,system/system}/build*.prop)
-[[ -z "${fingerprint}" ]] && fingerprint=$(grep -m1 -oP "(?<=^ro.product.build.fingerprint=).*" -hs product/build*.prop)
-[[ -z "${fingerprint}" ]] && fingerprint=$(grep -m1 -oP "(?<=^ro.build.fingerprint=).*" -hs {oppo_product,my_product}/build*.prop)
-[[ -z "${fingerprint}" ]] && fingerprint=$(grep -m1 -oP "(?<=^ro.system.build.fingerprint=).*" -hs my_product/build.prop)
-[[ -z "${fingerprint}" ]] && fingerprint=$(grep -m1 -oP "(?<=^ro.vendor.build.fingerprint=).*" -hs my_product/build.prop)
-[[ -z "${fingerprint}" ]] && fingerprint=$(grep -m1 -oP "(?<=^ro.bootimage.build.fingerprint=).*" -hs vendor/build.prop)
-brand=$(grep -m1 -oP "(?<=^ro.product.brand=).*" -hs {system,system/system,vendor}/build*.prop | head -1)
-[[ -z "${brand}" ]] && brand=$(grep -m1 -oP "(?<=^ro.product.brand.sub=).*" -hs system/system/euclid/my_product/build*.prop)
-[[ -z "${brand}" ]] && brand=$(grep -m1 -oP "(?<=^ro.product.vendor.brand=).*" -hs vendor/build*.prop | head -1)
-[[ -z "${brand}" ]] && brand=$(grep -m1 -oP "(?<=^ro.vendor.product.brand=).*" -hs vendor/build*.prop | head -1)
-[[ -z "${brand}" ]] && brand=$(grep -m1 -oP "(?<=^ro.product.system.brand=).*" -hs {system,system/system}/build*.prop | head -1)
-[[ -z "${brand}" || ${brand} == "OPPO" ]] && brand=$(grep -m1 -oP "(?<=^ro.product.system.brand=).*" -hs vendor/euclid/*/build.prop | head -1)
-[[ -z "${brand}" ]] && brand=$(grep -m1 -oP "(?<=^ro.product.product.brand=).*" -hs vendor/euclid/product/build*.prop)
-[[ -z "${brand}" ]] && brand=$(grep -m1 -oP "(?<=^ro.product.odm.brand=).*" -hs vendor/odm/etc/build*.prop)
-[[ -z "${brand}" ]] && brand=$(grep -m1 -oP "(?<=^ro.product.brand=).*" -hs {oppo_product,my_product}/build*.prop | head -1)
-[[ -z "${brand}" ]] && brand=$(grep -m1 -oP "(?<=^ro.product.brand=).*" -hs vendor/euclid/*/build.prop | head -1)
-[[ -z "${brand}" ]] && brand=$(echo "$fingerprint" | cut -d'/' -f1)
-codename=$(grep -m1 -oP "(?<=^ro.product.device=).*" -hs {vendor,system,system/system}/build*.prop | head -1)
-[[ -z "${codename}" ]] && codename=$(grep -m1 -oP "(?<=^ro.vendor.product.device.oem=).*" -hs vendor/euclid/odm/build.prop | head -1)
-[[ -z "${codename}" ]] && codename=$(grep -m1 -oP "(?<=^ro.product.vendor.device=).*" -hs vendor/build*.prop | head -1)
-[[ -z "${codename}" ]] && codename=$(grep -m1 -oP "(?<=^ro.vendor.product.device=).*" -hs vendor/build*.prop | head -1)
-[[ -z "${codename}" ]] && codename=$(grep -m1 -oP "(?<=^ro.product.system.device=).*" -hs {system,system/system}/build*.prop | head -1)
-[[ -z "${codename}" ]] && codename=$(grep -m1 -oP "(?<=^ro.product.system.device=).*" -hs vendor/euclid/*/build.prop | head -1)
-[[ -z "${codename}" ]] && codename=$(grep -m1 -oP "(?<=^ro.product.product.device=).*" -hs vendor/euclid/*/build.prop | head -1)
-[[ -z "${codename}" ]] && codename=$(grep -m1 -oP "(?<=^ro.product.product.model=).*" -hs vendor/euclid/*/build.prop | head -1)
-[[ -z "${codename}" ]] && codename=$(grep -m1 -oP "(?<=^ro.product.device=).*" -hs {oppo_product,my_product}/build*.prop | head -1)
-[[ -z "${codename}" ]] && codename=$(grep -m1 -oP "(?<=^ro.product.product.device=).*" -hs oppo_product/build*.prop)
-[[ -z "${codename}" ]] && codename=$(grep -m1 -oP "(?<=^ro.product.system.device=).*" -hs my_product/build*.prop)
-[[ -z "${codename}" ]] && codename=$(grep -m1 -oP "(?<=^ro.product.vendor.device=).*" -hs my_product/build*.prop)
-[[ -z "${codename}" ]] && codename=$(echo "$fingerprint" | cut -d'/' -f3 | cut -d':' -f1)
-[[ -z "${codename}" ]] && codename=$(grep -m1 -oP "(?<=^ro.build.fota.version=).*" -hs {system,system/system}/build*.prop | cut -d'-' -f1 | head -1)
-[[ -z "${codename}" ]] && codename=$(grep -oP "(?<=^ro.build.product=).*" -hs {vendor,system,system/system}/build*.prop | head -1)
-description=$(grep -m1 -oP "(?<=^ro.build.description=).*" -hs {system,system/system,vendor}/build*.prop | head -1)
-[[ -z "${description}" ]] && description=$(grep -m1 -oP "(?<=^ro.vendor.build.description=).*" -hs vendor/build*.prop)
-[[ -z "${description}" ]] && description=$(grep -m1 -oP "(?<=^ro.system.build.description=).*" -hs {system,system/system}/build*.prop)
-[[ -z "${description}" ]] && description=$(grep -m1 -oP "(?<=^ro.product.build.description=).*" -hs product/build.prop)
-[[ -z "${description}" ]] && description=$(grep -m1 -oP "(?<=^ro.product.build.description=).*" -hs product/build*.prop)
-incremental=$(grep -m1 -oP "(?<=^ro.build.version.incremental=).*" -hs {system,system/system,vendor}/build*.prop | head -1)
-[[ -z "${incremental}" ]] && incremental=$(grep -m1 -oP "(?<=^ro.vendor.build.version.incremental=).*" -hs vendor/build*.prop)
-[[ -z "${incremental}" ]] && incremental=$(grep -m1 -oP "(?<=^ro.system.build.version.incremental=).*" -hs {system,system/system}/build*.prop | head -1)
-[[ -z "${incremental}" ]] && incremental=$(grep -m1 -oP "(?<=^ro.build.version.incremental=).*" -hs my_product/build*.prop)
-[[ -z "${incremental}" ]] && incremental=$(grep -m1 -oP "(?<=^ro.system.build.version.incremental=).*" -hs my_product/build*.prop)
-[[ -z "${incremental}" ]] && incremental=$(grep -m1 -oP "(?<=^ro.vendor.build.version.incremental=).*" -hs my_product/build*.prop)
-# For Realme devices with empty incremental & fingerprint,
-[[ -z "${incremental}" && "${brand}" =~ "realme" ]] && incremental=$(grep -m1 -oP "(?<=^ro.build.version.ota=).*" -hs {vendor/euclid/product,oppo_product}/build.prop | rev | cut -d'_' -f'1-2' | rev)
-[[ -z "${incremental}" && ! -z "${description}" ]] && incremental=$(echo "${description}" | cut -d' ' -f4)
-[[ -z "${description}" && ! -z "${incremental}" ]] && description="${flavor} ${release} ${id} ${incremental} ${tags}"
-[[ -z "${description}" && -z "${incremental}" ]] && description="${codename}"
-abilist=$(grep -m1 -oP "(?<=^ro.product.cpu.abilist=).*" -hs {system,system/system}/build*.prop | head -1)
-[[ -z "${abilist}" ]] && abilist=$(grep -m1 -oP "(?<=^ro.vendor.product.cpu.abilist=).*" -hs vendor/build*.prop)
-locale=$(grep -m1 -oP "(?<=^ro.product.locale=).*" -hs {system,system/system}/build*.prop | head -1)
-[[ -z "${locale}" ]] && locale=undefined
-density=$(grep -m1 -oP "(?<=^ro.sf.lcd_density=).*" -hs {system,system/system}/build*.prop | head -1)
-[[ -z "${density}" ]] && density=undefined
-is_ab=$(grep -m1 -oP "(?<=^ro.build.ab_update=).*" -hs {system,system/system,vendor}/build*.prop)
-[[ -z "${is_ab}" ]] && is_ab="false"
-treble_support=$(grep -m1 -oP "(?<=^ro.treble.enabled=).*" -hs {system,system/system}/build*.prop)
-[[ -z "${treble_support}" ]] && treble_support="false"
-otaver=$(grep -m1 -oP "(?<=^ro.build.version.ota=).*" -hs {vendor/euclid/product,oppo_product,system,system/system}/build*.prop | head -1)
-[[ ! -z "${otaver}" && -z "${fingerprint}" ]] && branch=$(echo "${otaver}" | tr ' ' '-')
-[[ -z "${otaver}" ]] && otaver=$(grep -m1 -oP "(?<=^ro.build.fota.version=).*" -hs {system,system/system}/build*.prop | head -1)
-[[ -z "${branch}" ]] && branch=$(echo "${description}" | tr ' ' '-')
+
+# board-info.txt
+board_info_args=()
+read -ra board_info_rules <<< "${DUMPRX_BOARD_INFO_RULES}"
+for rule in "${board_info_rules[@]}"; do
+	board_info_args+=(--rule "${rule}")
+done
+log_stage_begin board_info
+python3 "${BOARDINFO}" "${OUTDIR}" "${board_info_args[@]}" -o "${OUTDIR}"/board-info.txt
+log_stage_end board_info
+
+# set variables from every build*.prop, read once and resolved by propindex.py
+props=$(python3 "${PROPINDEX}" --require "$(pwd)") || { printf "No system/vendor/product build*.prop found, pushing cancelled.\n" && exit 1; }
+eval "${props}"
 
 if [[ "$PUSH_TO_GITLAB" = true ]]; then
 	rm -rf .github_token
@@ -1669,6 +1965,24 @@ manufacturer=$(echo "${manufacturer}" | tr '[:upper:]' '[:lower:]' | tr -dc '[:p
 printf "## %s\n- Manufacturer: %s\n- Platform: %s\n- Codename: %s\n- Brand: %s\n- Flavor: %s\n- Release Version: %s\n- Kernel Version: %s\n- Id: %s\n- Incremental: %s\n- Tags: %s\n- CPU Abilist: %s\n- A/B Device: %s\n- Treble Device: %s\n- Locale: %s\n- Screen Density: %s\n- Fingerprint: %s\n- OTA version: %s\n- Branch: %s\n- Repo: %s\n" "${description}" "${manufacturer}" "${platform}" "${codename}" "${brand}" "${flavor}" "${release}" "${kernel_version}" "${id}" "${incremental}" "${tags}" "${abilist}" "${is_ab}" "${treble_support}" "${locale}" "${density}" "${fingerprint}" "${otaver}" "${branch}" "${repo}" > "${OUTDIR}"/README.md
 cat "${OUTDIR}"/README.md
 
+# Output manifest: ${OUTDIR} is walked once, later stages refresh only what they touch
+function out_manifest(){
+	# Usage: out_manifest <root> <scan|update|ls> [manifest.py options]
+	python3 "${MANIFEST}" "$@" --cache-dir "${DUMPRX_CACHE_DIR}"
+}
+
+# Generate Files having the sha1sum values of the Blobs
+function write_sha1sum(){
+	# Usage: write_sha1sum <file> <destination_file> [blobhash.py options]
+	# Blobs are hashed in parallel; unchanged files reuse cached hashes
+	log_stage_begin sha1 "${1##*/}"
+	python3 "${BLOBHASH}" "$1" "$2" --root "${OUTDIR}" \
+		--cache "${DUMPRX_CACHE_DIR}/blobhash_cache.json" "${@:3}"
+	log_stage_end sha1 "${1##*/}"
+}
+
+# Generate the device trees and file lists (the body keeps its top-level indentation)
+function generate_metadata() {
 # Generate TWRP Trees
 twrpdtout="twrp-device-tree"
 if [[ "$is_ab" = true ]]; then
@@ -1682,11 +1996,13 @@ else
 	twrpimg="recovery.img"
 fi
 if [[ -f ${twrpimg} ]]; then
+	log_stage_begin device_tree twrp
 	mkdir -p $twrpdtout
 	uvx -p 3.9 --from git+https://github.com/twrpdtgen/twrpdtgen@master twrpdtgen $twrpimg -o $twrpdtout
 	if [[ "$?" = 0 ]]; then
 		[[ ! -e "${OUTDIR}"/twrp-device-tree/README.md ]] && curl https://raw.githubusercontent.com/wiki/SebaUbuntu/TWRP-device-tree-generator/4.-Build-TWRP-from-source.md > ${twrpdtout}/README.md
 	fi
+	log_stage_end device_tree twrp
 fi
 
 # Remove all .git directories from twrpdtout
@@ -1695,67 +2011,27 @@ rm -rf $(find $twrpdtout -type d -name ".git")
 # copy file names
 chown "$(whoami)" ./* -R
 chmod -R u+rwX ./*		#ensure final permissions
-find "$OUTDIR" -type f -printf '%P\n' | sort | grep -v ".git/" > "$OUTDIR"/all_files.txt
+log_stage_begin file_list
+out_manifest "$OUTDIR" scan
+out_manifest "$OUTDIR" ls -o "$OUTDIR"/all_files.txt
+log_stage_end file_list
 
 # Generate LineageOS Trees
 if [[ "$treble_support" = true ]]; then
         aospdtout="aosp-device-tree"
         mkdir -p $aospdtout
+        log_stage_begin device_tree aosp
         uvx -p 3.9 aospdtgen $OUTDIR -o $aospdtout
+        log_stage_end device_tree aosp
 
         # Remove all .git directories from aospdtout
         rm -rf $(find $aospdtout -type d -name ".git")
 
         # Regenerate all_files.txt
-        find "$OUTDIR" -type f -printf '%P\n' | sort | grep -v ".git/" > "$OUTDIR"/all_files.txt
+        out_manifest "$OUTDIR" update "$OUTDIR/$aospdtout"
+        out_manifest "$OUTDIR" ls -o "$OUTDIR"/all_files.txt
 fi
 
-# Generate Files having the sha1sum values of the Blobs
-function write_sha1sum(){
-	# Usage: write_sha1sum <file> <destination_file>
-
-	local SRC_FILE=$1
-	local DST_FILE=$2
-
-	# Temporary file
-	local TMP_FILE=${SRC_FILE}.sha1sum.tmp
-	
-	# Get rid of all the Blank lines and Comments
-	( cat ${SRC_FILE} | grep -v '^[[:space:]]*$' | grep -v "# " ) > ${TMP_FILE}
-
-	# Append the sha1sum of blobs in the Destination File
-	cp ${SRC_FILE} ${DST_FILE}
-	cat ${TMP_FILE} | while read -r i; do {
-		local BLOB=${i}
-
-		# Do we have a "-" before the blob's path? If yes, then remove it
-		local BLOB_TOPDIR=$(echo ${BLOB} | cut -d / -f1)
-		[ "${BLOB_TOPDIR:0:1}" = "-" ] && local BLOB=${BLOB_TOPDIR/-/}/${BLOB/${BLOB_TOPDIR}\//}
-
-		# Is it a non- /vendor blob?
-		[ ! -e "${BLOB}" ] && {
-			# for system libs, bins etc.
-			if [ -e "system/${BLOB}" ]; then
-				local BLOB="system/${BLOB}"
-			# for system-as-root system libs, bins etc.
-			elif [ -e "system/system/${BLOB}" ]; then
-				local BLOB="system/system/${BLOB}"
-			fi
-		}
-		local SHA1=$(sha1sum ${BLOB} | gawk '{print $1}')
-
-		local BLOB=${i} # Switch back to the Original Blob's name
-		local ORG_EXP="${BLOB}"
-		local FINAL_EXP="${BLOB}|${SHA1}"
-
-		# Append the |sha1sum
-		sed -i "s:${ORG_EXP}$:${FINAL_EXP}:g" "${DST_FILE}"
-	}; done
-
-	# Delete the Temporary file
-	rm ${TMP_FILE}
-}
-
 # Generate proprietary-files.txt
 printf "Generating proprietary-files.txt...\n"
 bash "${UTILSDIR}"/android_tools/tools/proprietary-files.sh "${OUTDIR}"/all_files.txt >/dev/null
@@ -1774,15 +2050,25 @@ git -C "${UTILSDIR}"/android_tools/ stash
 
 # Generate all_files.sha1
 printf "Generating all_files.sha1...\n"
-write_sha1sum "$OUTDIR"/all_files.{txt,sha1.tmp}
-( cat "$OUTDIR"/all_files.sha1.tmp | grep -v all_files.txt ) > "$OUTDIR"/all_files.sha1		# all_files.txt will be regenerated
-rm -rf "$OUTDIR"/all_files.sha1.tmp
+write_sha1sum "$OUTDIR"/all_files.{txt,sha1} --exclude all_files.txt		# all_files.txt will be regenerated
 
 # Regenerate all_files.txt
 printf "Generating all_files.txt...\n"
-find "$OUTDIR" -type f -printf '%P\n' | sort | grep -v ".git/" > "$OUTDIR"/all_files.txt
+out_manifest "$OUTDIR" update "$OUTDIR"/{proprietary-files.txt,proprietary-files.sha1,all_files.sha1} "${TMPDIR}"
+out_manifest "$OUTDIR" ls -o "$OUTDIR"/all_files.txt
+}
+
+if checkpoint check metadata; then
+	log_info "Resuming: device trees and file lists already generated"
+else
+	generate_metadata
+	checkpoint save metadata -o "$OUTDIR"/all_files.txt -o "$OUTDIR"/all_files.sha1 \
+		-o "$OUTDIR"/proprietary-files.txt -o "$OUTDIR"/proprietary-files.sha1
+fi
 
 rm -rf "${TMPDIR}" 2>/dev/null
+# Drop tmp/ from the manifest the push steps list files from
+out_manifest "$OUTDIR" update "${TMPDIR}"
 
 # Helper function to push with retry logic
 # Wrapper that provides a simple interface while calling the library function with proper parameters
@@ -1802,6 +2088,7 @@ commit_and_push(){
 		"system"
 	)
 
+	log_stage_begin git_push
 	git lfs install 2>/dev/null
 	
 	# Enable LFS lock verification if remote origin exists
@@ -1812,14 +2099,14 @@ commit_and_push(){
 		git config "lfs.${remote_url}/info/lfs.locksverify" true 2>/dev/null || true
 	fi
 	
-	[ -e ".gitattributes" ] || find . -type f -not -path ".git/*" -size +100M -exec git lfs track {} \;
+	[ -e ".gitattributes" ] || out_manifest . ls --min-size 100M -0 | xargs -0 -r git lfs track
 	[ -e ".gitattributes" ] && {
 		git add ".gitattributes"
 		git commit -sm "Setup Git LFS"
 		git push -u origin "${branch}"
 	}
 
-	git add $(find -type f -name '*.apk')
+	out_manifest . ls --name '*.apk' -0 | xargs -0 -r git add
 	git commit -sm "Add apps for ${description}"
 	git push -u origin "${branch}"
 
@@ -1836,24 +2123,35 @@ commit_and_push(){
 	git add .
 	git commit -sm "Add extras for ${description}"
 	git push -u origin "${branch}"
+	log_stage_end git_push
+}
+
+git_exclude_state(){
+	# Keep the checkpoint state out of the dump repository
+	mkdir -p .git/info
+	grep -qxF "/.dumprx_state*" .git/info/exclude 2>/dev/null || echo "/.dumprx_state*" >> .git/info/exclude
+}
+
+remove_sys_journals(){
+	# Remove the [SYS] journal directories and drop them from the manifest
+	local journals
+	mapfile -t journals < <(find . -mindepth 2 -type d -name "\[SYS\]" -prune 2>/dev/null)
+	[[ ${#journals[@]} -gt 0 ]] || return 0
+	rm -rf "${journals[@]}"
+	out_manifest . update "${journals[@]}"
 }
 
 split_files(){
 	# usage: split_files <min_file_size> <part_size>
 	# Files larger than ${1} will be split into ${2} parts as *.aa, *.ab, etc.
-	mkdir -p "${TMPDIR}" 2>/dev/null
-	find . -size +${1} | cut -d'/' -f'2-' >| "${TMPDIR}"/.largefiles
-	if [[ -s "${TMPDIR}"/.largefiles ]]; then
-		printf '#!/bin/bash\n\n' > join_split_files.sh
-		while read -r l; do
-			split -b ${2} "${l}" "${l}".
-			rm -f "${l}" 2>/dev/null
-			printf "cat %s.* 2>/dev/null >> %s\n" "${l}" "${l}" >> join_split_files.sh
-			printf "rm -f %s.* 2>/dev/null\n" "${l}" >> join_split_files.sh
-		done < "${TMPDIR}"/.largefiles
-		chmod a+x join_split_files.sh 2>/dev/null
-	fi
-	rm -rf "${TMPDIR}" 2>/dev/null
+	# join_split_files.sh checks the parts against split_files.json and joins them
+	local changed
+	log_stage_begin split_files
+	mapfile -d '' -t changed < <(out_manifest . ls --min-size ${1} -0 | python3 "${SPLITFILES}" -b ${2} --from - -0)
+	if [[ ${#changed[@]} -gt 0 ]]; then
+		out_manifest . update "${changed[@]}"
+	fi
+	log_stage_end split_files
 }
 
 if [[ -s "${PROJECT_DIR}"/.github_token ]]; then
@@ -1877,13 +2175,14 @@ if [[ -s "${PROJECT_DIR}"/.github_token ]]; then
 	# Check if already dumped or not
 	curl -sf "https://raw.githubusercontent.com/${GIT_ORG}/${repo}/${branch}/all_files.txt" 2>/dev/null && { printf "Firmware already dumped!\nGo to https://github.com/%s/%s/tree/%s\n" "${GIT_ORG}" "${repo}" "${branch}" && exit 1; }
 	# Remove The Journal File Inside System/Vendor
-	find . -mindepth 2 -type d -name "\[SYS\]" -exec rm -rf {} \; 2>/dev/null
+	remove_sys_journals
 	split_files 62M 47M
 	log_info "Final Repository Contents:"
 	ls -lAog
 	
 	log_step "Initializing Git repository"
 	git init
+	git_exclude_state
 	
 	# Validate branch name before checkout
 	if [[ -z "${branch}" ]]; then
@@ -1897,7 +2196,8 @@ if [[ -s "${PROJECT_DIR}"/.github_token ]]; then
 	fi
 	
 	log_info "Creating git branch: ${branch}"
-	git checkout -b "${branch}" || { 
+	# A resumed push finds the branch from the previous run
+	git checkout -q "${branch}" 2>/dev/null || git checkout -b "${branch}" || { 
 		log_warn "Failed to create branch '${branch}', trying incremental '${incremental}'"
 		git checkout -b "${incremental}" && export branch="${incremental}"
 	}
@@ -1928,7 +2228,8 @@ if [[ -s "${PROJECT_DIR}"/.github_token ]]; then
 	log_info "Branch: ${branch}"
 	log_info "Description: ${description}"
 	sleep 1
-	git remote add origin https://${GITHUB_TOKEN}@github.com/${GIT_ORG}/${repo}.git
+	git remote add origin https://${GITHUB_TOKEN}@github.com/${GIT_ORG}/${repo}.git 2>/dev/null \
+		|| git remote set-url origin https://${GITHUB_TOKEN}@github.com/${GIT_ORG}/${repo}.git
 	commit_and_push
 	sleep 1
 	
@@ -1981,7 +2282,7 @@ elif [[ -s "${PROJECT_DIR}"/.gitlab_token ]]; then
 	[[ $(curl -sL "${GITLAB_HOST}/${GIT_ORG}/${repo}/-/raw/${branch}/all_files.txt" | grep "all_files.txt") ]] && { printf "Firmware already dumped!\nGo to https://"$GITLAB_INSTANCE"/${GIT_ORG}/${repo}/-/tree/${branch}\n" && exit 1; }
 
 	# Remove The Journal File Inside System/Vendor
-	find . -mindepth 2 -type d -name "\[SYS\]" -exec rm -rf {} \; 2>/dev/null
+	remove_sys_journals
 	split_files 62M 47M
 	printf "\nFinal Repository Should Look Like...\n" && ls -lAog
 	printf "\n\nStarting Git Init...\n"
@@ -1991,6 +2292,7 @@ elif [[ -s "${PROJECT_DIR}"/.gitlab_token ]]; then
 	git config --global user.email "41898282+github-actions[bot]@users.noreply.github.com"
 
 	git init		# Insure Your GitLab Authorization Before Running This Script
+	git_exclude_state
 	
 	# Validate branch name before checkout
 	if [[ -z "${branch}" ]]; then
@@ -2004,7 +2306,8 @@ elif [[ -s "${PROJECT_DIR}"/.gitlab_token ]]; then
 	fi
 	
 	log_info "Creating git branch: ${branch}"
-	git checkout -b "${branch}" || { 
+	# A resumed push finds the branch from the previous run
+	git checkout -q "${branch}" 2>/dev/null || git checkout -b "${branch}" || { 
 		log_warn "Failed to create branch '${branch}', trying incremental '${incremental}'"
 		git checkout -b "${incremental}" && export branch="${incremental}"
 	}
@@ -2026,8 +2329,14 @@ elif [[ -s "${PROJECT_DIR}"/.gitlab_token ]]; then
 	GRP_RESPONSE=$(curl -s --request GET --header "PRIVATE-TOKEN: ${GITLAB_TOKEN}" "${GITLAB_HOST}/api/v4/groups/${GIT_ORG}")
 	GRP_ID=$(echo "${GRP_RESPONSE}" | jq -r '.id')
 	
+	# A resumed push reuses the project created by the previous run
+	if checkpoint check git_push/gitlab_project -p "${GITLAB_HOST}" -p "${GIT_ORG}"; then
+		repo=$(checkpoint get git_push/gitlab_project repo)
+		codename=$(checkpoint get git_push/gitlab_project codename)
+		PROJECT_ID=$(checkpoint get git_push/gitlab_project project_id)
+		log_info "Resuming with project ${repo}"
 	# If group ID is null or empty, it's a user namespace
-	if [[ -z "${GRP_ID}" ]] || [[ "${GRP_ID}" == "null" ]]; then
+	elif [[ -z "${GRP_ID}" ]] || [[ "${GRP_ID}" == "null" ]]; then
 		log_info "Detected user namespace: ${GIT_ORG}"
 		IS_USER_NAMESPACE=true
 		
@@ -2195,6 +2504,8 @@ elif [[ -s "${PROJECT_DIR}"/.gitlab_token ]]; then
 	fi
 	
 	log_success "GitLab project created/found with ID: ${PROJECT_ID}"
+	checkpoint save git_push/gitlab_project -p "${GITLAB_HOST}" -p "${GIT_ORG}" \
+		--value repo="${repo}" --value codename="${codename}" --value project_id="${PROJECT_ID}"
 	log_info "Project URL: ${GITLAB_HOST}/${GIT_ORG}/${repo}"
 
 	# Commit and Push
@@ -2203,7 +2514,8 @@ elif [[ -s "${PROJECT_DIR}"/.gitlab_token ]]; then
 	# NOTE: SSH Keys must be added to your GitLab instance
 	log_step "Configuring Git remote with SSH"
 	log_info "Remote URL: git@${GITLAB_INSTANCE}:${GIT_ORG}/${repo}.git"
-	git remote add origin git@${GITLAB_INSTANCE}:${GIT_ORG}/${repo}.git
+	git remote add origin git@${GITLAB_INSTANCE}:${GIT_ORG}/${repo}.git 2>/dev/null \
+		|| git remote set-url origin git@${GITLAB_INSTANCE}:${GIT_ORG}/${repo}.git
 
 	# Ensure that the target repo is public (using API with token)
 	log_info "Setting repository visibility to public (API call)"
@@ -16,10 +16,19 @@ fi
 DUMPRX_CONFIG_FILE="${DUMPRX_CONFIG_FILE:-.dumprx.conf}"
 DUMPRX_DRY_RUN="${DUMPRX_DRY_RUN:-false}"
 DUMPRX_VERIFY_CHECKSUMS="${DUMPRX_VERIFY_CHECKSUMS:-false}"
+DUMPRX_DOWNLOAD_CHECKSUM="${DUMPRX_DOWNLOAD_CHECKSUM:-}"
 DUMPRX_KEEP_TEMP="${DUMPRX_KEEP_TEMP:-false}"
 DUMPRX_MAX_RETRIES="${DUMPRX_MAX_RETRIES:-3}"
 DUMPRX_DOWNLOAD_TIMEOUT="${DUMPRX_DOWNLOAD_TIMEOUT:-3600}"
 DUMPRX_ENABLE_SUMMARY="${DUMPRX_ENABLE_SUMMARY:-true}"
+DUMPRX_CACHE_DIR="${DUMPRX_CACHE_DIR:-${XDG_CACHE_HOME:-${HOME}/.cache}/dumprx}"
+DUMPRX_REMOTE_MEMBERS="${DUMPRX_REMOTE_MEMBERS:-}"
+DUMPRX_EXTRACT_JOBS="${DUMPRX_EXTRACT_JOBS:-0}"
+DUMPRX_EXTRACT_IO_BUDGET="${DUMPRX_EXTRACT_IO_BUDGET:-0}"
+DUMPRX_BOARD_INFO_RULES="${DUMPRX_BOARD_INFO_RULES:-}"
+DUMPRX_TELEMETRY="${DUMPRX_TELEMETRY:-false}"
+DUMPRX_TELEMETRY_DIR="${DUMPRX_TELEMETRY_DIR:-}"
+DUMPRX_RESUME="${DUMPRX_RESUME:-true}"
 
 # Load configuration from file
 function config_load() {
@@ -90,6 +99,9 @@ function config_load() {
 			verify_checksums)
 				export DUMPRX_VERIFY_CHECKSUMS="${value}"
 				;;
+			download_checksum)
+				export DUMPRX_DOWNLOAD_CHECKSUM="${value}"
+				;;
 			keep_temp)
 				export DUMPRX_KEEP_TEMP="${value}"
 				;;
@@ -102,6 +114,30 @@ function config_load() {
 			enable_summary)
 				export DUMPRX_ENABLE_SUMMARY="${value}"
 				;;
+			cache_dir)
+				export DUMPRX_CACHE_DIR="${value}"
+				;;
+			remote_members)
+				export DUMPRX_REMOTE_MEMBERS="${value}"
+				;;
+			extract_jobs)
+				export DUMPRX_EXTRACT_JOBS="${value}"
+				;;
+			extract_io_budget)
+				export DUMPRX_EXTRACT_IO_BUDGET="${value}"
+				;;
+			board_info_rules)
+				export DUMPRX_BOARD_INFO_RULES="${value}"
+				;;
+			telemetry)
+				export DUMPRX_TELEMETRY="${value}"
+				;;
+			telemetry_dir)
+				export DUMPRX_TELEMETRY_DIR="${value}"
+				;;
+			resume)
+				export DUMPRX_RESUME="${value}"
+				;;
 			*)
 				# Store custom configuration
 				export "DUMPRX_CUSTOM_${key}=${value}"
@@ -134,10 +170,19 @@ verbose_mode = ${DUMPRX_VERBOSE_MODE}
 # Operation settings
 dry_run = ${DUMPRX_DRY_RUN}
 verify_checksums = ${DUMPRX_VERIFY_CHECKSUMS}
+download_checksum = ${DUMPRX_DOWNLOAD_CHECKSUM}
 keep_temp = ${DUMPRX_KEEP_TEMP}
 max_retries = ${DUMPRX_MAX_RETRIES}
 download_timeout = ${DUMPRX_DOWNLOAD_TIMEOUT}
 enable_summary = ${DUMPRX_ENABLE_SUMMARY}
+cache_dir = ${DUMPRX_CACHE_DIR}
+remote_members = ${DUMPRX_REMOTE_MEMBERS}
+extract_jobs = ${DUMPRX_EXTRACT_JOBS}
+extract_io_budget = ${DUMPRX_EXTRACT_IO_BUDGET}
+board_info_rules = ${DUMPRX_BOARD_INFO_RULES}
+telemetry = ${DUMPRX_TELEMETRY}
+telemetry_dir = ${DUMPRX_TELEMETRY_DIR}
+resume = ${DUMPRX_RESUME}
 EOF
 	
 	log_success "Configuration saved successfully"
@@ -192,6 +237,10 @@ dry_run = false
 # Default: false
 verify_checksums = false
 
+# Expected md5, sha1 or sha256 of the downloaded firmware (told apart by
+# length), checked when verify_checksums is true
+# download_checksum = <hex digest>
+
 # Keep temporary files after extraction
 # Default: false
 keep_temp = false
@@ -208,6 +257,45 @@ download_timeout = 3600
 # Default: true
 enable_summary = true
 
+# Directory for state kept between runs (decoder state, caches)
+# Default: $XDG_CACHE_HOME/dumprx or $HOME/.cache/dumprx
+# cache_dir = /path/to/cache
+
+# Members to fetch from a remote zip over HTTP Range instead of the whole
+# archive (space or comma separated globs); falls back to a full download
+# Example: payload.bin *.new.dat.br boot.img
+# remote_members =
+
+# Partitions extracted concurrently
+# Default: 0 (number of CPUs)
+extract_jobs = 0
+
+# Total size in MiB of partition images extracted at the same time; a
+# larger image still runs on its own
+# Default: 0 (unlimited)
+extract_io_budget = 0
+
+# Extra board-info.txt version markers (space separated PATHS:REGEX:LABEL,
+# PATHS being comma separated globs in the dump); the first regex group
+# becomes "require version-LABEL=<value>"
+# Example: abl*:UEFI\sVer:\s*([\w.]+):abl
+# board_info_rules =
+
+# Record wall time, CPU time, I/O and peak disk usage of every stage and
+# partition to timings.json and trace.json (Chrome trace format); disk
+# usage is sampled by walking OUTDIR and TMPDIR in the background
+# Default: false
+telemetry = false
+
+# Directory for the telemetry files
+# Default: <DumprX directory>/telemetry
+# telemetry_dir = /path/to/telemetry
+
+# Skip the stages a previous run of the same firmware completed (download,
+# unpacking, partitions, file lists), kept in out/.dumprx_state.json
+# Default: true
+resume = true
+
 # ============================================================================
 # CUSTOM SETTINGS
 # ============================================================================
@@ -262,9 +350,18 @@ function config_show() {
 	echo "Operation Settings:"
 	echo "  Dry Run: ${DUMPRX_DRY_RUN}"
 	echo "  Verify Checksums: ${DUMPRX_VERIFY_CHECKSUMS}"
+	echo "  Download Checksum: ${DUMPRX_DOWNLOAD_CHECKSUM:-<not set>}"
 	echo "  Keep Temp Files: ${DUMPRX_KEEP_TEMP}"
 	echo "  Max Retries: ${DUMPRX_MAX_RETRIES}"
 	echo "  Download Timeout: ${DUMPRX_DOWNLOAD_TIMEOUT}s"
 	echo "  Enable Summary: ${DUMPRX_ENABLE_SUMMARY}"
+	echo "  Cache Dir: ${DUMPRX_CACHE_DIR}"
+	echo "  Remote Members: ${DUMPRX_REMOTE_MEMBERS:-<not set>}"
+	echo "  Extract Jobs: ${DUMPRX_EXTRACT_JOBS}"
+	echo "  Extract I/O Budget: ${DUMPRX_EXTRACT_IO_BUDGET} MiB"
+	echo "  Board Info Rules: ${DUMPRX_BOARD_INFO_RULES:-<not set>}"
+	echo "  Telemetry: ${DUMPRX_TELEMETRY}"
+	echo "  Telemetry Dir: ${DUMPRX_TELEMETRY_DIR:-<not set>}"
+	echo "  Resume: ${DUMPRX_RESUME}"
 	echo ""
 }
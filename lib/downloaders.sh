@@ -24,11 +24,35 @@ function download_direct() {
 	util_mkdir "${output_dir}" || return 1
 	cd "${output_dir}" || return 1
 	
+	# Fetch only the wanted members when the URL is a zip on a Range-capable server
+	if [[ -n "${DUMPRX_REMOTE_MEMBERS}" ]] && [[ -z "${filename}" ]] && [[ "${DUMPRX_DRY_RUN}" != "true" ]] && [[ "${url%%\?*}" == *.zip ]]; then
+		if download_remote_members "${url}" "$(pwd)"; then
+			return 0
+		fi
+		log_warn "Could not fetch archive members remotely, downloading the whole archive"
+	fi
+	
+	# With a checksum to verify, hash while downloading into the
+	# .<name>.<algorithm> sidecar download_verify reads
+	local algorithm=""
+	if [[ "${DUMPRX_VERIFY_CHECKSUMS}" == "true" ]] && [[ -n "${DUMPRX_DOWNLOAD_CHECKSUM}" ]]; then
+		algorithm=$(download_checksum_algorithm "${DUMPRX_DOWNLOAD_CHECKSUM}")
+	fi
+	
 	# Prepare download command
 	local download_cmd
-	local -a download_args
-	
-	if util_command_exists aria2c; then
+	local retries="${DUMPRX_MAX_RETRIES}"
+	local -a download_args stream_args
+	
+	if [[ -n "${algorithm}" ]] && [[ -f "${SEGMENTED:-}" ]] && python3 -c 'import requests' 2>/dev/null; then
+		# Parallel like aria2c, but digests the file as segments land and
+		# retries in-process, keeping the digest state between rounds
+		log_debug "Using the segmented downloader for download"
+		[[ -n "${filename}" ]] || filename=$(download_url_filename "${url}")
+		download_cmd="python3"
+		download_args=("${SEGMENTED}" --hash "${algorithm}" --attempts "${retries}" -o "${filename}" "${url}")
+		retries=1
+	elif util_command_exists aria2c; then
 		log_debug "Using aria2c for download"
 		download_cmd="aria2c"
 		download_args=(-x16 -s8 --console-log-level=warn --summary-interval=0 --check-certificate=false)
@@ -44,6 +68,7 @@ function download_direct() {
 			download_args+=(-O "${filename}")
 		fi
 		download_args+=("${url}")
+		stream_args=(-q --show-progress --progress=bar:force --no-check-certificate -O - "${url}")
 	elif util_command_exists curl; then
 		log_debug "Using curl for download"
 		download_cmd="curl"
@@ -52,6 +77,7 @@ function download_direct() {
 			download_args=(-L -o "${filename}")
 		fi
 		download_args+=("${url}")
+		stream_args=(-L "${url}")
 	else
 		log_error "No download tool available (aria2c, wget, or curl required)"
 		return 1
@@ -189,9 +215,17 @@ function download_direct() {
 			return 1
 		fi
 	else
+		# wget and curl stream to stdout and are hashed on the way to disk;
+		# a retry restarts the transfer, and with it the digest
+		if [[ -n "${algorithm}" ]] && [[ ${#stream_args[@]} -gt 0 ]] && util_command_exists "${algorithm}sum"; then
+			[[ -n "${filename}" ]] || filename=$(download_url_filename "${url}")
+			download_args=("${filename}" "${algorithm}" "${download_cmd}" "${stream_args[@]}")
+			download_cmd=download_hashed
+		fi
+		
 		# For wget and curl, use the spinner as before
 		log_spinner_start "Downloading..."
-		if util_retry "${DUMPRX_MAX_RETRIES}" 5 "${download_cmd}" "${download_args[@]}"; then
+		if util_retry "${retries}" 5 "${download_cmd}" "${download_args[@]}"; then
 			log_spinner_stop
 			log_success "Download completed successfully"
 			return 0
@@ -203,6 +237,54 @@ function download_direct() {
 	fi
 }
 
+# Name a download after the last path component of its URL, like curl -O
+function download_url_filename() {
+	local name="${1%%[?#]*}"
+	name="${name%/}"
+	name="${name##*/}"
+	echo "${name:-index.html}"
+}
+
+# Run a command that writes a download to stdout, saving it to a file and
+# hashing it on the way into the .<name>.<algorithm> sidecar download_verify reads
+function download_hashed() {
+	local file="$1"
+	local algorithm="$2"
+	shift 2
+	local sidecar digest
+	sidecar="$(dirname "${file}")/.$(basename "${file}").${algorithm}"
+	rm -f "${sidecar}"
+	digest=$(set -o pipefail; "$@" | tee "${file}" | "${algorithm}sum" | awk '{print $1}') || return 1
+	printf '%s  %s\n' "${digest}" "$(basename "${file}")" > "${sidecar}"
+}
+
+# Fetch selected members of a remote zip over HTTP Range requests
+function download_remote_members() {
+	local url="$1"
+	local output_dir="${2:-.}"
+	local remotezip="${REMOTEZIP:-}"
+	
+	if [[ -z "${remotezip}" ]] || [[ ! -f "${remotezip}" ]]; then
+		log_debug "Remote zip reader not found"
+		return 1
+	fi
+	
+	log_info "Fetching archive members remotely: ${DUMPRX_REMOTE_MEMBERS}"
+	
+	# Stage into a scratch directory so a partial fetch never mixes with a full download
+	local stage_dir
+	stage_dir=$(mktemp -d "${output_dir}/.remotezip.XXXXXX") || return 1
+	
+	if python3 "${remotezip}" "${url}" -m "${DUMPRX_REMOTE_MEMBERS}" -o "${stage_dir}"; then
+		mv -f "${stage_dir}"/* "${output_dir}/" && rm -rf "${stage_dir}"
+		log_success "Fetched archive members without downloading the archive"
+		return 0
+	fi
+	
+	rm -rf "${stage_dir}"
+	return 1
+}
+
 # Download from Mega.nz
 function download_mega() {
 	local url="$1"
@@ -323,8 +405,13 @@ function download_afh() {
 		return 0
 	fi
 	
+	# Hash while downloading with the algorithm of the expected checksum,
+	# or MD5, which AndroidFileHost publishes
+	local algorithm
+	algorithm=$(download_checksum_algorithm "${DUMPRX_DOWNLOAD_CHECKSUM:-}") || algorithm="md5"
+	
 	log_spinner_start "Downloading from AndroidFileHost..."
-	if python3 "${downloader}" -l "${url}"; then
+	if python3 "${downloader}" -l "${url}" --cache-dir "${DUMPRX_CACHE_DIR}" --hash "${algorithm}"; then
 		log_spinner_stop
 		log_success "AndroidFileHost download completed"
 		return 0
@@ -400,6 +487,8 @@ function download_file() {
 	# Sanitize downloaded filenames
 	if [[ ${result} -eq 0 ]]; then
 		cd "${output_dir}" || return 1
+		# Verify first: detox renames the file away from its digest sidecar
+		download_verify_dir . || return 1
 		for f in *; do
 			if [[ -f "${f}" ]]; then
 				if util_command_exists detox; then
@@ -412,6 +501,41 @@ function download_file() {
 	return ${result}
 }
 
+# Tell the algorithm of a hex digest from its length
+function download_checksum_algorithm() {
+	case "${#1}" in
+		32) echo md5 ;;
+		40) echo sha1 ;;
+		64) echo sha256 ;;
+		*) return 1 ;;
+	esac
+}
+
+# Verify every file a download produced against DUMPRX_DOWNLOAD_CHECKSUM
+function download_verify_dir() {
+	local output_dir="${1:-.}"
+	
+	[[ "${DUMPRX_VERIFY_CHECKSUMS}" == "true" ]] || return 0
+	if [[ -z "${DUMPRX_DOWNLOAD_CHECKSUM}" ]]; then
+		log_warn "No checksum provided for verification (download_checksum)"
+		return 0
+	fi
+	
+	local algorithm
+	if ! algorithm=$(download_checksum_algorithm "${DUMPRX_DOWNLOAD_CHECKSUM}"); then
+		log_error "Not an md5, sha1 or sha256 digest: ${DUMPRX_DOWNLOAD_CHECKSUM}"
+		return 1
+	fi
+	
+	local -a files
+	mapfile -t files < <(find "${output_dir}" -maxdepth 1 -type f ! -name '.*' 2>/dev/null)
+	if [[ ${#files[@]} -ne 1 ]]; then
+		log_warn "Download produced ${#files[@]} files, skipping checksum verification"
+		return 0
+	fi
+	download_verify "${files[0]}" "${DUMPRX_DOWNLOAD_CHECKSUM}" "${algorithm}"
+}
+
 # Verify download integrity
 function download_verify() {
 	local file="$1"
@@ -429,5 +553,24 @@ function download_verify() {
 	fi
 	
 	log_info "Verifying download integrity..."
+	
+	# Downloaders that hash while writing leave a .<name>.<algorithm> sidecar;
+	# trust it only if it is not older than the file itself
+	local sidecar
+	sidecar="$(dirname "${file}")/.$(basename "${file}").${algorithm}"
+	if [[ -f "${sidecar}" ]] && [[ ! "${sidecar}" -ot "${file}" ]]; then
+		local actual
+		actual=$(awk '{print $1; exit}' "${sidecar}")
+		log_debug "Using ${algorithm} digest computed during download"
+		if [[ "${actual,,}" == "${checksum,,}" ]]; then
+			log_success "Checksum verification passed"
+			return 0
+		fi
+		log_error "Checksum verification failed"
+		log_debug "Expected: ${checksum}"
+		log_debug "Actual: ${actual}"
+		return 1
+	fi
+	
 	util_verify_checksum "${file}" "${checksum}" "${algorithm}"
 }
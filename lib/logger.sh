@@ -318,5 +318,100 @@ function log_summary_print() {
 	DUMPRX_SUMMARY_ITEMS=()
 }
 
+# Stage telemetry
+# log_stage_begin/log_stage_end append one JSON line per stage to
+# DUMPRX_TELEMETRY_FILE (nothing is recorded while it is empty) with wall
+# time, CPU time and bytes read/written by this shell and the children it
+# waited for; utils/telemetry.py turns them into timings.json and a trace
+DUMPRX_TELEMETRY_FILE="${DUMPRX_TELEMETRY_FILE:-}"
+declare -gA DUMPRX_STAGE_START=() DUMPRX_STAGE_PARENT=()
+declare -ga _DUMPRX_STAGE_COUNTERS=()
+_DUMPRX_CLK_TCK=""
+
+# Set _DUMPRX_STAGE_COUNTERS to: usec user_ticks sys_ticks read_bytes write_bytes
+function _log_stage_counters() {
+	local now stat key value rbytes=0 wbytes=0
+	local -a fields=()
+	if [[ -n "${EPOCHREALTIME:-}" ]]; then
+		now="${EPOCHREALTIME/[.,]/}"
+	else
+		now=$(date +%s%6N)
+	fi
+	# Fields after "(comm) ": utime, stime, cutime, cstime are 11-14
+	if read -r stat 2>/dev/null < "/proc/${BASHPID}/stat"; then
+		read -ra fields <<< "${stat##*) }"
+	fi
+	while read -r key value; do
+		case "${key}" in
+			read_bytes:) rbytes="${value}" ;;
+			write_bytes:) wbytes="${value}" ;;
+		esac
+	done 2>/dev/null < "/proc/${BASHPID}/io"
+	_DUMPRX_STAGE_COUNTERS=("${now}" "$(( ${fields[11]:-0} + ${fields[13]:-0} ))" \
+		"$(( ${fields[12]:-0} + ${fields[14]:-0} ))" "${rbytes}" "${wbytes}")
+}
+
+function _log_json_string() {
+	local s="${1//\\/\\\\}"
+	printf '"%s"' "${s//\"/\\\"}"
+}
+
+# Start a stage: log_stage_begin <name> [partition]
+function log_stage_begin() {
+	[[ -n "${DUMPRX_TELEMETRY_FILE}" ]] || return 0
+	local key="${1}${2:+/${2}}"
+	_log_stage_counters
+	DUMPRX_STAGE_START["${key}"]="${_DUMPRX_STAGE_COUNTERS[*]}"
+	DUMPRX_STAGE_PARENT["${key}"]="${DUMPRX_TELEMETRY_STAGE:-}"
+	# Python tools started inside the stage record it as their parent
+	export DUMPRX_TELEMETRY_STAGE="${key}"
+}
+
+# Finish a stage: log_stage_end <name> [partition] [status]
+# The status defaults to that of the last command and is returned
+function log_stage_end() {
+	local status=$?
+	[[ -n "${3:-}" ]] && status="$3"
+	[[ -n "${DUMPRX_TELEMETRY_FILE}" ]] || return "${status}"
+	local key="${1}${2:+/${2}}"
+	local start="${DUMPRX_STAGE_START[${key}]:-}"
+	[[ -n "${start}" ]] || return "${status}"
+	local parent="${DUMPRX_STAGE_PARENT[${key}]}"
+	unset "DUMPRX_STAGE_START[${key}]" "DUMPRX_STAGE_PARENT[${key}]"
+	export DUMPRX_TELEMETRY_STAGE="${parent}"
+
+	local -a begin
+	read -ra begin <<< "${start}"
+	_log_stage_counters
+	local -a end=("${_DUMPRX_STAGE_COUNTERS[@]}")
+	[[ -n "${_DUMPRX_CLK_TCK}" ]] || _DUMPRX_CLK_TCK=$(getconf CLK_TCK 2>/dev/null || echo 100)
+	local tck="${_DUMPRX_CLK_TCK}"
+	local dur=$((end[0] - begin[0])) user=$((end[1] - begin[1])) sys=$((end[2] - begin[2]))
+
+	printf '{"type":"stage","name":%s,"partition":%s,"parent":%s,"ts":%s,"dur":%s,"pid":%s,"user":%d.%06d,"sys":%d.%06d,"read_bytes":%s,"write_bytes":%s,"status":%s}\n' \
+		"$(_log_json_string "$1")" "$([[ -n "${2:-}" ]] && _log_json_string "$2" || echo null)" \
+		"$([[ -n "${parent}" ]] && _log_json_string "${parent}" || echo null)" \
+		"${begin[0]}" "${dur}" "${BASHPID}" \
+		$((user / tck)) $(((user % tck) * 1000000 / tck)) $((sys / tck)) $(((sys % tck) * 1000000 / tck)) \
+		$((end[3] - begin[3])) $((end[4] - begin[4])) "${status}" >> "${DUMPRX_TELEMETRY_FILE}" 2>/dev/null
+	log_debug "Stage ${key}: $((dur / 1000000)).$(printf '%03d' $((dur / 1000 % 1000)))s"
+	return "${status}"
+}
+
+# Finish every stage still open (e.g. from an exit trap): log_stage_end_all [status]
+function log_stage_end_all() {
+	local status=$?
+	[[ -n "${1:-}" ]] && status="$1"
+	local key
+	for key in "${!DUMPRX_STAGE_START[@]}"; do
+		if [[ "${key}" == */* ]]; then
+			log_stage_end "${key%%/*}" "${key#*/}" "${status}"
+		else
+			log_stage_end "${key}" "" "${status}"
+		fi
+	done
+	return "${status}"
+}
+
 # Initialize on source
 log_init
@@ -100,6 +100,11 @@ log_step "Installing uv for Python package management"
 bash -c "$(curl -sL https://astral.sh/uv/install.sh)" || abort "uv installation failed"
 log_success "uv installed successfully"
 
+# Decompressors for the rootless EROFS and F2FS readers; without them
+# compressed images fall back to fsck.erofs and extract.f2fs
+log_step "Installing Python modules for the image readers"
+python3 -m pip install --user -r "${SCRIPT_DIR}/utils/requirements.txt" || log_warn "Could not install utils/requirements.txt, compressed images will use slower fallbacks"
+
 # Setup complete
 log_success "Setup completed successfully!"
 log_info "You can now run ./dumper.sh to start using DumprX"
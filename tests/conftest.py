@@ -0,0 +1,113 @@
+"""
+Shared fixtures: local HTTP servers with Range support
+"""
+
+import os
+import re
+import sys
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'utils'))
+sys.path.insert(0, os.path.join(ROOT, 'utils', 'downloaders'))
+
+RANGE = re.compile(r'bytes=(\d+)-(\d*)$')
+
+
+class RangeServer:
+    """
+    Serves in-memory files over HTTP with single Range support.
+
+    Args:
+        files: dict path -> bytes
+        chunk: Bytes written per send
+        delay: Seconds to sleep after each send (throttling)
+        stall_after: Stop sending for stall seconds after this many bytes
+            of a response (once per response)
+        stall: Seconds to stall
+        ranges: Answer Range requests with 206
+    """
+
+    def __init__(self, files, chunk=16 * 1024, delay=0.0, stall_after=None, stall=0.0,
+                 ranges=True):
+        self.files = files
+        self.chunk = chunk
+        self.delay = delay
+        self.stall_after = stall_after
+        self.stall = stall
+        self.ranges = ranges
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                data = server.files.get(self.path.split('?')[0])
+                if data is None:
+                    self.send_error(404)
+                    return
+                header = self.headers.get('Range')
+                server.requests.append((self.path, header))
+                start, end = 0, len(data)
+                match = RANGE.match(header or '') if server.ranges else None
+                if match:
+                    start = int(match.group(1))
+                    if match.group(2):
+                        end = min(end, int(match.group(2)) + 1)
+                    self.send_response(206)
+                    self.send_header('Content-Range', f'bytes {start}-{end - 1}/{len(data)}')
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Length', str(end - start))
+                self.end_headers()
+                sent = 0
+                stalled = False
+                try:
+                    while start + sent < end:
+                        piece = data[start + sent:min(end, start + sent + server.chunk)]
+                        self.wfile.write(piece)
+                        self.wfile.flush()
+                        sent += len(piece)
+                        if server.stall_after is not None and not stalled \
+                                and sent >= server.stall_after:
+                            stalled = True
+                            time.sleep(server.stall)
+                        if server.delay:
+                            time.sleep(server.delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.httpd.server_port}{path}'
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def range_server():
+    """Factory starting RangeServer instances, shut down after the test"""
+    servers = []
+
+    def start(files, **options):
+        server = RangeServer(files, **options)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
@@ -0,0 +1,64 @@
+"""
+Tests for utils/archive_index.py listing and extraction
+"""
+
+import os
+import zipfile
+import subprocess
+
+import pytest
+
+from archive_index import ArchiveIndex
+
+SEVEN_ZIP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'utils', 'bin', '7zz')
+
+
+def test_zip_listing_cached(tmp_path):
+    archive = tmp_path / 'fw.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('images/super.img_sparsechunk.0', b'chunk')
+        zf.writestr('images/system-p1.img', b'system')
+    manifest = tmp_path / 'archive_index.json'
+    index = ArchiveIndex(str(archive), str(manifest))
+    assert manifest.exists()
+
+    written, failed = index.extract(index.select(['*super?img*']), str(tmp_path / 'out'))
+    assert not failed
+    assert [p.rsplit('/', 1)[1] for p in written] == ['super.img_sparsechunk.0']
+    assert ArchiveIndex(str(archive), str(manifest)).members == index.members
+
+
+def test_failed_listing_not_cached(tmp_path):
+    archive = tmp_path / 'fw.bin'
+    archive.write_bytes(b'\x00' * 1024)
+    manifest = tmp_path / 'archive_index.json'
+    index = ArchiveIndex(str(archive), str(manifest), seven_zip='false')
+    assert index.members == []
+    assert not manifest.exists()
+
+
+@pytest.mark.skipif(not os.access(SEVEN_ZIP, os.X_OK), reason='needs utils/bin/7zz')
+@pytest.mark.parametrize('solid, runs', [('on', 1), ('off', 3)])
+def test_7z_runs_follow_solid_blocks(tmp_path, monkeypatch, solid, runs):
+    src = tmp_path / 'src'
+    src.mkdir()
+    files = {f'part{i}.img': os.urandom(50000 + i) for i in range(3)}
+    for name, data in files.items():
+        (src / name).write_bytes(data)
+    archive = tmp_path / 'fw.7z'
+    subprocess.run([SEVEN_ZIP, 'a', f'-ms={solid}', str(archive)]
+                   + sorted(str(p) for p in src.iterdir()),
+                   check=True, stdout=subprocess.DEVNULL)
+
+    index = ArchiveIndex(str(archive), seven_zip=SEVEN_ZIP)
+    assert index.is_solid == (solid == 'on')
+    calls = []
+    run_7z = index._run_7z
+    monkeypatch.setattr(index, '_run_7z', lambda plan, out: calls.append(plan) or run_7z(plan, out))
+    out = tmp_path / 'out'
+    written, failed = index.extract(index.select(['*.img']), str(out), jobs=4)
+    assert not failed and len(written) == 3
+    assert len(calls) == runs
+    for name, data in files.items():
+        assert (out / name).read_bytes() == data
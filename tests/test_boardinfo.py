@@ -0,0 +1,32 @@
+"""
+Tests for utils/boardinfo.py markers and rules
+"""
+
+import pytest
+
+from boardinfo import RULES, board_info, parse_rule
+
+
+def test_default_rules(tmp_path):
+    (tmp_path / 'modem').mkdir()
+    (tmp_path / 'modem' / 'qdsp6m.qdb').write_bytes(
+        b'\x00\x01QC_IMAGE_VERSION_STRING=MPSS.HI.4.3.1-00123-abc\x00')
+    (tmp_path / 'md1img.img').write_bytes(b'\xff' * 64 + b'MOLY.LR12A.R3.MP.V98.P75\x00\xff')
+    (tmp_path / 'modem.bin').write_bytes(b'\x00' * 32 + b'G991BXXU5CVF1\x00')
+    assert board_info(str(tmp_path), RULES, jobs=2) == [
+        'require version-baseband=4.3.1-00123-abc',
+        'require version-baseband=G991BXXU5CVF1',
+        'require version-baseband=MOLY.LR12A.R3.MP.V98.P75',
+    ]
+
+
+def test_rule_regex_with_colon(tmp_path):
+    (tmp_path / 'abl.img').write_bytes(b'\x00UEFI Ver: 5.0.230101.BOOT\x00')
+    rule = parse_rule(r'abl*,xbl*:UEFI\sVer:\s*([\w.]+):abl')
+    assert rule.paths == ('abl*', 'xbl*')
+    assert board_info(str(tmp_path), (rule,), jobs=1) == ['require version-abl=5.0.230101.BOOT']
+
+
+def test_invalid_rule():
+    with pytest.raises(ValueError):
+        parse_rule('modem:baseband')
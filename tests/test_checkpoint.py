@@ -0,0 +1,67 @@
+"""
+Tests for utils/checkpoint.py stage tracking
+"""
+
+from checkpoint import STATE_NAME, CheckpointState
+
+
+def _state(tmp_path, firmware=b'firmware'):
+    (tmp_path / 'fw.zip').write_bytes(firmware)
+    state = CheckpointState(str(tmp_path))
+    state.set_input(str(tmp_path / 'fw.zip'))
+    return state
+
+
+def test_save_and_check(tmp_path):
+    state = _state(tmp_path)
+    out = tmp_path / 'system.img'
+    out.write_bytes(b'system')
+    assert not state.check('extract', ['a'])
+    state.save('tools', outputs=[str(out)], any_input=True)
+    state.save('extract', ['a'], [str(out)], values={'codename': 'lisa'})
+    assert (tmp_path / STATE_NAME).exists()
+
+    state = CheckpointState(str(tmp_path))
+    assert state.check('extract', ['a'])
+    assert state.get('extract', 'codename') == 'lisa'
+    assert not state.check('extract', ['b'])
+    assert not state.check('extract', ['a'])
+
+    # Another firmware drops everything but the input independent stages
+    state.save('extract', ['a'], [str(out)])
+    _state(tmp_path, b'other firmware')
+    assert not state.check('extract', ['a'])
+    assert state.check('tools', any_input=True)
+
+
+def test_modified_output_drops_later_stages(tmp_path):
+    state = _state(tmp_path)
+    (tmp_path / 'system.img').write_bytes(b'system')
+    (tmp_path / 'system').mkdir()
+    (tmp_path / 'system' / 'build.prop').write_text('ro.build.id=1\n')
+    state.save('extract', outputs=[str(tmp_path / 'system.img')])
+    state.save('partitions', outputs=[str(tmp_path / 'system')])
+    state.save('partition/system', outputs=[str(tmp_path / 'system')])
+    assert state.check('partitions')
+
+    (tmp_path / 'system' / 'build.prop').write_text('ro.build.id=2\n')
+    assert not state.check('partitions')
+    assert not state.check('partition/system')
+    assert state.check('extract')
+
+
+def test_consumed_output(tmp_path):
+    state = _state(tmp_path)
+    image = tmp_path / 'system.img'
+    image.write_bytes(b'system')
+    state.save('extract', outputs=[str(image)])
+    (tmp_path / 'system').mkdir()
+    (tmp_path / 'system' / 'build.prop').write_text('ro.build.id=1\n')
+    image.unlink()
+    state.save('partition/system', outputs=[str(tmp_path / 'system')], consumes=[str(image)])
+    assert state.check('extract')
+
+    # Without the step that consumed it, the missing image counts again
+    (tmp_path / 'system' / 'build.prop').unlink()
+    assert not state.check('extract')
+    assert not state.check('partition/system')
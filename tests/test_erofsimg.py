@@ -0,0 +1,83 @@
+"""
+Tests for utils/erofsimg.py against a hand-built image
+
+mkfs.erofs only emits single-block interlaced pclusters, so the image is
+assembled here to also cover a two-block one with a wrapped tail.
+"""
+
+import os
+import stat
+import struct
+
+from erofsimg import (
+    ADVISE_BIG_PCLUSTER_1, ADVISE_BIG_PCLUSTER_2, ADVISE_INTERLACED_PCLUSTER,
+    DIRENT, EROFS_MAGIC, EROFS_SUPERBLOCK, EROFS_SUPERBLOCK_OFFSET, FULL_INDEX,
+    INODE_COMPACT, LAYOUT_COMPRESSED_FULL, LAYOUT_FLAT_INLINE, LCLUSTER_NONHEAD,
+    LCLUSTER_PLAIN, LI_D0_CBLKCNT, MAP_HEADER, ErofsImage,
+)
+
+BLOCK = 4096
+FILE_NID = 8
+SPLIT = 2 * BLOCK + 100
+
+
+def _inode(layout, mode, size):
+    return INODE_COMPACT.pack(layout << 1, 0, mode, 1, size, 0, 0, 0, 0, 0, 0)
+
+
+def _build(path, content):
+    """Root directory with one file made of two interlaced pclusters"""
+    image = bytearray(7 * BLOCK)
+    EROFS_SUPERBLOCK.pack_into(
+        image, EROFS_SUPERBLOCK_OFFSET, EROFS_MAGIC, 0, 0, 12, 0, 0, 2, 0, 0,
+        7, 1, 0, b'', b'', 0, 0, 0, 0, 0, 0, 0, 0)
+
+    names = [b'.', b'..', b'file']
+    nameoff = len(names) * DIRENT.size
+    dirents = b''
+    for name, nid, ftype in zip(names, (0, 0, FILE_NID), (2, 2, 1)):
+        dirents += DIRENT.pack(nid, nameoff, ftype, 0)
+        nameoff += len(name)
+    dirdata = dirents + b''.join(names)
+    root = BLOCK
+    image[root:root + 32] = _inode(LAYOUT_FLAT_INLINE, stat.S_IFDIR | 0o755, len(dirdata))
+    image[root + 32:root + 32 + len(dirdata)] = dirdata
+
+    node = BLOCK + FILE_NID * 32
+    image[node:node + 32] = _inode(LAYOUT_COMPRESSED_FULL, stat.S_IFREG | 0o644, len(content))
+    advise = ADVISE_INTERLACED_PCLUSTER | ADVISE_BIG_PCLUSTER_1 | ADVISE_BIG_PCLUSTER_2
+    MAP_HEADER.pack_into(image, node + 32, 0, advise, 0, 0)
+    index = [
+        (LCLUSTER_PLAIN, 0, 2),
+        (LCLUSTER_NONHEAD, 0, LI_D0_CBLKCNT | 3),
+        (LCLUSTER_PLAIN, SPLIT % BLOCK, 5),
+        (LCLUSTER_NONHEAD, 0, LI_D0_CBLKCNT | 2),
+        (LCLUSTER_NONHEAD, 0, 2),
+    ]
+    for i, entry in enumerate(index):
+        FULL_INDEX.pack_into(image, node + 48 + i * FULL_INDEX.size, *entry)
+
+    # [0, SPLIT) starts block-aligned; the second pcluster starts 100
+    # bytes into its block and its last 50 bytes wrap to the front
+    image[2 * BLOCK:2 * BLOCK + SPLIT] = content[:SPLIT]
+    second = content[SPLIT:]
+    shift = SPLIT % BLOCK
+    head = 2 * BLOCK - shift
+    image[5 * BLOCK + shift:7 * BLOCK] = second[:head]
+    image[5 * BLOCK:5 * BLOCK + len(second) - head] = second[head:]
+    with open(path, 'wb') as f:
+        f.write(image)
+
+
+def test_interlaced_big_pcluster(tmp_path):
+    content = os.urandom(4 * BLOCK + 50)
+    path = tmp_path / 'system.img'
+    _build(path, content)
+
+    with ErofsImage(str(path)) as fs:
+        inode = fs.inode(FILE_NID)
+        assert [e[:2] for e in fs.extents(inode)] == [(0, SPLIT), (SPLIT, len(content) - SPLIT)]
+        assert fs.read(inode) == content
+        out = tmp_path / 'out'
+        fs.extract(str(out), jobs=1, prefix='system')
+    assert (out / 'file').read_bytes() == content
@@ -0,0 +1,48 @@
+"""
+Tests for utils/ext4img.py against images built with mkfs.ext4 -d
+"""
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from ext4img import Ext4Image
+
+pytestmark = pytest.mark.skipif(shutil.which('mkfs.ext4') is None, reason='needs mkfs.ext4')
+
+GIB = 1024 ** 3
+
+
+def _mkfs(tmp_path, source, size):
+    image = tmp_path / 'system.img'
+    with open(image, 'wb') as f:
+        f.truncate(size)
+    subprocess.run(['mkfs.ext4', '-q', '-F', '-d', str(source), str(image)], check=True)
+    return image
+
+
+def test_file_over_4gib(tmp_path):
+    source = tmp_path / 'src'
+    source.mkdir()
+    head = os.urandom(4096)
+    tail = os.urandom(4096)
+    size = 5 * GIB + 8192
+    with open(source / 'big.bin', 'wb') as f:
+        f.write(head)
+        f.seek(size - len(tail))
+        f.write(tail)
+    (source / 'small.txt').write_bytes(b'ext4\n')
+    image = _mkfs(tmp_path, source, 6 * GIB)
+
+    out = tmp_path / 'out'
+    with Ext4Image(str(image)) as fs:
+        fs.extract(str(out), prefix='system')
+    big = out / 'big.bin'
+    assert big.stat().st_size == size
+    with open(big, 'rb') as f:
+        assert f.read(len(head)) == head
+        f.seek(size - len(tail))
+        assert f.read() == tail
+    assert (out / 'small.txt').read_bytes() == b'ext4\n'
@@ -0,0 +1,86 @@
+"""
+Tests for utils/remotezip.py against a local Range server
+"""
+
+import io
+import os
+import zipfile
+
+import pytest
+
+from remotezip import RemoteZip, RemoteZipError
+
+STORED = os.urandom(200 * 1024)
+DEFLATED = b'DumprX firmware member\n' * 20000
+LZMA = b'lzma compressed member\n' * 5000
+
+
+def _archive():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as zf:
+        zf.writestr('images/boot.img', STORED, compress_type=zipfile.ZIP_STORED)
+        zf.writestr('META-INF/build.prop', DEFLATED, compress_type=zipfile.ZIP_DEFLATED)
+        zf.writestr('payload.txt', LZMA, compress_type=zipfile.ZIP_LZMA)
+        zf.writestr('empty.txt', b'', compress_type=zipfile.ZIP_DEFLATED)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def archive(range_server):
+    data = _archive()
+    server = range_server({'/fw.zip': data})
+    return RemoteZip(server.url('/fw.zip')), server
+
+
+def _read(remote, name):
+    info = next(i for i in remote.infolist() if i.filename == name)
+    return b''.join(remote.iter_member(info))
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('images/boot.img', STORED),
+    ('META-INF/build.prop', DEFLATED),
+    ('payload.txt', LZMA),
+    ('empty.txt', b''),
+])
+def test_iter_member(archive, name, expected):
+    remote, _server = archive
+    assert _read(remote, name) == expected
+
+
+def test_members_fetched_without_archive(archive):
+    remote, server = archive
+    assert _read(remote, 'images/boot.img') == STORED
+    # Probe, tail, local header and the member itself; nothing else
+    assert len(server.requests) == 4
+    assert all(r[1] for r in server.requests)
+
+
+def test_extract_matching(archive, tmp_path):
+    remote, _server = archive
+    paths = remote.extract_matching(['*.img', 'build.prop'], str(tmp_path))
+    assert sorted(os.path.basename(p) for p in paths) == ['boot.img', 'build.prop']
+    assert (tmp_path / 'boot.img').read_bytes() == STORED
+    assert (tmp_path / 'build.prop').read_bytes() == DEFLATED
+    assert not list(tmp_path.glob('*.part'))
+
+
+def test_crc_mismatch(range_server, tmp_path):
+    data = bytearray(_archive())
+    # Flip a byte inside the stored member's data
+    offset = data.index(STORED[:64])
+    data[offset + 1000] ^= 0xFF
+    server = range_server({'/fw.zip': bytes(data)})
+    remote = RemoteZip(server.url('/fw.zip'))
+    with pytest.raises(RemoteZipError, match='CRC mismatch'):
+        _read(remote, 'images/boot.img')
+    info = remote.match(['boot.img'])[0]
+    with pytest.raises(RemoteZipError):
+        remote.extract(info, str(tmp_path))
+    assert not list(tmp_path.iterdir())
+
+
+def test_no_range_support(range_server):
+    server = range_server({'/fw.zip': _archive()}, ranges=False)
+    with pytest.raises(RemoteZipError, match='range'):
+        RemoteZip(server.url('/fw.zip'))
@@ -0,0 +1,146 @@
+"""
+Tests for utils/downloaders/segmented.py against local Range servers
+"""
+
+import os
+import json
+import hashlib
+
+import pytest
+
+import segmented
+from segmented import SegmentedDownload, download_from_mirrors, make_session, rank_mirrors
+
+SEGMENT = segmented.READ_CHUNK_SIZE
+DATA = os.urandom(8 * SEGMENT + 1234)
+
+
+def _ranged(server):
+    return [r for r in server.requests if r[1] and r[1] != 'bytes=0-0']
+
+
+def test_download_and_digest(range_server, tmp_path):
+    server = range_server({'/fw.zip': DATA})
+    dest = str(tmp_path / 'fw.zip')
+    job = SegmentedDownload(server.url('/fw.zip'), dest, connections=4, segment_size=SEGMENT,
+                            hash_algorithm='sha256')
+    job.run()
+    with open(dest, 'rb') as f:
+        assert f.read() == DATA
+    assert job.digest == hashlib.sha256(DATA).hexdigest()
+    with open(segmented.digest_path(dest, 'sha256')) as f:
+        assert f.read().split()[0] == job.digest
+    assert not os.path.exists(dest + segmented.STATE_SUFFIX)
+
+
+def test_single_stream_without_ranges(range_server, tmp_path):
+    server = range_server({'/fw.zip': DATA}, ranges=False)
+    dest = str(tmp_path / 'fw.zip')
+    job = SegmentedDownload(server.url('/fw.zip'), dest, segment_size=SEGMENT,
+                            hash_algorithm='md5')
+    job.run()
+    with open(dest, 'rb') as f:
+        assert f.read() == DATA
+    assert job.digest == hashlib.md5(DATA).hexdigest()
+
+
+def test_rank_mirrors_fastest_first(range_server):
+    slow = range_server({'/fw.zip': DATA}, chunk=8 * 1024, delay=0.02)
+    fast = range_server({'/fw.zip': DATA})
+    ranked = rank_mirrors(make_session(), [slow.url('/fw.zip'), fast.url('/fw.zip')],
+                          probe_bytes=2 * SEGMENT)
+    assert [r['url'] for r in ranked] == [fast.url('/fw.zip'), slow.url('/fw.zip')]
+    assert all(r['size'] == len(DATA) and r['ranges'] for r in ranked)
+
+
+def test_download_from_fastest_mirror(range_server, tmp_path):
+    slow = range_server({'/fw.zip': DATA}, chunk=8 * 1024, delay=0.02)
+    fast = range_server({'/fw.zip': DATA})
+    dest = str(tmp_path / 'fw.zip')
+    download_from_mirrors([slow.url('/fw.zip'), fast.url('/fw.zip')], dest, multi=False,
+                          connections=4, segment_size=SEGMENT)
+    with open(dest, 'rb') as f:
+        assert f.read() == DATA
+    # The slow mirror only saw the probe
+    assert len(slow.requests) == 1
+    assert len(_ranged(fast)) >= 8
+
+
+def test_switch_mirror_after_stall(range_server, tmp_path):
+    # The preferred mirror stops sending partway through every response
+    stalling = range_server({'/fw.zip': DATA}, chunk=4 * 1024, stall_after=16 * 1024, stall=5)
+    healthy = range_server({'/fw.zip': DATA})
+    dest = str(tmp_path / 'fw.zip')
+    job = SegmentedDownload(None, dest, connections=1, segment_size=SEGMENT, timeout=1,
+                            mirrors=[(stalling.url('/fw.zip'), 10.0),
+                                     (healthy.url('/fw.zip'), 1.0)])
+    job.run()
+    with open(dest, 'rb') as f:
+        assert f.read() == DATA
+    # The first segment started on the stalling mirror and finished elsewhere
+    assert _ranged(stalling)[0][1].startswith('bytes=0-')
+    assert _ranged(healthy)
+    assert job.mirrors[0].strikes >= 1
+
+
+def test_retry_keeps_digest_state(range_server, tmp_path):
+    server = range_server({'/fw.zip': DATA})
+    dest = str(tmp_path / 'fw.zip')
+    job = SegmentedDownload(server.url('/fw.zip'), dest, connections=1, segment_size=SEGMENT,
+                            max_retries=0, hash_algorithm='sha256')
+    failed = []
+    fetch = job._fetch_segment
+
+    def flaky(idx, mirror):
+        if idx == 4 and not failed:
+            failed.append(idx)
+            raise segmented.DownloadError('connection reset')
+        fetch(idx, mirror)
+
+    hasher = job.hasher
+    offsets = []
+    update = hasher.update
+
+    def record(data):
+        offsets.append(hasher.offset)
+        update(data)
+
+    job._fetch_segment = flaky
+    hasher.update = record
+    job.run(attempts=2)
+    with open(dest, 'rb') as f:
+        assert f.read() == DATA
+    assert failed
+    # The second round went on hashing where the first stopped
+    assert job.hasher is hasher
+    assert offsets == sorted(set(offsets))
+    assert job.digest == hashlib.sha256(DATA).hexdigest()
+
+
+def test_resume_from_stored_offsets(range_server, tmp_path):
+    # The first transfer dies halfway through segment 0
+    stalling = range_server({'/fw.zip': DATA}, chunk=4 * 1024, stall_after=2 * SEGMENT, stall=3)
+    dest = str(tmp_path / 'fw.zip')
+    segment_size = 4 * SEGMENT
+    first = SegmentedDownload(stalling.url('/fw.zip'), dest, connections=1,
+                              segment_size=segment_size, timeout=1, max_retries=0)
+    with pytest.raises(segmented.DownloadError):
+        first.run()
+    with open(dest + segmented.STATE_SUFFIX) as f:
+        state = json.load(f)
+    assert state['done'] == []
+    offset = state['partial']['0']
+    assert 0 < offset < segment_size
+
+    healthy = range_server({'/fw.zip': DATA})
+    job = SegmentedDownload(healthy.url('/fw.zip'), dest, connections=1,
+                            segment_size=segment_size, hash_algorithm='sha256')
+    job.run()
+    with open(dest, 'rb') as f:
+        assert f.read() == DATA
+    assert job.digest == hashlib.sha256(DATA).hexdigest()
+    # Segment 0 continued at the stored offset, the others started fresh
+    ranges = sorted(r[1] for r in _ranged(healthy))
+    assert ranges == sorted([f'bytes={offset}-{segment_size - 1}',
+                             f'bytes={segment_size}-{2 * segment_size - 1}',
+                             f'bytes={2 * segment_size}-{len(DATA) - 1}'])
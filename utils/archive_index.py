@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Archive Index Module for DumprX
+Lists a firmware archive (zip, tar, 7z, rar, ...) once into a JSON manifest,
+answers member queries from it instead of re-reading the archive, and
+extracts batches of members in one pass
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import struct
+import fnmatch
+import tarfile
+import zipfile
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from sparseimg import copy_range
+from telemetry import tool_stage
+
+
+MANIFEST_VERSION = 2
+ZIP_MAGIC = b'PK\x03\x04'
+ZIP_LOCAL_HEADER = struct.Struct('<4s5H3I2H')
+TAR_MAGIC_OFFSET = 257
+TAR_MAGIC = b'ustar'
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def _zip_method(compress_type):
+    return {
+        zipfile.ZIP_STORED: 'Store',
+        zipfile.ZIP_DEFLATED: 'Deflate',
+        zipfile.ZIP_BZIP2: 'BZip2',
+        zipfile.ZIP_LZMA: 'LZMA',
+    }.get(compress_type, str(compress_type))
+
+
+def _member(name, size, packed=None, method='', offset=None, is_dir=False, block=None):
+    return {
+        'name': name,
+        'size': size,
+        'packed': packed,
+        'method': method,
+        'offset': offset,
+        'dir': is_dir,
+        'block': block,
+    }
+
+
+class ArchiveIndex:
+    """
+    Member listing of one archive, cached in a manifest file.
+
+    The manifest is keyed by the archive's real path, size and mtime, so
+    it is rebuilt only when the archive changes.
+    """
+
+    def __init__(self, path, manifest_path=None, seven_zip='7zz', logger=None):
+        """
+        Load the manifest or list the archive.
+
+        Args:
+            path: Archive path
+            manifest_path: JSON file to cache the listing in (optional)
+            seven_zip: 7-Zip binary used for formats other than zip and tar
+            logger: Logger instance for logging (optional)
+        """
+        self.path = os.path.realpath(path)
+        self.manifest_path = manifest_path
+        self.seven_zip = seven_zip
+        self.logger = logger
+        st = os.stat(self.path)
+        self.key = {'archive': self.path, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+        manifest = self._load()
+        if manifest is None:
+            self.reader, self.format, self.members = self._build()
+            # A failed 7-Zip listing is not cached, so the next run lists again
+            if self.format is not None:
+                self._save()
+        else:
+            self.reader, self.format = manifest['reader'], manifest['format']
+            self.members = manifest['members']
+
+    def _log_warn(self, message):
+        if self.logger:
+            self.logger.warning(message)
+        else:
+            print(f"[WARN] {message}", file=sys.stderr)
+
+    # ------------------------------------------------------------------
+    # Manifest
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        if not self.manifest_path:
+            return None
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('version') != MANIFEST_VERSION:
+            return None
+        if any(manifest.get(k) != v for k, v in self.key.items()):
+            return None
+        return manifest
+
+    def _save(self):
+        if not self.manifest_path:
+            return
+        manifest = dict(self.key, version=MANIFEST_VERSION, reader=self.reader,
+                        format=self.format, members=self.members)
+        tmp_path = self.manifest_path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            self._log_warn(f"Could not write archive manifest: {e}")
+
+    # ------------------------------------------------------------------
+    # Listing
+    # ------------------------------------------------------------------
+
+    def _build(self):
+        """
+        Returns:
+            tuple: (reader, format, members); reader is zipfile, tarfile or 7zz
+        """
+        with open(self.path, 'rb') as f:
+            head = f.read(TAR_MAGIC_OFFSET + len(TAR_MAGIC))
+        if head.startswith(ZIP_MAGIC):
+            try:
+                return 'zipfile', 'zip', self._list_zip()
+            except zipfile.BadZipFile as e:
+                self._log_warn(f"zipfile could not read {self.path} ({e}), using 7-Zip")
+        elif head[TAR_MAGIC_OFFSET:].startswith(TAR_MAGIC):
+            try:
+                return 'tarfile', 'tar', self._list_tar()
+            except tarfile.TarError as e:
+                self._log_warn(f"tarfile could not read {self.path} ({e}), using 7-Zip")
+        return ('7zz',) + self._list_7z()
+
+    def _list_zip(self):
+        members = []
+        with zipfile.ZipFile(self.path) as zf:
+            for info in zf.infolist():
+                members.append(_member(info.filename.rstrip('/'), info.file_size,
+                                       info.compress_size, _zip_method(info.compress_type),
+                                       info.header_offset, info.is_dir()))
+        return members
+
+    def _list_tar(self):
+        members = []
+        with tarfile.open(self.path, 'r:') as tf:
+            for info in tf:
+                members.append(_member(info.name, info.size, info.size, 'Store',
+                                       info.offset_data, info.isdir()))
+        return members
+
+    def _list_7z(self):
+        """List anything 7-Zip can open; the format is whatever it reports"""
+        try:
+            proc = subprocess.run([self.seven_zip, 'l', '-slt', '-ba', self.path],
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            self._log_warn(f"Could not run {self.seven_zip}: {e}")
+            return None, []
+        if proc.returncode != 0:
+            return None, []
+
+        members = []
+        for block in proc.stdout.decode('utf-8', 'replace').split('\n\n'):
+            fields = {}
+            for line in block.splitlines():
+                key, sep, value = line.partition(' = ')
+                if sep:
+                    fields[key] = value
+                elif line.endswith(' ='):
+                    fields[line[:-2]] = ''
+            if 'Path' not in fields:
+                continue
+            is_dir = fields.get('Folder') == '+' or fields.get('Attributes', '').startswith('D')
+            members.append(_member(
+                fields['Path'],
+                int(fields['Size']) if fields.get('Size', '').isdigit() else 0,
+                int(fields['Packed Size']) if fields.get('Packed Size', '').isdigit() else None,
+                fields.get('Method', ''),
+                int(fields['Offset']) if fields.get('Offset', '').isdigit() else None,
+                is_dir,
+                int(fields['Block']) if fields.get('Block', '').isdigit() else None,
+            ))
+        return os.path.splitext(self.path)[1].lstrip('.').lower() or '7z', members
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def names(self, include_dirs=True):
+        """
+        Member names in archive order.
+
+        Returns:
+            list: Names
+        """
+        return [m['name'] for m in self.members if include_dirs or not m['dir']]
+
+    def find(self, pattern):
+        """
+        Members whose full name or basename matches a glob.
+
+        Args:
+            pattern: fnmatch pattern, e.g. 'super.*img' or 'system.new.dat*'
+
+        Returns:
+            list: Matching member dicts
+        """
+        return [m for m in self.members
+                if fnmatch.fnmatchcase(m['name'], pattern)
+                or fnmatch.fnmatchcase(os.path.basename(m['name']), pattern)]
+
+    def has(self, pattern):
+        """True if any member matches pattern (see find())"""
+        return bool(self.find(pattern))
+
+    def select(self, patterns):
+        """
+        File members matching any of patterns, in archive order.
+
+        Returns:
+            list: Member dicts
+        """
+        return [m for m in self.members if not m['dir'] and any(
+            fnmatch.fnmatchcase(m['name'], p) or fnmatch.fnmatchcase(os.path.basename(m['name']), p)
+            for p in patterns)]
+
+    @property
+    def is_solid(self):
+        """True if several members share one compressed block"""
+        blocks = [m['block'] for m in self.members if m['block'] is not None]
+        return len(blocks) != len(set(blocks))
+
+    # ------------------------------------------------------------------
+    # Extraction
+    # ------------------------------------------------------------------
+
+    def extract(self, members, output_dir, jobs=None, rename=None):
+        """
+        Extract members flat into output_dir, like 7zz e.
+
+        Zip and tar members are independent and are written concurrently;
+        stored data is copied with copy_file_range(). Everything else goes
+        through 7zz with list files: a non-solid 7z is split over parallel
+        runs, anything solid (or without block info, like rar) is decoded
+        once by a single run.
+
+        Args:
+            members: Member dicts from select()/find()
+            output_dir: Destination directory
+            jobs: Concurrent members for zip/tar, 7zz runs for a non-solid
+                7z (default: CPU count)
+            rename: Callable mapping a basename to the name to write (optional)
+
+        Returns:
+            tuple: (written paths, failed member names)
+        """
+        plan = []
+        seen = set()
+        for member in members:
+            if member['dir']:
+                continue
+            name = os.path.basename(member['name'])
+            if rename:
+                name = rename(name)
+            if name in seen:
+                self._log_warn(f"Skipping {member['name']}: {name} already extracted")
+                continue
+            seen.add(name)
+            plan.append((member, os.path.join(output_dir, name)))
+        if not plan:
+            return [], []
+
+        os.makedirs(output_dir, exist_ok=True)
+        if self.reader == 'zipfile':
+            failed = self._extract_zip(plan, jobs or os.cpu_count() or 1)
+        elif self.reader == 'tarfile':
+            failed = self._extract_tar(plan, jobs or os.cpu_count() or 1)
+        else:
+            failed = self._extract_7z(plan, output_dir, jobs or os.cpu_count() or 1)
+        written = [path for member, path in plan
+                   if member['name'] not in failed and os.path.exists(path)]
+        return written, failed
+
+    def _run_parallel(self, plan, jobs, extract_one):
+        failed = []
+
+        def task(item):
+            member, out_path = item
+            try:
+                extract_one(member, out_path)
+            except (OSError, zipfile.BadZipFile, tarfile.TarError, ValueError) as e:
+                self._log_warn(f"Failed to extract {member['name']}: {e}")
+                if os.path.exists(out_path):
+                    os.unlink(out_path)
+                failed.append(member['name'])
+
+        # Largest first so one big image does not start last
+        plan = sorted(plan, key=lambda item: item[0]['size'], reverse=True)
+        with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(plan)))) as pool:
+            list(pool.map(task, plan))
+        return failed
+
+    def _copy_stored(self, src_fd, offset, size, out_path):
+        fd = os.open(out_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            copy_range(src_fd, fd, size, offset, 0)
+        finally:
+            os.close(fd)
+
+    def _extract_zip(self, plan, jobs):
+        src_fd = os.open(self.path, os.O_RDONLY)
+        # ZipFile serialises reads on its shared handle; inflating runs in parallel
+        zf = zipfile.ZipFile(self.path)
+        try:
+            def extract_one(member, out_path):
+                info = zf.getinfo(member['name'])
+                if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1:
+                    header = os.pread(src_fd, ZIP_LOCAL_HEADER.size, info.header_offset)
+                    fields = ZIP_LOCAL_HEADER.unpack(header)
+                    if fields[0] != ZIP_MAGIC:
+                        raise ValueError('bad local file header')
+                    offset = info.header_offset + ZIP_LOCAL_HEADER.size + fields[9] + fields[10]
+                    self._copy_stored(src_fd, offset, info.file_size, out_path)
+                else:
+                    with zf.open(info) as src, open(out_path, 'wb') as dst:
+                        shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+
+            return self._run_parallel(plan, jobs, extract_one)
+        finally:
+            zf.close()
+            os.close(src_fd)
+
+    def _extract_tar(self, plan, jobs):
+        src_fd = os.open(self.path, os.O_RDONLY)
+        try:
+            def extract_one(member, out_path):
+                self._copy_stored(src_fd, member['offset'], member['size'], out_path)
+
+            # GNU sparse members are not stored contiguously
+            with tarfile.open(self.path, 'r:') as tf:
+                sparse = {info.name for info in tf if info.issparse()}
+            failed = self._run_parallel([i for i in plan if i[0]['name'] not in sparse],
+                                        jobs, extract_one)
+            if sparse:
+                with tarfile.open(self.path, 'r:') as tf:
+                    for member, out_path in plan:
+                        if member['name'] in sparse:
+                            with tf.extractfile(member['name']) as src, \
+                                    open(out_path, 'wb') as dst:
+                                shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+            return failed
+        finally:
+            os.close(src_fd)
+
+    def _extract_7z(self, plan, output_dir, jobs):
+        if jobs <= 1 or len(plan) <= 1 or self.is_solid or \
+                any(member['block'] is None for member, _out_path in plan):
+            return self._run_7z(plan, output_dir)
+        # Every member is its own block, so runs over disjoint lists do not
+        # decode anything twice; balance them by size
+        groups = [[] for _ in range(min(jobs, len(plan)))]
+        sizes = [0] * len(groups)
+        for item in sorted(plan, key=lambda item: item[0]['size'], reverse=True):
+            i = sizes.index(min(sizes))
+            groups[i].append(item)
+            sizes[i] += item[0]['size']
+        with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+            results = list(pool.map(lambda group: self._run_7z(group, output_dir), groups))
+        return [name for failed in results for name in failed]
+
+    def _run_7z(self, plan, output_dir):
+        with tempfile.TemporaryDirectory(dir=output_dir, prefix='.extract.') as stage:
+            list_path = os.path.join(stage, 'members.txt')
+            with open(list_path, 'w') as f:
+                for member, _out_path in plan:
+                    f.write(member['name'] + '\n')
+            out_dir = os.path.join(stage, 'out')
+            try:
+                subprocess.run([self.seven_zip, 'e', '-y', '-o' + out_dir, self.path,
+                                '@' + list_path],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except OSError as e:
+                self._log_warn(f"Could not run {self.seven_zip}: {e}")
+                return [member['name'] for member, _out_path in plan]
+            failed = []
+            for member, out_path in plan:
+                staged = os.path.join(out_dir, os.path.basename(member['name']))
+                if os.path.exists(staged):
+                    os.replace(staged, out_path)
+                else:
+                    failed.append(member['name'])
+            return failed
+
+
+def main():
+    """
+    Main function for standalone usage.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='List an archive once, query the cached manifest and extract members'
+    )
+    parser.add_argument('archive', help='Archive to index')
+    parser.add_argument('-m', '--manifest', default=None,
+                        help='Manifest file to cache the listing in')
+    parser.add_argument('--7zz', dest='seven_zip', default=os.environ.get('BIN_7ZZ', '7zz'),
+                        help='7-Zip binary for formats other than zip and tar (default: 7zz)')
+    parser.add_argument('command', nargs='?', default='ls',
+                        choices=('ls', 'has', 'find', 'json', 'extract'),
+                        help='ls: member names; has/find PATTERN...: glob query; '
+                             'json: manifest; extract PATTERN...: extract matches')
+    parser.add_argument('patterns', nargs='*', help='Globs for has/find/extract')
+    parser.add_argument('-o', '--output', default='.',
+                        help='Output directory for extract (default: current directory)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Concurrent members (zip/tar) or 7zz runs (non-solid 7z) '
+                             '(default: CPU count)')
+    parser.add_argument('--rename', nargs=2, metavar=('REGEX', 'REPL'), default=None,
+                        help='Rename extracted files: first re.sub() of REGEX in the basename')
+
+    args = parser.parse_intermixed_args()
+    if args.command in ('has', 'find', 'extract') and not args.patterns:
+        parser.error(f"{args.command} needs a pattern")
+
+    if not os.path.isfile(args.archive):
+        sys.exit(1)
+    try:
+        index = ArchiveIndex(args.archive, args.manifest, args.seven_zip)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.command == 'ls':
+        for name in index.names():
+            print(name)
+    elif args.command == 'find':
+        matches = index.select(args.patterns)
+        for member in matches:
+            print(member['name'])
+        sys.exit(0 if matches else 1)
+    elif args.command == 'has':
+        sys.exit(0 if any(index.has(p) for p in args.patterns) else 1)
+    elif args.command == 'extract':
+        rename = None
+        if args.rename:
+            regex = re.compile(args.rename[0])
+            rename = lambda name: regex.sub(args.rename[1], name, count=1)
+        written, failed = index.extract(index.select(args.patterns), args.output,
+                                        args.jobs, rename)
+        for path in written:
+            print(path)
+        sys.exit(1 if failed or not written else 0)
+    else:
+        json.dump({'format': index.format, 'reader': index.reader, 'solid': index.is_solid,
+                   'members': index.members}, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    with tool_stage():
+        main()
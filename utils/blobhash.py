@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Blob Hash Module for DumprX
+Pins blob lists (proprietary-files.txt, all_files.txt) with sha1 values,
+hashing files on a thread pool and remembering hashes across runs so only
+changed files are read again
+"""
+
+import os
+import sys
+import json
+import fnmatch
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from telemetry import tool_stage
+
+
+CACHE_VERSION = 2
+# Oldest entries are dropped beyond this, so the cache cannot grow forever
+MAX_CACHE_ENTRIES = 500000
+READ_SIZE = 1024 * 1024
+# Where a blob is looked up when the path is not found as written
+FALLBACK_DIRS = ('system', 'system/system')
+
+
+def sha1_file(path):
+    """
+    Hash one file.
+
+    Returns:
+        str: Hex sha1 digest
+    """
+    digest = hashlib.sha1()
+    buf = bytearray(READ_SIZE)
+    view = memoryview(buf)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+
+def _write_atomic(path, data):
+    """Write data to path through a temporary file and rename"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix='.blobhash-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class BlobHasher:
+    """
+    sha1 hasher with a persistent cache.
+
+    Cache entries are keyed by device and inode and are valid while the
+    file's size, mtime and ctime are unchanged. The ctime also catches a
+    reused inode and a rewrite that restored the old mtime.
+    """
+
+    def __init__(self, cache_file=None, jobs=None, logger=None):
+        """
+        Load the hash cache.
+
+        Args:
+            cache_file: JSON file to keep hashes in between runs (optional)
+            jobs: Hashing threads (default: CPU count)
+            logger: Logger instance for logging (optional)
+        """
+        self.cache_file = cache_file
+        self.jobs = jobs or os.cpu_count() or 1
+        self.logger = logger
+        self.cache = self._load_cache()
+        self.touched = {}
+        self.hashed = 0
+        self.cached = 0
+
+    def _log_warn(self, message):
+        if self.logger:
+            self.logger.warning(message)
+        else:
+            print(f"[WARN] {message}", file=sys.stderr)
+
+    def _load_cache(self):
+        if not self.cache_file:
+            return {}
+        try:
+            with open(self.cache_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+            return {}
+        return data.get('hashes', {})
+
+    def save(self):
+        """Persist the cache atomically, most recently used entries last"""
+        if not self.cache_file:
+            return
+        hashes = {key: value for key, value in self.cache.items() if key not in self.touched}
+        hashes.update(self.touched)
+        if len(hashes) > MAX_CACHE_ENTRIES:
+            hashes = dict(list(hashes.items())[-MAX_CACHE_ENTRIES:])
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_file)), exist_ok=True)
+            _write_atomic(self.cache_file,
+                          json.dumps({'version': CACHE_VERSION, 'hashes': hashes}).encode())
+        except OSError as e:
+            self._log_warn(f"Could not save hash cache {self.cache_file}: {e}")
+
+    def _hash_one(self, path):
+        """Return (key, cache entry, from cache) or None"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = f"{st.st_dev}:{st.st_ino}"
+        signature = [st.st_size, st.st_mtime_ns, st.st_ctime_ns]
+        entry = self.cache.get(key)
+        if entry and entry[:3] == signature:
+            return key, entry, True
+        try:
+            return key, signature + [sha1_file(path)], False
+        except OSError as e:
+            self._log_warn(f"Cannot hash {path}: {e}")
+            return None
+
+    def hash_files(self, paths):
+        """
+        Hash many files on the thread pool.
+
+        Args:
+            paths: File paths
+
+        Returns:
+            dict: path -> hex sha1, or None for files that cannot be read
+        """
+        paths = list(dict.fromkeys(paths))
+        if self.jobs <= 1 or len(paths) <= 1:
+            results = map(self._hash_one, paths)
+        else:
+            with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                results = list(pool.map(self._hash_one, paths))
+        hashes = {}
+        for path, result in zip(paths, results):
+            if result is None:
+                hashes[path] = None
+                continue
+            key, entry, from_cache = result
+            self.touched[key] = entry
+            if from_cache:
+                self.cached += 1
+            else:
+                self.hashed += 1
+            hashes[path] = entry[3]
+        return hashes
+
+
+def _blob_path(entry, root):
+    """
+    Find the file for one list entry: the path as written (without a
+    leading "-"), else under system/ or system/system/.
+    """
+    blob = entry[1:] if entry.startswith('-') else entry
+    for base in ('',) + FALLBACK_DIRS:
+        path = os.path.join(root, base, blob)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def pin_list(src, dst, root='.', hasher=None, exclude=()):
+    """
+    Write a copy of a blob list with "|sha1" appended to every blob.
+
+    Blank lines and comments are copied as they are; entries whose file
+    cannot be found are copied unpinned.
+
+    Args:
+        src: Blob list, one path per line
+        dst: Output file
+        root: Directory the paths are relative to
+        hasher: BlobHasher to use (default: uncached)
+        exclude: Glob patterns of entries to leave out of the output
+
+    Returns:
+        tuple: (pinned, missing) entry counts
+    """
+    hasher = hasher or BlobHasher()
+    with open(src, encoding='utf-8', errors='surrogateescape') as f:
+        lines = f.read().splitlines()
+
+    blobs = {}
+    excluded = set()
+    for line in lines:
+        entry = line.strip()
+        if not entry or '# ' in line:
+            continue
+        if any(fnmatch.fnmatchcase(entry, pattern) for pattern in exclude):
+            excluded.add(entry)
+        else:
+            blobs[entry] = _blob_path(entry, root)
+    hashes = hasher.hash_files(path for path in blobs.values() if path)
+
+    out = []
+    pinned = missing = 0
+    for line in lines:
+        entry = line.strip()
+        if entry in blobs:
+            sha1 = hashes.get(blobs[entry])
+            if sha1:
+                out.append(f"{line.rstrip()}|{sha1}")
+                pinned += 1
+                continue
+            missing += 1
+        elif entry in excluded:
+            continue
+        out.append(line)
+
+    with open(dst, 'w', encoding='utf-8', errors='surrogateescape') as f:
+        f.write(''.join(line + '\n' for line in out))
+    return pinned, missing
+
+
+def main():
+    """
+    Main function for standalone usage.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Pin a blob list with sha1 values'
+    )
+    parser.add_argument('src', help='Blob list (proprietary-files.txt, all_files.txt)')
+    parser.add_argument('dst', help='Output file')
+    parser.add_argument('-C', '--root', default='.',
+                        help='Directory the blob paths are relative to (default: .)')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='Hashing threads (default: CPU count)')
+    parser.add_argument('--cache', help='JSON file to keep hashes in between runs')
+    parser.add_argument('--exclude', action='append', default=[],
+                        help='Leave out entries matching this glob (repeatable)')
+
+    args = parser.parse_args()
+
+    hasher = BlobHasher(cache_file=args.cache, jobs=args.jobs)
+    try:
+        pinned, missing = pin_list(args.src, args.dst, args.root, hasher, args.exclude)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    hasher.save()
+    if missing:
+        print(f"[WARN] {missing} blob(s) not found, left unpinned", file=sys.stderr)
+    print(f"[INFO] Pinned {pinned} blob(s): {hasher.hashed} hashed, {hasher.cached} cached")
+
+
+if __name__ == '__main__':
+    with tool_stage():
+        main()
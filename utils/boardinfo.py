@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Board Info Module for DumprX
+Builds board-info.txt by scanning firmware blobs (modem, trustzone, ...)
+for version markers: every file is mmapped and searched with a compiled
+regex in a process pool (matching holds the GIL), instead of running
+strings on each of them
+"""
+
+import os
+import re
+import sys
+import glob
+import mmap
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from telemetry import tool_stage
+
+
+# Bytes strings(1) treats as text
+PRINTABLE = frozenset(range(0x20, 0x7f)) | {0x09}
+MIN_STRING = 4
+# How far a printable run is followed around a marker
+MAX_STRING = 4096
+
+Rule = namedtuple('Rule', 'paths marker format')
+
+# Model, region, update type, bootloader, feature, year, month, build
+SAMSUNG_BUILD = r'[A-Z]\d{3}[A-Z0-9]{1,3}[A-Z]{2}[USE][0-9A-Z][A-Z]{3}[0-9A-Z]'
+
+
+def _version_line(regex, label):
+    """Format "require version-LABEL=<first group, or the whole match>" lines"""
+    pattern = re.compile(regex)
+
+    def format_line(text):
+        match = pattern.search(text)
+        if not match:
+            return f"require version-{label}={text}"
+        return f"require version-{label}={match.group(1) if match.groups() else match.group(0)}"
+
+    return format_line
+
+
+# Each rule scans the files under paths (globs relative to the dump) for
+# marker and turns the printable string around every hit into a line
+RULES = (
+    # QC_IMAGE_VERSION_STRING=MPSS.XX.<version> -> baseband <version>
+    Rule(('modem',), re.compile(rb'QC_IMAGE_VERSION_STRING=MPSS.'),
+         lambda s: 'require version-baseband=' + s.replace('QC_IMAGE_VERSION_STRING=MPSS.', '')[3:]),
+    Rule(('tz*',), re.compile(rb'QC_IMAGE_VERSION_STRING'),
+         lambda s: s.replace('QC_IMAGE_VERSION_STRING', 'require version-trustzone')),
+    Rule(('vendor/build.prop',), re.compile(rb'ro\.vendor\.build\.date\.utc'),
+         lambda s: s.replace('ro.vendor.build.date.utc', 'require version-vendor')),
+    # MediaTek modem: MOLY.LR12A.R3.MP.V98.P75
+    Rule(('md1img*', 'modem*'), re.compile(rb'MOLY\.[\w.]+'),
+         _version_line(r'MOLY\.[\w.]+', 'baseband')),
+    # Exynos CP image: Samsung build id, e.g. G991BXXU5CVF1
+    Rule(('modem.bin*', 'radio*'), re.compile(SAMSUNG_BUILD.encode()),
+         _version_line(SAMSUNG_BUILD, 'baseband')),
+)
+
+
+def _string_at(data, start, end):
+    """The printable run containing data[start:end], like one strings line"""
+    low = start
+    limit = max(0, start - MAX_STRING)
+    while low > limit and data[low - 1] in PRINTABLE:
+        low -= 1
+    high = end
+    limit = min(len(data), end + MAX_STRING)
+    while high < limit and data[high] in PRINTABLE:
+        high += 1
+    if high - low < MIN_STRING:
+        return None, high
+    return bytes(data[low:high]).decode('ascii'), high
+
+
+def scan_file(path, marker):
+    """
+    Find the printable strings containing marker in one file.
+
+    Returns:
+        list: Strings, once each, in file order
+    """
+    try:
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return []
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return []
+    found = []
+    try:
+        covered = 0
+        for match in marker.finditer(data):
+            if match.start() < covered:
+                continue
+            text, covered = _string_at(data, match.start(), match.end())
+            if text is not None:
+                found.append(text)
+    finally:
+        data.close()
+    return found
+
+
+def _log_warn(message):
+    print(f"Warning: {message}", file=sys.stderr)
+
+
+def _rule_files(root, rule):
+    files = []
+    for pattern in rule.paths:
+        for path in sorted(glob.glob(os.path.join(glob.escape(root), pattern))):
+            if os.path.isfile(path):
+                files.append(path)
+            elif os.path.isdir(path):
+                for dirpath, _dirs, names in os.walk(path):
+                    files.extend(os.path.join(dirpath, name) for name in sorted(names))
+    return files
+
+
+def board_info(root, rules=RULES, jobs=None):
+    """
+    Scan a dump for all rules.
+
+    Args:
+        root: Dump directory
+        rules: Rule tuples (default: the built-in RULES)
+        jobs: Worker processes (default: CPU count)
+
+    Returns:
+        list: Sorted, unique board-info lines
+    """
+    tasks = [(path, rule) for rule in rules for path in _rule_files(root, rule)]
+    paths = [path for path, _rule in tasks]
+    markers = [rule.marker for _path, rule in tasks]
+    jobs = min(jobs or os.cpu_count() or 1, len(tasks))
+    results = None
+    if jobs > 1:
+        try:
+            pool = ProcessPoolExecutor(max_workers=jobs,
+                                       mp_context=multiprocessing.get_context('fork'))
+        except (OSError, ImportError, ValueError) as e:
+            # No working semaphores (e.g. without /dev/shm)
+            _log_warn(f"process pool unavailable ({e}), scanning in-process")
+        else:
+            with pool:
+                chunksize = max(1, len(tasks) // (jobs * 4))
+                results = list(pool.map(scan_file, paths, markers, chunksize=chunksize))
+    if results is None:
+        results = [scan_file(path, marker) for path, marker in zip(paths, markers)]
+    lines = {rule.format(text) for (_path, rule), found in zip(tasks, results) for text in found}
+    return sorted(lines)
+
+
+def parse_rule(spec):
+    """
+    Parse a --rule value: PATHS:REGEX:LABEL, where PATHS is a comma
+    separated list of globs and the line becomes
+    "require version-LABEL=<first group, or the whole match>".
+    PATHS ends at the first ':' and LABEL starts after the last one, so
+    REGEX may contain ':'.
+    """
+    try:
+        paths, rest = spec.split(':', 1)
+        regex, label = rest.rsplit(':', 1)
+        if not paths or not regex or not label:
+            raise ValueError("expected PATHS:REGEX:LABEL")
+        marker = re.compile(regex.encode())
+        format_line = _version_line(regex, label)
+    except (ValueError, re.error) as e:
+        raise ValueError(f"Invalid rule {spec!r}: {e}")
+
+    return Rule(tuple(paths.split(',')), marker, format_line)
+
+
+def main():
+    """
+    Main function for standalone usage.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Build board-info.txt from firmware version strings'
+    )
+    parser.add_argument('root', help='Dump directory')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Write board-info.txt here instead of stdout')
+    parser.add_argument('--rule', action='append', default=[], metavar='PATHS:REGEX:LABEL',
+                        help='Extra marker, e.g. "abl*:UEFI\\sVer:\\s*([\\w.]+):abl" '
+                             '(repeatable)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Worker processes (default: CPU count)')
+
+    args = parser.parse_args()
+
+    try:
+        rules = RULES + tuple(parse_rule(spec) for spec in args.rule)
+        lines = board_info(args.root, rules, args.jobs)
+        text = ''.join(line + '\n' for line in lines)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(text)
+        else:
+            sys.stdout.write(text)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    with tool_stage():
+        main()
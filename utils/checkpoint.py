@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Checkpoint Module for DumprX
+Remembers the stages a dump has completed in a state file in the work
+directory, so a rerun of the same firmware skips them. A checkpoint is
+keyed by the input fingerprint and the stage parameters, and is trusted
+only while its outputs keep the sizes and hashes recorded with it
+
+Stages are ordered by when they were saved. Names without a "/" are
+phases: a phase is also valid when a later phase is, and a phase that
+has to run again drops every checkpoint saved after it. Names with a
+"/" (partition/system, ...) are steps inside a phase; an output a phase
+recorded may disappear when a valid later step consumed it.
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import hashlib
+import tempfile
+from contextlib import contextmanager
+
+from telemetry import tool_stage
+
+
+STATE_NAME = '.dumprx_state.json'
+STATE_VERSION = 1
+# Files are hashed from this much data at their start, middle and end
+SAMPLE_SIZE = 1024 * 1024
+
+
+def sample_sha1(path, size=None):
+    """
+    Hash a file from SAMPLE_SIZE bytes at its start, middle and end (the
+    whole file when it is small) and its size.
+
+    Returns:
+        str: Hex sha1 digest
+    """
+    if size is None:
+        size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, 'rb') as f:
+        if size <= 3 * SAMPLE_SIZE:
+            offsets = [0]
+            length = size
+        else:
+            offsets = [0, (size - SAMPLE_SIZE) // 2, size - SAMPLE_SIZE]
+            length = SAMPLE_SIZE
+        for offset in offsets:
+            f.seek(offset)
+            digest.update(f.read(length))
+    return digest.hexdigest()
+
+
+def _walk(path):
+    """Yield (relative path, lstat) of the regular files below path, sorted"""
+    for dirpath, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full = os.path.join(dirpath, name)
+            try:
+                st = os.lstat(full)
+            except OSError:
+                continue
+            yield os.path.relpath(full, path), st
+
+
+def fingerprint(path):
+    """
+    Fingerprint a stage output: a file by size and sampled sha1, a
+    directory by a sha1 of every file's path, size and mtime.
+
+    Returns:
+        dict: Fingerprint, or None when path does not exist
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not os.path.isdir(path):
+        return {'size': st.st_size, 'sha1': sample_sha1(path, st.st_size)}
+    digest = hashlib.sha1()
+    count = total = 0
+    for rel, st in _walk(path):
+        digest.update(os.fsencode(rel) + f"\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+        count += 1
+        total += st.st_size
+    return {'files': count, 'size': total, 'sha1': digest.hexdigest()}
+
+
+def input_fingerprint(value):
+    """
+    Fingerprint the firmware input: a file, every file of a directory
+    (paths, sizes and sampled sha1s), or any other string (a URL) as is.
+
+    Returns:
+        str: Hex sha1 digest
+    """
+    digest = hashlib.sha1()
+    if os.path.isdir(value):
+        for rel, st in _walk(value):
+            full = os.path.join(value, rel)
+            digest.update(os.fsencode(rel) + f"\0{sample_sha1(full, st.st_size)}\n".encode())
+    elif os.path.isfile(value):
+        digest.update(sample_sha1(value).encode())
+    else:
+        digest.update(value.encode('utf-8', 'surrogateescape'))
+    return digest.hexdigest()
+
+
+def _params_key(params):
+    return hashlib.sha1(json.dumps(list(params)).encode()).hexdigest()
+
+
+def _is_phase(name):
+    return '/' not in name
+
+
+class CheckpointState:
+    """
+    State file of one work directory.
+
+    Output paths inside the work directory are stored relative to it.
+    Every change is made under an flock on the work directory and written
+    atomically, so concurrent partition jobs can save their checkpoints.
+    """
+
+    def __init__(self, path, logger=None):
+        """
+        Args:
+            path: State file, or the work directory to keep STATE_NAME in
+            logger: Logger instance for logging (optional)
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, STATE_NAME)
+        self.path = os.path.abspath(path)
+        self.root = os.path.dirname(self.path)
+        self.logger = logger
+
+    def _log_warn(self, message):
+        if self.logger:
+            self.logger.warning(message)
+        else:
+            print(f"[WARN] {message}", file=sys.stderr)
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = None
+        except (OSError, ValueError) as e:
+            self._log_warn(f"Ignoring unreadable state {self.path}: {e}")
+            data = None
+        if not isinstance(data, dict) or data.get('version') != STATE_VERSION:
+            data = {'version': STATE_VERSION, 'input': None, 'seq': 0, 'stages': {}}
+        return data
+
+    def _save(self, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.dumprx_state-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=1)
+                f.write('\n')
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @contextmanager
+    def _locked(self):
+        """Load the state under the lock and save it if it changed"""
+        fd = os.open(self.root, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            data = self._load()
+            before = json.dumps(data, sort_keys=True)
+            yield data
+            if json.dumps(data, sort_keys=True) != before:
+                self._save(data)
+        finally:
+            os.close(fd)
+
+    def _abspath(self, rel):
+        return rel if os.path.isabs(rel) else os.path.join(self.root, rel)
+
+    def _relpath(self, path):
+        path = os.path.abspath(path)
+        if path == self.root or path.startswith(self.root + os.sep):
+            return os.path.relpath(path, self.root)
+        return path
+
+    def set_input(self, value):
+        """
+        Record the firmware input. When it differs from the one the state
+        was saved for, every checkpoint tied to the input is dropped.
+
+        Returns:
+            str: Input fingerprint
+        """
+        digest = input_fingerprint(value)
+        with self._locked() as data:
+            if data['input'] != digest:
+                data['stages'] = {name: entry for name, entry in data['stages'].items()
+                                  if entry['input'] is None}
+                data['input'] = digest
+        return digest
+
+    def _valid(self, data, name, key, memo):
+        if name in memo:
+            return memo[name]
+        memo[name] = False
+        entry = data['stages'].get(name)
+        if not entry or (key is not None and entry['key'] != key):
+            return False
+        if entry['input'] is not None and entry['input'] != data['input']:
+            return False
+        later = sorted((other for other, e in data['stages'].items() if e['seq'] > entry['seq']),
+                       key=lambda other: data['stages'][other]['seq'])
+        # The firmware itself (a download) is never superseded
+        if _is_phase(name) and entry['input'] is not None and any(
+                self._valid(data, other, None, memo) for other in later
+                if _is_phase(other) and data['stages'][other]['input'] is not None):
+            memo[name] = True
+            return True
+        for rel, recorded in entry['outputs'].items():
+            current = fingerprint(self._abspath(rel))
+            if current == recorded:
+                continue
+            if current is None and any(rel in data['stages'][other]['consumes']
+                                       and self._valid(data, other, None, memo)
+                                       for other in later if not _is_phase(other)):
+                continue
+            return False
+        memo[name] = True
+        return True
+
+    def check(self, name, params=(), any_input=False):
+        """
+        Tell whether a stage can be skipped.
+
+        A phase that cannot is dropped with every checkpoint saved after
+        it, since they were built on its outputs; a step only drops itself.
+
+        Args:
+            name: Stage name
+            params: Stage parameters the checkpoint was saved with
+            any_input: The stage does not depend on the firmware input
+
+        Returns:
+            bool: True if the checkpoint exists and its outputs are intact
+        """
+        with self._locked() as data:
+            entry = data['stages'].get(name)
+            if entry and (entry['input'] is None) != any_input:
+                entry = None
+            if entry and self._valid(data, name, _params_key(params), {}):
+                return True
+            if entry and _is_phase(name):
+                data['stages'] = {other: e for other, e in data['stages'].items()
+                                  if e['seq'] < entry['seq']}
+            else:
+                data['stages'].pop(name, None)
+            return False
+
+    def save(self, name, params=(), outputs=(), consumes=(), values=None, any_input=False):
+        """
+        Record a completed stage.
+
+        Args:
+            name: Stage name
+            params: Stage parameters
+            outputs: Files and directories the stage produced
+            consumes: Outputs of earlier stages this one removed
+            values: Extra strings to keep with the checkpoint (dict)
+            any_input: The stage does not depend on the firmware input
+        """
+        recorded = {}
+        for path in outputs:
+            current = fingerprint(path)
+            if current is None:
+                self._log_warn(f"{name}: output {path} does not exist")
+                continue
+            recorded[self._relpath(path)] = current
+        with self._locked() as data:
+            data['seq'] += 1
+            data['stages'][name] = {
+                'seq': data['seq'],
+                'input': None if any_input else data['input'],
+                'key': _params_key(params),
+                'outputs': recorded,
+                'consumes': [self._relpath(path) for path in consumes],
+                'values': dict(values or {}),
+                'time': int(time.time()),
+            }
+
+    def get(self, name, key):
+        """
+        Read a value saved with a checkpoint.
+
+        Returns:
+            str: The value, or None
+        """
+        with self._locked() as data:
+            entry = data['stages'].get(name)
+            if not entry or (entry['input'] is not None and entry['input'] != data['input']):
+                return None
+            return entry['values'].get(key)
+
+    def reset(self):
+        """Forget every checkpoint"""
+        with self._locked():
+            pass
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _top_files(directory):
+    """Regular files directly in directory, except the state file"""
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError:
+        return []
+    return [os.path.join(directory, name) for name in names
+            if name != STATE_NAME and os.path.isfile(os.path.join(directory, name))]
+
+
+def main():
+    """
+    Main function for standalone usage.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Keep track of completed DumprX stages'
+    )
+    parser.add_argument('state', help=f'State file, or the work directory to keep {STATE_NAME} in')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    input_parser = subparsers.add_parser('input', help='Record the firmware input')
+    input_parser.add_argument('value', help='Firmware file, directory or URL')
+
+    for command, text in (('check', 'Exit 0 if a stage can be skipped'),
+                          ('save', 'Record a completed stage')):
+        sub = subparsers.add_parser(command, help=text)
+        sub.add_argument('name', help='Stage name (phase, or phase step such as partition/system)')
+        sub.add_argument('-p', '--param', action='append', default=[],
+                         help='Stage parameter (repeatable)')
+        sub.add_argument('--any-input', action='store_true',
+                         help='The stage does not depend on the firmware input')
+    save_parser = subparsers.choices['save']
+    save_parser.add_argument('-o', '--output', dest='outputs', action='append', default=[],
+                             metavar='PATH', help='File or directory produced (repeatable)')
+    save_parser.add_argument('--files-in', action='append', default=[], metavar='DIR',
+                             help='Also record every regular file directly in DIR')
+    save_parser.add_argument('--consumes', action='append', default=[], metavar='PATH',
+                             help='Earlier output removed by this stage (repeatable)')
+    save_parser.add_argument('--value', action='append', default=[], metavar='KEY=VALUE',
+                             help='Keep a value with the checkpoint (repeatable)')
+
+    get_parser = subparsers.add_parser('get', help='Print a value saved with a checkpoint')
+    get_parser.add_argument('name', help='Stage name')
+    get_parser.add_argument('key', help='Value name')
+
+    subparsers.add_parser('reset', help='Forget every checkpoint')
+
+    args = parser.parse_args()
+
+    state = CheckpointState(args.state)
+    try:
+        if args.command == 'input':
+            print(state.set_input(args.value))
+        elif args.command == 'check':
+            sys.exit(0 if state.check(args.name, args.param, args.any_input) else 1)
+        elif args.command == 'save':
+            outputs = list(args.outputs)
+            for directory in args.files_in:
+                outputs += _top_files(directory)
+            values = dict(value.partition('=')[::2] for value in args.value)
+            state.save(args.name, args.param, outputs, args.consumes, values, args.any_input)
+        elif args.command == 'get':
+            value = state.get(args.name, args.key)
+            if value is None:
+                sys.exit(1)
+            print(value)
+        else:
+            state.reset()
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == '__main__':
+    with tool_stage():
+        main()
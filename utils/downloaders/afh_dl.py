@@ -6,17 +6,26 @@ from __future__ import absolute_import
 from __future__ import print_function
 from builtins import input
 
+import os
 import re
 import cgi
 import json
 import math
 import sys
+import time
 import clint
 import argparse
 import humanize
 import requests
 
+from segmented import (SegmentedDownload, DownloadError, DEFAULT_ATTEMPTS, DEFAULT_CONNECTIONS,
+                       HASH_ALGORITHMS, make_session, rank_mirrors)
+
 mirror_url = r"https://androidfilehost.com/libs/otf/mirrors.otf.php"
+cache_name = "afh_mirrors.json"
+default_cache_ttl = 3600
+# AndroidFileHost publishes MD5 sums
+default_hash = "md5"
 url_matchers = [
     re.compile(r"fid=(?P<id>\d+)")
 ]
@@ -45,26 +54,90 @@ class Mirror:
     def __init__(self, **entries):
         self.__dict__.update(entries)
 
-def download_file(url, fname, fsize):
-    """Download file with progress bar"""
+class MirrorCache:
+    """On-disk cache of fid -> mirrors, filename and size with a TTL"""
+
+    def __init__(self, cache_dir=None, ttl=default_cache_ttl):
+        if cache_dir is None:
+            cache_dir = os.environ.get('DUMPRX_CACHE_DIR') or os.path.join(
+                os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'dumprx')
+        self.path = os.path.join(cache_dir, cache_name)
+        self.ttl = ttl
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _save(self, data):
+        now = time.time()
+        data = dict((k, v) for k, v in data.items() if now - v.get('time', 0) < self.ttl)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except (IOError, OSError) as e:
+            log_warning('Could not write mirror cache: {}'.format(e))
+
+    def get(self, fid):
+        """Return (servers, (rsize, size, fname)) if cached and fresh, else None"""
+        if self.ttl <= 0:
+            return None
+        entry = self._load().get(fid)
+        if not entry or time.time() - entry.get('time', 0) >= self.ttl:
+            return None
+        servers = [Mirror(**mirror) for mirror in entry['mirrors']]
+        rsize = entry['size']
+        return servers, (rsize, humanize.naturalsize(rsize, binary=True), entry['filename'])
+
+    def put(self, fid, servers, file_info):
+        if self.ttl <= 0:
+            return
+        data = self._load()
+        data[fid] = {
+            'time': time.time(),
+            'mirrors': [server.__dict__ for server in servers],
+            'size': file_info[0],
+            'filename': file_info[2],
+        }
+        self._save(data)
+
+    def drop(self, fid):
+        data = self._load()
+        if data.pop(fid, None) is not None:
+            self._save(data)
+
+def download_file(url, fname, fsize, connections=DEFAULT_CONNECTIONS, mirrors=None,
+                  session=None, hash_algorithm=default_hash):
+    """Download file over parallel range requests with progress bar; resumable"""
     try:
-        log_info('Downloading: {}'.format(fname))
-        dat = requests.get(url, stream=True)
-        with open(fname, 'wb') as f:
-            bar = clint.textui.progress.bar(dat.iter_content(chunk_size=4096),
-                                            expected_size=math.floor(fsize / 4096) + 1)
-            for chunk in bar:
-                f.write(chunk)
-                f.flush()
+        log_info('Downloading: {} ({} connections, {} mirror(s))'.format(
+            fname, connections, len(mirrors) if mirrors else 1))
+        bar = clint.textui.progress.Bar(expected_size=math.floor(fsize / 4096) + 1)
+        job = SegmentedDownload(url, fname, size=fsize, connections=connections,
+                                mirrors=mirrors, session=session, hash_algorithm=hash_algorithm,
+                                progress=lambda done, total: bar.show(done // 4096))
+        job.run(DEFAULT_ATTEMPTS)
+        bar.done()
+        if job.digest:
+            log_info('{}: {}'.format(hash_algorithm, job.digest))
         return True
-    except Exception as e:
+    except KeyboardInterrupt:
+        log_warning('Download interrupted, rerun to resume')
+        raise
+    except (DownloadError, requests.RequestException, OSError) as e:
         log_error('Download failed: {}'.format(e))
         return False
 
-def get_file_info(url):
+def get_file_info(url, session=requests):
     """Get file information from URL"""
     try:
-        data = requests.head(url)
+        data = session.head(url, allow_redirects=True)
         rsize = int(data.headers['Content-Length'])
         size = humanize.naturalsize(rsize, binary=True)
         ftype, fdata = cgi.parse_header(data.headers['Content-Disposition'])
@@ -73,11 +146,11 @@ def get_file_info(url):
         log_error('Failed to get file info: {}'.format(e))
         return None
 
-def download_servers(fid):
+def download_servers(fid, session=requests):
     """Get list of download mirrors"""
     try:
         log_info('Obtaining available download servers...')
-        cook = requests.get("https://androidfilehost.com/?fid={}".format(fid))
+        cook = session.get("https://androidfilehost.com/?fid={}".format(fid))
         post_data = {
             "submit": "submit",
             "action": "getdownloadmirrors",
@@ -92,7 +165,7 @@ def download_servers(fid):
             "X-MOD-SBB-CTYPE": "xhr",
             "X-Requested-With": "XMLHttpRequest"
         }
-        mirror_data = requests.post(mirror_url,
+        mirror_data = session.post(mirror_url,
                                     headers=mirror_headers,
                                     data=post_data,
                                     cookies=cook.cookies)
@@ -113,6 +186,22 @@ def download_servers(fid):
         log_error('Failed to get download servers: {}'.format(e))
         return None
 
+def select_mirrors(session, servers):
+    """Probe all servers concurrently and weight them by measured speed"""
+    log_info('Probing {} download server(s)...'.format(len(servers)))
+    names = {server.url: server.name for server in servers}
+    ranked = rank_mirrors(session, list(names))
+    if not ranked:
+        log_warning('No server answered the probe')
+        return []
+    
+    for result in ranked:
+        log_info('  {}: {:.0f} ms to first byte, {}/s'.format(
+            names[result['url']], result['ttfb'] * 1000,
+            humanize.naturalsize(result['speed'], binary=True)))
+    log_success('Fastest server: {}'.format(names[ranked[0]['url']]))
+    return [(result['url'], result['speed'] or 1.0) for result in ranked]
+
 def match_url(url):
     """Match AndroidFileHost URL pattern"""
     for pattern in url_matchers:
@@ -121,7 +210,7 @@ def match_url(url):
             return res
     return None
 
-def main(link=None):
+def main(link=None, connections=DEFAULT_CONNECTIONS, cache=None, hash_algorithm=default_hash):
     """Main download function"""
     given_url = link
     if not link:
@@ -132,7 +221,16 @@ def main(link=None):
         file_id = file_match.group('id')
         log_info('File ID: {}'.format(file_id))
         
-        servers = download_servers(file_id)
+        # One keep-alive session for the page, mirror list, probes and download
+        session = make_session(connections)
+        cache = cache or MirrorCache()
+        
+        cached = cache.get(file_id)
+        if cached:
+            servers, file_info = cached
+            log_info('Using cached server list ({} server(s))'.format(len(servers)))
+        else:
+            servers, file_info = download_servers(file_id, session), None
         if servers == None:
             log_error('Unable to retrieve download servers')
             log_warning('You may have been rate limited')
@@ -143,29 +241,41 @@ def main(link=None):
         for idx, server in enumerate(servers):
             print('  {}: {}'.format(idx, server.name))
         
-        choice = "0"
         if not link:
             choice = input("\nChoose a server to download from (0-{}): ".format(svc))
+            while not choice.isdigit() or int(choice) > svc or int(choice) < 0:
+                choice = input("Not a valid input, choose again (0-{}): ".format(svc))
+            server = servers[int(choice)]
+            log_info('Selected server: {}'.format(server.name))
+            mirrors = [(server.url, 1.0)]
+        else:
+            mirrors = select_mirrors(session, servers)
+            if not mirrors and cached:
+                # Cached mirror links may have expired; scrape fresh ones
+                log_warning('Refreshing cached server list')
+                cache.drop(file_id)
+                return main(link, connections, cache, hash_algorithm)
+            if not mirrors:
+                log_warning('Using {}'.format(servers[0].name))
+                mirrors = [(servers[0].url, 1.0)]
         
-        while not choice.isdigit() or int(choice) > svc or int(choice) < 0:
-            choice = input("Not a valid input, choose again (0-{}): ".format(svc))
-        
-        server = servers[int(choice)]
-        log_info('Selected server: {}'.format(server.name))
-        
-        file_info = get_file_info(server.url)
+        if file_info is None:
+            file_info = get_file_info(mirrors[0][0], session)
         if file_info is None:
             log_error('Failed to get file information')
             return 1
+        if not cached:
+            cache.put(file_id, servers, file_info)
         
         rsize, size, fname = file_info
         log_info('File: {}'.format(fname))
         log_info('Size: {}'.format(size))
         
-        if download_file(server.url, fname, rsize):
+        if download_file(None, fname, rsize, connections, mirrors, session, hash_algorithm):
             log_success('Download complete!')
             return 0
         else:
+            cache.drop(file_id)
             log_error('Download failed')
             return 1
     else:
@@ -183,13 +293,29 @@ def entry_main():
                         help="Run afh-dl in interactive mode")
     parser.add_argument("-l", "--link", action="store", nargs="?", type=str, default=None,
                         help="AndroidFileHost link to download")
+    parser.add_argument("-c", "--connections", action="store", type=int,
+                        default=DEFAULT_CONNECTIONS,
+                        help="Parallel connections per download (default: {})".format(
+                            DEFAULT_CONNECTIONS))
+    parser.add_argument("--cache-dir", action="store", type=str, default=None,
+                        help="Directory for the mirror cache (default: $DUMPRX_CACHE_DIR)")
+    parser.add_argument("--cache-ttl", action="store", type=int, default=default_cache_ttl,
+                        help="Seconds to reuse cached mirror lists, 0 disables "
+                             "(default: {})".format(default_cache_ttl))
+    parser.add_argument("--hash", action="store", choices=HASH_ALGORITHMS + ("none",),
+                        default=default_hash,
+                        help="Digest computed while downloading and written to "
+                             ".<file>.<hash> (default: {})".format(default_hash))
     parsed = parser.parse_args()
+    cache = MirrorCache(parsed.cache_dir, parsed.cache_ttl)
+    hash_algorithm = None if parsed.hash == "none" else parsed.hash
     
     try:
         if parsed.interactive == True:
-            return main()
+            return main(connections=parsed.connections, cache=cache,
+                        hash_algorithm=hash_algorithm)
         elif not parsed.link == None:
-            return main(parsed.link)
+            return main(parsed.link, parsed.connections, cache, hash_algorithm)
         else:
             log_error('A link must be specified if not in interactive mode')
             log_info('Use -h for help')
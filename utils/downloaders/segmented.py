@@ -0,0 +1,683 @@
+#!/usr/bin/env python3
+"""
+Segmented Downloader Module for DumprX
+Downloads a file over several HTTP Range connections, optionally spread
+over several mirrors, into a preallocated file with positioned writes,
+and resumes interrupted transfers from a small state file
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_CONNECTIONS = 8
+DEFAULT_SEGMENT_SIZE = 16 * 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_ATTEMPTS = 3
+
+# A segment slower than STALL_SPEED bytes/s over STALL_WINDOW seconds is
+# abandoned and retried, on another mirror when one is available
+STALL_SPEED = 8 * 1024
+STALL_WINDOW = 10.0
+MIRROR_MAX_STRIKES = 3
+PROBE_BYTES = 256 * 1024
+
+PART_SUFFIX = '.part'
+STATE_SUFFIX = '.part.json'
+STATE_SAVE_INTERVAL = 2.0
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+HASH_ALGORITHMS = ('md5', 'sha1', 'sha256')
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+              "AppleWebKit/537.36 (KHTML, like Gecko) "
+              "Chrome/63.0.3239.132 Safari/537.36")
+
+
+class DownloadError(Exception):
+    """Raised when a download cannot be completed"""
+
+
+class _Aborted(Exception):
+    """Internal: another worker failed, stop quietly"""
+
+
+def make_session(pool_size=DEFAULT_CONNECTIONS):
+    """
+    Create a keep-alive session whose connection pool fits pool_size workers.
+
+    Args:
+        pool_size: Number of connections kept per host
+
+    Returns:
+        requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+
+def probe(session, url, timeout=DEFAULT_TIMEOUT):
+    """
+    Find the size of a remote file and whether it supports Range requests.
+
+    Args:
+        session: requests.Session to use
+        url: File URL
+
+    Returns:
+        tuple: (size or None, ranges_supported)
+    """
+    with session.get(url, headers={'Range': 'bytes=0-0'}, stream=True,
+                     timeout=timeout, allow_redirects=True) as r:
+        if r.status_code == 206:
+            content_range = r.headers.get('Content-Range', '')
+            total = content_range.rpartition('/')[2]
+            if total.isdigit():
+                return int(total), True
+        if r.status_code in (200, 206):
+            length = r.headers.get('Content-Length')
+            return (int(length) if length and length.isdigit() else None), False
+        raise DownloadError(f'HTTP {r.status_code} while probing {url}')
+
+
+def probe_mirror(session, url, probe_bytes=PROBE_BYTES, timeout=DEFAULT_TIMEOUT):
+    """
+    Measure a mirror with a small Range request.
+
+    Args:
+        session: requests.Session to use
+        url: File URL on the mirror
+        probe_bytes: Bytes to fetch for the throughput estimate
+
+    Returns:
+        dict: url, ok, ttfb (s), speed (bytes/s), size, ranges, error
+    """
+    result = {'url': url, 'ok': False, 'ttfb': None, 'speed': 0.0,
+              'size': None, 'ranges': False, 'error': None}
+    start = time.monotonic()
+    try:
+        with session.get(url, headers={'Range': f'bytes=0-{probe_bytes - 1}'},
+                         stream=True, timeout=timeout) as r:
+            if r.status_code not in (200, 206):
+                result['error'] = f'HTTP {r.status_code}'
+                return result
+            received = 0
+            first = None
+            for chunk in r.iter_content(READ_CHUNK_SIZE):
+                if first is None:
+                    first = time.monotonic()
+                received += len(chunk)
+                if received >= probe_bytes:
+                    break
+            end = time.monotonic()
+            if r.status_code == 206:
+                total = r.headers.get('Content-Range', '').rpartition('/')[2]
+                result['size'] = int(total) if total.isdigit() else None
+                result['ranges'] = result['size'] is not None
+            else:
+                length = r.headers.get('Content-Length', '')
+                result['size'] = int(length) if length.isdigit() else None
+    except (requests.RequestException, OSError) as e:
+        result['error'] = str(e)
+        return result
+    first = first or end
+    result['ttfb'] = first - start
+    # Throughput excludes the time to first byte
+    result['speed'] = received / max(end - first, 1e-3) if received else 0.0
+    result['ok'] = received > 0
+    return result
+
+
+def rank_mirrors(session, urls, probe_bytes=PROBE_BYTES, timeout=DEFAULT_TIMEOUT):
+    """
+    Probe mirrors concurrently and order them fastest first.
+
+    Mirrors that fail, or whose size disagrees with the majority, are
+    dropped.
+
+    Returns:
+        list: probe_mirror() results for usable mirrors, fastest first
+    """
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=len(urls)) as pool:
+        results = list(pool.map(lambda u: probe_mirror(session, u, probe_bytes, timeout), urls))
+    usable = [r for r in results if r['ok']]
+    sizes = [r['size'] for r in usable if r['size']]
+    if sizes:
+        common = max(set(sizes), key=sizes.count)
+        usable = [r for r in usable if r['size'] in (None, common)]
+    return sorted(usable, key=lambda r: (-r['ranges'], -r['speed'], r['ttfb']))
+
+
+def digest_path(dest, algorithm):
+    """
+    Path of the digest sidecar written next to a finished download.
+
+    The sidecar is a hidden ``.<name>.<algorithm>`` file in sha256sum
+    format so it is not mistaken for part of the firmware.
+    """
+    head, tail = os.path.split(dest)
+    return os.path.join(head, f'.{tail}.{algorithm}')
+
+
+def write_digest(dest, algorithm, digest):
+    path = digest_path(dest, algorithm)
+    with open(path, 'w') as f:
+        f.write(f'{digest}  {os.path.basename(dest)}\n')
+    return path
+
+
+class OrderedHasher:
+    """
+    Digest of a file that is written out of order.
+
+    Only the contiguous prefix of finished bytes is hashed; each call to
+    advance() reads the newly completed span back with os.pread(). The
+    data was written moments earlier, so it is served from the page cache
+    rather than the disk.
+    """
+
+    def __init__(self, algorithm):
+        self.algorithm = algorithm
+        self.hash = hashlib.new(algorithm)
+        self.offset = 0
+
+    def update(self, data):
+        """Hash data that follows the current offset directly"""
+        self.hash.update(data)
+        self.offset += len(data)
+
+    def advance(self, fd, limit):
+        """Hash bytes [offset, limit) of fd"""
+        while self.offset < limit:
+            data = os.pread(fd, min(HASH_CHUNK_SIZE, limit - self.offset), self.offset)
+            if not data:
+                raise DownloadError(f'short read while hashing at byte {self.offset}')
+            self.update(data)
+
+    def hexdigest(self):
+        return self.hash.hexdigest()
+
+
+class _Mirror:
+    """Per-mirror bookkeeping for SegmentedDownload"""
+
+    def __init__(self, url, weight=1.0):
+        self.url = url
+        self.weight = max(float(weight), 1e-6)
+        self.strikes = 0
+        self.disabled = False
+
+
+def _pwrite_full(fd, data, offset):
+    view = memoryview(data)
+    while view:
+        done = os.pwrite(fd, view, offset)
+        view = view[done:]
+        offset += done
+
+
+class SegmentedDownload:
+    """
+    Parallel HTTP Range download of a single file.
+
+    The file is split into fixed-size segments that a pool of workers
+    pulls from a queue. With several mirrors, workers are spread over
+    them in proportion to their weight (usually measured speed); a
+    worker whose mirror fails or stalls moves to the best other mirror,
+    and a mirror that keeps failing is dropped. Each worker streams its segment straight into
+    the preallocated ``<dest>.part`` file with os.pwrite(), so segments
+    can finish in any order. Finished segments and the progress of
+    unfinished ones are saved to ``<dest>.part.json``; a later run with
+    the same size and segment size continues where the last one stopped.
+
+    With hash_algorithm set, the monitor thread digests the finished
+    prefix of the file while the download runs, so the digest is ready
+    when the last segment lands. Retried rounds of run() keep the digest
+    state; only a download resumed by a new process re-reads what it
+    already has.
+    """
+
+    def __init__(self, url, dest, size=None, connections=DEFAULT_CONNECTIONS,
+                 segment_size=DEFAULT_SEGMENT_SIZE, session=None,
+                 timeout=DEFAULT_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES,
+                 progress=None, logger=None, mirrors=None, stall_speed=STALL_SPEED,
+                 hash_algorithm=None):
+        """
+        Initialize the download.
+
+        Args:
+            url: File URL (may be None when mirrors are given)
+            dest: Destination path
+            size: File size in bytes if already known (optional)
+            connections: Number of parallel connections
+            segment_size: Bytes per Range request
+            session: requests.Session to reuse (optional)
+            timeout: Connect/read timeout in seconds; a stalled segment is retried
+            max_retries: Retries per segment before giving up
+            progress: Callback progress(done_bytes, total_bytes) (optional)
+            logger: Logger instance for logging (optional)
+            mirrors: List of (url, weight) to download from (optional)
+            stall_speed: Minimum bytes/s per segment before switching mirrors
+            hash_algorithm: Digest to compute while downloading, one of
+                HASH_ALGORITHMS; written to digest_path(dest) (optional)
+        """
+        if not mirrors:
+            mirrors = [(url, 1.0)]
+        self.mirrors = [_Mirror(u, w) for u, w in mirrors]
+        self.url = url or self.mirrors[0].url
+        self.stall_speed = stall_speed
+        self.dest = dest
+        self.size = size
+        self.connections = max(1, connections)
+        self.segment_size = max(READ_CHUNK_SIZE, segment_size)
+        self.session = session or make_session(self.connections)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.progress = progress
+        self.logger = logger
+
+        self.part_path = dest + PART_SUFFIX
+        self.state_path = dest + STATE_SUFFIX
+
+        self._lock = threading.Lock()
+        self._abort = threading.Event()
+        self._error = None
+        self._fd = None
+        self._done = set()
+        self._written = {}
+        self._bytes_done = 0
+        self.hasher = OrderedHasher(hash_algorithm) if hash_algorithm else None
+        self.digest = None
+
+    def _log_info(self, message):
+        if self.logger:
+            self.logger.info(message)
+        else:
+            print(f"[INFO] {message}")
+
+    def _log_warn(self, message):
+        if self.logger:
+            self.logger.warning(message)
+        else:
+            print(f"[WARN] {message}", file=sys.stderr)
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    @property
+    def segment_count(self):
+        return -(-self.size // self.segment_size)
+
+    def _segment_bounds(self, idx):
+        start = idx * self.segment_size
+        return start, min(self.size, start + self.segment_size)
+
+    def _load_state(self):
+        if not os.path.exists(self.part_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        if state.get('size') != self.size or state.get('segment_size') != self.segment_size:
+            self._log_warn('Existing partial download does not match, starting over')
+            return
+        self._done = set(state.get('done', []))
+        self._written = {int(k): v for k, v in state.get('partial', {}).items()}
+        self._bytes_done = sum(self._segment_bounds(i)[1] - self._segment_bounds(i)[0]
+                               for i in self._done)
+        self._bytes_done += sum(self._written.values())
+        if self._bytes_done:
+            self._log_info(f'Resuming download at {100.0 * self._bytes_done / self.size:.1f}%')
+
+    def _save_state(self):
+        with self._lock:
+            state = {
+                'url': self.url,
+                'size': self.size,
+                'segment_size': self.segment_size,
+                'done': sorted(self._done),
+                'partial': {str(k): v for k, v in self._written.items()
+                            if v and k not in self._done},
+            }
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def _clear_state(self):
+        for path in (self.state_path, self.state_path + '.tmp'):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    # ------------------------------------------------------------------
+    # Transfer
+    # ------------------------------------------------------------------
+
+    def _open_part(self):
+        fd = os.open(self.part_path, os.O_RDWR | os.O_CREAT, 0o644)
+        if os.fstat(fd).st_size != self.size:
+            try:
+                os.posix_fallocate(fd, 0, self.size)
+            except (AttributeError, OSError):
+                os.ftruncate(fd, self.size)
+        return fd
+
+    def _fetch_segment(self, idx, mirror):
+        seg_start, seg_end = self._segment_bounds(idx)
+        pos = seg_start + self._written.get(idx, 0)
+        if pos < seg_end:
+            headers = {'Range': f'bytes={pos}-{seg_end - 1}'}
+            with self.session.get(mirror.url, headers=headers, stream=True,
+                                  timeout=self.timeout) as r:
+                if r.status_code != 206:
+                    raise DownloadError(f"HTTP {r.status_code} for range {headers['Range']}")
+                window_start, window_pos = time.monotonic(), pos
+                for chunk in r.iter_content(READ_CHUNK_SIZE):
+                    if self._abort.is_set():
+                        raise _Aborted()
+                    now = time.monotonic()
+                    if now - window_start >= STALL_WINDOW:
+                        if self.stall_speed and \
+                                (pos - window_pos) / (now - window_start) < self.stall_speed:
+                            raise DownloadError(f'stalled below {self.stall_speed} B/s')
+                        window_start, window_pos = now, pos
+                    if pos + len(chunk) > seg_end:
+                        chunk = chunk[:seg_end - pos]
+                    _pwrite_full(self._fd, chunk, pos)
+                    pos += len(chunk)
+                    with self._lock:
+                        self._written[idx] = pos - seg_start
+                        self._bytes_done += len(chunk)
+                    if pos >= seg_end:
+                        break
+            if pos < seg_end:
+                raise DownloadError(
+                    f'connection closed at byte {pos - seg_start} of segment {idx}')
+        with self._lock:
+            self._done.add(idx)
+            self._written.pop(idx, None)
+
+    def _assign_mirrors(self, count):
+        """Spread count workers over mirrors by weight (largest remainder)"""
+        total = sum(m.weight for m in self.mirrors)
+        shares = [count * m.weight / total for m in self.mirrors]
+        slots = [int(share) for share in shares]
+        order = sorted(range(len(shares)), key=lambda i: shares[i] - slots[i], reverse=True)
+        for i in order[:count - sum(slots)]:
+            slots[i] += 1
+        assigned = []
+        for mirror, n in zip(self.mirrors, slots):
+            assigned.extend([mirror] * n)
+        return assigned
+
+    def _next_mirror(self, current):
+        """Pick the best usable mirror other than current, if any"""
+        with self._lock:
+            others = [m for m in self.mirrors if m is not current and not m.disabled]
+            if not others:
+                return current
+            return max(others, key=lambda m: (m.weight / (1 + m.strikes), -m.strikes))
+
+    def _strike(self, mirror, error):
+        with self._lock:
+            mirror.strikes += 1
+            active = [m for m in self.mirrors if not m.disabled]
+            if mirror.strikes >= MIRROR_MAX_STRIKES and len(active) > 1 and not mirror.disabled:
+                mirror.disabled = True
+                self._log_warn(f'Dropping mirror {mirror.url} ({error})')
+
+    def _worker(self, pending, attempts, mirror):
+        while not self._abort.is_set():
+            try:
+                idx = pending.get_nowait()
+            except queue.Empty:
+                return
+            if mirror.disabled:
+                mirror = self._next_mirror(mirror)
+            try:
+                self._fetch_segment(idx, mirror)
+            except _Aborted:
+                return
+            except (requests.RequestException, DownloadError, OSError) as e:
+                with self._lock:
+                    attempts[idx] = tries = attempts.get(idx, 0) + 1
+                if tries > self.max_retries:
+                    self._error = DownloadError(f'segment {idx} failed after {tries} attempts: {e}')
+                    self._abort.set()
+                    return
+                self._strike(mirror, e)
+                switched = self._next_mirror(mirror)
+                if switched is not mirror:
+                    self._log_warn(f'Segment {idx} interrupted on {mirror.url} ({e}), '
+                                   f'switching to {switched.url}')
+                    mirror = switched
+                else:
+                    self._log_warn(f'Segment {idx} interrupted ({e}), retrying')
+                    time.sleep(min(2 ** tries, 30))
+                pending.put(idx)
+
+    def _hashed_limit(self):
+        """End of the contiguous run of finished bytes from offset 0"""
+        with self._lock:
+            idx = self.hasher.offset // self.segment_size
+            while idx in self._done:
+                idx += 1
+            partial = self._written.get(idx, 0)
+        return min(self.size, idx * self.segment_size + partial)
+
+    def _monitor(self, workers):
+        last_save = time.monotonic()
+        while True:
+            alive = [t for t in workers if t.is_alive()]
+            if not alive:
+                break
+            alive[0].join(0.5)
+            if self.hasher:
+                self.hasher.advance(self._fd, self._hashed_limit())
+            if self.progress:
+                self.progress(self._bytes_done, self.size)
+            if time.monotonic() - last_save >= STATE_SAVE_INTERVAL:
+                self._save_state()
+                last_save = time.monotonic()
+
+    def _run_segmented(self):
+        self._abort.clear()
+        self._error = None
+        self._done, self._written, self._bytes_done = set(), {}, 0
+        self._load_state()
+        if self.hasher and self.hasher.offset > self._hashed_limit():
+            # The partial download was discarded, so was the hashed prefix
+            self.hasher = OrderedHasher(self.hasher.algorithm)
+        self._fd = self._open_part()
+        try:
+            pending = queue.Queue()
+            for idx in range(self.segment_count):
+                if idx not in self._done:
+                    pending.put(idx)
+
+            attempts = {}
+            count = min(self.connections, pending.qsize())
+            workers = [threading.Thread(target=self._worker, args=(pending, attempts, mirror),
+                                        daemon=True)
+                       for mirror in self._assign_mirrors(count)]
+            for t in workers:
+                t.start()
+            try:
+                self._monitor(workers)
+            except KeyboardInterrupt:
+                self._abort.set()
+                for t in workers:
+                    t.join()
+                self._save_state()
+                raise
+            if self.hasher and not self._error and len(self._done) == self.segment_count:
+                self.hasher.advance(self._fd, self.size)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+        if self._error or len(self._done) != self.segment_count:
+            self._save_state()
+            raise self._error or DownloadError('download incomplete')
+        if self.progress:
+            self.progress(self.size, self.size)
+
+    def _run_single(self):
+        """Plain streaming download for servers without Range support"""
+        done = 0
+        with self.session.get(self.mirrors[0].url, stream=True, timeout=self.timeout) as r:
+            r.raise_for_status()
+            with open(self.part_path, 'wb') as f:
+                for chunk in r.iter_content(READ_CHUNK_SIZE):
+                    f.write(chunk)
+                    if self.hasher:
+                        self.hasher.update(chunk)
+                    done += len(chunk)
+                    if self.progress:
+                        self.progress(done, self.size or done)
+        if self.size is not None and done != self.size:
+            raise DownloadError(f'expected {self.size} bytes, got {done}')
+        self.size = done
+
+    def run(self, attempts=1):
+        """
+        Perform the download.
+
+        Args:
+            attempts: Rounds to try; a failed round keeps the finished
+                segments and the digest state for the next one
+
+        Returns:
+            str: Destination path
+
+        Raises:
+            DownloadError: If the download could not be completed
+        """
+        for attempt in range(1, attempts + 1):
+            try:
+                return self._run_once()
+            except (DownloadError, requests.RequestException, OSError) as e:
+                if attempt >= attempts:
+                    raise
+                self._log_warn(f'Download failed ({e}), retrying')
+                time.sleep(min(2 ** attempt, 30))
+
+    def _run_once(self):
+        size, ranges = probe(self.session, self.mirrors[0].url, self.timeout)
+        if self.size is None:
+            self.size = size
+
+        if not ranges or not self.size:
+            self._log_warn('Server does not support ranged downloads, using a single stream')
+            self._clear_state()
+            if self.hasher:
+                self.hasher = OrderedHasher(self.hasher.algorithm)
+            self._run_single()
+        else:
+            self._run_segmented()
+
+        os.replace(self.part_path, self.dest)
+        self._clear_state()
+        if self.hasher:
+            self.digest = self.hasher.hexdigest()
+            write_digest(self.dest, self.hasher.algorithm, self.digest)
+        return self.dest
+
+
+def download(url, dest, attempts=1, **kwargs):
+    """
+    Download url to dest with SegmentedDownload.
+
+    Returns:
+        str: Destination path
+    """
+    return SegmentedDownload(url, dest, **kwargs).run(attempts)
+
+
+def download_from_mirrors(urls, dest, multi=True, session=None, attempts=1, **kwargs):
+    """
+    Probe mirrors, then download from the fastest one or, with multi,
+    from all usable mirrors weighted by measured speed.
+
+    Args:
+        urls: Mirror URLs of the same file
+        dest: Destination path
+        multi: Spread segments over several mirrors
+
+    Returns:
+        str: Destination path
+    """
+    session = session or make_session(kwargs.get('connections', DEFAULT_CONNECTIONS))
+    ranked = rank_mirrors(session, urls, timeout=kwargs.get('timeout', DEFAULT_TIMEOUT))
+    if not ranked:
+        raise DownloadError('no usable mirror')
+    if not multi:
+        ranked = ranked[:1]
+    mirrors = [(r['url'], r['speed'] or 1.0) for r in ranked]
+    return SegmentedDownload(None, dest, session=session, mirrors=mirrors, **kwargs).run(attempts)
+
+
+def main():
+    """
+    Main function for standalone usage.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Segmented, resumable HTTP download'
+    )
+    parser.add_argument('url', nargs='+', help='URL to download (several mirrors allowed)')
+    parser.add_argument('-o', '--output', required=True, help='Output file')
+    parser.add_argument('-c', '--connections', type=int, default=DEFAULT_CONNECTIONS,
+                        help=f'Parallel connections (default: {DEFAULT_CONNECTIONS})')
+    parser.add_argument('-s', '--segment-size', type=int, default=DEFAULT_SEGMENT_SIZE,
+                        help=f'Bytes per range request (default: {DEFAULT_SEGMENT_SIZE})')
+    parser.add_argument('-t', '--timeout', type=int, default=DEFAULT_TIMEOUT,
+                        help=f'Stall timeout in seconds (default: {DEFAULT_TIMEOUT})')
+    parser.add_argument('-a', '--attempts', type=int, default=DEFAULT_ATTEMPTS,
+                        help=f'Download rounds before giving up (default: {DEFAULT_ATTEMPTS})')
+    parser.add_argument('--single-mirror', action='store_true',
+                        help='Use only the fastest mirror instead of spreading segments')
+    parser.add_argument('--hash', choices=HASH_ALGORITHMS, default=None,
+                        help='Digest to compute while downloading, written to .<name>.<hash>')
+
+    args = parser.parse_args()
+
+    try:
+        options = dict(connections=args.connections, segment_size=args.segment_size,
+                       timeout=args.timeout, hash_algorithm=args.hash,
+                       attempts=max(1, args.attempts))
+        if len(args.url) > 1:
+            download_from_mirrors(args.url, args.output, multi=not args.single_mirror,
+                                  **options)
+        else:
+            download(args.url[0], args.output, **options)
+    except (DownloadError, requests.RequestException, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("Interrupted, partial download kept for resume", file=sys.stderr)
+        sys.exit(130)
+
+
+if __name__ == '__main__':
+    main()
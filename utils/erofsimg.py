@@ -0,0 +1,845 @@
+#!/usr/bin/env python3
+"""
+EROFS Image Reader for DumprX
+Extracts EROFS partition images without fsck.erofs: plans every regular
+file's extents up front and decompresses the physical clusters across a
+process pool, each shared cluster exactly once
+"""
+
+import os
+import sys
+import lzma
+import stat
+import zlib
+import struct
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from sparseimg import open_image, copy_range
+from ext4img import _capabilities, write_fs_config
+from telemetry import tool_stage
+
+try:
+    import lz4.block as lz4_block
+except ImportError:
+    lz4_block = None
+
+LZ4_MISSING = "lz4 compressed image needs the lz4 module (pip install -r utils/requirements.txt)"
+
+
+EROFS_SUPERBLOCK_OFFSET = 1024
+EROFS_MAGIC = 0xE0F5E1E2
+EROFS_SUPERBLOCK = struct.Struct('<IIIBBHQQIIII16s16sIHHHBBIQ')
+
+FEATURE_INCOMPAT_ZERO_PADDING = 0x1
+FEATURE_INCOMPAT_FRAGMENTS = 0x20
+
+LAYOUT_FLAT_PLAIN = 0
+LAYOUT_COMPRESSED_FULL = 1
+LAYOUT_FLAT_INLINE = 2
+LAYOUT_COMPRESSED_COMPACT = 3
+LAYOUT_CHUNK_BASED = 4
+
+INODE_COMPACT = struct.Struct('<HHHHIIIIHHI')
+INODE_EXTENDED = struct.Struct('<HHHHQIIIIQII16s')
+
+CHUNK_FORMAT_BLKBITS_MASK = 0x1F
+CHUNK_FORMAT_INDEXES = 0x20
+NULL_ADDR = 0xFFFFFFFF
+
+XATTR_IBODY_HEADER_SIZE = 12
+XATTR_ENTRY = struct.Struct('<BBH')
+XATTR_PREFIXES = {
+    1: 'user.',
+    2: 'system.posix_acl_access',
+    3: 'system.posix_acl_default',
+    4: 'trusted.',
+    6: 'security.',
+}
+
+DIRENT = struct.Struct('<QHBB')
+
+# z_erofs_map_header and lcluster index
+MAP_HEADER = struct.Struct('<IHBB')
+FULL_INDEX = struct.Struct('<HHI')
+ADVISE_COMPACTED_2B = 0x0001
+ADVISE_BIG_PCLUSTER_1 = 0x0002
+ADVISE_BIG_PCLUSTER_2 = 0x0004
+ADVISE_INLINE_PCLUSTER = 0x0008
+ADVISE_INTERLACED_PCLUSTER = 0x0010
+ADVISE_FRAGMENT_PCLUSTER = 0x0020
+FRAGMENT_INODE_BIT = 7
+
+LCLUSTER_PLAIN = 0
+LCLUSTER_HEAD1 = 1
+LCLUSTER_NONHEAD = 2
+LCLUSTER_HEAD2 = 3
+LI_D0_CBLKCNT = 1 << 11
+
+# Extent kinds
+EXT_RAW = 'raw'
+EXT_FRAGMENT = 'fragment'
+EXT_SHIFTED = 'shifted'
+EXT_INTERLACED = 'interlaced'
+ALGORITHMS = ('lz4', 'lzma', 'deflate', 'zstd')
+
+# Work items are batched until they cover this many compressed bytes
+BATCH_SIZE = 4 * 1024 * 1024
+DEFAULT_JOBS = os.cpu_count() or 4
+
+
+class Inode:
+    """
+    Decoded EROFS inode.
+    """
+
+    __slots__ = ('nid', 'offset', 'isize', 'layout', 'xattr_isize', 'mode',
+                 'size', 'u', 'uid', 'gid')
+
+    def __init__(self, nid, offset, raw):
+        self.nid = nid
+        self.offset = offset
+        fmt = struct.unpack_from('<H', raw, 0)[0]
+        self.layout = (fmt >> 1) & 0x7
+        if fmt & 1:
+            (_fmt, xattr_icount, self.mode, _r, self.size, self.u, _ino,
+             self.uid, self.gid, _mtime, _nsec, _nlink, _r2) = INODE_EXTENDED.unpack_from(raw, 0)
+            self.isize = INODE_EXTENDED.size
+        else:
+            (_fmt, xattr_icount, self.mode, _nlink, self.size, _r, self.u,
+             _ino, self.uid, self.gid, _r2) = INODE_COMPACT.unpack_from(raw, 0)
+            self.isize = INODE_COMPACT.size
+        self.xattr_isize = 0
+        if xattr_icount:
+            self.xattr_isize = XATTR_IBODY_HEADER_SIZE + (xattr_icount - 1) * 4
+
+    @property
+    def kind(self):
+        return stat.S_IFMT(self.mode)
+
+    @property
+    def inline_offset(self):
+        """Image offset of the data right after the inode and its xattrs"""
+        return self.offset + self.isize + self.xattr_isize
+
+
+class ErofsImage:
+    """
+    Read-only EROFS filesystem on top of an ImageView.
+    """
+
+    def __init__(self, path, logger=None):
+        """
+        Open an EROFS image and read its superblock.
+
+        Args:
+            path: Image path (raw, sparse or with a recorded header offset),
+                or a list of sparse chunk files
+            logger: Logger instance for logging (optional)
+        """
+        self.path = path
+        self.logger = logger
+        self.view = open_image(path)
+        try:
+            self._read_superblock()
+        except Exception:
+            self.view.close()
+            raise
+
+    def _log_warn(self, message):
+        if self.logger:
+            self.logger.warning(message)
+        else:
+            print(f"[WARN] {message}", file=sys.stderr)
+
+    def _read_superblock(self):
+        sb = self.view.pread(EROFS_SUPERBLOCK.size, EROFS_SUPERBLOCK_OFFSET)
+        if len(sb) < EROFS_SUPERBLOCK.size:
+            raise ValueError(f"{self.path}: not an EROFS image")
+        (magic, _checksum, _compat, blkszbits, _extslots, self.root_nid, _inos,
+         _build_time, _nsec, _blocks, self.meta_blkaddr, self.xattr_blkaddr,
+         _uuid, _volume, self.incompat, _algs, _extra_devices, _devt_slotoff,
+         _dirblkbits, _prefix_count, _prefix_start, self.packed_nid) = EROFS_SUPERBLOCK.unpack(sb)
+        if magic != EROFS_MAGIC:
+            raise ValueError(f"{self.path}: not an EROFS image")
+        self.blkszbits = blkszbits
+        self.block_size = 1 << blkszbits
+        if not self.incompat & FEATURE_INCOMPAT_FRAGMENTS:
+            self.packed_nid = 0
+
+    def inode(self, nid):
+        """
+        Read an inode by nid.
+
+        Returns:
+            Inode: Decoded inode
+        """
+        offset = self.meta_blkaddr * self.block_size + nid * 32
+        return Inode(nid, offset, self.view.pread(INODE_EXTENDED.size, offset))
+
+    def xattrs(self, inode):
+        """
+        Read the extended attributes of an inode (inline and shared).
+
+        Returns:
+            dict: name -> bytes
+        """
+        attrs = {}
+        if not inode.xattr_isize:
+            return attrs
+        body = self.view.pread(inode.xattr_isize, inode.offset + inode.isize)
+        shared_count = body[4]
+        pos = XATTR_IBODY_HEADER_SIZE
+        for i in range(shared_count):
+            xattr_id = struct.unpack_from('<I', body, pos + i * 4)[0]
+            entry_offset = self.xattr_blkaddr * self.block_size + xattr_id * 4
+            name_len, _index, value_size = XATTR_ENTRY.unpack(
+                self.view.pread(XATTR_ENTRY.size, entry_offset))
+            entry = self.view.pread(XATTR_ENTRY.size + name_len + value_size, entry_offset)
+            self._parse_xattr(entry, 0, attrs)
+        pos += shared_count * 4
+        while pos + XATTR_ENTRY.size <= len(body):
+            pos = self._parse_xattr(body, pos, attrs)
+        return attrs
+
+    def _parse_xattr(self, buf, pos, attrs):
+        name_len, name_index, value_size = XATTR_ENTRY.unpack_from(buf, pos)
+        start = pos + XATTR_ENTRY.size
+        name = bytes(buf[start:start + name_len]).decode('ascii', 'replace')
+        value = bytes(buf[start + name_len:start + name_len + value_size])
+        # Long name prefixes (index with bit 7 set) are not resolved
+        if not name_index & 0x80:
+            attrs[XATTR_PREFIXES.get(name_index, '') + name] = value
+        return (start + name_len + value_size + 3) & ~3
+
+    def extents(self, inode):
+        """
+        Map an inode's data.
+
+        Returns:
+            list: (file_offset, length, kind, image_offset, physical_length)
+            tuples in file order; kind is EXT_RAW, EXT_FRAGMENT (offset
+            into the packed inode), EXT_SHIFTED/EXT_INTERLACED (stored
+            uncompressed) or an algorithm name. Holes are left out.
+        """
+        if not inode.size:
+            return []
+        if inode.layout == LAYOUT_FLAT_PLAIN:
+            return [(0, inode.size, EXT_RAW, inode.u * self.block_size, inode.size)]
+        if inode.layout == LAYOUT_FLAT_INLINE:
+            bs = self.block_size
+            head = (-(-inode.size // bs) - 1) * bs
+            extents = []
+            if head:
+                extents.append((0, head, EXT_RAW, inode.u * bs, head))
+            extents.append((head, inode.size - head, EXT_RAW, inode.inline_offset,
+                            inode.size - head))
+            return extents
+        if inode.layout == LAYOUT_CHUNK_BASED:
+            return self._chunk_extents(inode)
+        if inode.layout in (LAYOUT_COMPRESSED_FULL, LAYOUT_COMPRESSED_COMPACT):
+            return _CompressedMap(self, inode).extents()
+        raise ValueError(f"nid {inode.nid}: unsupported data layout {inode.layout}")
+
+    def _chunk_extents(self, inode):
+        fmt = inode.u & 0xFFFF
+        chunk_size = self.block_size << (fmt & CHUNK_FORMAT_BLKBITS_MASK)
+        count = -(-inode.size // chunk_size)
+        unit = 8 if fmt & CHUNK_FORMAT_INDEXES else 4
+        base = (inode.inline_offset + unit - 1) & ~(unit - 1)
+        table = self.view.pread(count * unit, base)
+        extents = []
+        for i in range(count):
+            if unit == 8:
+                _advise, device_id, blkaddr = struct.unpack_from('<HHI', table, i * 8)
+                if device_id:
+                    raise ValueError(f"nid {inode.nid}: chunks on extra devices are not supported")
+            else:
+                blkaddr = struct.unpack_from('<I', table, i * 4)[0]
+            if blkaddr == NULL_ADDR:
+                continue
+            offset = i * chunk_size
+            length = min(chunk_size, inode.size - offset)
+            extents.append((offset, length, EXT_RAW, blkaddr * self.block_size, length))
+        return extents
+
+    def read(self, inode, start=0, size=None):
+        """
+        Read part of a file, a directory or a symlink into memory.
+
+        Args:
+            inode: Inode to read
+            start: File offset
+            size: Number of bytes (default: up to the end of the file)
+
+        Returns:
+            bytes: Content, holes read as zeros
+        """
+        end = inode.size if size is None else min(inode.size, start + size)
+        if start >= end:
+            return b''
+        data = bytearray(end - start)
+        for offset, length, kind, phys, plen in self.extents(inode):
+            if offset >= end or offset + length <= start:
+                continue
+            if kind == EXT_FRAGMENT:
+                chunk = self.read(self.inode(self.packed_nid), phys, length)
+            else:
+                chunk = decode_extent(self.view, kind, phys, plen, length,
+                                      offset, self.block_size, self.incompat)
+            lo = max(start, offset)
+            hi = min(end, offset + len(chunk))
+            data[lo - start:hi - start] = chunk[lo - offset:hi - offset]
+        return bytes(data)
+
+    def listdir(self, inode):
+        """
+        List a directory.
+
+        Returns:
+            list: (name bytes, nid) tuples without . and ..
+        """
+        data = self.read(inode)
+        entries = []
+        for base in range(0, len(data), self.block_size):
+            block = data[base:base + self.block_size]
+            if len(block) < DIRENT.size:
+                break
+            first_nameoff = DIRENT.unpack_from(block, 0)[1]
+            count = first_nameoff // DIRENT.size
+            dirents = [DIRENT.unpack_from(block, i * DIRENT.size) for i in range(count)]
+            for i, (nid, nameoff, _type, _r) in enumerate(dirents):
+                end = dirents[i + 1][1] if i + 1 < count else len(block)
+                name = block[nameoff:end]
+                if i + 1 == count:
+                    name = name.split(b'\x00', 1)[0]
+                if name not in (b'.', b'..'):
+                    entries.append((name, nid))
+        return entries
+
+    def walk(self):
+        """
+        Walk the tree from the root directory.
+
+        Yields:
+            tuple: (relative path bytes, Inode), parents before children
+        """
+        stack = [(b'', self.inode(self.root_nid))]
+        while stack:
+            path, inode = stack.pop()
+            yield path, inode
+            if inode.kind != stat.S_IFDIR:
+                continue
+            children = []
+            for name, nid in self.listdir(inode):
+                if b'/' in name or not name:
+                    continue
+                children.append((path + b'/' + name if path else name, self.inode(nid)))
+            stack.extend(reversed(children))
+
+    def extract(self, output_dir, jobs=DEFAULT_JOBS, prefix=''):
+        """
+        Extract the whole tree into output_dir.
+
+        The tree is walked once to create directories, symlinks and empty
+        files and to collect every extent. Extents are then grouped by
+        physical cluster, so a cluster shared by several files (dedupe)
+        is decompressed once, and the groups are processed by a process
+        pool writing straight into the output files. Tail fragments are
+        copied from the packed inode after it has been decoded.
+
+        Args:
+            output_dir: Destination directory
+            jobs: Worker processes
+            prefix: Path prefix used in the returned metadata
+
+        Returns:
+            list: (path, uid, gid, mode, capabilities, selinux context)
+            for every entry, in walk order
+        """
+        out_root = os.fsencode(output_dir)
+        os.makedirs(out_root, exist_ok=True)
+        metadata = []
+        dirs = []
+        linked = {}
+        clusters = {}
+        fragments = []
+
+        for rel, inode in self.walk():
+            target = os.path.join(out_root, rel) if rel else out_root
+            attrs = self.xattrs(inode)
+            metadata.append((
+                os.path.join(prefix, os.fsdecode(rel)) if rel else prefix,
+                inode.uid, inode.gid, stat.S_IMODE(inode.mode),
+                _capabilities(attrs.get('security.capability')),
+                attrs.get('security.selinux', b'').rstrip(b'\x00').decode('ascii', 'replace'),
+            ))
+            kind = inode.kind
+            if kind == stat.S_IFDIR:
+                os.makedirs(target, exist_ok=True)
+                dirs.append((target, inode.mode))
+            elif kind == stat.S_IFLNK:
+                if os.path.lexists(target):
+                    os.unlink(target)
+                os.symlink(self.read(inode), target)
+            elif kind == stat.S_IFREG:
+                if os.path.lexists(target):
+                    os.unlink(target)
+                if inode.nid in linked:
+                    os.link(linked[inode.nid], target)
+                    continue
+                linked[inode.nid] = target
+                fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                             (stat.S_IMODE(inode.mode) & 0o777) | 0o600)
+                os.ftruncate(fd, inode.size)
+                os.close(fd)
+                self._plan(inode, target, clusters, fragments)
+
+        packed_path = None
+        try:
+            if fragments:
+                fd, packed_path = tempfile.mkstemp(prefix=b'.erofs_packed_', dir=out_root)
+                os.close(fd)
+                packed = self.inode(self.packed_nid)
+                os.truncate(packed_path, packed.size)
+                packed_clusters = {}
+                self._plan(packed, packed_path, packed_clusters, [])
+                self._run(packed_clusters, jobs)
+            self._run(clusters, jobs)
+            for path, offset, frag_offset, length in fragments:
+                src = os.open(packed_path, os.O_RDONLY)
+                dst = os.open(path, os.O_WRONLY)
+                try:
+                    copy_range(src, dst, length, frag_offset, offset)
+                finally:
+                    os.close(src)
+                    os.close(dst)
+        finally:
+            if packed_path:
+                os.unlink(packed_path)
+
+        for target, mode in reversed(dirs):
+            os.chmod(target, (stat.S_IMODE(mode) & 0o777) | 0o700)
+        return metadata
+
+    def _plan(self, inode, target, clusters, fragments):
+        for offset, length, kind, phys, plen in self.extents(inode):
+            if kind == EXT_FRAGMENT:
+                fragments.append((target, offset, phys, length))
+                continue
+            # Stored clusters decode differently depending on the file offset
+            key = (kind, phys, plen, offset % self.block_size if kind == EXT_INTERLACED else 0)
+            clusters.setdefault(key, []).append((target, offset, length))
+
+    def _run(self, clusters, jobs):
+        if lz4_block is None and any(kind == 'lz4' for kind, _phys, _plen, _shift in clusters):
+            raise ValueError(LZ4_MISSING)
+        batches = []
+        batch = []
+        size = 0
+        for (kind, phys, plen, shift), refs in clusters.items():
+            batch.append((kind, phys, plen, shift, refs))
+            size += plen
+            if size >= BATCH_SIZE:
+                batches.append(batch)
+                batch = []
+                size = 0
+        if batch:
+            batches.append(batch)
+        if not batches:
+            return
+
+        params = (self.path, self.block_size, self.incompat)
+        pool = None
+        if jobs > 1 and len(batches) > 1:
+            try:
+                pool = ProcessPoolExecutor(max_workers=jobs,
+                                           mp_context=multiprocessing.get_context('fork'),
+                                           initializer=_init_worker, initargs=params)
+            except (OSError, ImportError, ValueError) as e:
+                # No working semaphores (e.g. without /dev/shm)
+                self._log_warn(f"process pool unavailable ({e}), using threads")
+        if pool is None:
+            _init_worker(*params, view=self.view)
+            pool = ThreadPoolExecutor(max_workers=max(1, jobs))
+        with pool:
+            for _ in pool.map(_process_batch, batches):
+                pass
+
+    def close(self):
+        self.view.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _CompressedMap:
+    """
+    Decoder for the lcluster index of a compressed inode (full or compact).
+    """
+
+    def __init__(self, fs, inode):
+        self.fs = fs
+        self.inode = inode
+        base = (inode.inline_offset + 7) & ~7
+        (self.fragmentoff, self.advise, algorithms, clusterbits) = \
+            MAP_HEADER.unpack(fs.view.pread(MAP_HEADER.size, base))
+        self.idata_size = self.fragmentoff >> 16
+        self.algorithms = (algorithms & 0xF, algorithms >> 4)
+        self.lclusterbits = fs.blkszbits + (clusterbits & 0xF)
+        self.whole_fragment = bool(clusterbits >> FRAGMENT_INODE_BIT)
+        self.totalidx = -(-inode.size >> self.lclusterbits) if inode.size else 0
+        self.compact = inode.layout == LAYOUT_COMPRESSED_COMPACT
+        if self.compact:
+            self.ebase = base + MAP_HEADER.size
+            self.initial_4b = ((32 - self.ebase % 32) // 4) & 7
+            self.count_2b = 0
+            if self.advise & ADVISE_COMPACTED_2B and self.initial_4b < self.totalidx:
+                self.count_2b = (self.totalidx - self.initial_4b) // 16 * 16
+            size = self._compact_end(self.totalidx - 1) - self.ebase if self.totalidx else 0
+        else:
+            self.ebase = base + MAP_HEADER.size + 8
+            size = self.totalidx * FULL_INDEX.size
+        self.index = fs.view.pread(size, self.ebase)
+        self.index_end = self.ebase + size
+
+    def _compact_pos(self, lcn):
+        pos = self.ebase
+        shift = 2
+        if lcn >= self.initial_4b:
+            pos += self.initial_4b * 4
+            lcn -= self.initial_4b
+            if lcn < self.count_2b:
+                shift = 1
+            else:
+                pos += self.count_2b * 2
+                lcn -= self.count_2b
+        return pos + (lcn << shift), shift
+
+    def _compact_end(self, lcn):
+        pos, shift = self._compact_pos(lcn)
+        pack = (2 if shift == 2 else 16) << shift
+        return pos - pos % pack + pack
+
+    def lcluster(self, lcn):
+        """
+        Decode one lcluster index entry.
+
+        Returns:
+            tuple: (type, clusterofs, pblk, compressedblks); pblk is only
+            meaningful for head types and compressedblks only for a
+            NONHEAD carrying CBLKCNT (0 otherwise)
+        """
+        if not self.compact:
+            advise, clusterofs, blkaddr = FULL_INDEX.unpack_from(self.index, lcn * FULL_INDEX.size)
+            kind = advise & 0x3
+            if kind == LCLUSTER_NONHEAD:
+                delta0 = blkaddr & 0xFFFF
+                cblks = delta0 & ~LI_D0_CBLKCNT if delta0 & LI_D0_CBLKCNT else 0
+                return kind, 0, 0, cblks
+            return kind, clusterofs, blkaddr, 0
+
+        pos, shift = self._compact_pos(lcn)
+        vcnt = 2 if shift == 2 else 16
+        packsize = vcnt << shift
+        lobits = max(self.lclusterbits, 12)
+        encodebits = (packsize - 4) * 8 // vcnt
+        rel = pos - self.ebase
+        pack_start = rel - rel % packsize
+        pack = self.index[pack_start:pack_start + packsize]
+        i = (rel % packsize) >> shift
+
+        def decode(j):
+            bitpos = encodebits * j
+            v = int.from_bytes(pack[bitpos // 8:bitpos // 8 + 4], 'little') >> (bitpos & 7)
+            return (v >> lobits) & 3, v & ((1 << lobits) - 1)
+
+        kind, lo = decode(i)
+        if kind == LCLUSTER_NONHEAD:
+            return kind, 0, 0, lo & ~LI_D0_CBLKCNT if lo & LI_D0_CBLKCNT else 0
+
+        big = bool(self.advise & ADVISE_BIG_PCLUSTER_1)
+        if not big:
+            nblk = 1
+            while i > 0:
+                i -= 1
+                t, v = decode(i)
+                if t == LCLUSTER_NONHEAD:
+                    i -= v
+                if i >= 0:
+                    nblk += 1
+        else:
+            nblk = 0
+            while i > 0:
+                i -= 1
+                t, v = decode(i)
+                if t == LCLUSTER_NONHEAD:
+                    if v & LI_D0_CBLKCNT:
+                        i -= 1
+                        nblk += v & ~LI_D0_CBLKCNT
+                        continue
+                    if v <= 1:
+                        raise ValueError(f"nid {self.inode.nid}: corrupted compact index")
+                    i -= v - 2
+                    continue
+                nblk += 1
+        base_blkaddr = struct.unpack_from('<I', pack, packsize - 4)[0]
+        return kind, lo, base_blkaddr + nblk, 0
+
+    def _compressed_blocks(self, kind, lcn):
+        if kind == LCLUSTER_HEAD1:
+            big = self.advise & ADVISE_BIG_PCLUSTER_1
+        else:
+            big = self.advise & ADVISE_BIG_PCLUSTER_2
+        if not big or lcn + 1 >= self.totalidx:
+            return 1
+        # The first NONHEAD lcluster carries the block count, if any
+        next_kind, _ofs, _pblk, cblks = self.lcluster(lcn + 1)
+        if next_kind == LCLUSTER_NONHEAD:
+            if not cblks:
+                raise ValueError(f"nid {self.inode.nid}: missing pcluster size at lcluster {lcn + 1}")
+            return cblks
+        # Followed by a head: the pcluster is one lcluster long
+        return 1 << (self.lclusterbits - self.fs.blkszbits)
+
+    def extents(self):
+        inode = self.inode
+        bs = self.fs.block_size
+        if self.whole_fragment:
+            return [(0, inode.size, EXT_FRAGMENT, self.fragmentoff, inode.size)]
+
+        heads = []
+        for lcn in range(self.totalidx):
+            kind, clusterofs, pblk, _cblks = self.lcluster(lcn)
+            if kind == LCLUSTER_NONHEAD:
+                continue
+            start = (lcn << self.lclusterbits) + clusterofs
+            if start >= inode.size:
+                break
+            heads.append((start, kind, pblk, lcn))
+
+        extents = []
+        tail_fragment = self.advise & ADVISE_FRAGMENT_PCLUSTER
+        tail_inline = self.advise & ADVISE_INLINE_PCLUSTER
+        for n, (start, kind, pblk, lcn) in enumerate(heads):
+            end = heads[n + 1][0] if n + 1 < len(heads) else inode.size
+            length = end - start
+            last = n + 1 == len(heads)
+            if last and tail_fragment:
+                fragmentoff = self.fragmentoff
+                if not self.compact:
+                    fragmentoff |= pblk << 32
+                extents.append((start, length, EXT_FRAGMENT, fragmentoff, length))
+                continue
+            if last and tail_inline:
+                phys, plen = self.index_end, self.idata_size
+            else:
+                phys = pblk * bs
+                plen = self._compressed_blocks(kind, lcn) * bs
+            if kind == LCLUSTER_PLAIN:
+                method = EXT_INTERLACED if self.advise & ADVISE_INTERLACED_PCLUSTER else EXT_SHIFTED
+            else:
+                algorithm = self.algorithms[0 if kind == LCLUSTER_HEAD1 else 1]
+                if algorithm >= len(ALGORITHMS):
+                    raise ValueError(f"nid {inode.nid}: unknown compression algorithm {algorithm}")
+                method = ALGORITHMS[algorithm]
+            extents.append((start, length, method, phys, plen))
+        return extents
+
+
+def decode_extent(view, kind, phys, plen, length, offset, block_size, incompat):
+    """
+    Produce the first length bytes of one extent.
+
+    Args:
+        view: ImageView of the filesystem
+        kind: Extent kind from ErofsImage.extents()
+        phys: Image offset of the (compressed) data
+        plen: Physical length
+        length: Number of bytes wanted
+        offset: File offset of the extent (for interlaced clusters)
+        block_size: Filesystem block size
+        incompat: Superblock incompatible features
+
+    Returns:
+        bytes: Decoded data
+    """
+    raw = view.pread(plen, phys)
+    if kind in (EXT_RAW, EXT_SHIFTED):
+        return raw[:length]
+    if kind == EXT_INTERLACED:
+        # Stored at the extent's in-block offset, the rest wraps to the start
+        shift = offset % block_size
+        head = min(len(raw) - shift, length)
+        return raw[shift:shift + head] + raw[:length - head]
+    if kind != 'lz4' or incompat & FEATURE_INCOMPAT_ZERO_PADDING:
+        # Compressed data is right-aligned in the cluster
+        raw = raw.lstrip(b'\x00')
+    return decompress(kind, raw, length)
+
+
+def decompress(algorithm, data, size):
+    """
+    Decompress the first size bytes of an EROFS physical cluster.
+
+    Args:
+        algorithm: 'lz4', 'lzma' (MicroLZMA), 'deflate' or 'zstd'
+        data: Compressed bytes (padding removed)
+        size: Number of bytes wanted
+
+    Returns:
+        bytes: Decompressed data
+    """
+    if algorithm == 'lz4':
+        if lz4_block is None:
+            raise ValueError(LZ4_MISSING)
+        try:
+            out = lz4_block.decompress(data, uncompressed_size=size)
+            if len(out) == size:
+                return out
+        except lz4_block.LZ4BlockError:
+            pass
+        # Trailing data or a partial reference: decode only what is needed
+        return _lz4_decompress_partial(data, size)
+    if algorithm == 'lzma':
+        # MicroLZMA: the first byte of the range coder (always 0) is
+        # replaced by the inverted properties byte
+        props = ~data[0] & 0xFF
+        lc, props = props % 9, props // 9
+        lp, pb = props % 5, props // 5
+        dict_size = max(4096, 1 << max(0, size - 1).bit_length())
+        decoder = lzma.LZMADecompressor(lzma.FORMAT_RAW, filters=[{
+            'id': lzma.FILTER_LZMA1, 'lc': lc, 'lp': lp, 'pb': pb, 'dict_size': dict_size,
+        }])
+        return decoder.decompress(b'\x00' + bytes(data[1:]), max_length=size)
+    if algorithm == 'deflate':
+        return zlib.decompressobj(-15).decompress(data, size)
+    if algorithm == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstd compressed image needs the zstandard module")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)[:size]
+    raise ValueError(f"unsupported compression {algorithm}")
+
+
+def _lz4_decompress_partial(src, size):
+    dst = bytearray()
+    i = 0
+    n = len(src)
+    while i < n and len(dst) < size:
+        token = src[i]
+        i += 1
+        literals = token >> 4
+        if literals == 15:
+            while True:
+                b = src[i]
+                i += 1
+                literals += b
+                if b != 255:
+                    break
+        dst += src[i:i + literals]
+        i += literals
+        if i >= n or len(dst) >= size:
+            break
+        distance = src[i] | (src[i + 1] << 8)
+        i += 2
+        match = token & 15
+        if match == 15:
+            while True:
+                b = src[i]
+                i += 1
+                match += b
+                if b != 255:
+                    break
+        match += 4
+        start = len(dst) - distance
+        if start < 0 or not distance:
+            raise ValueError("corrupted LZ4 data")
+        if distance >= match:
+            dst += dst[start:start + match]
+        else:
+            pattern = bytes(dst[start:])
+            dst += (pattern * (match // distance + 1))[:match]
+    return bytes(dst[:size])
+
+
+_worker = {}
+
+
+def _init_worker(path, block_size, incompat, view=None):
+    _worker['view'] = view or open_image(path)
+    _worker['block_size'] = block_size
+    _worker['incompat'] = incompat
+
+
+def _process_batch(batch):
+    """Decode a batch of physical clusters and write every reference"""
+    view = _worker['view']
+    block_size = _worker['block_size']
+    incompat = _worker['incompat']
+    fds = {}
+    try:
+        for kind, phys, plen, _shift, refs in batch:
+            if kind == EXT_RAW:
+                for path, offset, length in refs:
+                    fd = fds.get(path)
+                    if fd is None:
+                        fd = fds[path] = os.open(path, os.O_WRONLY)
+                    view.copy_to(fd, phys, length, offset)
+                continue
+            data = decode_extent(view, kind, phys, plen, max(r[2] for r in refs),
+                                 refs[0][1], block_size, incompat)
+            for path, offset, length in refs:
+                if len(data) < length:
+                    raise ValueError(f"{os.fsdecode(path)}: short cluster at {phys}")
+                fd = fds.get(path)
+                if fd is None:
+                    fd = fds[path] = os.open(path, os.O_WRONLY)
+                os.pwrite(fd, data[:length], offset)
+    finally:
+        for fd in fds.values():
+            os.close(fd)
+
+
+def main():
+    """
+    Main function for standalone usage.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Extract an EROFS image without fsck.erofs'
+    )
+    parser.add_argument('image', nargs='+', help='EROFS image (raw or sparse), or its sparse chunks')
+    parser.add_argument('-o', '--output', required=True, help='Output directory')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS,
+                        help=f'Worker processes (default: {DEFAULT_JOBS})')
+    parser.add_argument('--fs-config', help='Write owners, modes and capabilities here')
+    parser.add_argument('--file-contexts', help='Write SELinux contexts here')
+    parser.add_argument('--prefix', default=None,
+                        help='Path prefix in the sidecars (default: output directory name)')
+
+    args = parser.parse_args()
+    prefix = args.prefix
+    if prefix is None:
+        prefix = os.path.basename(os.path.normpath(args.output))
+
+    image = args.image[0] if len(args.image) == 1 else args.image
+    try:
+        with ErofsImage(image) as fs:
+            metadata = fs.extract(args.output, args.jobs, prefix)
+        write_fs_config(metadata, args.fs_config, args.file_contexts)
+    except (OSError, ValueError, struct.error, lzma.LZMAError, zlib.error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"[INFO] Extracted {len(metadata)} entries to {args.output}")
+
+
+if __name__ == '__main__':
+    with tool_stage():
+        main()
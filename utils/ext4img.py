@@ -0,0 +1,546 @@
+#!/usr/bin/env python3
+"""
+Ext4 Image Reader for DumprX
+Extracts ext4 partition images without mounting them: walks the inode
+tables, extent trees and inline data of a raw, sparse or header-offset
+image and writes files straight into the output tree
+"""
+
+import os
+import sys
+import stat
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sparseimg import open_image
+from telemetry import tool_stage
+
+
+EXT4_SUPERBLOCK_OFFSET = 1024
+EXT4_MAGIC = 0xEF53
+EXT4_ROOT_INO = 2
+
+INCOMPAT_FILETYPE = 0x2
+INCOMPAT_META_BG = 0x10
+INCOMPAT_64BIT = 0x80
+INCOMPAT_INLINE_DATA = 0x8000
+
+INODE_FLAG_ENCRYPT = 0x800
+INODE_FLAG_EXTENTS = 0x80000
+INODE_FLAG_INLINE_DATA = 0x10000000
+
+EXTENT_MAGIC = 0xF30A
+EXTENT_HEADER = struct.Struct('<HHHHI')
+EXTENT_INDEX = struct.Struct('<IIHH')
+EXTENT_LEAF = struct.Struct('<IHHI')
+EXTENT_INIT_MAX_LEN = 32768
+
+XATTR_MAGIC = 0xEA020000
+XATTR_ENTRY = struct.Struct('<BBHIII')
+XATTR_PREFIXES = {
+    1: 'user.',
+    2: 'system.posix_acl_access',
+    3: 'system.posix_acl_default',
+    4: 'trusted.',
+    6: 'security.',
+    7: 'system.',
+    8: 'system.richacl',
+}
+
+DIR_ENTRY = struct.Struct('<IHBB')
+
+# Files larger than this are copied as several ranges in parallel
+SPLIT_SIZE = 64 * 1024 * 1024
+DEFAULT_JOBS = os.cpu_count() or 4
+
+
+class Inode:
+    """
+    Decoded ext4 inode.
+    """
+
+    __slots__ = ('ino', 'mode', 'uid', 'gid', 'size', 'flags', 'block',
+                 'file_acl', 'raw', 'extra_start')
+
+    def __init__(self, ino, raw, inode_size):
+        self.ino = ino
+        self.raw = raw
+        (self.mode, uid_lo, size_lo, _atime, _ctime, _mtime, _dtime, gid_lo,
+         _links, _blocks_lo, self.flags) = struct.unpack_from('<HHIIIIIHHII', raw, 0)
+        self.block = raw[0x28:0x28 + 60]
+        file_acl_lo, size_hi = struct.unpack_from('<II', raw, 0x68)
+        file_acl_hi, uid_hi, gid_hi = struct.unpack_from('<HHH', raw, 0x76)
+        self.uid = uid_lo | (uid_hi << 16)
+        self.gid = gid_lo | (gid_hi << 16)
+        self.size = size_lo | (size_hi << 32)
+        self.file_acl = file_acl_lo | (file_acl_hi << 32)
+        self.extra_start = None
+        if inode_size > 128 and len(raw) >= 0x82:
+            extra_isize = struct.unpack_from('<H', raw, 0x80)[0]
+            if 128 + extra_isize + 4 <= len(raw):
+                self.extra_start = 128 + extra_isize
+
+    @property
+    def kind(self):
+        return stat.S_IFMT(self.mode)
+
+
+class Ext4Image:
+    """
+    Read-only ext4 filesystem on top of an ImageView.
+    """
+
+    def __init__(self, path, logger=None):
+        """
+        Open an ext4 image and read its superblock and group descriptors.
+
+        Args:
+            path: Image path (raw, sparse or with a recorded header offset),
+                or a list of sparse chunk files
+            logger: Logger instance for logging (optional)
+        """
+        self.path = path
+        self.logger = logger
+        self.view = open_image(path)
+        try:
+            self._read_superblock()
+            self._read_group_descriptors()
+        except Exception:
+            self.view.close()
+            raise
+
+    def _log_warn(self, message):
+        if self.logger:
+            self.logger.warning(message)
+        else:
+            print(f"[WARN] {message}", file=sys.stderr)
+
+    def _read_superblock(self):
+        sb = self.view.pread(1024, EXT4_SUPERBLOCK_OFFSET)
+        if len(sb) < 1024 or struct.unpack_from('<H', sb, 0x38)[0] != EXT4_MAGIC:
+            raise ValueError(f"{self.path}: not an ext4 image")
+
+        (self.inodes_count, blocks_lo, _r, _free_b, _free_i, self.first_data_block,
+         log_block_size, _log_cluster, self.blocks_per_group, _cpg,
+         self.inodes_per_group) = struct.unpack_from('<11I', sb, 0)
+        rev_level = struct.unpack_from('<I', sb, 0x4C)[0]
+        self.inode_size = struct.unpack_from('<H', sb, 0x58)[0] if rev_level else 128
+        self.incompat = struct.unpack_from('<I', sb, 0x60)[0]
+        self.block_size = 1024 << log_block_size
+        blocks_hi = struct.unpack_from('<I', sb, 0x150)[0] if self.incompat & INCOMPAT_64BIT else 0
+        self.blocks_count = blocks_lo | (blocks_hi << 32)
+        self.desc_size = 32
+        if self.incompat & INCOMPAT_64BIT:
+            self.desc_size = max(32, struct.unpack_from('<H', sb, 0xFE)[0])
+        if self.incompat & INCOMPAT_META_BG:
+            raise ValueError(f"{self.path}: meta_bg layout is not supported")
+
+    def _read_group_descriptors(self):
+        groups = -(-self.inodes_count // self.inodes_per_group)
+        table = self.view.pread(groups * self.desc_size,
+                                (self.first_data_block + 1) * self.block_size)
+        self.inode_tables = []
+        for group in range(groups):
+            base = group * self.desc_size
+            lo = struct.unpack_from('<I', table, base + 0x8)[0]
+            hi = 0
+            if self.desc_size >= 64:
+                hi = struct.unpack_from('<I', table, base + 0x28)[0]
+            self.inode_tables.append(lo | (hi << 32))
+
+    def inode(self, ino):
+        """
+        Read an inode by number.
+
+        Returns:
+            Inode: Decoded inode
+        """
+        group, index = divmod(ino - 1, self.inodes_per_group)
+        offset = self.inode_tables[group] * self.block_size + index * self.inode_size
+        return Inode(ino, self.view.pread(self.inode_size, offset), self.inode_size)
+
+    def xattrs(self, inode):
+        """
+        Read the extended attributes of an inode (in-inode and block).
+
+        Returns:
+            dict: name -> bytes
+        """
+        attrs = {}
+        if inode.extra_start is not None:
+            raw = inode.raw
+            if struct.unpack_from('<I', raw, inode.extra_start)[0] == XATTR_MAGIC:
+                first = inode.extra_start + 4
+                self._parse_xattrs(raw, first, first, attrs)
+        if inode.file_acl:
+            block = self.view.pread(self.block_size, inode.file_acl * self.block_size)
+            if len(block) >= 32 and struct.unpack_from('<I', block, 0)[0] == XATTR_MAGIC:
+                self._parse_xattrs(block, 32, 0, attrs)
+        return attrs
+
+    def _parse_xattrs(self, buf, pos, value_base, attrs):
+        while pos + XATTR_ENTRY.size <= len(buf):
+            if buf[pos:pos + 4] == b'\x00\x00\x00\x00':
+                break
+            name_len, name_index, value_offs, value_inum, value_size, _hash = \
+                XATTR_ENTRY.unpack_from(buf, pos)
+            name = buf[pos + XATTR_ENTRY.size:pos + XATTR_ENTRY.size + name_len]
+            full_name = XATTR_PREFIXES.get(name_index, '') + name.decode('ascii', 'replace')
+            if value_inum:
+                # Value stored in its own inode (ea_inode)
+                value = self.read(self.inode(value_inum))[:value_size]
+            else:
+                start = value_base + value_offs
+                value = bytes(buf[start:start + value_size])
+            attrs[full_name] = value
+            pos += (XATTR_ENTRY.size + name_len + 3) & ~3
+
+    def runs(self, inode):
+        """
+        Map an inode's data to the image.
+
+        Returns:
+            list: (file_offset, image_offset, length) runs sorted by file
+            offset; holes and unwritten extents are left out
+        """
+        if inode.flags & INODE_FLAG_EXTENTS:
+            extents = []
+            self._walk_extents(inode.block, extents)
+        else:
+            extents = self._block_map(inode)
+        bs = self.block_size
+        runs = []
+        for logical, physical, count in sorted(extents):
+            offset = logical * bs
+            if offset >= inode.size:
+                continue
+            length = min(count * bs, inode.size - offset)
+            if runs and runs[-1][0] + runs[-1][2] == offset \
+                    and runs[-1][1] + runs[-1][2] == physical * bs:
+                prev = runs.pop()
+                runs.append((prev[0], prev[1], prev[2] + length))
+            else:
+                runs.append((offset, physical * bs, length))
+        return runs
+
+    def _walk_extents(self, node, out):
+        magic, entries, _max, depth, _gen = EXTENT_HEADER.unpack_from(node, 0)
+        if magic != EXTENT_MAGIC:
+            raise ValueError(f"{self.path}: bad extent header")
+        pos = EXTENT_HEADER.size
+        for _ in range(entries):
+            if depth:
+                _block, leaf_lo, leaf_hi, _unused = EXTENT_INDEX.unpack_from(node, pos)
+                child = self.view.pread(self.block_size, (leaf_lo | (leaf_hi << 32)) * self.block_size)
+                self._walk_extents(child, out)
+            else:
+                logical, length, start_hi, start_lo = EXTENT_LEAF.unpack_from(node, pos)
+                # Unwritten (preallocated) extents read as zeros
+                if length <= EXTENT_INIT_MAX_LEN:
+                    out.append((logical, start_lo | (start_hi << 32), length))
+            pos += 12
+
+    def _block_map(self, inode):
+        per_block = self.block_size // 4
+        pointers = struct.unpack_from('<15I', inode.block, 0)
+        total = -(-inode.size // self.block_size)
+        extents = []
+
+        def add(logical, physical):
+            if extents and extents[-1][0] + extents[-1][2] == logical \
+                    and extents[-1][1] + extents[-1][2] == physical:
+                last = extents.pop()
+                extents.append((last[0], last[1], last[2] + 1))
+            else:
+                extents.append((logical, physical, 1))
+
+        def walk(block, level, logical):
+            if not block:
+                return
+            table = struct.unpack(f'<{per_block}I',
+                                  self.view.pread(self.block_size, block * self.block_size))
+            span = per_block ** (level - 1)
+            for i, child in enumerate(table):
+                start = logical + i * span
+                if start >= total:
+                    return
+                if not child:
+                    continue
+                if level == 1:
+                    add(start, child)
+                else:
+                    walk(child, level - 1, start)
+
+        for i in range(min(12, total)):
+            if pointers[i]:
+                add(i, pointers[i])
+        logical = 12
+        for level, block in enumerate(pointers[12:15], 1):
+            walk(block, level, logical)
+            logical += per_block ** level
+        return extents
+
+    def read(self, inode):
+        """
+        Read a whole (small) file or directory into memory.
+
+        Returns:
+            bytes: File content
+        """
+        if inode.flags & INODE_FLAG_INLINE_DATA:
+            data = inode.block + self.xattrs(inode).get('system.data', b'')
+            return data[:inode.size]
+        data = bytearray(inode.size)
+        for offset, image_offset, length in self.runs(inode):
+            data[offset:offset + length] = self.view.pread(length, image_offset)
+        return bytes(data)
+
+    def listdir(self, inode):
+        """
+        List a directory, including hashed (htree) and inline directories.
+
+        Returns:
+            list: (name bytes, inode number, file type) tuples without . and ..
+        """
+        entries = []
+        if inode.flags & INODE_FLAG_INLINE_DATA:
+            # Parent inode number, then entries in i_block and system.data
+            self._parse_dirents(inode.block[:inode.size], 4, entries)
+            extra = self.xattrs(inode).get('system.data', b'')
+            if extra:
+                self._parse_dirents(extra, 0, entries)
+            return entries
+        data = self.read(inode)
+        for base in range(0, len(data), self.block_size):
+            self._parse_dirents(data[base:base + self.block_size], 0, entries)
+        return entries
+
+    def _parse_dirents(self, buf, pos, entries):
+        while pos + DIR_ENTRY.size <= len(buf):
+            ino, rec_len, name_len, file_type = DIR_ENTRY.unpack_from(buf, pos)
+            if rec_len < DIR_ENTRY.size:
+                break
+            if not self.incompat & INCOMPAT_FILETYPE:
+                # Old format: 16-bit name length, type from the inode
+                name_len |= file_type << 8
+                file_type = 0
+            name = buf[pos + DIR_ENTRY.size:pos + DIR_ENTRY.size + name_len]
+            if ino and name not in (b'.', b'..'):
+                entries.append((bytes(name), ino, file_type))
+            pos += rec_len
+
+    def walk(self):
+        """
+        Walk the tree from the root directory.
+
+        Yields:
+            tuple: (relative path bytes, Inode), parents before children
+        """
+        stack = [(b'', self.inode(EXT4_ROOT_INO))]
+        while stack:
+            path, inode = stack.pop()
+            yield path, inode
+            if inode.kind != stat.S_IFDIR:
+                continue
+            children = []
+            for name, ino, _file_type in self.listdir(inode):
+                if b'/' in name:
+                    continue
+                child_path = path + b'/' + name if path else name
+                children.append((child_path, self.inode(ino)))
+            stack.extend(reversed(children))
+
+    def extract(self, output_dir, jobs=DEFAULT_JOBS, prefix=''):
+        """
+        Extract the whole tree into output_dir.
+
+        Directories, symlinks and hard links are created while walking;
+        file data is copied by a thread pool with positioned writes, large
+        files split into several ranges.
+
+        Args:
+            output_dir: Destination directory
+            jobs: Concurrent copy workers
+            prefix: Path prefix used in the returned metadata
+
+        Returns:
+            list: (path, uid, gid, mode, capabilities, selinux context)
+            for every entry, in walk order
+        """
+        out_root = os.fsencode(output_dir)
+        os.makedirs(out_root, exist_ok=True)
+        metadata = []
+        dirs = []
+        linked = {}
+        errors = []
+        lock = threading.Lock()
+
+        def copy(path, runs):
+            try:
+                fd = os.open(path, os.O_WRONLY)
+                try:
+                    for offset, image_offset, length in runs:
+                        self.view.copy_to(fd, image_offset, length, offset)
+                finally:
+                    os.close(fd)
+            except (OSError, ValueError) as e:
+                with lock:
+                    errors.append(f"{os.fsdecode(path)}: {e}")
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            for rel, inode in self.walk():
+                target = os.path.join(out_root, rel) if rel else out_root
+                attrs = self.xattrs(inode)
+                metadata.append((
+                    os.path.join(prefix, os.fsdecode(rel)) if rel else prefix,
+                    inode.uid, inode.gid, stat.S_IMODE(inode.mode),
+                    _capabilities(attrs.get('security.capability')),
+                    attrs.get('security.selinux', b'').rstrip(b'\x00').decode('ascii', 'replace'),
+                ))
+                kind = inode.kind
+                if kind == stat.S_IFDIR:
+                    os.makedirs(target, exist_ok=True)
+                    dirs.append((target, inode.mode))
+                elif kind == stat.S_IFLNK:
+                    if inode.size < 60 and not inode.flags & (INODE_FLAG_EXTENTS | INODE_FLAG_INLINE_DATA) \
+                            and not inode.file_acl:
+                        link = inode.block[:inode.size]
+                    else:
+                        link = self.read(inode)
+                    if os.path.lexists(target):
+                        os.unlink(target)
+                    os.symlink(link, target)
+                elif kind == stat.S_IFREG:
+                    if os.path.lexists(target):
+                        os.unlink(target)
+                    if inode.ino in linked:
+                        os.link(linked[inode.ino], target)
+                        continue
+                    linked[inode.ino] = target
+                    if inode.flags & INODE_FLAG_ENCRYPT:
+                        self._log_warn(f"{os.fsdecode(rel)} is encrypted, skipping content")
+                        runs = []
+                    elif inode.flags & INODE_FLAG_INLINE_DATA:
+                        runs = None
+                    else:
+                        runs = self.runs(inode)
+                    fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                                 (stat.S_IMODE(inode.mode) & 0o777) | 0o600)
+                    try:
+                        if runs is None:
+                            os.write(fd, self.read(inode))
+                        else:
+                            os.ftruncate(fd, inode.size)
+                    finally:
+                        os.close(fd)
+                    for part in _split_runs(runs or []):
+                        pool.submit(copy, target, part)
+
+        for target, mode in reversed(dirs):
+            os.chmod(target, (stat.S_IMODE(mode) & 0o777) | 0o700)
+        if errors:
+            raise OSError(f"{len(errors)} file(s) failed: {errors[0]}")
+        return metadata
+
+    def close(self):
+        self.view.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _split_runs(runs):
+    """Group runs into copy tasks of about SPLIT_SIZE bytes"""
+    part = []
+    size = 0
+    for offset, image_offset, length in runs:
+        while length > 0:
+            n = min(length, SPLIT_SIZE - size)
+            part.append((offset, image_offset, n))
+            size += n
+            offset += n
+            image_offset += n
+            length -= n
+            if size >= SPLIT_SIZE:
+                yield part
+                part = []
+                size = 0
+    if part:
+        yield part
+
+
+def _capabilities(raw):
+    """Effective capability mask from a security.capability value"""
+    if not raw or len(raw) < 12:
+        return 0
+    permitted = struct.unpack_from('<I', raw, 4)[0]
+    if len(raw) >= 20:
+        permitted |= struct.unpack_from('<I', raw, 12)[0] << 32
+    return permitted
+
+
+def write_fs_config(metadata, fs_config=None, file_contexts=None):
+    """
+    Write fs_config ("path uid gid mode [capabilities=0x..]") and
+    file_contexts ("/path context") sidecars.
+
+    Args:
+        metadata: Result of Ext4Image.extract()
+        fs_config: fs_config output path (optional)
+        file_contexts: file_contexts output path (optional)
+    """
+    if fs_config:
+        with open(fs_config, 'w') as f:
+            for path, uid, gid, mode, caps, _context in metadata:
+                line = f"{path or '/'} {uid} {gid} {mode:04o}"
+                if caps:
+                    line += f" capabilities=0x{caps:x}"
+                f.write(line + '\n')
+    if file_contexts:
+        with open(file_contexts, 'w') as f:
+            for path, _uid, _gid, _mode, _caps, context in metadata:
+                if context:
+                    f.write(f"/{path} {context}\n")
+
+
+def main():
+    """
+    Main function for standalone usage.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Extract an ext4 image without mounting it'
+    )
+    parser.add_argument('image', nargs='+', help='ext4 image (raw or sparse), or its sparse chunks')
+    parser.add_argument('-o', '--output', required=True, help='Output directory')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS,
+                        help=f'Concurrent copy workers (default: {DEFAULT_JOBS})')
+    parser.add_argument('--fs-config', help='Write owners, modes and capabilities here')
+    parser.add_argument('--file-contexts', help='Write SELinux contexts here')
+    parser.add_argument('--prefix', default=None,
+                        help='Path prefix in the sidecars (default: output directory name)')
+
+    args = parser.parse_args()
+    prefix = args.prefix
+    if prefix is None:
+        prefix = os.path.basename(os.path.normpath(args.output))
+
+    image = args.image[0] if len(args.image) == 1 else args.image
+    try:
+        with Ext4Image(image) as fs:
+            metadata = fs.extract(args.output, args.jobs, prefix)
+        write_fs_config(metadata, args.fs_config, args.file_contexts)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"[INFO] Extracted {len(metadata)} entries to {args.output}")
+
+
+if __name__ == '__main__':
+    with tool_stage():
+        main()
@@ -0,0 +1,668 @@
+#!/usr/bin/env python3
+"""
+F2FS Image Reader for DumprX
+Extracts F2FS partition images without mounting them: loads the checkpoint
+and the whole NAT into an array once, resolves file blocks through the
+node tree in bulk and copies them with positioned reads from a thread pool
+"""
+
+import os
+import sys
+import stat
+import zlib
+import struct
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from sparseimg import open_image
+from ext4img import _split_runs, _capabilities, write_fs_config
+from telemetry import tool_stage
+
+try:
+    import lz4.block as lz4_block
+except ImportError:
+    lz4_block = None
+
+LZ4_MISSING = "LZ4 compressed file needs the lz4 module (pip install -r utils/requirements.txt)"
+
+
+F2FS_SUPER_OFFSET = 1024
+F2FS_MAGIC = 0xF2F52010
+F2FS_BLKSIZE = 4096
+F2FS_SUPERBLOCK = struct.Struct('<IHHIIIIIIIQ16I')
+
+FEATURE_EXTRA_ATTR = 0x8
+FEATURE_FLEXIBLE_INLINE_XATTR = 0x40
+
+# Checkpoint
+CHECKPOINT = struct.Struct('<QQQIII32s16s32s16sIIIIIIIII')
+CP_COMPACT_SUM_FLAG = 0x4
+CP_LARGE_NAT_BITMAP_FLAG = 0x400
+CP_CHKSUM_OFFSET = F2FS_BLKSIZE - 4
+CP_BITMAP_OFFSET = 192
+
+# NAT and its journal in the hot data summary
+NAT_ENTRY_SIZE = 9
+NAT_ENTRY_PER_BLOCK = F2FS_BLKSIZE // NAT_ENTRY_SIZE
+SUM_ENTRY_SIZE = 7 * 512
+NAT_JOURNAL_ENTRY = struct.Struct('<IBII')
+NAT_JOURNAL_ENTRIES = 38
+
+# Node blocks
+NODE_FOOTER_SIZE = 24
+DEF_ADDRS_PER_INODE = 923
+DEF_ADDRS_PER_BLOCK = 1018
+NIDS_PER_BLOCK = 1018
+DEFAULT_INLINE_XATTR_ADDRS = 50
+INODE_ADDR_OFFSET = 360
+INODE_NID_OFFSET = INODE_ADDR_OFFSET + DEF_ADDRS_PER_INODE * 4
+
+INLINE_XATTR = 0x01
+INLINE_DATA = 0x02
+INLINE_DENTRY = 0x04
+EXTRA_ATTR = 0x20
+
+COMPR_FL = 0x4
+ENCRYPT_FL = 0x800
+
+NULL_ADDR = 0
+NEW_ADDR = 0xFFFFFFFF
+COMPRESS_ADDR = 0xFFFFFFFE
+COMPRESS_DATA_HEADER = struct.Struct('<II16x')
+COMPRESS_ALGORITHMS = ('lzo', 'lz4', 'zstd', 'lzo-rle')
+
+# Dentries
+DIR_ENTRY = struct.Struct('<IIHB')
+SLOT_LEN = 8
+NR_DENTRY_IN_BLOCK = 214
+DENTRY_BITMAP_SIZE = (NR_DENTRY_IN_BLOCK + 7) // 8
+DENTRY_RESERVED_SIZE = 3
+
+XATTR_MAGIC = 0xF2F52011
+XATTR_HEADER_SIZE = 24
+XATTR_ENTRY = struct.Struct('<BBH')
+XATTR_PREFIXES = {
+    1: 'user.',
+    2: 'system.posix_acl_access',
+    3: 'system.posix_acl_default',
+    4: 'trusted.',
+    6: 'security.',
+}
+
+DEFAULT_JOBS = os.cpu_count() or 4
+
+
+def _crc32(seed, data):
+    """Linux crc32_le (no pre or post inversion), as used by F2FS"""
+    return zlib.crc32(data, seed ^ 0xFFFFFFFF) ^ 0xFFFFFFFF
+
+
+class Inode:
+    """
+    Decoded F2FS inode (the inode node block).
+    """
+
+    __slots__ = ('ino', 'raw', 'mode', 'inline', 'uid', 'gid', 'size',
+                 'xattr_nid', 'flags', 'extra', 'inline_xattr', 'compress')
+
+    def __init__(self, ino, raw, features):
+        self.ino = ino
+        self.raw = raw
+        (self.mode, _advise, self.inline, self.uid, self.gid, _links,
+         self.size) = struct.unpack_from('<HBBIIIQ', raw, 0)
+        self.xattr_nid, self.flags = struct.unpack_from('<II', raw, 76)
+        self.extra = 0
+        if self.inline & EXTRA_ATTR:
+            self.extra = struct.unpack_from('<H', raw, INODE_ADDR_OFFSET)[0] // 4
+        # As in the kernel: the flexible size lives in the extra attributes
+        if self.inline & EXTRA_ATTR and features & FEATURE_FLEXIBLE_INLINE_XATTR:
+            self.inline_xattr = struct.unpack_from('<H', raw, INODE_ADDR_OFFSET + 2)[0]
+        elif self.inline & (INLINE_XATTR | INLINE_DENTRY):
+            self.inline_xattr = DEFAULT_INLINE_XATTR_ADDRS
+        else:
+            self.inline_xattr = 0
+        self.compress = None
+        if self.flags & COMPR_FL and self.extra:
+            algorithm, log_cluster_size = struct.unpack_from('<BB', raw, INODE_ADDR_OFFSET + 32)
+            self.compress = (algorithm, 1 << log_cluster_size)
+
+    @property
+    def kind(self):
+        return stat.S_IFMT(self.mode)
+
+    @property
+    def addrs_per_inode(self):
+        addrs = DEF_ADDRS_PER_INODE - self.extra - self.inline_xattr
+        if self.compress:
+            addrs -= addrs % self.compress[1]
+        return addrs
+
+    @property
+    def addrs_per_block(self):
+        if self.compress:
+            return DEF_ADDRS_PER_BLOCK - DEF_ADDRS_PER_BLOCK % self.compress[1]
+        return DEF_ADDRS_PER_BLOCK
+
+    def inline_data(self):
+        """Inline data area (after the reserved first address slot)"""
+        start = INODE_ADDR_OFFSET + (self.extra + 1) * 4
+        end = INODE_ADDR_OFFSET + (DEF_ADDRS_PER_INODE - self.inline_xattr) * 4
+        return self.raw[start:end]
+
+
+class F2fsImage:
+    """
+    Read-only F2FS filesystem on top of an ImageView.
+    """
+
+    def __init__(self, path, logger=None):
+        """
+        Open an F2FS image and load its checkpoint and node address table.
+
+        Args:
+            path: Image path (raw, sparse or with a recorded header offset),
+                or a list of sparse chunk files
+            logger: Logger instance for logging (optional)
+        """
+        self.path = path
+        self.logger = logger
+        self.view = open_image(path)
+        try:
+            self._read_superblock()
+            self._read_checkpoint()
+            self._read_nat()
+        except Exception:
+            self.view.close()
+            raise
+
+    def _log_warn(self, message):
+        if self.logger:
+            self.logger.warning(message)
+        else:
+            print(f"[WARN] {message}", file=sys.stderr)
+
+    def _block(self, blkaddr, count=1):
+        return self.view.pread(count * F2FS_BLKSIZE, blkaddr * F2FS_BLKSIZE)
+
+    def _read_superblock(self):
+        # The second copy lives at the same offset of block 1
+        for base in (0, F2FS_BLKSIZE):
+            sb = self.view.pread(3072, base + F2FS_SUPER_OFFSET)
+            if len(sb) == 3072 and struct.unpack_from('<I', sb, 0)[0] == F2FS_MAGIC:
+                break
+        else:
+            raise ValueError(f"{self.path}: not an F2FS image")
+        fields = F2FS_SUPERBLOCK.unpack_from(sb, 0)
+        log_blocksize, self.log_blocks_per_seg = fields[5], fields[6]
+        (_section_count, _segment_count, _ckpt, _sit, self.segment_count_nat, _ssa,
+         _main, _seg0, self.cp_blkaddr, _sit_blkaddr, self.nat_blkaddr, _ssa_blkaddr,
+         _main_blkaddr, self.root_ino, _node_ino, _meta_ino) = fields[11:27]
+        if log_blocksize != 12:
+            raise ValueError(f"{self.path}: unsupported block size {1 << log_blocksize}")
+        self.blocks_per_seg = 1 << self.log_blocks_per_seg
+        self.cp_payload, = struct.unpack_from('<I', sb, 1664)
+        self.features, = struct.unpack_from('<I', sb, 2180)
+        # devs[0].path is set only on multi-device filesystems
+        if sb[2201] != 0:
+            raise ValueError(f"{self.path}: multi-device F2FS is not supported")
+
+    def _checkpoint_pack(self, start):
+        head = self._block(start)
+        if len(head) < F2FS_BLKSIZE:
+            return None
+        fields = CHECKPOINT.unpack_from(head, 0)
+        version, flags, total_blocks, checksum_offset = fields[0], fields[10], fields[11], fields[18]
+        if checksum_offset > CP_CHKSUM_OFFSET or not 0 < total_blocks <= self.blocks_per_seg:
+            return None
+        crc = _crc32(F2FS_MAGIC, head[:checksum_offset])
+        if checksum_offset < CP_CHKSUM_OFFSET:
+            crc = _crc32(crc, head[checksum_offset + 4:])
+        if crc != struct.unpack_from('<I', head, checksum_offset)[0]:
+            return None
+        tail = self._block(start + total_blocks - 1, 1)
+        if len(tail) < 8 or struct.unpack_from('<Q', tail, 0)[0] != version:
+            return None
+        return version, start, head, flags, fields
+
+    def _read_checkpoint(self):
+        packs = [self._checkpoint_pack(self.cp_blkaddr),
+                 self._checkpoint_pack(self.cp_blkaddr + self.blocks_per_seg)]
+        packs = [p for p in packs if p]
+        if not packs:
+            raise ValueError(f"{self.path}: no valid F2FS checkpoint")
+        _version, start, head, self.cp_flags, fields = max(packs, key=lambda p: p[0])
+        self.cp_start = start
+        self.cp_start_sum = fields[12]
+        sit_bitmap_size, nat_bitmap_size = fields[16], fields[17]
+        if self.cp_flags & CP_LARGE_NAT_BITMAP_FLAG:
+            offset = CP_BITMAP_OFFSET + 4
+        elif self.cp_payload:
+            offset = CP_BITMAP_OFFSET
+        else:
+            offset = CP_BITMAP_OFFSET + sit_bitmap_size
+        self.nat_bitmap = head[offset:offset + nat_bitmap_size]
+
+    def _read_nat(self):
+        """Load every NAT entry's block address into one array indexed by nid"""
+        nat_blocks = (self.segment_count_nat >> 1) << self.log_blocks_per_seg
+        self.nat = array('I', bytes(4 * nat_blocks * NAT_ENTRY_PER_BLOCK))
+        bitmap = self.nat_bitmap
+        seg_blocks = self.blocks_per_seg
+        for seg in range(nat_blocks // seg_blocks):
+            # Read each NAT segment pair once; the bitmap picks the live copy per block
+            base = self.nat_blkaddr + (seg << self.log_blocks_per_seg << 1)
+            pair = self._block(base, 2 * seg_blocks)
+            for rel in range(seg_blocks):
+                block_off = seg * seg_blocks + rel
+                if block_off >> 3 < len(bitmap) and bitmap[block_off >> 3] & (0x80 >> (block_off & 7)):
+                    pos = (rel + seg_blocks) * F2FS_BLKSIZE
+                else:
+                    pos = rel * F2FS_BLKSIZE
+                block = pair[pos:pos + NAT_ENTRY_PER_BLOCK * NAT_ENTRY_SIZE]
+                if not block.strip(b'\x00'):
+                    continue
+                nid = block_off * NAT_ENTRY_PER_BLOCK
+                for i, (_version, _ino, blkaddr) in enumerate(struct.iter_unpack('<BII', block)):
+                    if blkaddr:
+                        self.nat[nid + i] = blkaddr
+
+        # Entries updated since the NAT blocks were written
+        summary = self._block(self.cp_start + self.cp_start_sum)
+        journal = 0 if self.cp_flags & CP_COMPACT_SUM_FLAG else SUM_ENTRY_SIZE
+        count = min(struct.unpack_from('<H', summary, journal)[0], NAT_JOURNAL_ENTRIES)
+        for i in range(count):
+            nid, _version, _ino, blkaddr = NAT_JOURNAL_ENTRY.unpack_from(
+                summary, journal + 2 + i * NAT_JOURNAL_ENTRY.size)
+            if nid < len(self.nat):
+                self.nat[nid] = blkaddr
+
+    def node(self, nid):
+        """
+        Read a node block by nid.
+
+        Returns:
+            bytes: Node block
+        """
+        if nid >= len(self.nat) or self.nat[nid] in (NULL_ADDR, NEW_ADDR):
+            raise ValueError(f"{self.path}: node {nid} is not allocated")
+        return self._block(self.nat[nid])
+
+    def inode(self, ino):
+        """
+        Read an inode by number.
+
+        Returns:
+            Inode: Decoded inode
+        """
+        return Inode(ino, self.node(ino), self.features)
+
+    def xattrs(self, inode):
+        """
+        Read the extended attributes of an inode (inline and xattr node).
+
+        Returns:
+            dict: name -> bytes
+        """
+        buf = b''
+        # Inline dentries reserve the area too, but only INLINE_XATTR fills it
+        if inode.inline & INLINE_XATTR and inode.inline_xattr:
+            start = INODE_ADDR_OFFSET + (DEF_ADDRS_PER_INODE - inode.inline_xattr) * 4
+            buf = inode.raw[start:start + inode.inline_xattr * 4]
+        if inode.xattr_nid:
+            buf += self.node(inode.xattr_nid)[:F2FS_BLKSIZE - NODE_FOOTER_SIZE]
+        attrs = {}
+        if len(buf) < XATTR_HEADER_SIZE or struct.unpack_from('<I', buf, 0)[0] != XATTR_MAGIC:
+            return attrs
+        pos = XATTR_HEADER_SIZE
+        while pos + XATTR_ENTRY.size <= len(buf):
+            if buf[pos:pos + 4] == b'\x00\x00\x00\x00':
+                break
+            name_index, name_len, value_size = XATTR_ENTRY.unpack_from(buf, pos)
+            start = pos + XATTR_ENTRY.size
+            name = buf[start:start + name_len].decode('ascii', 'replace')
+            attrs[XATTR_PREFIXES.get(name_index, '') + name] = \
+                bytes(buf[start + name_len:start + name_len + value_size])
+            pos = (start + name_len + value_size + 3) & ~3
+        return attrs
+
+    def addresses(self, inode):
+        """
+        Resolve every data block address of an inode through its node tree.
+
+        Returns:
+            array: Block address per file block (NULL_ADDR/NEW_ADDR for holes,
+            COMPRESS_ADDR at the head of compressed clusters)
+        """
+        total = -(-inode.size // F2FS_BLKSIZE)
+        addrs = array('I')
+        api = inode.addrs_per_inode
+        first = INODE_ADDR_OFFSET + inode.extra * 4
+        addrs.frombytes(inode.raw[first:first + min(api, total) * 4])
+        if len(addrs) >= total:
+            return addrs
+        apb = inode.addrs_per_block
+        nids = struct.unpack_from('<5I', inode.raw, INODE_NID_OFFSET)
+
+        def direct(nid):
+            count = min(apb, total - len(addrs))
+            if nid:
+                addrs.frombytes(self.node(nid)[:count * 4])
+            else:
+                addrs.extend(bytes(count))
+
+        def indirect(nid, level):
+            span = apb * NIDS_PER_BLOCK ** (level - 1)
+            children = struct.unpack('<1018I', self.node(nid)[:NIDS_PER_BLOCK * 4]) if nid else ()
+            for i in range(NIDS_PER_BLOCK):
+                if len(addrs) >= total:
+                    return
+                child = children[i] if children else 0
+                if level == 1:
+                    direct(child)
+                elif child:
+                    indirect(child, level - 1)
+                else:
+                    addrs.extend(bytes(min(span, total - len(addrs))))
+
+        for nid, level in zip(nids, (0, 0, 1, 1, 2)):
+            if len(addrs) >= total:
+                break
+            if level:
+                indirect(nid, level)
+            else:
+                direct(nid)
+        return addrs
+
+    def runs(self, inode):
+        """
+        Map an inode's data to the image.
+
+        Returns:
+            tuple: (runs, clusters); runs are (file_offset, image_offset,
+            length) sorted by file offset with holes left out, clusters are
+            (file_offset, length, block addresses) of compressed clusters
+        """
+        addrs = self.addresses(inode)
+        cluster_size = inode.compress[1] if inode.compress else 0
+        runs = []
+        clusters = []
+        index = 0
+        total = len(addrs)
+        while index < total:
+            addr = addrs[index]
+            offset = index * F2FS_BLKSIZE
+            if addr == COMPRESS_ADDR and cluster_size:
+                blocks = [a for a in addrs[index + 1:index + cluster_size]
+                          if a not in (NULL_ADDR, NEW_ADDR)]
+                length = min(cluster_size * F2FS_BLKSIZE, inode.size - offset)
+                clusters.append((offset, length, blocks))
+                index += cluster_size
+                continue
+            index += 1
+            if addr in (NULL_ADDR, NEW_ADDR, COMPRESS_ADDR):
+                continue
+            length = min(F2FS_BLKSIZE, inode.size - offset)
+            image_offset = addr * F2FS_BLKSIZE
+            if runs and runs[-1][0] + runs[-1][2] == offset \
+                    and runs[-1][1] + runs[-1][2] == image_offset:
+                prev = runs.pop()
+                runs.append((prev[0], prev[1], prev[2] + length))
+            else:
+                runs.append((offset, image_offset, length))
+        return runs, clusters
+
+    def decompress_cluster(self, inode, length, blocks):
+        """
+        Decompress one compressed cluster.
+
+        Returns:
+            bytes: The first length bytes of the cluster
+        """
+        algorithm = inode.compress[0]
+        name = COMPRESS_ALGORITHMS[algorithm] if algorithm < len(COMPRESS_ALGORITHMS) else str(algorithm)
+        data = b''.join(self._block(addr) for addr in blocks)
+        clen, _checksum = COMPRESS_DATA_HEADER.unpack_from(data, 0)
+        cdata = data[COMPRESS_DATA_HEADER.size:COMPRESS_DATA_HEADER.size + clen]
+        rlen = inode.compress[1] * F2FS_BLKSIZE
+        if name == 'lz4':
+            if lz4_block is None:
+                raise ValueError(LZ4_MISSING)
+            out = lz4_block.decompress(cdata, uncompressed_size=rlen)
+        elif name == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise ValueError("zstd compressed file needs the zstandard module")
+            out = zstandard.ZstdDecompressor().decompress(cdata, max_output_size=rlen)
+        else:
+            raise ValueError(f"{name} compressed files are not supported")
+        return out[:length]
+
+    def read(self, inode):
+        """
+        Read a whole (small) file, directory or symlink into memory.
+
+        Returns:
+            bytes: File content
+        """
+        if inode.inline & (INLINE_DATA | INLINE_DENTRY):
+            return inode.inline_data()[:inode.size]
+        data = bytearray(inode.size)
+        runs, clusters = self.runs(inode)
+        for offset, image_offset, length in runs:
+            data[offset:offset + length] = self.view.pread(length, image_offset)
+        for offset, length, blocks in clusters:
+            data[offset:offset + length] = self.decompress_cluster(inode, length, blocks)
+        return bytes(data)
+
+    def listdir(self, inode):
+        """
+        List a directory, including inline directories.
+
+        Returns:
+            list: (name bytes, inode number, file type) tuples without . and ..
+        """
+        entries = []
+        if inode.inline & INLINE_DENTRY:
+            area = inode.inline_data()
+            count = len(area) * 8 // ((DIR_ENTRY.size + SLOT_LEN) * 8 + 1)
+            bitmap_size = (count + 7) // 8
+            reserved = len(area) - ((DIR_ENTRY.size + SLOT_LEN) * count + bitmap_size)
+            dentries = bitmap_size + reserved
+            self._parse_dentries(area, count, 0, dentries, dentries + DIR_ENTRY.size * count, entries)
+            return entries
+        data = self.read(inode)
+        dentries = DENTRY_BITMAP_SIZE + DENTRY_RESERVED_SIZE
+        names = dentries + DIR_ENTRY.size * NR_DENTRY_IN_BLOCK
+        for base in range(0, len(data) - F2FS_BLKSIZE + 1, F2FS_BLKSIZE):
+            self._parse_dentries(data, NR_DENTRY_IN_BLOCK, base, base + dentries,
+                                 base + names, entries)
+        return entries
+
+    def _parse_dentries(self, buf, count, bitmap, dentries, names, entries):
+        pos = 0
+        while pos < count:
+            if not buf[bitmap + (pos >> 3)] & (1 << (pos & 7)):
+                pos += 1
+                continue
+            _hash, ino, name_len, file_type = DIR_ENTRY.unpack_from(buf, dentries + pos * DIR_ENTRY.size)
+            if not name_len:
+                pos += 1
+                continue
+            name = bytes(buf[names + pos * SLOT_LEN:names + pos * SLOT_LEN + name_len])
+            if ino and name not in (b'.', b'..'):
+                entries.append((name, ino, file_type))
+            pos += (name_len + SLOT_LEN - 1) // SLOT_LEN
+
+    def walk(self):
+        """
+        Walk the tree from the root directory.
+
+        Yields:
+            tuple: (relative path bytes, Inode), parents before children
+        """
+        stack = [(b'', self.inode(self.root_ino))]
+        while stack:
+            path, inode = stack.pop()
+            yield path, inode
+            if inode.kind != stat.S_IFDIR:
+                continue
+            children = []
+            for name, ino, _file_type in self.listdir(inode):
+                if b'/' in name:
+                    continue
+                child_path = path + b'/' + name if path else name
+                children.append((child_path, self.inode(ino)))
+            stack.extend(reversed(children))
+
+    def extract(self, output_dir, jobs=DEFAULT_JOBS, prefix=''):
+        """
+        Extract the whole tree into output_dir.
+
+        Directories, symlinks and hard links are created while walking;
+        file data is copied by a thread pool with positioned writes, large
+        files split into several ranges, compressed clusters decoded by
+        the same pool.
+
+        Args:
+            output_dir: Destination directory
+            jobs: Concurrent copy workers
+            prefix: Path prefix used in the returned metadata
+
+        Returns:
+            list: (path, uid, gid, mode, capabilities, selinux context)
+            for every entry, in walk order
+        """
+        out_root = os.fsencode(output_dir)
+        os.makedirs(out_root, exist_ok=True)
+        metadata = []
+        dirs = []
+        linked = {}
+        errors = []
+        lock = threading.Lock()
+
+        def copy(path, runs):
+            try:
+                fd = os.open(path, os.O_WRONLY)
+                try:
+                    for offset, image_offset, length in runs:
+                        self.view.copy_to(fd, image_offset, length, offset)
+                finally:
+                    os.close(fd)
+            except (OSError, ValueError) as e:
+                with lock:
+                    errors.append(f"{os.fsdecode(path)}: {e}")
+
+        def inflate(path, inode, clusters):
+            try:
+                fd = os.open(path, os.O_WRONLY)
+                try:
+                    for offset, length, blocks in clusters:
+                        os.pwrite(fd, self.decompress_cluster(inode, length, blocks), offset)
+                finally:
+                    os.close(fd)
+            except (OSError, ValueError, struct.error) as e:
+                with lock:
+                    errors.append(f"{os.fsdecode(path)}: {e}")
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            for rel, inode in self.walk():
+                target = os.path.join(out_root, rel) if rel else out_root
+                attrs = self.xattrs(inode)
+                metadata.append((
+                    os.path.join(prefix, os.fsdecode(rel)) if rel else prefix,
+                    inode.uid, inode.gid, stat.S_IMODE(inode.mode),
+                    _capabilities(attrs.get('security.capability')),
+                    attrs.get('security.selinux', b'').rstrip(b'\x00').decode('ascii', 'replace'),
+                ))
+                kind = inode.kind
+                if kind == stat.S_IFDIR:
+                    os.makedirs(target, exist_ok=True)
+                    dirs.append((target, inode.mode))
+                elif kind == stat.S_IFLNK:
+                    if os.path.lexists(target):
+                        os.unlink(target)
+                    os.symlink(self.read(inode), target)
+                elif kind == stat.S_IFREG:
+                    if os.path.lexists(target):
+                        os.unlink(target)
+                    if inode.ino in linked:
+                        os.link(linked[inode.ino], target)
+                        continue
+                    linked[inode.ino] = target
+                    runs, clusters = [], []
+                    if inode.flags & ENCRYPT_FL:
+                        self._log_warn(f"{os.fsdecode(rel)} is encrypted, skipping content")
+                    elif not inode.inline & INLINE_DATA:
+                        runs, clusters = self.runs(inode)
+                    if clusters and lz4_block is None \
+                            and inode.compress[0] == COMPRESS_ALGORITHMS.index('lz4'):
+                        raise ValueError(f"{os.fsdecode(rel)}: {LZ4_MISSING}")
+                    fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                                 (stat.S_IMODE(inode.mode) & 0o777) | 0o600)
+                    try:
+                        if inode.inline & INLINE_DATA and not inode.flags & ENCRYPT_FL:
+                            os.write(fd, self.read(inode))
+                        else:
+                            os.ftruncate(fd, inode.size)
+                    finally:
+                        os.close(fd)
+                    for part in _split_runs(runs):
+                        pool.submit(copy, target, part)
+                    for i in range(0, len(clusters), 16):
+                        pool.submit(inflate, target, inode, clusters[i:i + 16])
+
+        for target, mode in reversed(dirs):
+            os.chmod(target, (stat.S_IMODE(mode) & 0o777) | 0o700)
+        if errors:
+            raise OSError(f"{len(errors)} file(s) failed: {errors[0]}")
+        return metadata
+
+    def close(self):
+        self.view.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    """
+    Main function for standalone usage.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Extract an F2FS image without mounting it'
+    )
+    parser.add_argument('image', nargs='+', help='F2FS image (raw or sparse), or its sparse chunks')
+    parser.add_argument('-o', '--output', required=True, help='Output directory')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS,
+                        help=f'Concurrent copy workers (default: {DEFAULT_JOBS})')
+    parser.add_argument('--fs-config', help='Write owners, modes and capabilities here')
+    parser.add_argument('--file-contexts', help='Write SELinux contexts here')
+    parser.add_argument('--prefix', default=None,
+                        help='Path prefix in the sidecars (default: output directory name)')
+
+    args = parser.parse_args()
+    prefix = args.prefix
+    if prefix is None:
+        prefix = os.path.basename(os.path.normpath(args.output))
+
+    image = args.image[0] if len(args.image) == 1 else args.image
+    try:
+        with F2fsImage(image) as fs:
+            metadata = fs.extract(args.output, args.jobs, prefix)
+        write_fs_config(metadata, args.fs_config, args.file_contexts)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"[INFO] Extracted {len(metadata)} entries to {args.output}")
+
+
+if __name__ == '__main__':
+    with tool_stage():
+        main()
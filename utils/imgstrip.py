@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Header Strip Module for DumprX
+Drops vendor headers (MOTO, ASUS) from the front of partition images without
+rewriting them: the range is collapsed in place where the filesystem allows
+it, otherwise the offset is recorded and readers see a shifted view
+"""
+
+import os
+import sys
+import errno
+import ctypes
+
+from sparseimg import copy_range, header_offset, header_offset_path
+from telemetry import tool_stage
+
+
+FALLOC_FL_COLLAPSE_RANGE = 0x08
+
+_fallocate_func = None
+
+
+def _fallocate():
+    global _fallocate_func
+    if _fallocate_func is None:
+        libc = ctypes.CDLL(None, use_errno=True)
+        func = getattr(libc, 'fallocate64', None) or libc.fallocate
+        func.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong]
+        func.restype = ctypes.c_int
+        _fallocate_func = func
+    return _fallocate_func
+
+
+def collapse_range(path, offset):
+    """
+    Remove the first offset bytes of a file in place.
+
+    Only works on filesystems with FALLOC_FL_COLLAPSE_RANGE (ext4, xfs)
+    and when offset is a multiple of the filesystem block size.
+
+    Returns:
+        bool: True if the header was removed
+    """
+    fd = os.open(path, os.O_RDWR)
+    try:
+        if offset % os.fstatvfs(fd).f_bsize or offset >= os.fstat(fd).st_size:
+            return False
+        try:
+            ret = _fallocate()(fd, FALLOC_FL_COLLAPSE_RANGE, 0, offset)
+        except (OSError, AttributeError):
+            return False
+        if ret != 0:
+            err = ctypes.get_errno()
+            if err not in (errno.EOPNOTSUPP, errno.EINVAL, errno.ENOSYS, errno.EPERM):
+                raise OSError(err, os.strerror(err), path)
+            return False
+        return True
+    finally:
+        os.close(fd)
+
+
+def strip_header(path, offset):
+    """
+    Drop a vendor header of offset bytes from an image.
+
+    Args:
+        path: Raw image path
+        offset: Header size in bytes
+
+    Returns:
+        str: 'collapsed' if the file was shortened in place, 'view' if the
+        offset was recorded for readers instead
+    """
+    offset += header_offset(path)
+    if collapse_range(path, offset):
+        _clear(path)
+        return 'collapsed'
+    with open(header_offset_path(path), 'w') as f:
+        f.write(f"{offset}\n")
+    return 'view'
+
+
+def materialize(path):
+    """
+    Rewrite an image without its recorded header, for tools that cannot
+    read at an offset.
+
+    Returns:
+        bool: True if the image was rewritten
+    """
+    offset = header_offset(path)
+    if not offset:
+        return False
+    if collapse_range(path, offset):
+        _clear(path)
+        return True
+    tmp_path = path + '.tmp'
+    src = os.open(path, os.O_RDONLY)
+    dst = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        copy_range(src, dst, max(0, os.fstat(src).st_size - offset), offset, 0)
+    except BaseException:
+        os.close(dst)
+        os.unlink(tmp_path)
+        raise
+    finally:
+        os.close(src)
+    os.close(dst)
+    os.replace(tmp_path, path)
+    _clear(path)
+    return True
+
+
+def _clear(path):
+    try:
+        os.unlink(header_offset_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def main():
+    """
+    Main function for standalone usage.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Drop vendor headers from partition images without copying them'
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    strip = sub.add_parser('strip', help='Drop the first OFFSET bytes of an image')
+    strip.add_argument('offset', type=int, help='Header size in bytes')
+    strip.add_argument('image', help='Raw image')
+
+    mat = sub.add_parser('materialize', help='Apply a recorded header offset by rewriting the image')
+    mat.add_argument('image', help='Raw image')
+
+    off = sub.add_parser('offset', help='Print the recorded header offset of an image')
+    off.add_argument('image', help='Raw image')
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'strip':
+            print(strip_header(args.image, args.offset))
+        elif args.command == 'materialize':
+            materialize(args.image)
+        else:
+            print(header_offset(args.image))
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    with tool_stage():
+        main()
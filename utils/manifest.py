@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Output Manifest Module for DumprX
+Walks the dump output once into an SQLite manifest (path, size, mode,
+mtime, optional sha1), refreshes only the paths a stage touched, and
+answers file list queries (all_files.txt, large files, LFS candidates)
+from it instead of walking the tree again
+"""
+
+import os
+import sys
+import stat
+import fnmatch
+import hashlib
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from blobhash import sha1_file
+from checkpoint import STATE_NAME
+from telemetry import tool_stage
+
+
+SCHEMA_VERSION = 1
+SKIP_DIRS = ('.git',)
+# Kept in the dump directory by checkpoint.py, not part of the dump
+SKIP_FILES = (STATE_NAME,)
+SIZE_UNITS = {'': 1, 'c': 1, 'k': 1 << 10, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+
+def parse_size(value):
+    """
+    Parse a find(1)-style size such as 62M or 100M.
+
+    Returns:
+        int: Size in bytes
+    """
+    unit = value[-1] if value and not value[-1].isdigit() else ''
+    if unit not in SIZE_UNITS:
+        raise ValueError(f"Invalid size: {value}")
+    return int(value[:len(value) - len(unit)]) * SIZE_UNITS[unit]
+
+
+def default_manifest_path(root, cache_dir=None):
+    """Manifest file for a root directory, under the DumprX cache"""
+    if not cache_dir:
+        cache_dir = os.environ.get('DUMPRX_CACHE_DIR') or os.path.join(
+            os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'dumprx')
+    key = hashlib.sha1(os.path.realpath(root).encode('utf-8', 'surrogateescape')).hexdigest()
+    return os.path.join(cache_dir, 'manifest', f"{key[:16]}.sqlite")
+
+
+class Manifest:
+    """
+    Files below one root directory, kept in an SQLite database.
+
+    Paths are relative to the root with / separators; .git directories
+    are never entered, and symlinks and the checkpoint state file are
+    not listed.
+    """
+
+    def __init__(self, root, path=None, jobs=None, logger=None):
+        """
+        Open (or create) the manifest of a root directory.
+
+        Args:
+            root: Directory the manifest describes
+            path: SQLite file (default: per-root file in the DumprX cache)
+            jobs: Hashing threads (default: CPU count)
+            logger: Logger instance for logging (optional)
+        """
+        self.root = os.path.realpath(root)
+        self.path = path or default_manifest_path(root)
+        self.jobs = jobs or os.cpu_count() or 1
+        self.logger = logger
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, '
+                        'mode INTEGER, mtime_ns INTEGER, ino INTEGER, sha1 TEXT)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS files_size ON files (size)')
+
+    def _log_warn(self, message):
+        if self.logger:
+            self.logger.warning(message)
+        else:
+            print(f"[WARN] {message}", file=sys.stderr)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _root_id(self):
+        st = os.stat(self.root)
+        return f"{SCHEMA_VERSION}:{self.root}:{st.st_dev}:{st.st_ino}"
+
+    def is_current(self):
+        """Whether the manifest was scanned from this very root directory"""
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'root'").fetchone()
+        return bool(row) and row[0] == self._root_id()
+
+    def _walk(self, rel):
+        """Yield (relative path, stat) for every regular file below rel"""
+        stack = [rel]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(os.path.join(self.root, current) if current else self.root) as it:
+                    entries = list(it)
+            except NotADirectoryError:
+                try:
+                    st = os.lstat(os.path.join(self.root, current))
+                except OSError:
+                    continue
+                if stat.S_ISREG(st.st_mode):
+                    yield current, st
+                continue
+            except OSError:
+                continue
+            for entry in entries:
+                child = f"{current}/{entry.name}" if current else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in SKIP_DIRS:
+                            stack.append(child)
+                    elif entry.is_file(follow_symlinks=False) and entry.name not in SKIP_FILES:
+                        yield child, entry.stat(follow_symlinks=False)
+                except OSError as e:
+                    self._log_warn(f"Cannot stat {entry.path}: {e}")
+
+    def _store(self, rows, prefixes, with_hash):
+        """Replace the entries under prefixes with rows, keeping known hashes"""
+        known = {}
+        for prefix in prefixes:
+            query, params = self._under(prefix)
+            for path, size, mtime_ns, ino, sha1 in self.db.execute(
+                    f"SELECT path, size, mtime_ns, ino, sha1 FROM files WHERE {query}", params):
+                if sha1:
+                    known[path] = ((size, mtime_ns, ino), sha1)
+        records = []
+        for path, st in rows:
+            try:
+                path.encode('utf-8')
+            except UnicodeEncodeError:
+                self._log_warn(f"Skipping non UTF-8 file name: {path!r}")
+                continue
+            old = known.get(path)
+            sha1 = old[1] if old and old[0] == (st.st_size, st.st_mtime_ns, st.st_ino) else None
+            records.append([path, st.st_size, st.st_mode, st.st_mtime_ns, st.st_ino, sha1])
+
+        if with_hash:
+            pending = [record for record in records if record[5] is None]
+            with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                digests = pool.map(self._hash, (record[0] for record in pending))
+                for record, sha1 in zip(pending, digests):
+                    record[5] = sha1
+
+        with self.db:
+            for prefix in prefixes:
+                query, params = self._under(prefix)
+                self.db.execute(f"DELETE FROM files WHERE {query}", params)
+            self.db.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)', records)
+        return len(records)
+
+    def _hash(self, rel):
+        try:
+            return sha1_file(os.path.join(self.root, rel))
+        except OSError as e:
+            self._log_warn(f"Cannot hash {rel}: {e}")
+            return None
+
+    @staticmethod
+    def _under(prefix):
+        """SQL condition matching prefix itself and everything below it"""
+        if not prefix:
+            return '1', ()
+        # '0' sorts right after '/', so this range is exactly "prefix/..."
+        return '(path = ? OR (path >= ? AND path < ?))', (prefix, prefix + '/', prefix + '0')
+
+    def _relative(self, path):
+        full = os.path.realpath(os.path.join(self.root, path))
+        rel = os.path.relpath(full, self.root)
+        if rel == os.curdir:
+            return ''
+        if rel.startswith(os.pardir + os.sep) or rel == os.pardir:
+            raise ValueError(f"{path} is outside {self.root}")
+        return rel.replace(os.sep, '/')
+
+    def scan(self, with_hash=False):
+        """
+        Walk the whole root and replace the manifest with it.
+
+        Args:
+            with_hash: Also record sha1 values (reused while unchanged)
+
+        Returns:
+            int: Number of files
+        """
+        count = self._store(self._walk(''), [''], with_hash)
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('root', ?)", (self._root_id(),))
+        return count
+
+    def update(self, paths, with_hash=False):
+        """
+        Refresh only some paths after a stage changed them. Each path is
+        re-walked if it is a directory; paths that are gone are dropped.
+
+        Args:
+            paths: Files or directories, relative to the root or absolute
+
+        Returns:
+            int: Number of files now recorded under those paths
+        """
+        if not self.is_current():
+            return self.scan(with_hash)
+        prefixes = list(dict.fromkeys(self._relative(path) for path in paths))
+        if '' in prefixes:
+            return self.scan(with_hash)
+        rows = [row for prefix in prefixes for row in self._walk(prefix)]
+        return self._store(rows, prefixes, with_hash)
+
+    def files(self, min_size=None, names=(), under=None):
+        """
+        Query the manifest.
+
+        Args:
+            min_size: Only files larger than this many bytes
+            names: Only files whose name matches one of these globs
+            under: Only files below this directory
+
+        Returns:
+            list: (path, size, mode, mtime_ns, sha1) tuples sorted by path
+        """
+        query, params = ['1'], []
+        if min_size is not None:
+            query.append('size > ?')
+            params.append(min_size)
+        if under:
+            condition, extra = self._under(self._relative(under))
+            query.append(condition)
+            params.extend(extra)
+        rows = self.db.execute(
+            f"SELECT path, size, mode, mtime_ns, sha1 FROM files WHERE {' AND '.join(query)}",
+            params).fetchall()
+        if names:
+            rows = [row for row in rows
+                    if any(fnmatch.fnmatchcase(row[0].rsplit('/', 1)[-1], name) for name in names)]
+        rows.sort(key=lambda row: row[0].encode('utf-8', 'surrogateescape'))
+        return rows
+
+    def write_list(self, output, **query):
+        """
+        Write a file list (like all_files.txt) that includes the list file
+        itself when it lives below the root.
+
+        Args:
+            output: List file to write
+            **query: Filters passed to files()
+
+        Returns:
+            int: Number of paths written
+        """
+        rel = None
+        try:
+            rel = self._relative(output)
+        except ValueError:
+            pass
+        output = os.path.join(self.root, output)
+        if rel:
+            open(output, 'a').close()
+            self.update([rel])
+        paths = [row[0] for row in self.files(**query)]
+        with open(output, 'w', encoding='utf-8', errors='surrogateescape') as f:
+            f.write(''.join(path + '\n' for path in paths))
+        if rel:
+            self.update([rel])
+        return len(paths)
+
+
+def main():
+    """
+    Main function for standalone usage.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Keep a manifest of the dump output and list files from it'
+    )
+    parser.add_argument('root', help='Directory the manifest describes')
+    parser.add_argument('command', nargs='?', default='ls', choices=('scan', 'update', 'ls'),
+                        help='scan: walk the whole root; update PATH...: refresh paths; '
+                             'ls: list files (scanning first if needed)')
+    parser.add_argument('paths', nargs='*', help='Paths for update')
+    parser.add_argument('-m', '--manifest', default=None,
+                        help='SQLite manifest file (default: per-root file in the cache dir)')
+    parser.add_argument('--cache-dir', default=None,
+                        help='DumprX cache directory for the default manifest file')
+    parser.add_argument('--hash', action='store_true',
+                        help='Record sha1 values while scanning or updating')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Hashing threads (default: CPU count)')
+    parser.add_argument('--min-size', default=None,
+                        help='ls: only files larger than SIZE (find -size style, e.g. 62M)')
+    parser.add_argument('--name', action='append', default=[],
+                        help='ls: only files whose name matches this glob (repeatable)')
+    parser.add_argument('--under', default=None, help='ls: only files below this directory')
+    parser.add_argument('-o', '--output', default=None,
+                        help='ls: write the list to this file, including itself')
+    parser.add_argument('-0', '--null', action='store_true',
+                        help='ls: separate paths with NUL instead of newline')
+    parser.add_argument('-l', '--long', action='store_true',
+                        help='ls: also print size, octal mode, mtime and sha1')
+
+    args = parser.parse_intermixed_args()
+    if args.command == 'update' and not args.paths:
+        parser.error("update needs a path")
+
+    try:
+        min_size = parse_size(args.min_size) if args.min_size else None
+        manifest_path = args.manifest or default_manifest_path(args.root, args.cache_dir)
+        with Manifest(args.root, manifest_path, args.jobs) as manifest:
+            if args.command == 'scan':
+                count = manifest.scan(args.hash)
+                print(f"[INFO] Indexed {count} file(s) under {manifest.root}", file=sys.stderr)
+                return
+            if args.command == 'update':
+                manifest.update(args.paths, args.hash)
+                return
+            if not manifest.is_current():
+                manifest.scan(args.hash)
+            query = {'min_size': min_size, 'names': args.name, 'under': args.under}
+            if args.output:
+                manifest.write_list(args.output, **query)
+                return
+            end = '\0' if args.null else '\n'
+            out = sys.stdout
+            out.reconfigure(errors='surrogateescape')
+            for path, size, mode, mtime_ns, sha1 in manifest.files(**query):
+                if args.long:
+                    out.write(f"{path}\t{size}\t{mode & 0o7777:o}\t{mtime_ns}\t{sha1 or '-'}{end}")
+                else:
+                    out.write(path + end)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    with tool_stage():
+        main()
@@ -1,66 +1,234 @@
 #!/usr/bin/env python3
 """
 OMC Decoder Module for DumprX
-Decrypts XML files from Samsung optics partition using the OMCDecoder binary
+Decrypts XML files from Samsung optics partition in-process with zlib,
+using the OMCDecoder binary only as an optional fallback
 """
 
 import os
 import sys
+import time
+import mmap
+import zlib
+import shutil
+import tempfile
+import json
 import subprocess
-import glob
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from telemetry import tool_stage
+
+
+# Per-position rotate/XOR tables from OMCDecoder's OMCTextDecoder (include.h);
+# byte i is rotated left by _SHIFTS[i % 256] and XORed with _SALTS[i % 256].
+_SHIFTS = (
+    1, 1, 0, 2, 2, 4, 5, 0, 4, 7, 1, 6, 5, 3, 3, 1,
+    2, 5, 0, 6, 2, 2, 4, 2, 2, 3, 0, 2, 1, 2, 4, 3,
+    4, 0, 0, 0, 3, 5, 3, 1, 6, 5, 6, 1, 1, 1, 0, 0,
+    3, 2, 7, 7, 5, 6, 7, 3, 5, 1, 0, 7, 6, 3, 6, 5,
+    4, 5, 3, 5, 1, 3, 3, 1, 5, 4, 1, 0, 0, 2, 6, 6,
+    6, 6, 4, 0, 1, 1, 0, 5, 5, 4, 2, 4, 6, 1, 7, 1,
+    2, 1, 1, 6, 5, 4, 7, 6, 5, 1, 6, 7, 0, 2, 6, 3,
+    1, 7, 1, 1, 7, 4, 0, 4, 2, 5, 3, 1, 1, 5, 6, 0,
+    3, 5, 3, 6, 5, 7, 2, 5, 6, 6, 2, 2, 3, 6, 0, 4,
+    3, 2, 0, 2, 2, 3, 5, 3, 3, 2, 5, 5, 5, 1, 3, 1,
+    1, 1, 4, 5, 1, 6, 2, 4, 7, 1, 4, 6, 0, 6, 4, 3,
+    2, 6, 1, 6, 3, 2, 1, 6, 7, 3, 2, 1, 1, 5, 6, 7,
+    2, 2, 2, 7, 4, 6, 7, 5, 3, 1, 4, 2, 7, 1, 6, 2,
+    4, 1, 5, 6, 5, 4, 5, 0, 1, 1, 6, 3, 7, 2, 0, 2,
+    5, 0, 1, 3, 3, 2, 6, 7, 7, 2, 5, 6, 0, 4, 1, 2,
+    5, 3, 7, 6, 5, 2, 5, 2, 0, 1, 3, 1, 4, 3, 4, 2,
+)
+
+_SALTS = (
+    0x41, 0xc5, 0x21, 0xde, 0x6b, 0x1c, 0x95, 0x37, 0x4e, 0x11, 0xaf, 0x06, 0xb0, 0x87, 0xdd, 0xe9,
+    0x48, 0x7a, 0xc1, 0xd5, 0x44, 0x77, 0xb2, 0x91, 0xc4, 0x1f, 0x3c, 0x39, 0x5c, 0xa8, 0x9c, 0xbb,
+    0x96, 0x5b, 0x45, 0x5d, 0x6e, 0x17, 0x5d, 0x35, 0xd4, 0xcd, 0x40, 0xb0, 0x2e, 0x02, 0xfc, 0x0c,
+    0xd3, 0x50, 0xd4, 0xdd, 0x91, 0xe4, 0xbe, 0x8c, 0x27, 0x02, 0xe5, 0xd3, 0xcc, 0x7d, 0x27, 0x42,
+    0xa6, 0x3f, 0x97, 0xbd, 0x54, 0xc7, 0xfc, 0xfc, 0x65, 0xa6, 0x51, 0x0a, 0xdf, 0x01, 0x43, 0xc7,
+    0xb9, 0x12, 0xb6, 0x66, 0x60, 0xa7, 0x40, 0xef, 0x36, 0xa2, 0xac, 0xbe, 0x0e, 0x77, 0x79, 0x02,
+    0xb2, 0xb1, 0x59, 0x3f, 0x5d, 0x6d, 0xb2, 0xcd, 0x42, 0xdc, 0x20, 0x56, 0x03, 0xc6, 0xf1, 0x5c,
+    0x3a, 0x02, 0xa7, 0xb0, 0xf3, 0xff, 0x7a, 0xfc, 0x30, 0x3f, 0xd4, 0x3b, 0x64, 0xd6, 0xd3, 0x3b,
+    0xf9, 0xef, 0xca, 0x22, 0xca, 0x47, 0xc0, 0xe6, 0xa9, 0xb0, 0xef, 0xd4, 0xda, 0x90, 0x46, 0x0a,
+    0x96, 0x5f, 0xe8, 0xfc, 0x8a, 0x2d, 0xab, 0xf3, 0x55, 0x19, 0x9a, 0x89, 0x0d, 0xdb, 0x74, 0x2e,
+    0xbb, 0x3b, 0x2a, 0xa6, 0xda, 0x97, 0x65, 0x89, 0xdc, 0x61, 0xfd, 0xc2, 0xa5, 0x9f, 0x83, 0x11,
+    0x0e, 0x6a, 0xb8, 0x89, 0x63, 0x6f, 0x14, 0x12, 0xe5, 0x71, 0x40, 0xe8, 0x4a, 0xc4, 0x9c, 0x1a,
+    0x38, 0xd4, 0xba, 0x0c, 0xcd, 0x9c, 0xe0, 0xf5, 0x1a, 0x30, 0x8b, 0x62, 0xa3, 0x33, 0xe7, 0xb1,
+    0xe1, 0x61, 0x57, 0x97, 0xc0, 0x07, 0xf3, 0x9b, 0x21, 0x86, 0x05, 0x98, 0x59, 0xd4, 0x8b, 0x3f,
+    0xb0, 0xfa, 0xb9, 0x92, 0xe3, 0x97, 0x74, 0x6b, 0xa3, 0x5b, 0xd7, 0xf3, 0x14, 0x8d, 0xb2, 0x2b,
+    0x4f, 0x86, 0x06, 0x66, 0xe0, 0x34, 0x8a, 0xcd, 0x48, 0x98, 0x29, 0xda, 0x7c, 0x48, 0x82, 0xdd,
+)
+
+# zlib window bits accepting both gzip and zlib headers, as gzip-hpp does
+_ZLIB_AUTO_HEADER = 32 + zlib.MAX_WBITS
+
+_decode_tables = None
+_encode_tables = None
+
+
+def _rotl(value, shift):
+    return ((value << shift) | (value >> (8 - shift))) & 0xFF
+
+
+def _build_tables():
+    global _decode_tables, _encode_tables
+    decode, encode = [], []
+    for i in range(256):
+        shift, salt = _SHIFTS[i], _SALTS[i]
+        decode.append(bytes(_rotl(b, shift) ^ salt for b in range(256)))
+        encode.append(bytes(_rotl(b ^ salt, (8 - shift) % 8) for b in range(256)))
+    _decode_tables, _encode_tables = decode, encode
+
+
+def _transform(data, tables):
+    # Every 256th byte shares a table, so each residue class is a single
+    # C-level translate over a strided slice.
+    buf = bytearray(data)
+    for i in range(min(256, len(buf))):
+        buf[i::256] = buf[i::256].translate(tables[i])
+    return buf
+
+
+def decode_bytes(data):
+    """
+    Decode an OMC-encrypted buffer.
+
+    Args:
+        data: Encrypted bytes (bytes, bytearray, memoryview or mmap)
+
+    Returns:
+        bytes: Decompressed plain XML
+
+    Raises:
+        zlib.error: If the descrambled payload is not valid gzip/zlib data
+    """
+    if _decode_tables is None:
+        _build_tables()
+    return zlib.decompress(bytes(_transform(data, _decode_tables)), _ZLIB_AUTO_HEADER)
+
+
+def is_encoded(head):
+    """
+    Check whether leading bytes look like an OMC-scrambled file.
+
+    Descrambles the first two bytes and looks for a gzip or zlib header,
+    so plain or already decoded XML is rejected without decompressing.
+
+    Args:
+        head: At least the first two bytes of a file
+
+    Returns:
+        bool: True if the file should be decoded
+    """
+    if len(head) < 2:
+        return False
+    b0 = _rotl(head[0], _SHIFTS[0]) ^ _SALTS[0]
+    b1 = _rotl(head[1], _SHIFTS[1]) ^ _SALTS[1]
+    if b0 == 0x1F and b1 == 0x8B:
+        return True
+    return (b0 & 0x0F) == 8 and ((b0 << 8) | b1) % 31 == 0
+
+
+def encode_bytes(data):
+    """
+    Encode plain XML the way Samsung stores it (gzip, then scramble).
+
+    Args:
+        data: Plain bytes
+
+    Returns:
+        bytes: Encrypted bytes
+    """
+    if _encode_tables is None:
+        _build_tables()
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    packed = compressor.compress(data) + compressor.flush()
+    return bytes(_transform(packed, _encode_tables))
+
+
+def _temp_path(path):
+    """Create an empty temporary file next to path and return its name"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.omc-', suffix='.tmp')
+    os.close(fd)
+    return tmp_path
+
+
+def _write_atomic(path, data, mode=None):
+    """Write data to path through a temporary file and rename"""
+    tmp_path = _temp_path(path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+# Decode every (infile, outfile) pair handed to one shell and report the
+# exit status of each as "<status>\t<infile>\0". The binary takes a single
+# file, so it still runs once per file; the shell saves Python a spawn and
+# a result round trip for each of them.
+_BATCH_SCRIPT = (
+    'bin=$0\n'
+    'while [ "$#" -gt 1 ]; do\n'
+    '  "$bin" -d "$1" "$2" >/dev/null 2>&1\n'
+    '  printf \'%s\\t%s\\0\' "$?" "$1"\n'
+    '  shift 2\n'
+    'done\n'
+)
 
 
 class OMCDecoder:
     """
     Handler for Samsung OMC (OEM Multi-CSC) XML file decryption.
-    Uses the omcdecoder binary to decrypt XML files from the optics partition.
+    Decrypts XML files from the optics partition in-process; the omcdecoder
+    binary is used only when requested or as a fallback.
     """
     
-    def __init__(self, binary_path=None, logger=None):
+    def __init__(self, binary_path=None, logger=None, use_binary=False):
         """
         Initialize the OMCDecoder.
         
         Args:
             binary_path: Path to the omcdecoder binary (optional)
             logger: Logger instance for logging (optional)
+            use_binary: If True, always decode through the binary
         """
         self.logger = logger
+        self.use_binary = use_binary
+        self.last_report = None
+        self.omcdecoder_bin = self._find_binary(binary_path)
         
-        # Determine binary path
-        if binary_path and os.path.exists(binary_path):
-            self.omcdecoder_bin = binary_path
-        else:
-            # Try to find the binary in common locations
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            possible_paths = [
-                os.path.join(script_dir, 'bin', 'omcdecoder'),
-                os.path.join(script_dir, 'OMCDecoder', 'omcdecoder'),
-                'omcdecoder'  # Try PATH
-            ]
-            
-            self.omcdecoder_bin = None
-            for path in possible_paths:
-                if os.path.exists(path) and os.access(path, os.X_OK):
-                    self.omcdecoder_bin = path
-                    break
-            
-            if not self.omcdecoder_bin:
-                # Try which command
-                try:
-                    result = subprocess.run(['which', 'omcdecoder'], 
-                                         capture_output=True, text=True, check=False)
-                    if result.returncode == 0 and result.stdout.strip():
-                        self.omcdecoder_bin = result.stdout.strip()
-                except Exception as e:
-                    # Could not locate omcdecoder in PATH, will fall through to error below
-                    self._log_debug(f"Exception occurred while running 'which omcdecoder': {e}")
-        
-        if not self.omcdecoder_bin:
+        if use_binary and not self.omcdecoder_bin:
             raise FileNotFoundError(
                 "omcdecoder binary not found. Please ensure it is built and available."
             )
         
-        self._log_info(f"OMCDecoder initialized with binary: {self.omcdecoder_bin}")
+        if use_binary:
+            self._log_info(f"OMCDecoder initialized with binary: {self.omcdecoder_bin}")
+        else:
+            fallback = self.omcdecoder_bin or 'none'
+            self._log_info(f"OMCDecoder initialized with native decoder (binary fallback: {fallback})")
+    
+    @staticmethod
+    def _find_binary(binary_path=None):
+        """Locate the optional omcdecoder binary without spawning processes"""
+        if binary_path and os.path.exists(binary_path):
+            return binary_path
+        
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        for path in (os.path.join(script_dir, 'bin', 'omcdecoder'),
+                     os.path.join(script_dir, 'OMCDecoder', 'omcdecoder')):
+            if os.path.exists(path) and os.access(path, os.X_OK):
+                return path
+        return shutil.which('omcdecoder')
     
     def _log_info(self, message):
         """Log info message"""
@@ -88,6 +256,63 @@ class OMCDecoder:
         if self.logger:
             self.logger.debug(message)
     
+    @staticmethod
+    def _output_path(input_file, output_file=None, in_place=False):
+        """Resolve the output path for a decoded file"""
+        if in_place:
+            return input_file
+        if output_file:
+            return output_file
+        base = os.path.splitext(input_file)[0]
+        return f"{base}_decrypted.xml"
+
+    @staticmethod
+    def _decode_native(input_file, output_file):
+        """
+        Decode one file in-process; the input is mmapped and the output
+        replaced atomically.
+        """
+        with open(input_file, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if st.st_size == 0:
+                raise zlib.error("empty input")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                plain = decode_bytes(data)
+        mode = st.st_mode & 0o7777 if output_file == input_file else None
+        _write_atomic(output_file, plain, mode)
+    
+    @staticmethod
+    def _commit_output(tmp_path, input_file, output_file, success):
+        """Move a binary-decoded temp file into place, or discard it"""
+        if not success:
+            os.unlink(tmp_path)
+            return
+        if output_file == input_file:
+            shutil.copymode(input_file, tmp_path)
+        os.replace(tmp_path, output_file)
+    
+    def _decode_binary(self, input_file, output_file):
+        """
+        Decode one file through the omcdecoder binary. The binary truncates
+        its output before decoding, so it always writes to a temp file.
+        """
+        tmp_path = _temp_path(output_file)
+        cmd = [self.omcdecoder_bin, '-d', input_file, tmp_path]
+        
+        self._log_debug(f"Running: {' '.join(cmd)}")
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, check=False)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        self._commit_output(tmp_path, input_file, output_file, result.returncode == 0)
+        if result.returncode != 0:
+            self._log_error(f"Failed to decode {input_file}")
+            if result.stderr:
+                self._log_error(f"Error: {result.stderr}")
+            return False
+        return True
+    
     def decode_file(self, input_file, output_file=None, in_place=False):
         """
         Decode a single OMC XML file.
@@ -104,106 +329,338 @@ class OMCDecoder:
             self._log_error(f"Input file not found: {input_file}")
             return False
         
+        target = self._output_path(input_file, output_file, in_place)
         try:
-            cmd = [self.omcdecoder_bin, '-d']
-            
-            if in_place:
-                cmd.extend(['-i', input_file])
+            if self.use_binary:
+                success = self._decode_binary(input_file, target)
             else:
-                if not output_file:
-                    # Generate output filename
-                    base = os.path.splitext(input_file)[0]
-                    output_file = f"{base}_decrypted.xml"
-                cmd.extend([input_file, output_file])
-            
-            self._log_debug(f"Running: {' '.join(cmd)}")
-            
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=False
-            )
+                try:
+                    self._decode_native(input_file, target)
+                    success = True
+                except (zlib.error, ValueError) as e:
+                    if not self.omcdecoder_bin:
+                        self._log_error(f"Failed to decode {input_file}: {e}")
+                        return False
+                    self._log_debug(f"Native decode failed for {input_file} ({e}), trying binary")
+                    success = self._decode_binary(input_file, target)
             
-            if result.returncode == 0:
-                target = input_file if in_place else output_file
+            if success:
                 self._log_info(f"Successfully decoded: {input_file} -> {target}")
-                return True
-            else:
-                self._log_error(f"Failed to decode {input_file}")
-                if result.stderr:
-                    self._log_error(f"Error: {result.stderr}")
-                return False
-                
+            return success
         except Exception as e:
             self._log_error(f"Exception while decoding {input_file}: {str(e)}")
             return False
     
-    def find_xml_files(self, directory):
+    def _scan_xml(self, directory, recursive=True):
         """
-        Find all XML files in a directory recursively.
+        Walk a directory once and collect XML files with their stat results.
+
+        Returns:
+            list: Sorted (path, os.stat_result) tuples
+        """
+        found = []
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if recursive:
+                                    pending.append(entry.path)
+                            elif entry.name.lower().endswith('.xml') and entry.is_file():
+                                found.append((entry.path, entry.stat()))
+                        except OSError:
+                            continue
+            except OSError as e:
+                self._log_warn(f"Cannot read directory {current}: {e}")
+        found.sort(key=lambda item: item[0])
+        return found
+    
+    def find_xml_files(self, directory, recursive=True):
+        """
+        Find all XML files (any case of .xml) in a directory.
         
         Args:
             directory: Directory to search
+            recursive: If True, search subdirectories too
             
         Returns:
             list: List of XML file paths
         """
-        xml_files = []
-        
         if not os.path.exists(directory):
             self._log_warn(f"Directory not found: {directory}")
-            return xml_files
-        
-        # Search for XML files
-        for pattern in ['**/*.xml', '**/*.XML']:
-            xml_files.extend(glob.glob(
-                os.path.join(directory, pattern),
-                recursive=True
-            ))
-        
-        # Remove duplicates and sort
-        xml_files = sorted(list(set(xml_files)))
+            return []
         
+        xml_files = [path for path, _st in self._scan_xml(directory, recursive)]
         self._log_info(f"Found {len(xml_files)} XML file(s) in {directory}")
         return xml_files
     
-    def decode_directory(self, directory, in_place=True, recursive=True):
+    @staticmethod
+    def _load_state(state_file):
+        """Load the decoded-file state: {abspath: [size, mtime_ns]}"""
+        if not state_file:
+            return {}
+        try:
+            with open(state_file) as f:
+                data = json.load(f)
+            return data.get('files', {}) if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_state(self, state_file, files):
+        """Persist the decoded-file state atomically"""
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(state_file)), exist_ok=True)
+            _write_atomic(state_file, json.dumps({'version': 1, 'files': files}).encode())
+        except OSError as e:
+            self._log_warn(f"Could not save state file {state_file}: {e}")
+    
+    @staticmethod
+    def _needs_decode(path):
+        """Read the leading bytes of a file and check if it is still scrambled"""
+        try:
+            with open(path, 'rb') as f:
+                return is_encoded(f.read(2))
+        except OSError:
+            return True  # let the decoder report the error
+    
+    def _binary_fallback(self, batch_results, in_place):
+        """
+        Hand the files of a natively decoded batch that failed to the
+        binary, if there is one.
+
+        Args:
+            batch_results: Per-file result dicts from _native_batch()
+            in_place: If True, overwrite the input files
+
+        Returns:
+            list: Per-file result dicts
+        """
+        retry = [entry['file'] for entry in batch_results if not entry['success']]
+        if not retry or not self.omcdecoder_bin:
+            return batch_results
+        results = {entry['file']: entry for entry in batch_results}
+        for entry in self._run_binary_batch(retry, in_place):
+            entry['seconds'] += results[entry['file']]['seconds']
+            if not entry['success']:
+                entry['error'] = f"{results[entry['file']]['error']}; binary: {entry['error']}"
+            results[entry['file']] = entry
+        return [results[entry['file']] for entry in batch_results]
+
+    def _process_pool(self, workers):
+        """Process pool for the native decoder, threads if processes are unavailable"""
+        if workers > 1:
+            try:
+                return ProcessPoolExecutor(max_workers=workers,
+                                           mp_context=multiprocessing.get_context('fork'))
+            except (OSError, ImportError, ValueError) as e:
+                # No working semaphores (e.g. without /dev/shm)
+                self._log_warn(f"process pool unavailable ({e}), using threads")
+        return ThreadPoolExecutor(max_workers=workers)
+
+    def _run_binary_batch(self, batch, in_place):
+        """
+        Decode a batch of files with the binary. It takes one file per
+        run, so a single shell runs it once per file.
+
+        Args:
+            batch: List of input file paths
+            in_place: If True, overwrite the input files
+
+        Returns:
+            list: Per-file result dicts
+        """
+        args = []
+        temps = {}
+        for input_file in batch:
+            temps[input_file] = _temp_path(self._output_path(input_file, in_place=in_place))
+            args.extend([input_file, temps[input_file]])
+
+        start = time.monotonic()
+        try:
+            result = subprocess.run(
+                ['sh', '-c', _BATCH_SCRIPT, self.omcdecoder_bin] + args,
+                capture_output=True,
+                check=False
+            )
+        except Exception as e:
+            for tmp_path in temps.values():
+                os.unlink(tmp_path)
+            return [{'file': f, 'success': False, 'error': str(e)} for f in batch]
+        elapsed = time.monotonic() - start
+
+        status = {}
+        for record in result.stdout.split(b'\0'):
+            if b'\t' not in record:
+                continue
+            code, path = record.split(b'\t', 1)
+            status[os.fsdecode(path)] = int(code)
+
+        results = []
+        for input_file in batch:
+            code = status.get(input_file)
+            entry = {
+                'file': input_file,
+                'success': code == 0,
+                'seconds': elapsed / len(batch),
+            }
+            if code is None:
+                entry['error'] = 'not processed'
+            elif code != 0:
+                entry['error'] = f'exit status {code}'
+            self._commit_output(temps[input_file], input_file,
+                                self._output_path(input_file, in_place=in_place),
+                                entry['success'])
+            results.append(entry)
+        return results
+
+    def decode_batch(self, xml_files, in_place=True, jobs=None, batch_size=64):
+        """
+        Decode many XML files using a bounded pool of batched decoder runs.
+
+        Files are split into batches and up to ``jobs`` batches run
+        concurrently. The native decoder holds the GIL, so its batches
+        run in worker processes. The binary decodes one file per run; a
+        batch for it (forced, or for files the native decoder rejected)
+        is one shell running it once per file, and those run on threads.
+
+        Args:
+            xml_files: List of XML file paths
+            in_place: If True, overwrite original files with decoded versions
+            jobs: Number of concurrent batches (default: CPU count)
+            batch_size: Maximum number of files per batch
+
+        Returns:
+            dict: {'results': [per-file dicts], 'summary': timing summary}
+        """
+        jobs = max(1, jobs or os.cpu_count() or 1)
+        start = time.monotonic()
+
+        missing = [f for f in xml_files if not os.path.exists(f)]
+        present = [f for f in xml_files if os.path.exists(f)]
+        for f in missing:
+            self._log_error(f"Input file not found: {f}")
+
+        # Aim for a few batches per worker so a slow batch doesn't stall the pool
+        per_batch = max(1, min(batch_size, -(-len(present) // (jobs * 4)))) if present else 1
+        batches = [present[i:i + per_batch] for i in range(0, len(present), per_batch)]
+
+        results = [{'file': f, 'success': False, 'error': 'not found'} for f in missing]
+        if batches:
+            workers = min(jobs, len(batches))
+            if self.use_binary:
+                pool = ThreadPoolExecutor(max_workers=workers)
+                run = partial(self._run_binary_batch, in_place=in_place)
+            else:
+                pool = self._process_pool(workers)
+                run = partial(_native_batch, in_place=in_place)
+            with pool:
+                for batch_results in pool.map(run, batches):
+                    if not self.use_binary:
+                        batch_results = self._binary_fallback(batch_results, in_place)
+                    for entry in batch_results:
+                        if entry['success']:
+                            self._log_debug(f"Decoded: {entry['file']}")
+                        else:
+                            self._log_error(f"Failed to decode {entry['file']}: {entry['error']}")
+                    results.extend(batch_results)
+
+        elapsed = time.monotonic() - start
+        decoded = sum(1 for r in results if r['success'])
+        summary = {
+            'total': len(xml_files),
+            'decoded': decoded,
+            'failed': len(xml_files) - decoded,
+            'batches': len(batches),
+            'jobs': jobs,
+            'seconds': round(elapsed, 3),
+            'files_per_second': round(len(xml_files) / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+        return {'results': results, 'summary': summary}
+
+    def decode_directory(self, directory, in_place=True, recursive=True, jobs=None,
+                         batch_size=64, state_file=None):
         """
         Decode all XML files in a directory.
         
+        Files that are not scrambled (plain or already decoded XML) are
+        skipped. With a state file, in-place runs also remember decoded
+        files by path, size and mtime and skip them without opening.
+        
         Args:
             directory: Directory containing XML files
             in_place: If True, overwrite original files with decoded versions
             recursive: If True, search recursively
+            jobs: Number of concurrent batches (default: CPU count)
+            batch_size: Maximum number of files per batch
+            state_file: JSON file remembering decoded files (optional)
             
         Returns:
-            tuple: (success_count, total_count)
+            tuple: (success_count, total_count); skipped files count as successes
         """
-        xml_files = self.find_xml_files(directory)
+        if not os.path.exists(directory):
+            self._log_warn(f"Directory not found: {directory}")
+            return (0, 0)
         
-        if not xml_files:
+        entries = self._scan_xml(directory, recursive)
+        self._log_info(f"Found {len(entries)} XML file(s) in {directory}")
+        
+        if not entries:
             self._log_warn(f"No XML files found in {directory}")
             return (0, 0)
         
-        success_count = 0
-        total_count = len(xml_files)
+        total_count = len(entries)
+        use_state = bool(state_file) and in_place
+        known = self._load_state(state_file) if use_state else {}
+        state = {}
+        pending = []
+        skipped = []
+        for path, st in entries:
+            key = os.path.abspath(path)
+            signature = [st.st_size, st.st_mtime_ns]
+            if known.get(key) == signature or not self._needs_decode(path):
+                skipped.append({'file': path, 'success': True, 'skipped': True})
+                state[key] = signature
+            else:
+                pending.append(path)
+        
+        self._log_info(f"Decoding {len(pending)} XML file(s), "
+                       f"{len(skipped)} already plain...")
         
-        self._log_info(f"Decoding {total_count} XML file(s)...")
+        report = self.decode_batch(pending, in_place=in_place, jobs=jobs,
+                                   batch_size=batch_size)
+        report['results'] = skipped + report['results']
+        summary = report['summary']
+        summary['skipped'] = len(skipped)
+        summary['total'] = total_count
+        self.last_report = report
         
-        for xml_file in xml_files:
-            if self.decode_file(xml_file, in_place=in_place):
-                success_count += 1
+        if use_state:
+            for entry in report['results']:
+                if entry['success'] and not entry.get('skipped'):
+                    try:
+                        st = os.stat(entry['file'])
+                    except OSError:
+                        continue
+                    state[os.path.abspath(entry['file'])] = [st.st_size, st.st_mtime_ns]
+            self._save_state(state_file, state)
         
-        self._log_info(f"Decoded {success_count}/{total_count} XML file(s)")
-        return (success_count, total_count)
+        self._log_info(
+            f"Decoded {summary['decoded']}/{len(pending)} XML file(s), skipped "
+            f"{summary['skipped']} in {summary['seconds']}s "
+            f"({summary['batches']} batch(es), {summary['jobs']} job(s))"
+        )
+        return (summary['decoded'] + summary['skipped'], total_count)
     
-    def process_optics_partition(self, optics_dir):
+    def process_optics_partition(self, optics_dir, state_file=None):
         """
         Process the optics partition to decode all XML files.
         
         Args:
             optics_dir: Path to extracted optics partition directory
+            state_file: JSON file remembering decoded files (optional)
             
         Returns:
             bool: True if processing was successful, False otherwise
@@ -219,7 +676,8 @@ class OMCDecoder:
         self._log_info(f"Processing optics partition: {optics_dir}")
         
         # Decode all XML files in the optics directory
-        success, total = self.decode_directory(optics_dir, in_place=True)
+        success, total = self.decode_directory(optics_dir, in_place=True,
+                                               state_file=state_file)
         
         if total == 0:
             self._log_warn("No XML files found in optics partition")
@@ -233,6 +691,31 @@ class OMCDecoder:
         return True
 
 
+def _native_batch(batch, in_place):
+    """
+    Decode a batch of files in-process (a process pool work item).
+
+    Args:
+        batch: List of input file paths
+        in_place: If True, overwrite the input files
+
+    Returns:
+        list: Per-file result dicts
+    """
+    results = []
+    for input_file in batch:
+        start = time.monotonic()
+        entry = {'file': input_file, 'success': True}
+        try:
+            OMCDecoder._decode_native(input_file,
+                                      OMCDecoder._output_path(input_file, in_place=in_place))
+        except (zlib.error, ValueError, OSError) as e:
+            entry = {'file': input_file, 'success': False, 'error': str(e)}
+        entry['seconds'] = time.monotonic() - start
+        results.append(entry)
+    return results
+
+
 def main():
     """
     Main function for standalone usage.
@@ -258,7 +741,32 @@ def main():
     )
     parser.add_argument(
         '-b', '--binary',
-        help='Path to omcdecoder binary'
+        help='Path to omcdecoder binary (optional fallback)'
+    )
+    parser.add_argument(
+        '--use-binary',
+        action='store_true',
+        help='Decode through the omcdecoder binary instead of in-process'
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=None,
+        help='Concurrent decoder batches for directories (default: CPU count)'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=64,
+        help='Maximum files per batch (default: 64)'
+    )
+    parser.add_argument(
+        '--state',
+        help='State file remembering decoded files between in-place runs'
+    )
+    parser.add_argument(
+        '--report',
+        help='Write per-file results and timing summary as JSON to this file'
     )
     parser.add_argument(
         '-v', '--verbose',
@@ -269,7 +777,7 @@ def main():
     args = parser.parse_args()
     
     try:
-        decoder = OMCDecoder(binary_path=args.binary)
+        decoder = OMCDecoder(binary_path=args.binary, use_binary=args.use_binary)
         
         if os.path.isfile(args.input):
             # Single file
@@ -283,8 +791,15 @@ def main():
             # Directory
             success, total = decoder.decode_directory(
                 args.input,
-                in_place=args.in_place
+                in_place=args.in_place,
+                jobs=args.jobs,
+                batch_size=args.batch_size,
+                state_file=args.state
             )
+            if args.report and decoder.last_report:
+                import json
+                with open(args.report, 'w') as f:
+                    json.dump(decoder.last_report, f, indent=2)
             sys.exit(0 if success > 0 else 1)
         else:
             print(f"Error: {args.input} is neither a file nor a directory", file=sys.stderr)
@@ -296,4 +811,5 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    with tool_stage():
+        main()
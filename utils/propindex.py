@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Prop Index Module for DumprX
+Reads every build*.prop of a dump (or of partition images, without
+extracting them) in one pass and resolves the device metadata from a
+declarative fallback table
+"""
+
+import os
+import sys
+import json
+import stat
+import shlex
+import fnmatch
+from collections import namedtuple
+
+from telemetry import tool_stage
+
+
+# Where the props live, relative to the dump root
+SYSTEM = ('system/build*.prop', 'system/system/build*.prop')
+VENDOR = ('vendor/build*.prop',)
+SYSTEM_VENDOR = SYSTEM + VENDOR
+VENDOR_SYSTEM = VENDOR + SYSTEM
+EUCLID = ('vendor/euclid/*/build.prop',)
+EUCLID_PRODUCT = ('vendor/euclid/product/build*.prop',)
+EUCLID_MY_PRODUCT = ('system/system/euclid/my_product/build*.prop',)
+ODM = ('vendor/odm/etc/build*.prop',)
+MY_PRODUCT = ('my_product/build*.prop',)
+OPLUS_PRODUCT = ('oppo_product/build*.prop', 'my_product/build*.prop')
+OTA = ('vendor/euclid/product/build.prop', 'oppo_product/build.prop')
+
+Step = namedtuple('Step', 'key sources transform when replace')
+
+
+def _prop(key, sources, transform=None, when=None, replace=()):
+    """First value of key in sources, in source order"""
+    return Step(key, sources, transform, when, replace)
+
+
+def _derived(compute, when=None):
+    """Value computed from the fields resolved so far"""
+    return Step(None, (), compute, when, ())
+
+
+def _cut(value, delimiter, field):
+    """cut -d<delimiter> -f<field>, including its no-delimiter behaviour"""
+    if delimiter not in value:
+        return value
+    parts = value.split(delimiter)
+    return parts[field - 1] if len(parts) >= field else ''
+
+
+def _dashed(value):
+    return value.replace(' ', '-')
+
+
+# Each field takes the first non-empty step, in order. A field may appear
+# more than once: later entries continue its chain after other fields
+# have been resolved.
+FIELDS = (
+    ('flavor', (
+        _prop('ro.build.flavor', SYSTEM_VENDOR),
+        _prop('ro.vendor.build.flavor', VENDOR),
+        _prop('ro.system.build.flavor', SYSTEM),
+        _prop('ro.build.type', SYSTEM),
+    )),
+    ('release', (
+        _prop('ro.build.version.release', SYSTEM_VENDOR),
+        _prop('ro.vendor.build.version.release', VENDOR),
+        _prop('ro.system.build.version.release', SYSTEM),
+    )),
+    ('id', (
+        _prop('ro.build.id', SYSTEM_VENDOR),
+        _prop('ro.vendor.build.id', VENDOR),
+        _prop('ro.system.build.id', SYSTEM),
+    )),
+    ('tags', (
+        _prop('ro.build.tags', SYSTEM_VENDOR),
+        _prop('ro.vendor.build.tags', VENDOR),
+        _prop('ro.system.build.tags', SYSTEM),
+    )),
+    ('platform', (
+        _prop('ro.board.platform', SYSTEM_VENDOR),
+        _prop('ro.vendor.board.platform', VENDOR),
+        _prop('ro.system.board.platform', SYSTEM),
+    )),
+    ('manufacturer', (
+        _prop('ro.product.manufacturer', SYSTEM_VENDOR),
+        _prop('ro.product.brand.sub', EUCLID_MY_PRODUCT),
+        _prop('ro.vendor.product.manufacturer', VENDOR),
+        _prop('ro.product.vendor.manufacturer', VENDOR),
+        _prop('ro.system.product.manufacturer', SYSTEM),
+        _prop('ro.product.system.manufacturer', SYSTEM),
+        _prop('ro.product.odm.manufacturer', ODM),
+        _prop('ro.product.manufacturer', OPLUS_PRODUCT + ('product/build*.prop',)),
+        _prop('ro.product.manufacturer', EUCLID),
+        _prop('ro.system.product.manufacturer', EUCLID),
+        _prop('ro.product.product.manufacturer', EUCLID_PRODUCT),
+    )),
+    ('fingerprint', (
+        _prop('ro.build.fingerprint', SYSTEM),
+        _prop('ro.vendor.build.fingerprint', VENDOR),
+        _prop('ro.system.build.fingerprint', SYSTEM),
+        _prop('ro.product.build.fingerprint', ('product/build*.prop',)),
+        _prop('ro.build.fingerprint', OPLUS_PRODUCT),
+        _prop('ro.system.build.fingerprint', ('my_product/build.prop',)),
+        _prop('ro.vendor.build.fingerprint', ('my_product/build.prop',)),
+        _prop('ro.bootimage.build.fingerprint', ('vendor/build.prop',)),
+    )),
+    ('brand', (
+        _prop('ro.product.brand', SYSTEM_VENDOR),
+        _prop('ro.product.brand.sub', EUCLID_MY_PRODUCT),
+        _prop('ro.product.vendor.brand', VENDOR),
+        _prop('ro.vendor.product.brand', VENDOR),
+        _prop('ro.product.system.brand', SYSTEM),
+        # Euclid firmwares report the parent brand; prefer the sub-brand
+        _prop('ro.product.system.brand', EUCLID, replace=('OPPO',)),
+        _prop('ro.product.product.brand', EUCLID_PRODUCT),
+        _prop('ro.product.odm.brand', ODM),
+        _prop('ro.product.brand', OPLUS_PRODUCT),
+        _prop('ro.product.brand', EUCLID),
+        _derived(lambda f: _cut(f['fingerprint'], '/', 1)),
+    )),
+    ('codename', (
+        _prop('ro.product.device', VENDOR_SYSTEM),
+        _prop('ro.vendor.product.device.oem', ('vendor/euclid/odm/build.prop',)),
+        _prop('ro.product.vendor.device', VENDOR),
+        _prop('ro.vendor.product.device', VENDOR),
+        _prop('ro.product.system.device', SYSTEM),
+        _prop('ro.product.system.device', EUCLID),
+        _prop('ro.product.product.device', EUCLID),
+        _prop('ro.product.product.model', EUCLID),
+        _prop('ro.product.device', OPLUS_PRODUCT),
+        _prop('ro.product.product.device', ('oppo_product/build*.prop',)),
+        _prop('ro.product.system.device', MY_PRODUCT),
+        _prop('ro.product.vendor.device', MY_PRODUCT),
+        _derived(lambda f: _cut(_cut(f['fingerprint'], '/', 3), ':', 1)),
+        _prop('ro.build.fota.version', SYSTEM, transform=lambda v: _cut(v, '-', 1)),
+        _prop('ro.build.product', VENDOR_SYSTEM),
+    )),
+    ('description', (
+        _prop('ro.build.description', SYSTEM_VENDOR),
+        _prop('ro.vendor.build.description', VENDOR),
+        _prop('ro.system.build.description', SYSTEM),
+        _prop('ro.product.build.description', ('product/build.prop', 'product/build*.prop')),
+    )),
+    ('incremental', (
+        _prop('ro.build.version.incremental', SYSTEM_VENDOR),
+        _prop('ro.vendor.build.version.incremental', VENDOR),
+        _prop('ro.system.build.version.incremental', SYSTEM),
+        _prop('ro.build.version.incremental', MY_PRODUCT),
+        _prop('ro.system.build.version.incremental', MY_PRODUCT),
+        _prop('ro.vendor.build.version.incremental', MY_PRODUCT),
+        # Realme firmwares may carry neither incremental nor fingerprint
+        _prop('ro.build.version.ota', OTA, transform=lambda v: '_'.join(v.split('_')[-2:]),
+              when=lambda f: 'realme' in f['brand']),
+        _derived(lambda f: _cut(f['description'], ' ', 4)),
+    )),
+    ('description', (
+        _derived(lambda f: f"{f['flavor']} {f['release']} {f['id']} {f['incremental']} {f['tags']}",
+                 when=lambda f: f['incremental']),
+        _derived(lambda f: f['codename']),
+    )),
+    ('abilist', (
+        _prop('ro.product.cpu.abilist', SYSTEM),
+        _prop('ro.vendor.product.cpu.abilist', VENDOR),
+    )),
+    ('locale', (
+        _prop('ro.product.locale', SYSTEM),
+        _derived(lambda f: 'undefined'),
+    )),
+    ('density', (
+        _prop('ro.sf.lcd_density', SYSTEM),
+        _derived(lambda f: 'undefined'),
+    )),
+    ('is_ab', (
+        _prop('ro.build.ab_update', SYSTEM_VENDOR),
+        _derived(lambda f: 'false'),
+    )),
+    ('treble_support', (
+        _prop('ro.treble.enabled', SYSTEM),
+        _derived(lambda f: 'false'),
+    )),
+    ('otaver', (
+        _prop('ro.build.version.ota', EUCLID_PRODUCT + ('oppo_product/build*.prop',) + SYSTEM),
+    )),
+    ('branch', (
+        _derived(lambda f: _dashed(f['otaver']), when=lambda f: not f['fingerprint']),
+    )),
+    ('otaver', (
+        _prop('ro.build.fota.version', SYSTEM),
+    )),
+    ('branch', (
+        _derived(lambda f: _dashed(f['description'])),
+    )),
+)
+
+# Partitions whose top-level build*.prop means the dump has metadata at all
+PRIMARY = SYSTEM_VENDOR + ('*product/build*.prop',)
+
+PATTERNS = tuple(dict.fromkeys(
+    pattern for _name, steps in FIELDS for step in steps for pattern in step.sources
+)) + PRIMARY
+
+
+def _match(parts, pattern):
+    """Component-wise glob match, so * never crosses a directory"""
+    pattern_parts = pattern.split('/')
+    return len(parts) == len(pattern_parts) and all(
+        fnmatch.fnmatchcase(part, pat) for part, pat in zip(parts, pattern_parts)
+    )
+
+
+def _wanted_dir(parts):
+    """Whether some pattern can match below this directory"""
+    depth = len(parts)
+    for pattern in PATTERNS:
+        pattern_parts = pattern.split('/')
+        if len(pattern_parts) > depth and _match(parts, '/'.join(pattern_parts[:depth])):
+            return True
+    return False
+
+
+def _wanted_file(parts):
+    return any(_match(parts, pattern) for pattern in PATTERNS)
+
+
+def parse_props(data):
+    """
+    Parse a build.prop.
+
+    Args:
+        data: File content (bytes)
+
+    Returns:
+        dict: key -> value of the first occurrence of each key
+    """
+    props = {}
+    for line in data.decode('utf-8', errors='replace').splitlines():
+        if not line or line.startswith('#'):
+            continue
+        key, sep, value = line.partition('=')
+        if sep:
+            props.setdefault(key, value)
+    return props
+
+
+class PropIndex:
+    """
+    All build*.prop files of a dump, parsed once and keyed by their path
+    relative to the dump root.
+    """
+
+    def __init__(self, logger=None):
+        """
+        Create an empty index; fill it with scan() or scan_image().
+
+        Args:
+            logger: Logger instance for logging (optional)
+        """
+        self.logger = logger
+        self.files = {}
+
+    def _log_warn(self, message):
+        if self.logger:
+            self.logger.warning(message)
+        else:
+            print(f"[WARN] {message}", file=sys.stderr)
+
+    def scan(self, root):
+        """
+        Index the prop files of an extracted dump in one directory walk,
+        descending only into directories a source pattern can reach.
+
+        Args:
+            root: Dump directory
+        """
+        stack = [()]
+        while stack:
+            parts = stack.pop()
+            try:
+                with os.scandir(os.path.join(root, *parts)) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            for entry in entries:
+                child = parts + (entry.name,)
+                if entry.is_dir():
+                    if _wanted_dir(child):
+                        stack.append(child)
+                elif entry.is_file() and _wanted_file(child):
+                    try:
+                        with open(entry.path, 'rb') as f:
+                            self.files['/'.join(child)] = parse_props(f.read())
+                    except OSError as e:
+                        self._log_warn(f"Cannot read {entry.path}: {e}")
+
+    def scan_image(self, path, partition=None):
+        """
+        Index the prop files inside an ext4, EROFS or F2FS partition image
+        without extracting it, as if it had been extracted to <partition>/.
+
+        Args:
+            path: Image path
+            partition: Directory the image extracts to (default: image name)
+        """
+        from imgsniff import sniff
+
+        if partition is None:
+            partition = os.path.basename(path).rsplit('.img', 1)[0]
+        info = sniff(path)
+        kind = info.get('inner') if info['type'] == 'sparse' else info['type']
+        if kind == 'ext4':
+            from ext4img import Ext4Image as reader_class
+        elif kind == 'erofs':
+            from erofsimg import ErofsImage as reader_class
+        elif kind == 'f2fs':
+            from f2fsimg import F2fsImage as reader_class
+        else:
+            raise ValueError(f"{path}: unsupported image type {kind}")
+
+        with reader_class(path, logger=self.logger) as reader:
+            _root_path, root = next(reader.walk())
+            stack = [((partition,), root)]
+            while stack:
+                parts, inode = stack.pop()
+                # ext4 and F2FS also return the file type, EROFS does not
+                for entry in reader.listdir(inode):
+                    name, ino = entry[0].decode('utf-8', errors='surrogateescape'), entry[1]
+                    child = parts + (name,)
+                    if '/' in name or not (_wanted_dir(child) or _wanted_file(child)):
+                        continue
+                    node = reader.inode(ino)
+                    if node.kind == stat.S_IFDIR:
+                        if _wanted_dir(child):
+                            stack.append((child, node))
+                    elif node.kind == stat.S_IFREG and _wanted_file(child):
+                        self.files['/'.join(child)] = parse_props(reader.read(node))
+
+    def has_primary(self):
+        """Whether system, vendor or a product partition has a build*.prop"""
+        return any(_match(name.split('/'), pattern)
+                   for name in self.files for pattern in PRIMARY)
+
+    def values(self, key, sources):
+        """
+        Values of key in the files matching sources.
+
+        Files are taken pattern by pattern, in name order within a
+        pattern, like a shell glob list.
+
+        Yields:
+            str: Values, in source order
+        """
+        seen = set()
+        names = sorted(self.files)
+        for pattern in sources:
+            for name in names:
+                if name in seen or not _match(name.split('/'), pattern):
+                    continue
+                seen.add(name)
+                value = self.files[name].get(key)
+                if value is not None:
+                    yield value
+
+    def get(self, key, sources=None):
+        """
+        First non-empty value of key, in sources or in any file.
+
+        Returns:
+            str: Value, or '' if not found
+        """
+        if sources is None:
+            candidates = (self.files[name].get(key) for name in sorted(self.files))
+        else:
+            candidates = self.values(key, sources)
+        return next((value for value in candidates if value), '')
+
+    def resolve(self):
+        """
+        Resolve the device metadata from the FIELDS table.
+
+        Returns:
+            dict: field name -> value ('' when nothing matched)
+        """
+        fields = dict.fromkeys((name for name, _steps in FIELDS), '')
+        for name, steps in FIELDS:
+            for step in steps:
+                current = fields[name]
+                if current and current not in step.replace:
+                    continue
+                if step.when and not step.when(fields):
+                    continue
+                if step.key is None:
+                    value = step.transform(fields)
+                else:
+                    value = self.get(step.key, step.sources)
+                    if value and step.transform:
+                        value = step.transform(value)
+                fields[name] = value
+        return fields
+
+
+def to_shell(fields):
+    """
+    Format fields as shell assignments, safe to eval.
+
+    Returns:
+        str: One name=value line per field
+    """
+    return ''.join(f"{name}={shlex.quote(value)}\n" for name, value in fields.items())
+
+
+def main():
+    """
+    Main function for standalone usage.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Resolve device metadata from build*.prop files'
+    )
+    parser.add_argument('root', nargs='?', default='.',
+                        help='Extracted dump directory (default: current directory)')
+    parser.add_argument('-i', '--image', action='append', default=[],
+                        help='Probe a partition image instead of a dump; '
+                             'NAME=IMAGE sets the directory it maps to')
+    parser.add_argument('-f', '--format', choices=('shell', 'json'), default='shell',
+                        help='Output format (default: shell)')
+    parser.add_argument('--index', action='store_true',
+                        help='Print the whole parsed index as JSON')
+    parser.add_argument('--get', metavar='KEY',
+                        help='Print the first value of one prop key')
+    parser.add_argument('--require', action='store_true',
+                        help='Fail if system, vendor and product have no build*.prop')
+
+    args = parser.parse_args()
+
+    index = PropIndex()
+    try:
+        if args.image:
+            for spec in args.image:
+                partition, sep, path = spec.partition('=')
+                if not sep:
+                    partition, path = None, spec
+                index.scan_image(path, partition)
+        else:
+            index.scan(args.root)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.require and not index.has_primary():
+        print("Error: no system/vendor/product build*.prop found", file=sys.stderr)
+        sys.exit(1)
+
+    if args.index:
+        json.dump(index.files, sys.stdout, indent=2, sort_keys=True)
+        print()
+    elif args.get:
+        print(index.get(args.get))
+    elif args.format == 'json':
+        json.dump(index.resolve(), sys.stdout, indent=2)
+        print()
+    else:
+        sys.stdout.write(to_shell(index.resolve()))
+
+
+if __name__ == '__main__':
+    with tool_stage():
+        main()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Remote Zip Module for DumprX
+Reads the central directory of a zip archive over HTTP Range requests and
+fetches only the members that are needed, without downloading the archive
+"""
+
+import os
+import io
+import sys
+import zlib
+import struct
+import fnmatch
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from telemetry import tool_stage
+
+
+READAHEAD_SIZE = 64 * 1024
+TAIL_SIZE = 128 * 1024
+STREAM_CHUNK_SIZE = 1024 * 1024
+DEFAULT_TIMEOUT = 30
+DEFAULT_JOBS = 4
+
+LOCAL_HEADER = struct.Struct('<4s5H3I2H')
+LOCAL_HEADER_MAGIC = b'PK\x03\x04'
+
+
+class RemoteZipError(Exception):
+    """Raised when an archive cannot be read remotely"""
+
+
+class HTTPRangeFile(io.RawIOBase):
+    """
+    Seekable read-only file object backed by HTTP Range requests.
+
+    Reads are served from a single readahead buffer, so the many small
+    reads zipfile makes while parsing the end of the archive cost one
+    request each time the position leaves the buffer.
+    """
+
+    def __init__(self, url, session=None, timeout=DEFAULT_TIMEOUT,
+                 readahead=READAHEAD_SIZE):
+        super().__init__()
+        self.url = url
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.readahead = readahead
+        self.requests = 0
+        self._pos = 0
+        self._buf_start = 0
+        self._buf = b''
+        self.size = self._probe_size()
+
+    def _probe_size(self):
+        with self.session.get(self.url, headers={'Range': 'bytes=0-0'}, stream=True,
+                              timeout=self.timeout) as r:
+            self.requests += 1
+            total = r.headers.get('Content-Range', '').rpartition('/')[2]
+            if r.status_code != 206 or not total.isdigit():
+                raise RemoteZipError(f"server does not support range requests (HTTP {r.status_code})")
+            return int(total)
+
+    def fetch(self, start, end):
+        """
+        Fetch bytes [start, end) with one request.
+
+        Returns:
+            bytes: Data received
+        """
+        end = min(end, self.size)
+        if start >= end:
+            return b''
+        r = self.session.get(self.url, headers={'Range': f'bytes={start}-{end - 1}'},
+                             timeout=self.timeout)
+        self.requests += 1
+        if r.status_code != 206:
+            raise RemoteZipError(f"HTTP {r.status_code} for bytes {start}-{end - 1}")
+        return r.content
+
+    def prefetch(self, start, end):
+        """Load [start, end) into the readahead buffer"""
+        self._buf_start = start
+        self._buf = self.fetch(start, end)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = self.size + offset
+        else:
+            raise ValueError(f"invalid whence {whence}")
+        self._pos = max(0, self._pos)
+        return self._pos
+
+    def readinto(self, b):
+        n = min(len(b), self.size - self._pos)
+        if n <= 0:
+            return 0
+        buf_end = self._buf_start + len(self._buf)
+        if not (self._buf_start <= self._pos and self._pos + n <= buf_end):
+            self.prefetch(self._pos, self._pos + max(n, self.readahead))
+        offset = self._pos - self._buf_start
+        b[:n] = self._buf[offset:offset + n]
+        self._pos += n
+        return n
+
+
+class RemoteZip:
+    """
+    Zip archive on an HTTP server that supports Range requests.
+    """
+
+    def __init__(self, url, session=None, timeout=DEFAULT_TIMEOUT, logger=None):
+        """
+        Read the end of central directory and the central directory.
+
+        Args:
+            url: Archive URL
+            session: requests.Session to reuse (optional)
+            timeout: Request timeout in seconds
+            logger: Logger instance for logging (optional)
+        """
+        self.url = url
+        self.logger = logger
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.file = HTTPRangeFile(url, self.session, timeout)
+        # EOCD, comment and ZIP64 records all live in the tail; in most
+        # archives the central directory does too
+        self.file.prefetch(max(0, self.file.size - TAIL_SIZE), self.file.size)
+        try:
+            self.zip = zipfile.ZipFile(self.file)
+        except zipfile.BadZipFile as e:
+            raise RemoteZipError(f"{url}: {e}")
+
+    def _log_info(self, message):
+        if self.logger:
+            self.logger.info(message)
+        else:
+            print(f"[INFO] {message}", file=sys.stderr)
+
+    def infolist(self):
+        return self.zip.infolist()
+
+    def match(self, patterns):
+        """
+        Select file members whose name or basename matches any pattern.
+
+        Args:
+            patterns: Iterable of fnmatch patterns
+
+        Returns:
+            list: Matching ZipInfo objects
+        """
+        selected = []
+        for info in self.zip.infolist():
+            if info.is_dir():
+                continue
+            base = os.path.basename(info.filename)
+            if any(fnmatch.fnmatchcase(info.filename, p) or fnmatch.fnmatchcase(base, p)
+                   for p in patterns):
+                selected.append(info)
+        return selected
+
+    def _data_offset(self, info):
+        header = self.file.fetch(info.header_offset,
+                                 info.header_offset + LOCAL_HEADER.size)
+        fields = LOCAL_HEADER.unpack(header)
+        if fields[0] != LOCAL_HEADER_MAGIC:
+            raise RemoteZipError(f"{info.filename}: bad local file header")
+        name_len, extra_len = fields[9], fields[10]
+        return info.header_offset + LOCAL_HEADER.size + name_len + extra_len
+
+    def iter_member(self, info):
+        """
+        Stream a member's uncompressed bytes.
+
+        Stored and deflated members are fetched with a single Range
+        request and inflated on the fly; other methods go through zipfile.
+
+        Yields:
+            bytes: Uncompressed data chunks
+        """
+        if info.flag_bits & 0x1:
+            raise RemoteZipError(f"{info.filename}: encrypted members are not supported")
+
+        if info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            with self.zip.open(info) as member:
+                while True:
+                    chunk = member.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        return
+                    yield chunk
+
+        start = self._data_offset(info)
+        end = start + info.compress_size
+        inflater = zlib.decompressobj(-15) if info.compress_type == zipfile.ZIP_DEFLATED else None
+        crc = 0
+        size = 0
+        if end > start:
+            with self.session.get(self.url, headers={'Range': f'bytes={start}-{end - 1}'},
+                                  stream=True, timeout=self.timeout) as r:
+                if r.status_code != 206:
+                    raise RemoteZipError(f"HTTP {r.status_code} fetching {info.filename}")
+                for chunk in r.iter_content(STREAM_CHUNK_SIZE):
+                    if inflater:
+                        chunk = inflater.decompress(chunk)
+                    if chunk:
+                        crc = zlib.crc32(chunk, crc)
+                        size += len(chunk)
+                        yield chunk
+            if inflater:
+                tail = inflater.flush()
+                if tail:
+                    crc = zlib.crc32(tail, crc)
+                    size += len(tail)
+                    yield tail
+        if size != info.file_size or crc != info.CRC:
+            raise RemoteZipError(f"{info.filename}: size or CRC mismatch")
+
+    def extract(self, info, output_dir, flatten=True):
+        """
+        Download one member into output_dir.
+
+        Args:
+            info: ZipInfo of the member
+            output_dir: Destination directory
+            flatten: Drop the directory part of the member name
+
+        Returns:
+            str: Path of the extracted file
+        """
+        name = os.path.basename(info.filename) if flatten else info.filename
+        out_path = os.path.join(output_dir, name)
+        if not os.path.realpath(out_path).startswith(os.path.realpath(output_dir) + os.sep):
+            raise RemoteZipError(f"{info.filename}: unsafe member path")
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        tmp_path = out_path + '.part'
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in self.iter_member(info):
+                    f.write(chunk)
+            os.replace(tmp_path, out_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._log_info(f"Fetched {info.filename} ({info.file_size} bytes)")
+        return out_path
+
+    def extract_matching(self, patterns, output_dir, jobs=DEFAULT_JOBS):
+        """
+        Download every member matching patterns, several at a time.
+
+        Returns:
+            list: Paths of the extracted files
+        """
+        selected = self.match(patterns)
+        names = [os.path.basename(i.filename) for i in selected]
+        flatten = len(set(names)) == len(names)
+        with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(selected) or 1))) as pool:
+            return list(pool.map(lambda i: self.extract(i, output_dir, flatten), selected))
+
+
+def split_patterns(values):
+    """Split repeated/comma/space separated pattern arguments"""
+    patterns = []
+    for value in values or []:
+        patterns.extend(p for p in value.replace(',', ' ').split() if p)
+    return patterns
+
+
+def main():
+    """
+    Main function for standalone usage.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Fetch selected members of a remote zip over HTTP Range requests'
+    )
+    parser.add_argument('url', help='Zip archive URL')
+    parser.add_argument('-m', '--member', action='append', default=[],
+                        help='Member name or glob (repeatable, comma/space separated)')
+    parser.add_argument('-o', '--output', default='.',
+                        help='Output directory (default: current directory)')
+    parser.add_argument('-l', '--list', action='store_true',
+                        help='List members and exit')
+    parser.add_argument('--stdout', action='store_true',
+                        help='Stream the single matching member to stdout')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS,
+                        help=f'Members fetched concurrently (default: {DEFAULT_JOBS})')
+
+    args = parser.parse_args()
+    patterns = split_patterns(args.member)
+
+    try:
+        archive = RemoteZip(args.url)
+
+        if args.list:
+            for info in archive.infolist():
+                print(f"{info.file_size}\t{info.compress_size}\t{info.filename}")
+            sys.exit(0)
+
+        if not patterns:
+            print("Error: no members requested (-m)", file=sys.stderr)
+            sys.exit(1)
+
+        if args.stdout:
+            selected = archive.match(patterns)
+            if len(selected) != 1:
+                print(f"Error: --stdout needs exactly one match, got {len(selected)}",
+                      file=sys.stderr)
+                sys.exit(2 if not selected else 1)
+            for chunk in archive.iter_member(selected[0]):
+                sys.stdout.buffer.write(chunk)
+            sys.exit(0)
+
+        paths = archive.extract_matching(patterns, args.output, args.jobs)
+        if not paths:
+            print("Error: no member matched", file=sys.stderr)
+            sys.exit(2)
+        print(f"[INFO] {len(paths)} member(s) fetched with "
+              f"{archive.file.requests} metadata request(s)", file=sys.stderr)
+    except (RemoteZipError, requests.RequestException, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    with tool_stage():
+        main()
@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+"""
+Image View Module for DumprX
+Random-access, read-only views over raw and Android sparse images, and a
+streaming sparse to raw expander (simg2img replacement)
+"""
+
+import os
+import sys
+import bisect
+import struct
+from abc import ABC, abstractmethod
+
+from telemetry import tool_stage
+
+
+SPARSE_HEADER_MAGIC = 0xED26FF3A
+SPARSE_HEADER = struct.Struct('<IHHHHIIII')
+CHUNK_HEADER = struct.Struct('<HHII')
+
+CHUNK_TYPE_RAW = 0xCAC1
+CHUNK_TYPE_FILL = 0xCAC2
+CHUNK_TYPE_DONT_CARE = 0xCAC3
+CHUNK_TYPE_CRC32 = 0xCAC4
+
+# Segment kinds yielded by ImageView.segments()
+SEG_DATA = 'data'
+SEG_ZERO = 'zero'
+SEG_FILL = 'fill'
+
+COPY_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+class ImageView(ABC):
+    """
+    Base class for read-only image views.
+
+    A view describes its content as a sequence of segments so that callers
+    can copy data without materializing it: 'data' segments point into a
+    backing file descriptor, 'zero' segments are holes and 'fill' segments
+    repeat a 4-byte pattern.
+    """
+
+    size = 0
+
+    @abstractmethod
+    def segments(self, offset, size):
+        """
+        Describe the bytes in [offset, offset + size).
+
+        Yields:
+            tuple: (SEG_DATA, length, (fd, file_offset)),
+                   (SEG_ZERO, length, None) or
+                   (SEG_FILL, length, pattern)
+        """
+
+    def pread(self, size, offset):
+        """
+        Read up to size bytes at offset.
+
+        Args:
+            size: Number of bytes to read
+            offset: Offset inside the image
+
+        Returns:
+            bytes: Data read (short only at the end of the image)
+        """
+        size = max(0, min(size, self.size - offset))
+        parts = []
+        for kind, length, arg in self.segments(offset, size):
+            if kind == SEG_DATA:
+                fd, pos = arg
+                parts.append(_pread_full(fd, length, pos))
+            elif kind == SEG_FILL:
+                parts.append(_fill_bytes(arg, length))
+            else:
+                parts.append(bytes(length))
+        return b''.join(parts)
+
+    def copy_to(self, out_fd, offset, size, out_offset):
+        """
+        Copy a range of the image into an output file descriptor.
+
+        Zero segments are skipped, so the output should be a freshly
+        truncated file for them to become holes.
+
+        Args:
+            out_fd: Destination file descriptor
+            offset: Source offset inside the image
+            size: Number of bytes to copy
+            out_offset: Destination offset inside out_fd
+        """
+        for kind, length, arg in self.segments(offset, size):
+            if kind == SEG_DATA:
+                fd, pos = arg
+                copy_range(fd, out_fd, length, pos, out_offset)
+            elif kind == SEG_FILL:
+                _write_fill(out_fd, arg, length, out_offset)
+            out_offset += length
+
+    def close(self):
+        """Release the underlying file descriptors"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RawImage(ImageView):
+    """
+    View over a plain (non-sparse) image file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.size = os.fstat(self.fd).st_size
+
+    def segments(self, offset, size):
+        size = max(0, min(size, self.size - offset))
+        if size:
+            yield (SEG_DATA, size, (self.fd, offset))
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class OffsetImage(RawImage):
+    """
+    View over a raw image that starts after a vendor header.
+
+    Used when the header could not be cut off in place (see imgstrip.py);
+    offset 0 of the view is the first byte after the header.
+    """
+
+    def __init__(self, path, offset):
+        super().__init__(path)
+        self.offset = offset
+        self.size = max(0, self.size - offset)
+
+    def segments(self, offset, size):
+        size = max(0, min(size, self.size - offset))
+        if size:
+            yield (SEG_DATA, size, (self.fd, self.offset + offset))
+
+
+class ChunkedImage(ImageView):
+    """
+    View described by a sorted table of non-overlapping chunks.
+
+    Ranges not covered by any chunk (DONT_CARE) read as zeros.
+    """
+
+    def _reset_table(self):
+        # Parallel lists: output start, length, kind, argument
+        self._starts = []
+        self._lengths = []
+        self._kinds = []
+        self._args = []
+
+    def _add(self, start, length, kind, arg):
+        if not length:
+            return
+        # A fill of zeros is a hole
+        if kind == SEG_FILL and arg == b'\x00\x00\x00\x00':
+            kind, arg = SEG_ZERO, None
+        if self._starts and self._starts[-1] + self._lengths[-1] == start \
+                and self._kinds[-1] == kind and self._continues(start, kind, arg):
+            self._lengths[-1] += length
+            return
+        self._starts.append(start)
+        self._lengths.append(length)
+        self._kinds.append(kind)
+        self._args.append(arg)
+
+    def _continues(self, start, kind, arg):
+        """Whether a chunk at start extends the last table entry"""
+        prev = self._args[-1]
+        if kind == SEG_DATA:
+            return prev[0] == arg[0] and prev[1] + self._lengths[-1] == arg[1]
+        if kind == SEG_FILL:
+            return _shift_pattern(prev, start - self._starts[-1]) == arg
+        return True
+
+    def _chunk_at(self, offset):
+        """Index of the chunk containing offset, or -1"""
+        idx = bisect.bisect_right(self._starts, offset) - 1
+        if idx >= 0 and offset < self._starts[idx] + self._lengths[idx]:
+            return idx
+        return -1
+
+    def segments(self, offset, size):
+        end = min(offset + size, self.size)
+        idx = max(0, bisect.bisect_right(self._starts, offset) - 1)
+        while offset < end:
+            if idx < len(self._starts) and offset >= self._starts[idx] + self._lengths[idx]:
+                idx += 1
+                continue
+            if idx >= len(self._starts) or offset < self._starts[idx]:
+                # Gap before the next chunk
+                nxt = self._starts[idx] if idx < len(self._starts) else end
+                length = min(nxt, end) - offset
+                yield (SEG_ZERO, length, None)
+                offset += length
+                continue
+
+            start = self._starts[idx]
+            length = min(start + self._lengths[idx], end) - offset
+            kind = self._kinds[idx]
+            if kind == SEG_DATA:
+                fd, pos = self._args[idx]
+                yield (SEG_DATA, length, (fd, pos + offset - start))
+            elif kind == SEG_FILL:
+                # Keep the pattern phase aligned to the output offset
+                yield (SEG_FILL, length, _shift_pattern(self._args[idx], offset - start))
+            else:
+                yield (SEG_ZERO, length, None)
+            offset += length
+            idx += 1
+
+
+class SparseImage(ChunkedImage):
+    """
+    View over an Android sparse image without expanding it.
+
+    The chunk table is indexed once; every read is then resolved with a
+    binary search over the output offsets of the chunks.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        try:
+            self._parse()
+        except Exception:
+            os.close(self.fd)
+            self.fd = None
+            raise
+
+    def _parse(self):
+        header = _pread_full(self.fd, SPARSE_HEADER.size, 0)
+        if len(header) < SPARSE_HEADER.size:
+            raise ValueError(f"{self.path}: file too short for a sparse header")
+
+        (magic, major, _minor, file_hdr_sz, chunk_hdr_sz, blk_sz,
+         total_blks, total_chunks, _checksum) = SPARSE_HEADER.unpack(header)
+        if magic != SPARSE_HEADER_MAGIC:
+            raise ValueError(f"{self.path}: not an Android sparse image")
+        if major != 1:
+            raise ValueError(f"{self.path}: unsupported sparse format version {major}")
+
+        self.block_size = blk_sz
+        self.size = total_blks * blk_sz
+        self._reset_table()
+
+        pos = file_hdr_sz
+        out = 0
+        for _ in range(total_chunks):
+            chunk = _pread_full(self.fd, CHUNK_HEADER.size, pos)
+            if len(chunk) < CHUNK_HEADER.size:
+                raise ValueError(f"{self.path}: truncated chunk header at {pos}")
+            chunk_type, _reserved, chunk_sz, total_sz = CHUNK_HEADER.unpack(chunk)
+            data_pos = pos + chunk_hdr_sz
+            length = chunk_sz * blk_sz
+
+            if chunk_type == CHUNK_TYPE_RAW:
+                self._add(out, length, SEG_DATA, (self.fd, data_pos))
+            elif chunk_type == CHUNK_TYPE_FILL:
+                self._add(out, length, SEG_FILL, _pread_full(self.fd, 4, data_pos))
+            elif chunk_type not in (CHUNK_TYPE_DONT_CARE, CHUNK_TYPE_CRC32):
+                raise ValueError(f"{self.path}: unknown chunk type 0x{chunk_type:04x}")
+
+            out += length
+            pos += total_sz
+
+        if out != self.size:
+            raise ValueError(
+                f"{self.path}: chunks cover {out} bytes, header says {self.size}"
+            )
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class SparseChunkImage(ChunkedImage):
+    """
+    View over an image split into several sparse files (sparsechunk.N,
+    super.N.img, super_*.img), as simg2img would write them one after the
+    other into the same output.
+
+    Each file only covers part of the image and leaves the rest as
+    DONT_CARE; where files overlap, the later one wins.
+    """
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self.parts = []
+        try:
+            for path in self.paths:
+                self.parts.append(SparseImage(path))
+            self._merge()
+        except Exception:
+            self.close()
+            raise
+
+    def _merge(self):
+        self.size = max(part.size for part in self.parts)
+        self.block_size = self.parts[0].block_size
+        self._reset_table()
+
+        bounds = set()
+        for part in self.parts:
+            for start, length in zip(part._starts, part._lengths):
+                bounds.update((start, start + length))
+        bounds = sorted(bounds)
+
+        for lo, hi in zip(bounds, bounds[1:]):
+            for part in reversed(self.parts):
+                idx = part._chunk_at(lo)
+                if idx < 0:
+                    continue
+                shift = lo - part._starts[idx]
+                kind, arg = part._kinds[idx], part._args[idx]
+                if kind == SEG_DATA:
+                    arg = (arg[0], arg[1] + shift)
+                elif kind == SEG_FILL:
+                    arg = _shift_pattern(arg, shift)
+                self._add(lo, hi - lo, kind, arg)
+                break
+
+    def close(self):
+        for part in self.parts:
+            part.close()
+        self.parts = []
+
+
+def is_sparse(path):
+    """
+    Check whether a file is an Android sparse image.
+
+    Args:
+        path: Path to the image
+
+    Returns:
+        bool: True if the file starts with the sparse magic
+    """
+    try:
+        with open(path, 'rb') as f:
+            magic = f.read(4)
+    except OSError:
+        return False
+    return len(magic) == 4 and struct.unpack('<I', magic)[0] == SPARSE_HEADER_MAGIC
+
+
+def header_offset_path(path):
+    """Sidecar recording a vendor header left in front of an image"""
+    return os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.offset")
+
+
+def header_offset(path):
+    """
+    Size of the vendor header recorded for an image.
+
+    Returns:
+        int: Offset of the filesystem inside the file, 0 if none
+    """
+    try:
+        with open(header_offset_path(path)) as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def open_image(path):
+    """
+    Open an image as a random-access view, sparse or raw.
+
+    Args:
+        path: Path to the image, or a list of sparse chunk files
+
+    Returns:
+        ImageView: SparseImage, SparseChunkImage, OffsetImage or RawImage
+    """
+    if isinstance(path, (list, tuple)):
+        if len(path) == 1:
+            return open_image(path[0])
+        return SparseChunkImage(path)
+    if is_sparse(path):
+        return SparseImage(path)
+    offset = header_offset(path)
+    if offset:
+        return OffsetImage(path, offset)
+    return RawImage(path)
+
+
+def expand(paths, out_path):
+    """
+    Write the raw image of one or more sparse files to out_path.
+
+    DONT_CARE and zero FILL chunks become holes, RAW chunks are copied
+    with copy_file_range() and nothing is buffered beyond one fill block.
+
+    Args:
+        paths: Sparse image path, or a list of sparse chunk files
+        out_path: Destination raw image
+
+    Returns:
+        int: Size of the raw image
+    """
+    with open_image(paths) as view:
+        tmp_path = out_path + '.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, view.size)
+            view.copy_to(fd, 0, view.size, 0)
+        except BaseException:
+            os.close(fd)
+            os.unlink(tmp_path)
+            raise
+        os.close(fd)
+        os.replace(tmp_path, out_path)
+        return view.size
+
+
+_copy_file_range_ok = hasattr(os, 'copy_file_range')
+
+
+def copy_range(src_fd, dst_fd, length, src_offset, dst_offset):
+    """
+    Copy bytes between file descriptors at explicit offsets.
+
+    Uses copy_file_range() when the kernel supports it (in-kernel copy,
+    reflink on btrfs/xfs) and falls back to pread/pwrite otherwise.
+    """
+    global _copy_file_range_ok
+
+    while length > 0 and _copy_file_range_ok:
+        try:
+            done = os.copy_file_range(src_fd, dst_fd, min(length, 1 << 30),
+                                      src_offset, dst_offset)
+        except OSError:
+            _copy_file_range_ok = False
+            break
+        if done <= 0:
+            break
+        length -= done
+        src_offset += done
+        dst_offset += done
+
+    while length > 0:
+        data = os.pread(src_fd, min(length, COPY_BUFFER_SIZE), src_offset)
+        if not data:
+            raise IOError(f"unexpected end of file at offset {src_offset}")
+        _pwrite_full(dst_fd, data, dst_offset)
+        length -= len(data)
+        src_offset += len(data)
+        dst_offset += len(data)
+
+
+def _pread_full(fd, size, offset):
+    parts = []
+    while size > 0:
+        data = os.pread(fd, size, offset)
+        if not data:
+            break
+        parts.append(data)
+        size -= len(data)
+        offset += len(data)
+    return b''.join(parts)
+
+
+def _pwrite_full(fd, data, offset):
+    view = memoryview(data)
+    while view:
+        done = os.pwrite(fd, view, offset)
+        view = view[done:]
+        offset += done
+
+
+def _shift_pattern(pattern, shift):
+    shift %= 4
+    return pattern[shift:] + pattern[:shift]
+
+
+def _fill_bytes(pattern, length):
+    return (pattern * (length // 4 + 1))[:length]
+
+
+def _write_fill(fd, pattern, length, offset):
+    block = _fill_bytes(pattern, min(length, COPY_BUFFER_SIZE))
+    while length > 0:
+        n = min(length, len(block))
+        _pwrite_full(fd, block[:n] if n < len(block) else block, offset)
+        length -= n
+        offset += n
+
+
+def main():
+    """
+    Main function for standalone usage (simg2img compatible).
+    """
+    import argparse
+    import shutil
+
+    parser = argparse.ArgumentParser(
+        description='Expand Android sparse images (or sparse chunks) to a raw image'
+    )
+    parser.add_argument('images', nargs='+',
+                        help='Sparse image(s) in order, followed by the raw output')
+    parser.add_argument('--move-raw', action='store_true',
+                        help='Move a single non-sparse input to the output instead of failing')
+    parser.add_argument('--check', action='store_true',
+                        help='Only print "sparse" or "raw" for each image')
+
+    args = parser.parse_args()
+
+    if args.check:
+        for path in args.images:
+            print(f"{path}\t{'sparse' if is_sparse(path) else 'raw'}")
+        sys.exit(0)
+
+    if len(args.images) < 2:
+        parser.error('need at least one input and an output')
+    inputs, output = args.images[:-1], args.images[-1]
+
+    if len(inputs) == 1 and not is_sparse(inputs[0]):
+        if not args.move_raw:
+            print(f"Error: {inputs[0]} is not a sparse image", file=sys.stderr)
+            sys.exit(3)
+        if os.path.realpath(inputs[0]) != os.path.realpath(output):
+            shutil.move(inputs[0], output)
+        print(f"[INFO] {inputs[0]} is already raw, moved to {output}")
+        sys.exit(0)
+
+    try:
+        size = expand(inputs, output)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"[INFO] {', '.join(inputs)} -> {output} ({size} bytes)")
+
+
+if __name__ == '__main__':
+    with tool_stage():
+        main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Split Files Module for DumprX
+Splits files too large for a git push into parts with copy_file_range()
+(reflinks on btrfs/xfs instead of copies), several files at a time, and
+writes a sha1 manifest plus a join script that checks the parts and
+rebuilds the files the same way
+"""
+
+import os
+import sys
+import json
+import shlex
+import string
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import parse_size
+from sparseimg import copy_range
+from telemetry import tool_stage
+
+
+MANIFEST_NAME = 'split_files.json'
+JOIN_SCRIPT_NAME = 'join_split_files.sh'
+READ_SIZE = 1024 * 1024
+# split(1)'s default two-letter suffixes: aa, ab, ... zz
+SUFFIXES = [a + b for a in string.ascii_lowercase for b in string.ascii_lowercase]
+
+# Runs inside the dump repository, so it cannot import anything from DumprX
+_JOINER = r'''
+import os, sys, json, hashlib
+
+# Every write goes through the raw fds, so copy_file_range() and the
+# read/write fallback can be mixed without a buffer to flush in between
+def copy(src, dst, length):
+    offset = 0
+    fast = hasattr(os, 'copy_file_range')
+    while offset < length:
+        done = 0
+        if fast:
+            try:
+                done = os.copy_file_range(src, dst, length - offset)
+            except OSError:
+                fast = False
+        if done <= 0:
+            data = os.read(src, min(1 << 20, length - offset))
+            if not data:
+                break
+            view = memoryview(data)
+            while view:
+                view = view[os.write(dst, view):]
+            done = len(data)
+        offset += done
+
+with open('split_files.json') as f:
+    entries = json.load(f)['files']
+failed = 0
+for entry in entries:
+    parts = entry['parts']
+    if os.path.exists(entry['path']) and not any(os.path.exists(p['path']) for p in parts):
+        continue
+    whole = hashlib.sha1()
+    bad = None
+    for part in parts:
+        digest = hashlib.sha1()
+        try:
+            with open(part['path'], 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+                    whole.update(chunk)
+        except OSError:
+            bad = part['path']
+            break
+        if digest.hexdigest() != part['sha1']:
+            bad = part['path']
+            break
+    if bad or whole.hexdigest() != entry['sha1']:
+        print(f"{entry['path']}: part {bad or '?'} is missing or corrupt", file=sys.stderr)
+        failed += 1
+        continue
+    tmp = entry['path'] + '.join'
+    with open(tmp, 'wb', buffering=0) as dst:
+        for part in parts:
+            with open(part['path'], 'rb', buffering=0) as src:
+                copy(src.fileno(), dst.fileno(), part['size'])
+    os.replace(tmp, entry['path'])
+    for part in parts:
+        os.unlink(part['path'])
+sys.exit(1 if failed else 0)
+'''
+
+
+def split_file(path, part_size):
+    """
+    Split one file into path.aa, path.ab, ... and remove it.
+
+    Parts are created with copy_file_range(); the source is read once to
+    hash each part and the whole file.
+
+    Args:
+        path: File to split
+        part_size: Size of every part but the last
+
+    Returns:
+        dict: Manifest entry (path, size, sha1, parts)
+    """
+    size = os.path.getsize(path)
+    count = max(1, -(-size // part_size))
+    if count > len(SUFFIXES):
+        raise ValueError(f"{path}: {count} parts exceed the {len(SUFFIXES)} split suffixes")
+
+    whole = hashlib.sha1()
+    parts = []
+    src_fd = os.open(path, os.O_RDONLY)
+    try:
+        for index in range(count):
+            offset = index * part_size
+            length = min(part_size, size - offset)
+            part_path = f"{path}.{SUFFIXES[index]}"
+            dst_fd = os.open(part_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            parts.append({'path': part_path, 'size': length})
+            try:
+                copy_range(src_fd, dst_fd, length, offset, 0)
+            finally:
+                os.close(dst_fd)
+            digest = hashlib.sha1()
+            done = 0
+            while done < length:
+                chunk = os.pread(src_fd, min(READ_SIZE, length - done), offset + done)
+                if not chunk:
+                    raise IOError(f"{path}: unexpected end of file")
+                digest.update(chunk)
+                whole.update(chunk)
+                done += len(chunk)
+            parts[-1]['sha1'] = digest.hexdigest()
+    except BaseException:
+        for part in parts:
+            try:
+                os.unlink(part['path'])
+            except OSError:
+                pass
+        raise
+    finally:
+        os.close(src_fd)
+    os.unlink(path)
+    return {'path': path, 'size': size, 'sha1': whole.hexdigest(), 'parts': parts}
+
+
+def write_join_script(root, entries):
+    """
+    Write split_files.json and join_split_files.sh into root.
+
+    The join script checks every part against the manifest and rebuilds
+    the files with copy_file_range() through python3, or with sha1sum and
+    cat where python3 is not available.
+    """
+    with open(os.path.join(root, MANIFEST_NAME), 'w') as f:
+        json.dump({'version': 1, 'files': entries}, f, indent=2)
+        f.write('\n')
+
+    lines = [
+        '#!/bin/bash',
+        '',
+        f'# Rebuilds the files split for git push, checking {MANIFEST_NAME}',
+        'cd "$(dirname "$0")" || exit 1',
+        'if command -v python3 >/dev/null 2>&1; then',
+        "\texec python3 - <<'EOF'",
+        _JOINER.strip(),
+        'EOF',
+        'fi',
+        '',
+        "sha1sum -c --quiet <<'EOF' || exit 1",
+    ]
+    lines += [f"{part['sha1']}  {part['path']}" for entry in entries for part in entry['parts']]
+    lines.append('EOF')
+    for entry in entries:
+        parts = ' '.join(shlex.quote(part['path']) for part in entry['parts'])
+        lines.append(f"cat {parts} > {shlex.quote(entry['path'])} && rm -f {parts}")
+    path = os.path.join(root, JOIN_SCRIPT_NAME)
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.chmod(path, 0o755)
+
+
+def split_files(paths, part_size, root='.', jobs=None):
+    """
+    Split files on a thread pool and write the manifest and join script.
+
+    Args:
+        paths: Files to split, relative to root
+        part_size: Part size in bytes
+        root: Dump directory the join script is written to
+        jobs: Files split concurrently (default: CPU count)
+
+    Returns:
+        tuple: (manifest entries of the split files, [(path, error)] of
+        the files that could not be split)
+    """
+    paths = [path for path in dict.fromkeys(paths) if os.path.isfile(os.path.join(root, path))]
+    if not paths:
+        return [], []
+
+    def task(path):
+        entry = split_file(os.path.join(root, path), part_size)
+        entry['path'] = path
+        for part in entry['parts']:
+            part['path'] = os.path.relpath(part['path'], root)
+        return entry
+
+    entries = []
+    failed = []
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        futures = [(path, pool.submit(task, path)) for path in paths]
+        for path, future in futures:
+            try:
+                entries.append(future.result())
+            except (OSError, ValueError) as e:
+                failed.append((path, e))
+    # Files that were split are gone, so their parts are recorded even
+    # when another file failed
+    if entries:
+        write_join_script(root, entries)
+    return entries, failed
+
+
+def main():
+    """
+    Main function for standalone usage.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Split large files into parts with a hash manifest and join script'
+    )
+    parser.add_argument('paths', nargs='*', help='Files to split, relative to --root')
+    parser.add_argument('-b', '--part-size', required=True,
+                        help='Part size (split -b style, e.g. 47M)')
+    parser.add_argument('-C', '--root', default='.',
+                        help='Dump directory for the manifest and join script (default: .)')
+    parser.add_argument('--from', dest='from_file', default=None,
+                        help="Read more paths from this file ('-' for stdin)")
+    parser.add_argument('-0', '--null', action='store_true',
+                        help='Paths in --from and in the output are NUL separated')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Files split concurrently (default: CPU count)')
+
+    args = parser.parse_args()
+
+    end = '\0' if args.null else '\n'
+    paths = list(args.paths)
+    if args.from_file:
+        if args.from_file == '-':
+            data = sys.stdin.buffer.read()
+        else:
+            with open(args.from_file, 'rb') as f:
+                data = f.read()
+        paths += [os.fsdecode(p) for p in data.split(end.encode()) if p]
+
+    try:
+        part_size = parse_size(args.part_size)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    entries, failed = split_files(paths, part_size, args.root, args.jobs)
+    for path, error in failed:
+        print(f"Error: {path}: {error}", file=sys.stderr)
+
+    # Every path that changed, for the output manifest
+    out = sys.stdout
+    out.reconfigure(errors='surrogateescape')
+    if entries:
+        out.write(f"{MANIFEST_NAME}{end}{JOIN_SCRIPT_NAME}{end}")
+    for entry in entries:
+        out.write(entry['path'] + end)
+        for part in entry['parts']:
+            out.write(part['path'] + end)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    with tool_stage():
+        main()
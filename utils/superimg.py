@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Super Image Reader for DumprX
+Reads logical partitions straight out of a (sparse or raw) super.img using
+the LP metadata, without converting the whole image to raw first
+"""
+
+import os
+import sys
+import struct
+import hashlib
+
+from sparseimg import ImageView, SEG_ZERO, open_image
+from telemetry import tool_stage
+
+
+LP_PARTITION_RESERVED_BYTES = 4096
+LP_METADATA_GEOMETRY_SIZE = 4096
+LP_SECTOR_SIZE = 512
+
+LP_METADATA_GEOMETRY_MAGIC = 0x616C4467
+LP_METADATA_HEADER_MAGIC = 0x414C5030
+
+LP_TARGET_TYPE_LINEAR = 0
+LP_TARGET_TYPE_ZERO = 1
+
+GEOMETRY = struct.Struct('<II32sIII')
+HEADER_V1_0 = struct.Struct('<IHHI32sI32s' + 'III' * 4)
+PARTITION = struct.Struct('<36sIIII')
+EXTENT = struct.Struct('<QIQI')
+GROUP = struct.Struct('<36sIQ')
+BLOCK_DEVICE = struct.Struct('<QIIQ36sI')
+
+
+def _cstr(raw):
+    return raw.split(b'\x00', 1)[0].decode('ascii', 'replace')
+
+
+class LogicalPartition(ImageView):
+    """
+    Random-access view over one logical partition inside a super image.
+    """
+
+    def __init__(self, super_view, name, extents, group=''):
+        self.super_view = super_view
+        self.name = name
+        self.group = group
+        # (logical_start, length, target_type, physical_offset, source)
+        self.extents = []
+        pos = 0
+        for num_sectors, target_type, target_data, target_source in extents:
+            length = num_sectors * LP_SECTOR_SIZE
+            self.extents.append((pos, length, target_type,
+                                 target_data * LP_SECTOR_SIZE, target_source))
+            pos += length
+        self.size = pos
+
+    @property
+    def is_local(self):
+        """True if every extent lives on the super block device itself"""
+        return all(e[2] != LP_TARGET_TYPE_LINEAR or e[4] == 0 for e in self.extents)
+
+    def segments(self, offset, size):
+        end = min(offset + size, self.size)
+        for start, length, target_type, phys, source in self.extents:
+            if offset >= end:
+                break
+            if start + length <= offset:
+                continue
+            n = min(start + length, end) - offset
+            if target_type == LP_TARGET_TYPE_ZERO:
+                yield (SEG_ZERO, n, None)
+            elif source != 0:
+                raise ValueError(
+                    f"{self.name}: extent on block device {source} is not part of this image"
+                )
+            else:
+                for seg in self.super_view.segments(phys + offset - start, n):
+                    yield seg
+            offset += n
+
+    def extract(self, out_path):
+        """
+        Write the partition to out_path; zero ranges become holes.
+
+        Args:
+            out_path: Destination image path
+        """
+        tmp_path = out_path + '.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, self.size)
+            self.copy_to(fd, 0, self.size, 0)
+        except Exception:
+            os.close(fd)
+            os.unlink(tmp_path)
+            raise
+        os.close(fd)
+        os.replace(tmp_path, out_path)
+
+    def stream(self, out, chunk_size=4 * 1024 * 1024):
+        """
+        Write the partition sequentially to a binary file object.
+
+        Args:
+            out: Writable binary stream (e.g. sys.stdout.buffer)
+            chunk_size: Read size per step
+        """
+        offset = 0
+        while offset < self.size:
+            data = self.pread(min(chunk_size, self.size - offset), offset)
+            out.write(data)
+            offset += len(data)
+
+
+class SuperImage:
+    """
+    Parser for the LP (dynamic partitions) metadata of a super image.
+    """
+
+    def __init__(self, path, slot=0, logger=None):
+        """
+        Open and index a super image.
+
+        Args:
+            path: Path to super.img (sparse or raw), or a list of sparse
+                chunk files making up one super image
+            slot: Metadata slot to read
+            logger: Logger instance for logging (optional)
+        """
+        self.path = path
+        self.logger = logger
+        self.view = open_image(path)
+        try:
+            self._read_geometry()
+            self._read_metadata(slot)
+        except Exception:
+            self.view.close()
+            raise
+
+    def _log_warn(self, message):
+        if self.logger:
+            self.logger.warning(message)
+        else:
+            print(f"[WARN] {message}", file=sys.stderr)
+
+    def _read_geometry(self):
+        for offset in (LP_PARTITION_RESERVED_BYTES,
+                       LP_PARTITION_RESERVED_BYTES + LP_METADATA_GEOMETRY_SIZE):
+            raw = self.view.pread(GEOMETRY.size, offset)
+            if len(raw) < GEOMETRY.size:
+                continue
+            (magic, struct_size, checksum, metadata_max_size,
+             metadata_slot_count, logical_block_size) = GEOMETRY.unpack(raw)
+            if magic != LP_METADATA_GEOMETRY_MAGIC:
+                continue
+            block = bytearray(self.view.pread(struct_size, offset))
+            block[8:40] = bytes(32)
+            if hashlib.sha256(block).digest() != checksum:
+                self._log_warn(f"Geometry checksum mismatch at offset {offset}")
+                continue
+            self.metadata_max_size = metadata_max_size
+            self.metadata_slot_count = metadata_slot_count
+            self.logical_block_size = logical_block_size
+            return
+        raise ValueError(f"{self.path}: no valid LP metadata geometry found")
+
+    def _read_metadata(self, slot):
+        base = (LP_PARTITION_RESERVED_BYTES + LP_METADATA_GEOMETRY_SIZE * 2
+                + slot * self.metadata_max_size)
+        raw = self.view.pread(HEADER_V1_0.size, base)
+        fields = HEADER_V1_0.unpack(raw)
+        (magic, major, minor, header_size, header_checksum,
+         tables_size, tables_checksum) = fields[:7]
+        if magic != LP_METADATA_HEADER_MAGIC:
+            raise ValueError(f"{self.path}: bad LP metadata header magic")
+        if major != 10:
+            raise ValueError(f"{self.path}: unsupported LP metadata version {major}.{minor}")
+
+        header = bytearray(self.view.pread(header_size, base))
+        header[12:44] = bytes(32)
+        if hashlib.sha256(header).digest() != header_checksum:
+            self._log_warn("LP metadata header checksum mismatch")
+
+        tables = self.view.pread(tables_size, base + header_size)
+        if hashlib.sha256(tables).digest() != tables_checksum:
+            self._log_warn("LP metadata tables checksum mismatch")
+
+        descriptors = [fields[7 + i * 3:10 + i * 3] for i in range(4)]
+        partitions, extents, groups, devices = [
+            self._table(tables, desc, layout)
+            for desc, layout in zip(descriptors, (PARTITION, EXTENT, GROUP, BLOCK_DEVICE))
+        ]
+
+        self.block_devices = [_cstr(d[4]) for d in devices]
+        group_names = [_cstr(g[0]) for g in groups]
+        self.partitions = []
+        for name, _attrs, first_extent, num_extents, group_index in partitions:
+            name = _cstr(name)
+            part_extents = extents[first_extent:first_extent + num_extents]
+            group = group_names[group_index] if group_index < len(group_names) else ''
+            self.partitions.append(LogicalPartition(self.view, name, part_extents, group))
+
+    @staticmethod
+    def _table(tables, descriptor, layout):
+        offset, num_entries, entry_size = descriptor
+        entries = []
+        for i in range(num_entries):
+            start = offset + i * entry_size
+            entries.append(layout.unpack_from(tables, start))
+        return entries
+
+    def get(self, name):
+        """
+        Look up a logical partition by exact name.
+
+        Returns:
+            LogicalPartition or None
+        """
+        for partition in self.partitions:
+            if partition.name == name:
+                return partition
+        return None
+
+    def find(self, name):
+        """
+        Look up a partition, preferring the _a slot like lpunpack users do.
+
+        Returns:
+            LogicalPartition or None
+        """
+        for candidate in (name + '_a', name):
+            partition = self.get(candidate)
+            if partition is not None and partition.size > 0:
+                return partition
+        return None
+
+    def close(self):
+        self.view.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    """
+    Main function for standalone usage.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Extract logical partitions from a sparse or raw super image'
+    )
+    parser.add_argument('image', nargs='+',
+                        help='super.img (sparse or raw), or its sparse chunks in order')
+    parser.add_argument('-p', '--partitions', default=None,
+                        help='Space or comma separated partition names to extract '
+                             '(the _a slot is preferred); default: all non-empty partitions')
+    parser.add_argument('-o', '--output', default='.',
+                        help='Output directory (default: current directory)')
+    parser.add_argument('-S', '--slot', type=int, default=0,
+                        help='Metadata slot to read (default: 0)')
+    parser.add_argument('-l', '--list', action='store_true',
+                        help='List partitions and exit')
+    parser.add_argument('--stdout', action='store_true',
+                        help='Stream the single requested partition to stdout')
+
+    args = parser.parse_args()
+    if args.partitions is not None:
+        args.partitions = args.partitions.replace(',', ' ').split()
+
+    try:
+        sup = SuperImage(args.image, slot=args.slot)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    with sup:
+        if args.list:
+            for partition in sup.partitions:
+                print(f"{partition.name}\t{partition.size}\t{partition.group}")
+            sys.exit(0)
+
+        if args.stdout:
+            if not args.partitions or len(args.partitions) != 1:
+                print("Error: --stdout needs exactly one partition", file=sys.stderr)
+                sys.exit(1)
+            partition = sup.find(args.partitions[0])
+            if partition is None:
+                print(f"Error: partition not found: {args.partitions[0]}", file=sys.stderr)
+                sys.exit(1)
+            partition.stream(sys.stdout.buffer)
+            sys.exit(0)
+
+        if args.partitions:
+            wanted = [(name, sup.find(name)) for name in args.partitions]
+        else:
+            wanted = [(p.name, p) for p in sup.partitions if p.size > 0]
+
+        os.makedirs(args.output, exist_ok=True)
+        failed = 0
+        for name, partition in wanted:
+            if partition is None:
+                continue
+            if not partition.is_local:
+                print(f"[WARN] {partition.name} spans other block devices, skipping",
+                      file=sys.stderr)
+                failed += 1
+                continue
+            out_path = os.path.join(args.output, f"{name}.img")
+            try:
+                partition.extract(out_path)
+                print(f"[INFO] {partition.name} -> {out_path} ({partition.size} bytes)")
+            except (OSError, ValueError) as e:
+                print(f"[ERROR] Failed to extract {partition.name}: {e}", file=sys.stderr)
+                failed += 1
+
+        sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    with tool_stage():
+        main()
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Telemetry Module for DumprX
+Records what every stage of a dump costs: wall time, CPU time (getrusage),
+bytes read and written (/proc/<pid>/io) and the peak disk usage of
+OUTDIR/TMPDIR, and renders the records as timings.json and a Chrome trace
+(chrome://tracing, https://ui.perfetto.dev)
+
+Stages are appended as JSON lines to the file named by
+DUMPRX_TELEMETRY_FILE, by log_stage_begin/log_stage_end in the shell and
+by Stage/tool_stage here; nothing is recorded while it is unset.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import resource
+
+
+EVENTS_ENV = 'DUMPRX_TELEMETRY_FILE'
+# Key of the enclosing shell stage, recorded as the parent of tool stages
+PARENT_ENV = 'DUMPRX_TELEMETRY_STAGE'
+SAMPLE_INTERVAL = 1.0
+# Disk sampling is slowed down so walking the tree takes at most 1/RATIO
+# of the time
+WALK_RATIO = 10
+COUNTERS = ('user', 'sys', 'read_bytes', 'write_bytes')
+
+
+def _now_us():
+    return time.time_ns() // 1000
+
+
+def read_io(pid='self'):
+    """
+    Read the storage I/O counters of a process, its threads and the
+    children it has waited for.
+
+    Returns:
+        tuple: (read_bytes, write_bytes), zeros where /proc/<pid>/io cannot
+        be read
+    """
+    counters = {}
+    try:
+        with open(f'/proc/{pid}/io') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                counters[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return counters.get('read_bytes', 0), counters.get('write_bytes', 0)
+
+
+def _cpu_times():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + children.ru_utime, own.ru_stime + children.ru_stime
+
+
+def emit(record, path=None):
+    """
+    Append one record to the event file (default: $DUMPRX_TELEMETRY_FILE).
+
+    Records are written with a single O_APPEND write, so concurrent
+    writers do not interleave; errors are ignored.
+    """
+    path = path or os.environ.get(EVENTS_ENV)
+    if not path:
+        return
+    line = json.dumps(record, separators=(',', ':')) + '\n'
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+class Stage:
+    """
+    Context manager recording one stage of the current process.
+
+    CPU time and I/O include child processes waited for during the stage.
+    """
+
+    def __init__(self, name, partition=None):
+        """
+        Args:
+            name: Stage name
+            partition: Partition the stage works on (optional)
+        """
+        self.name = name
+        self.partition = partition
+        self.enabled = bool(os.environ.get(EVENTS_ENV))
+        self.start = None
+
+    def __enter__(self):
+        if self.enabled:
+            self.start = (_now_us(),) + _cpu_times() + read_io()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.enabled:
+            return False
+        end = (_now_us(),) + _cpu_times() + read_io()
+        if exc_type is None:
+            status = 0
+        elif exc_type is SystemExit:
+            status = exc.code if isinstance(exc.code, int) else int(exc.code is not None)
+        else:
+            status = 1
+        record = {
+            'type': 'stage',
+            'name': self.name,
+            'partition': self.partition,
+            'parent': os.environ.get(PARENT_ENV) or None,
+            'ts': self.start[0],
+            'dur': end[0] - self.start[0],
+            'pid': os.getpid(),
+            'status': status,
+        }
+        for index, key in enumerate(COUNTERS, 1):
+            value = end[index] - self.start[index]
+            record[key] = round(value, 6) if isinstance(value, float) else value
+        emit(record)
+        return False
+
+
+def tool_stage():
+    """Stage named after the running script, for a tool's __main__ block"""
+    return Stage(os.path.splitext(os.path.basename(sys.argv[0]))[0])
+
+
+def dir_usage(dirs):
+    """
+    Measure directories like du -sx, walking nested ones only once.
+
+    Args:
+        dirs: dict label -> directory
+
+    Returns:
+        dict: label -> bytes allocated (0 for missing directories)
+    """
+    paths = {label: os.path.realpath(path) for label, path in dirs.items()}
+    usage = dict.fromkeys(paths, 0)
+    tops = {path for path in paths.values()
+            if not any(path.startswith(other + os.sep) for other in paths.values())}
+    for top in tops:
+        try:
+            device = os.stat(top).st_dev
+        except OSError:
+            continue
+        stack = [top]
+        while stack:
+            directory = stack.pop()
+            owners = [label for label, path in paths.items()
+                      if directory == path or directory.startswith(path + os.sep)]
+            total = 0
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if st.st_dev != device:
+                            continue
+                        total += st.st_blocks * 512
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+            except OSError:
+                continue
+            for label in owners:
+                usage[label] += total
+    return usage
+
+
+def sample(dirs, pid=None, interval=SAMPLE_INTERVAL, path=None):
+    """
+    Record the usage of dirs until process pid exits (or forever).
+
+    A record is written whenever the usage changes; sampling slows down
+    on large trees so the walks stay cheap.
+    """
+    last = None
+    while pid is None or _alive(pid):
+        started = time.monotonic()
+        usage = dir_usage(dirs)
+        if usage != last:
+            emit({'type': 'disk', 'ts': _now_us(), 'usage': usage}, path)
+            last = usage
+        time.sleep(max(interval, (time.monotonic() - started) * WALK_RATIO))
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def load_events(path):
+    """
+    Read an event file.
+
+    Returns:
+        tuple: (stage records sorted by start, disk records sorted by time)
+    """
+    stages = []
+    samples = []
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('type') == 'stage':
+                stages.append(record)
+            elif record.get('type') == 'disk':
+                samples.append(record)
+    stages.sort(key=lambda record: (record['ts'], -record['dur']))
+    samples.sort(key=lambda record: record['ts'])
+    return stages, samples
+
+
+def _stage_key(record):
+    if record.get('partition'):
+        return f"{record['name']}/{record['partition']}"
+    return record['name']
+
+
+def _peak_usage(start, end, samples):
+    """Largest usage per label from the sample in effect at start to end"""
+    peak = {}
+    current = None
+    for record in samples:
+        if record['ts'] <= start:
+            current = record
+            continue
+        if record['ts'] > end:
+            break
+        for label, value in record['usage'].items():
+            peak[label] = max(peak.get(label, 0), value)
+    if current:
+        for label, value in current['usage'].items():
+            peak[label] = max(peak.get(label, 0), value)
+    return peak
+
+
+def build_timings(stages, samples):
+    """
+    Summarize stage records.
+
+    Returns:
+        dict: timings.json content; times are in seconds from the first
+        stage, totals add up every stage of the same name
+    """
+    if not stages:
+        return {'version': 1, 'started': None, 'wall': 0, 'peak_disk': {},
+                'stages': [], 'totals': {}}
+    origin = min(record['ts'] for record in stages)
+    finish = max(record['ts'] + record['dur'] for record in stages)
+
+    rows = []
+    totals = {}
+    for record in stages:
+        row = {
+            'name': record['name'],
+            'partition': record.get('partition'),
+            'parent': record.get('parent'),
+            'pid': record.get('pid'),
+            'start': round((record['ts'] - origin) / 1e6, 6),
+            'wall': round(record['dur'] / 1e6, 6),
+        }
+        for key in COUNTERS:
+            row[key] = record.get(key, 0)
+        row['peak_disk'] = _peak_usage(record['ts'], record['ts'] + record['dur'], samples)
+        row['status'] = record.get('status', 0)
+        rows.append(row)
+
+        total = totals.setdefault(record['name'], dict.fromkeys(('count', 'wall') + COUNTERS, 0))
+        total['count'] += 1
+        total['wall'] += row['wall']
+        for key in COUNTERS:
+            total[key] += row[key]
+    for total in totals.values():
+        for key in ('wall', 'user', 'sys'):
+            total[key] = round(total[key], 6)
+
+    return {
+        'version': 1,
+        'started': origin / 1e6,
+        'wall': round((finish - origin) / 1e6, 6),
+        'peak_disk': _peak_usage(origin, finish, samples),
+        'stages': rows,
+        'totals': dict(sorted(totals.items(), key=lambda item: -item[1]['wall'])),
+    }
+
+
+def build_trace(stages, samples):
+    """
+    Convert stage records to the Chrome trace event format: one complete
+    ("X") event per stage on a row per process, and disk usage counters.
+
+    Returns:
+        dict: Trace JSON object
+    """
+    pid = stages[0]['pid'] if stages else 0
+    events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+               'args': {'name': 'DumprX'}}]
+    threads = {}
+    for record in stages:
+        threads.setdefault(record['pid'], _stage_key(record))
+        args = {key: record.get(key, 0) for key in COUNTERS}
+        args['status'] = record.get('status', 0)
+        if record.get('parent'):
+            args['parent'] = record['parent']
+        events.append({
+            'name': _stage_key(record),
+            'cat': record['name'],
+            'ph': 'X',
+            'ts': record['ts'],
+            'dur': record['dur'],
+            'pid': pid,
+            'tid': record['pid'],
+            'args': args,
+        })
+    for tid, name in threads.items():
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                       'args': {'name': f"{name} ({tid})"}})
+    for record in samples:
+        events.append({'name': 'disk', 'ph': 'C', 'ts': record['ts'], 'pid': pid,
+                       'args': record['usage']})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=1)
+        f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def _parse_dir(spec):
+    label, sep, path = spec.partition('=')
+    if not sep:
+        return os.path.basename(os.path.normpath(spec)) or spec, spec
+    return label, path
+
+
+def main():
+    """
+    Main function for standalone usage.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Record and report DumprX stage telemetry'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sample_parser = subparsers.add_parser('sample', help='Record directory usage')
+    sample_parser.add_argument('dirs', nargs='+', metavar='[LABEL=]DIR',
+                               help='Directories to measure')
+    sample_parser.add_argument('--pid', type=int, default=None,
+                               help='Stop when this process exits')
+    sample_parser.add_argument('--interval', type=float, default=SAMPLE_INTERVAL,
+                               help=f'Seconds between samples (default: {SAMPLE_INTERVAL})')
+    sample_parser.add_argument('-e', '--events', default=None,
+                               help=f'Event file (default: ${EVENTS_ENV})')
+
+    report_parser = subparsers.add_parser('report', help='Write timings.json and a Chrome trace')
+    report_parser.add_argument('events', help='Event file')
+    report_parser.add_argument('-o', '--output', default=None,
+                               help='timings.json path (default: stdout)')
+    report_parser.add_argument('--trace', default=None, help='Chrome trace path')
+
+    args = parser.parse_args()
+
+    if args.command == 'sample':
+        path = args.events or os.environ.get(EVENTS_ENV)
+        if not path:
+            print(f"Error: no event file (--events or ${EVENTS_ENV})", file=sys.stderr)
+            sys.exit(1)
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            sample(dict(_parse_dir(spec) for spec in args.dirs), args.pid, args.interval, path)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    try:
+        stages, samples = load_events(args.events)
+        timings = build_timings(stages, samples)
+        if args.trace:
+            _write_json(args.trace, build_trace(stages, samples))
+        if args.output:
+            _write_json(args.output, timings)
+        else:
+            json.dump(timings, sys.stdout, indent=1)
+            sys.stdout.write('\n')
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()